@@ -1,5 +1,26 @@
 from django.contrib import admin
-from .models import Denuncia
+from kiItem import shards
+from .models import Denuncia, DenunciaArquivada
+from . import moderacao
+from .exportacao import resposta_exportacao
+
+
+class FiltroShard(admin.SimpleListFilter):
+    """
+    Com vários shards (ver kiItem/shards.py), lista as denúncias de um shard; as ações sobre as
+    selecionadas valem para o shard escolhido. Sem shards o filtro não aparece.
+    """
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shards.shards()] if shards.distribuido() else []
+
+    def queryset(self, request, queryset):
+        if self.value() in shards.shards():
+            return queryset.using(self.value())
+        return queryset
+
 
 @admin.register(Denuncia)
 class DenunciaAdmin(admin.ModelAdmin):
@@ -8,9 +29,12 @@ class DenunciaAdmin(admin.ModelAdmin):
         'get_receita_titulo', 
         'get_motivo_display', 
         'get_denunciante_username', 
-        'data_denuncia'
+        'data_denuncia',
+        'status'
     ]
     list_filter = [
+        FiltroShard,
+        'status',
         'motivo_denuncia', 
         'data_denuncia', 
         'id_receita__tipo'
@@ -25,7 +49,7 @@ class DenunciaAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Informações da Denúncia', {
-            'fields': ('unique_id', 'data_denuncia')
+            'fields': ('unique_id', 'data_denuncia', 'status')
         }),
         ('Detalhes', {
             'fields': ('id_receita', 'motivo_denuncia', 'detalhamento')
@@ -51,10 +75,33 @@ class DenunciaAdmin(admin.ModelAdmin):
     get_denunciante_username.admin_order_field = 'id_denunciante__username'
     
     # Ações customizadas para o admin
-    actions = ['marcar_como_resolvida']
+    actions = ['marcar_como_resolvida', 'marcar_como_descartada', 'exportar_csv']
     
     def marcar_como_resolvida(self, request, queryset):
-        # Ação futura para marcar denúncias como resolvidas
-        # Por enquanto, apenas uma mensagem
-        self.message_user(request, f"{queryset.count()} denúncias selecionadas. Funcionalidade de resolução será implementada futuramente.")
+        alteradas = moderacao.alterar_status(queryset.values_list('unique_id', flat=True), 'resolvida')
+        self.message_user(request, f"{alteradas} denúncias marcadas como resolvidas.")
     marcar_como_resolvida.short_description = "Marcar denúncias selecionadas como resolvidas"
+    
+    def marcar_como_descartada(self, request, queryset):
+        alteradas = moderacao.alterar_status(queryset.values_list('unique_id', flat=True), 'descartada')
+        self.message_user(request, f"{alteradas} denúncias descartadas.")
+    marcar_como_descartada.short_description = "Descartar denúncias selecionadas"
+    
+    def exportar_csv(self, request, queryset):
+        # Streaming direto do banco, sem carregar as denúncias selecionadas em memória
+        return resposta_exportacao(queryset, 'csv')
+    exportar_csv.short_description = "Exportar denúncias selecionadas (CSV)"
+
+
+@admin.register(DenunciaArquivada)
+class DenunciaArquivadaAdmin(admin.ModelAdmin):
+    list_display = ['unique_id', 'id_receita', 'motivo_denuncia', 'status', 'data_denuncia', 'data_arquivamento']
+    list_filter = ['motivo_denuncia', 'status']
+    ordering = ['-data_denuncia']
+
+    # O arquivo é alimentado apenas pelo comando arquivar_denuncias
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
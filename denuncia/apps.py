@@ -5,3 +5,7 @@ class DenunciaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'denuncia'
     verbose_name = 'Sistema de Denúncias'
+
+    def ready(self):
+        # Registra os receivers que mantêm as estatísticas incrementais
+        from . import signals  # noqa: F401
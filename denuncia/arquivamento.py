@@ -0,0 +1,76 @@
+"""
+Retenção de denúncias: move denúncias moderadas para a tabela compacta DenunciaArquivada.
+
+Cada lote é copiado com INSERT ... SELECT e removido com DELETE na mesma transação.
+O DELETE não dispara sinais, então os contadores de EstatisticaDenuncia continuam
+incluindo as denúncias arquivadas; estatisticas.recalcular() soma as duas tabelas.
+Denúncias pendentes nunca são arquivadas, para não sair da fila de moderação.
+Com vários shards, cada shard arquiva as próprias denúncias na sua tabela de arquivo
+(ver kiItem/shards.py).
+"""
+from django.db import connections, transaction
+from django.db.models import Case, DateTimeField, IntegerField, Value, When
+from django.utils import timezone
+from kiItem import shards
+from .models import Denuncia, DenunciaArquivada
+
+TAMANHO_LOTE = 5000
+
+
+def _criterio(limite_data=None, todas_moderadas=False):
+    denuncias = Denuncia.objects.exclude(status='pendente')
+    if not todas_moderadas:
+        denuncias = denuncias.filter(data_denuncia__lt=limite_data)
+    return denuncias
+
+
+def _copiar_lote(ids, arquivado_em, using):
+    """INSERT ... SELECT das denúncias do lote para a tabela de arquivo"""
+    codigo_status = Case(
+        *[When(status=status, then=Value(codigo)) for status, codigo in DenunciaArquivada.CODIGO_STATUS.items()],
+        output_field=IntegerField()
+    )
+    selecao = Denuncia.objects.using(using).filter(pk__in=ids).order_by().values(
+        'unique_id', 'id_receita_id', 'id_denunciante_id', 'motivo_denuncia', 'data_denuncia',
+        codigo_status=codigo_status,
+        arquivado_em=Value(arquivado_em, output_field=DateTimeField()),
+    )
+    sql, params = selecao.query.sql_with_params()
+    opcoes = DenunciaArquivada._meta
+    colunas = ', '.join(
+        connections[using].ops.quote_name(opcoes.get_field(nome).column)
+        for nome in ['unique_id', 'id_receita', 'id_denunciante', 'motivo_denuncia', 'data_denuncia', 'status', 'data_arquivamento']
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'INSERT INTO {connections[using].ops.quote_name(opcoes.db_table)} ({colunas}) {sql}', params)
+
+
+def arquivar(limite_data=None, todas_moderadas=False, lote=TAMANHO_LOTE):
+    """
+    Arquiva, em lotes de `lote` denúncias por transação, as denúncias moderadas anteriores a
+    `limite_data` (ou todas as moderadas com todas_moderadas=True), um shard de cada vez.
+    Gera o total acumulado após cada lote.
+    """
+    if limite_data is None and not todas_moderadas:
+        raise ValueError("Informe limite_data ou todas_moderadas=True.")
+    total = 0
+    for using in shards.shards():
+        while True:
+            with transaction.atomic(using=using):
+                ids = list(
+                    _criterio(limite_data, todas_moderadas).using(using)
+                    .order_by('data_denuncia', 'unique_id')
+                    .select_for_update(skip_locked=connections[using].features.has_select_for_update_skip_locked)
+                    .values_list('unique_id', flat=True)[:lote]
+                )
+                if not ids:
+                    break
+                _copiar_lote(ids, timezone.now(), using)
+                # Remoção direta, sem sinais: as estatísticas continuam contando as denúncias arquivadas
+                Denuncia.objects.using(using).filter(pk__in=ids)._raw_delete(using)
+            total += len(ids)
+            yield total
+
+
+def quantidade_pendente_arquivamento(limite_data=None, todas_moderadas=False):
+    return sum(shards.em_todos(lambda alias: _criterio(limite_data, todas_moderadas).using(alias).count()))
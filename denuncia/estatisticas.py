@@ -0,0 +1,209 @@
+"""
+Estatísticas de denúncias mantidas de forma incremental.
+
+Cada denúncia incluída ou excluída ajusta, na mesma transação, os contadores de
+EstatisticaDenuncia. Os endpoints de estatísticas leem apenas esses contadores,
+então o custo não cresce com o tamanho da tabela de denúncias. Denúncias movidas
+para DenunciaArquivada continuam contadas (ver arquivamento.py).
+"""
+from datetime import timedelta
+from types import SimpleNamespace
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.contrib.auth.models import User
+from kiItem import shards
+from receita.models import Receita
+from .models import Denuncia, DenunciaArquivada, EstatisticaDenuncia
+
+# Quantidade de itens nos rankings e de dias na série diária
+TAMANHO_RANKING = 10
+DIAS_SERIE_DIARIA = 30
+
+
+def _dia(data):
+    return timezone.localdate(data).isoformat() if data else ''
+
+
+def _chaves(denuncia):
+    """Contadores afetados por uma denúncia: (dimensão, chave)"""
+    return [
+        ('total', ''),
+        ('motivo', str(denuncia.motivo_denuncia)),
+        ('receita', str(denuncia.id_receita_id)),
+        ('denunciante', str(denuncia.id_denunciante_id)),
+        ('dia', _dia(denuncia.data_denuncia)),
+    ]
+
+
+def _rotulo_relacionado(denuncia, nome, atributo):
+    """Atributo do objeto relacionado, sem carregá-lo inteiro quando ainda não está na instância"""
+    campo = Denuncia._meta.get_field(nome)
+    if campo.is_cached(denuncia):
+        return getattr(campo.get_cached_value(denuncia), atributo)
+    return campo.related_model._base_manager.filter(
+        pk=getattr(denuncia, campo.attname)
+    ).values_list(atributo, flat=True).first() or ''
+
+
+def _rotulos(denuncia):
+    """
+    Textos exibidos nos rankings, gravados junto dos contadores para evitar joins na leitura.
+    Cada rótulo é calculado só quando o contador é criado; os dos contadores existentes são
+    atualizados por recalcular().
+    """
+    return {
+        'motivo': denuncia.get_motivo_denuncia_display,
+        'receita': lambda: _rotulo_relacionado(denuncia, 'id_receita', 'titulo'),
+        'denunciante': lambda: _rotulo_relacionado(denuncia, 'id_denunciante', 'username'),
+    }
+
+
+def _ajustar(dimensao, chave, delta, rotulo=None):
+    contadores = EstatisticaDenuncia.objects.filter(dimensao=dimensao, chave=chave)
+    if contadores.update(quantidade=F('quantidade') + delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            EstatisticaDenuncia.objects.create(
+                dimensao=dimensao, chave=chave, rotulo=rotulo() if rotulo else '', quantidade=delta
+            )
+    except IntegrityError:
+        # Outra transação criou o contador ao mesmo tempo: basta incrementá-lo
+        contadores.update(quantidade=F('quantidade') + delta)
+
+
+def registrar_denuncia(denuncia, delta):
+    """Soma (delta=1) ou subtrai (delta=-1) uma denúncia dos contadores"""
+    rotulos = _rotulos(denuncia) if delta > 0 else {}
+    with transaction.atomic():
+        for dimensao, chave in _chaves(denuncia):
+            _ajustar(dimensao, chave, delta, rotulos.get(dimensao))
+
+
+def registrar_alteracao(anterior, denuncia):
+    """Move a denúncia entre contadores quando motivo, receita ou denunciante são alterados"""
+    antigas = set(_chaves(anterior))
+    novas = set(_chaves(denuncia))
+    if antigas == novas:
+        return
+    rotulos = _rotulos(denuncia)
+    with transaction.atomic():
+        for dimensao, chave in antigas - novas:
+            _ajustar(dimensao, chave, -1)
+        for dimensao, chave in novas - antigas:
+            _ajustar(dimensao, chave, 1, rotulos.get(dimensao))
+
+
+def estado_atual(denuncia_id, using=None):
+    """Valores gravados de uma denúncia, usados para detectar alterações antes do save"""
+    valores = Denuncia.objects.using(using).filter(pk=denuncia_id).values(
+        'motivo_denuncia', 'id_receita_id', 'id_denunciante_id', 'data_denuncia', 'status'
+    ).first()
+    return SimpleNamespace(**valores) if valores else None
+
+
+def _somar(contadores, dimensao, linhas, rotulos=None):
+    """Acumula em `contadores` as quantidades por chave; rotulos dá o texto de cada chave"""
+    for chave, quantidade in linhas:
+        chave = chave.isoformat() if dimensao == 'dia' else str(chave)
+        rotulo, atual = contadores.get((dimensao, chave), ('', 0))
+        if rotulos is not None:
+            rotulo = rotulos.get(chave, rotulo)
+        contadores[(dimensao, chave)] = (rotulo, atual + quantidade)
+
+
+def _contagens(registros):
+    """Quantidades de um conjunto de denúncias por dimensão: {dimensão: [(chave, quantidade)]}"""
+    por_dimensao = {'motivo': 'motivo_denuncia', 'receita': 'id_receita', 'denunciante': 'id_denunciante'}
+    linhas = {'total': [('', registros.count())]}
+    for dimensao, campo in por_dimensao.items():
+        linhas[dimensao] = list(registros.values_list(campo).annotate(quantidade=Count('pk')))
+    linhas['dia'] = list(registros.annotate(dia=TruncDate('data_denuncia')).values_list('dia').annotate(quantidade=Count('pk')))
+    return linhas
+
+
+def recalcular():
+    """Recalcula todos os contadores a partir das denúncias existentes e das arquivadas"""
+    contadores = {}
+    motivos = {str(codigo): texto for codigo, texto in Denuncia.MOTIVO_CHOICES}
+
+    # Denúncias distribuídas entre os shards, e arquivadas no shard onde estavam: contadas em
+    # paralelo em cada um e somadas aqui
+    parciais = shards.em_todos(lambda alias: [
+        _contagens(Denuncia.objects.using(alias).order_by()),
+        _contagens(DenunciaArquivada.objects.using(alias).order_by()),
+    ])
+    parciais = [linhas for parcial in parciais for linhas in parcial]
+    for linhas in parciais:
+        for dimensao, valores in linhas.items():
+            _somar(contadores, dimensao, valores)
+
+    def chaves(dimensao):
+        return [int(chave) for (dim, chave) in contadores if dim == dimensao]
+
+    # Rótulos buscados uma vez por dimensão, inclusive para as chaves que só existem no arquivo
+    rotulos = {
+        'motivo': motivos,
+        'receita': {str(pk): titulo for pk, titulo in Receita.objects.filter(pk__in=chaves('receita')).values_list('pk', 'titulo')},
+        'denunciante': {str(pk): nome for pk, nome in User.objects.filter(pk__in=chaves('denunciante')).values_list('pk', 'username')},
+    }
+
+    objetos = [
+        EstatisticaDenuncia(
+            dimensao=dimensao, chave=chave, quantidade=quantidade,
+            rotulo=rotulos.get(dimensao, {}).get(chave, 'Desconhecido' if dimensao == 'motivo' else rotulo)
+        )
+        for (dimensao, chave), (rotulo, quantidade) in contadores.items()
+    ]
+    with transaction.atomic():
+        EstatisticaDenuncia.objects.all().delete()
+        EstatisticaDenuncia.objects.bulk_create(objetos, batch_size=1000)
+    return len(objetos)
+
+
+def _ranking(dimensao, limite=TAMANHO_RANKING):
+    return EstatisticaDenuncia.objects.filter(dimensao=dimensao, quantidade__gt=0).order_by('-quantidade', 'chave')[:limite]
+
+
+def total_denuncias():
+    contador = EstatisticaDenuncia.objects.filter(dimensao='total', chave='').first()
+    return contador.quantidade if contador else 0
+
+
+def por_motivo():
+    """Quantidade por motivo, do mais para o menos frequente"""
+    return [
+        {'motivo_codigo': int(contador.chave), 'motivo_texto': contador.rotulo, 'quantidade': contador.quantidade}
+        for contador in _ranking('motivo', limite=len(Denuncia.MOTIVO_CHOICES))
+    ]
+
+
+def receitas_mais_denunciadas():
+    return [
+        {'id_receita': int(contador.chave), 'id_receita__titulo': contador.rotulo, 'count': contador.quantidade}
+        for contador in _ranking('receita')
+    ]
+
+
+def usuarios_que_mais_denunciam():
+    return [
+        {'id_denunciante': int(contador.chave), 'id_denunciante__username': contador.rotulo, 'count': contador.quantidade}
+        for contador in _ranking('denunciante')
+    ]
+
+
+def por_dia(dias=DIAS_SERIE_DIARIA):
+    """Série diária dos últimos dias, incluindo os dias sem denúncias"""
+    hoje = timezone.localdate()
+    inicio = hoje - timedelta(days=dias - 1)
+    contadores = dict(
+        EstatisticaDenuncia.objects.filter(dimensao='dia', chave__gte=inicio.isoformat())
+        .values_list('chave', 'quantidade')
+    )
+    serie = []
+    for deslocamento in range(dias):
+        dia = (inicio + timedelta(days=deslocamento)).isoformat()
+        serie.append({'dia': dia, 'quantidade': contadores.get(dia, 0)})
+    return serie
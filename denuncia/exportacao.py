@@ -0,0 +1,111 @@
+"""
+Exportação de denúncias em CSV ou NDJSON.
+
+As linhas são lidas com values_list().iterator() e escritas uma a uma em um
+StreamingHttpResponse: nenhum objeto de modelo é criado e a memória usada não
+depende da quantidade de denúncias exportadas.
+
+Com vários shards (ver kiItem/shards.py) as linhas de cada shard são lidas sem join, intercaladas
+pela data, e o título da receita e o nome do denunciante são buscados em 'default' a cada bloco.
+"""
+import csv
+import heapq
+import json
+from itertools import islice
+from operator import itemgetter
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from kiItem import shards
+from receita.models import Receita
+from .models import Denuncia
+
+# Linhas buscadas do banco por vez (cursor no servidor no PostgreSQL)
+TAMANHO_BLOCO = 2000
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+COLUNAS = [
+    ('unique_id', 'unique_id'),
+    ('data_denuncia', 'data_denuncia'),
+    ('status', 'status'),
+    ('motivo_denuncia', 'motivo_denuncia'),
+    ('id_receita', 'id_receita_id'),
+    ('receita_titulo', 'id_receita__titulo'),
+    ('id_denunciante', 'id_denunciante_id'),
+    ('denunciante_username', 'id_denunciante__username'),
+    ('detalhamento', 'detalhamento'),
+]
+
+
+class _Eco:
+    """Arquivo falso para o csv.writer: devolve a linha escrita em vez de guardá-la"""
+    def write(self, valor):
+        return valor
+
+
+# Colunas que vêm das tabelas globais, com o campo da denúncia que as referencia
+ROTULOS = {
+    'receita_titulo': ('id_receita', Receita, 'titulo'),
+    'denunciante_username': ('id_denunciante', User, 'username'),
+}
+
+
+def _registros(queryset, colunas):
+    nomes = [nome for nome, _ in colunas]
+    linhas = queryset.order_by('-data_denuncia', '-unique_id').values_list(*(campo for _, campo in colunas))
+    for linha in linhas.iterator(chunk_size=TAMANHO_BLOCO):
+        yield dict(zip(nomes, linha))
+
+
+def _com_rotulos(registros):
+    """Completa cada bloco de registros com os rótulos das tabelas globais, lidos de 'default'"""
+    while bloco := list(islice(registros, TAMANHO_BLOCO)):
+        for nome, (coluna, modelo, campo) in ROTULOS.items():
+            valores = dict(modelo.objects.filter(pk__in={registro[coluna] for registro in bloco}).values_list('pk', campo))
+            for registro in bloco:
+                registro[nome] = valores.get(registro[coluna])
+        # Mesma ordem de colunas da exportação sem shards
+        for registro in bloco:
+            yield {nome: registro[nome] for nome, _ in COLUNAS}
+
+
+def _registros_em_todos(queryset):
+    colunas = [(nome, campo) for nome, campo in COLUNAS if nome not in ROTULOS]
+    por_shard = [_com_rotulos(_registros(queryset.using(alias), colunas)) for alias in shards.shards()]
+    return heapq.merge(*por_shard, key=itemgetter('data_denuncia', 'unique_id'), reverse=True)
+
+
+def _linhas(queryset):
+    motivos = dict(Denuncia.MOTIVO_CHOICES)
+    registros = _registros_em_todos(queryset) if shards.distribuido() else _registros(queryset, COLUNAS)
+    for registro in registros:
+        registro['unique_id'] = str(registro['unique_id'])
+        registro['data_denuncia'] = registro['data_denuncia'].isoformat()
+        registro['motivo_texto'] = motivos.get(registro['motivo_denuncia'], 'Desconhecido')
+        yield registro
+
+
+def gerar_csv(queryset):
+    escritor = csv.writer(_Eco())
+    cabecalho = [nome for nome, _ in COLUNAS] + ['motivo_texto']
+    yield escritor.writerow(cabecalho)
+    for registro in _linhas(queryset):
+        yield escritor.writerow([registro[nome] for nome in cabecalho])
+
+
+def gerar_ndjson(queryset):
+    for registro in _linhas(queryset):
+        yield json.dumps(registro, ensure_ascii=False) + '\n'
+
+
+def resposta_exportacao(queryset, formato='csv'):
+    """StreamingHttpResponse com as denúncias do queryset no formato pedido ('csv' ou 'ndjson')"""
+    gerador = gerar_csv if formato == 'csv' else gerar_ndjson
+    resposta = StreamingHttpResponse(gerador(queryset), content_type=FORMATOS[formato])
+    nome_arquivo = f"denuncias-{timezone.localtime():%Y%m%d-%H%M%S}.{formato}"
+    resposta['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return resposta
@@ -0,0 +1,69 @@
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from .models import Denuncia
+
+
+def _inteiro(params, nome):
+    valor = params.get(nome)
+    if not valor:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValidationError({nome: "O valor deve ser um número inteiro."})
+
+
+def _data(params, nome):
+    valor = params.get(nome)
+    if not valor:
+        return None
+    try:
+        data = parse_datetime(valor) or parse_date(valor)
+    except ValueError:
+        data = None
+    if data is None:
+        raise ValidationError({nome: "Data inválida. Use o formato YYYY-MM-DD."})
+    return valor
+
+
+def filtros_denuncias(params):
+    """
+    Monta o filtro de denúncias a partir dos parâmetros de consulta
+    (motivo, receita_id, usuario_id, data_inicio, data_fim, status e search).
+    Usado pelo filtro da API e pela exportação, para que ambos aceitem os mesmos parâmetros.
+    """
+    motivo = _inteiro(params, 'motivo')
+    receita_id = _inteiro(params, 'receita_id')
+    usuario_id = _inteiro(params, 'usuario_id')
+    data_inicio = _data(params, 'data_inicio')
+    data_fim = _data(params, 'data_fim')
+    status = params.get('status')
+    search = params.get('search')  # Busca no detalhamento
+
+    # Validações
+    valid_motivos = [choice[0] for choice in Denuncia.MOTIVO_CHOICES]
+    if motivo is not None and motivo not in valid_motivos:
+        raise ValidationError({"motivo": f"Motivo inválido. Valores permitidos: {valid_motivos}"})
+
+    valid_status = [choice[0] for choice in Denuncia.STATUS_CHOICES]
+    if status and status not in valid_status:
+        raise ValidationError({"status": f"Status inválido. Valores permitidos: {', '.join(valid_status)}"})
+
+    # Construção do filtro dinâmico
+    filtros = Q()
+    if motivo is not None:
+        filtros &= Q(motivo_denuncia=motivo)
+    if receita_id is not None:
+        filtros &= Q(id_receita=receita_id)
+    if usuario_id is not None:
+        filtros &= Q(id_denunciante=usuario_id)
+    if data_inicio:
+        filtros &= Q(data_denuncia__gte=data_inicio)
+    if data_fim:
+        filtros &= Q(data_denuncia__lte=data_fim)
+    if status:
+        filtros &= Q(status=status)
+    if search:
+        filtros &= Q(detalhamento__icontains=search)
+    return filtros
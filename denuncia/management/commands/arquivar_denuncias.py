@@ -0,0 +1,34 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from denuncia import arquivamento
+
+
+class Command(BaseCommand):
+    help = (
+        'Move denúncias já moderadas (resolvidas ou descartadas) para a tabela de arquivo, em lotes. '
+        'Denúncias pendentes permanecem na fila de moderação.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=12, help='Arquiva denúncias mais antigas que N meses (padrão: 12)')
+        parser.add_argument('--todas-moderadas', action='store_true', help='Arquiva todas as denúncias moderadas, independente da data')
+        parser.add_argument('--lote', type=int, default=arquivamento.TAMANHO_LOTE, help='Denúncias por transação')
+        parser.add_argument('--simular', action='store_true', help='Apenas informa quantas denúncias seriam arquivadas')
+
+    def handle(self, *args, **options):
+        if options['meses'] < 0 or options['lote'] <= 0:
+            raise CommandError('--meses não pode ser negativo e --lote deve ser positivo.')
+        # Mês aproximado em 30 dias: a retenção não precisa de precisão de calendário
+        limite_data = timezone.now() - timedelta(days=30 * options['meses'])
+        todas_moderadas = options['todas_moderadas']
+
+        if options['simular']:
+            quantidade = arquivamento.quantidade_pendente_arquivamento(limite_data, todas_moderadas)
+            self.stdout.write(f'{quantidade} denúncias seriam arquivadas.')
+            return
+
+        total = 0
+        for total in arquivamento.arquivar(limite_data, todas_moderadas, lote=options['lote']):
+            self.stdout.write(f'{total} denúncias arquivadas...')
+        self.stdout.write(self.style.SUCCESS(f'Arquivamento concluído: {total} denúncias movidas para o arquivo.'))
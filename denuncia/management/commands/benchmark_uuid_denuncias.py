@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from denuncia.models import uuid7
+
+GERADORES = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a taxa de inserção e o tamanho dos índices de uma tabela no formato de Denuncia '
+        'usando chaves uuid4 e uuid7. Em PostgreSQL usa tabelas temporárias no banco configurado; '
+        'em SQLite usa arquivos temporários separados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=2_000_000, help='Quantidade de linhas por tabela (padrão: 2.000.000)')
+        parser.add_argument('--lote', type=int, default=10_000, help='Linhas por lote de inserção (padrão: 10.000)')
+        parser.add_argument('--database', default='default', help='Alias do banco usado no PostgreSQL')
+
+    def handle(self, *args, **options):
+        linhas, lote = options['linhas'], options['lote']
+        if linhas <= 0 or lote <= 0:
+            raise CommandError('--linhas e --lote devem ser positivos.')
+
+        conexao = connections[options['database']]
+        if conexao.vendor == 'postgresql':
+            medir = self.medir_postgresql
+        elif conexao.vendor == 'sqlite':
+            medir = self.medir_sqlite
+        else:
+            raise CommandError(f'Banco {conexao.vendor} não suportado pelo benchmark.')
+
+        self.stdout.write(f'Inserindo {linhas} linhas por tabela em lotes de {lote} ({conexao.vendor})...')
+        resultados = {nome: medir(conexao, nome, gerador, linhas, lote) for nome, gerador in GERADORES.items()}
+
+        self.stdout.write(f"{'chave':<8}{'linhas/s':>14}{'pk (MB)':>12}{'índice data (MB)':>20}")
+        for nome, (taxa, tamanho_pk, tamanho_data) in resultados.items():
+            self.stdout.write(f'{nome:<8}{taxa:>14,.0f}{tamanho_pk / 2**20:>12.1f}{tamanho_data / 2**20:>20.1f}')
+
+    def lotes(self, gerador, linhas, lote):
+        """Linhas sintéticas em ordem de inserção, com data crescente como numa tabela real"""
+        inicio = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for deslocamento in range(0, linhas, lote):
+            yield [
+                (gerador(), inicio + timedelta(seconds=numero), numero % 7 + 1)
+                for numero in range(deslocamento, min(deslocamento + lote, linhas))
+            ]
+
+    def medir_postgresql(self, conexao, nome, gerador, linhas, lote):
+        tabela = f'benchmark_denuncia_{nome}'
+        with conexao.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {tabela}')
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {tabela} ('
+                f'unique_id uuid PRIMARY KEY, data_denuncia timestamptz NOT NULL, motivo_denuncia integer NOT NULL)'
+            )
+            cursor.execute(f'CREATE INDEX {tabela}_data_idx ON {tabela} (data_denuncia DESC, unique_id DESC)')
+            decorrido = 0.0
+            for linhas_lote in self.lotes(gerador, linhas, lote):
+                inicio = time.perf_counter()
+                cursor.executemany(f'INSERT INTO {tabela} VALUES (%s, %s, %s)', linhas_lote)
+                decorrido += time.perf_counter() - inicio
+            cursor.execute(f"SELECT pg_relation_size('{tabela}_pkey'), pg_relation_size('{tabela}_data_idx')")
+            tamanho_pk, tamanho_data = cursor.fetchone()
+            cursor.execute(f'DROP TABLE {tabela}')
+        return linhas / decorrido, tamanho_pk, tamanho_data
+
+    def medir_sqlite(self, conexao, nome, gerador, linhas, lote):
+        # Cada chave em um arquivo próprio, para medir o tamanho das páginas de índice sem interferência
+        with tempfile.TemporaryDirectory() as diretorio:
+            banco = sqlite3.connect(os.path.join(diretorio, f'{nome}.sqlite3'))
+            # Mesmo formato usado pelo Django no SQLite: uuid como texto hexadecimal de 32 caracteres
+            banco.execute(
+                'CREATE TABLE denuncia (unique_id char(32) PRIMARY KEY, data_denuncia datetime NOT NULL, '
+                'motivo_denuncia integer NOT NULL)'
+            )
+            banco.execute('CREATE INDEX denuncia_data_idx ON denuncia (data_denuncia DESC, unique_id DESC)')
+            decorrido = 0.0
+            for linhas_lote in self.lotes(gerador, linhas, lote):
+                linhas_lote = [(chave.hex, data.isoformat(), motivo) for chave, data, motivo in linhas_lote]
+                inicio = time.perf_counter()
+                with banco:
+                    banco.executemany('INSERT INTO denuncia VALUES (?, ?, ?)', linhas_lote)
+                decorrido += time.perf_counter() - inicio
+            tamanho_pk, tamanho_data = self.tamanho_indices_sqlite(banco)
+            banco.close()
+        return linhas / decorrido, tamanho_pk, tamanho_data
+
+    def tamanho_indices_sqlite(self, banco):
+        """Tamanho dos índices pela tabela virtual dbstat; sem ela, estima pelo número de páginas do arquivo"""
+        try:
+            tamanhos = dict(banco.execute('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name'))
+            return tamanhos.get('sqlite_autoindex_denuncia_1', 0), tamanhos.get('denuncia_data_idx', 0)
+        except sqlite3.OperationalError:
+            tamanho_pagina = banco.execute('PRAGMA page_size').fetchone()[0]
+            paginas = banco.execute('PRAGMA page_count').fetchone()[0]
+            return tamanho_pagina * paginas, 0
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from denuncia import estatisticas, moderacao
+
+
+class Command(BaseCommand):
+    help = 'Recalcula do zero os contadores de estatísticas das denúncias e de denúncias pendentes das receitas'
+
+    def handle(self, *args, **options):
+        total = estatisticas.recalcular()
+        self.stdout.write(self.style.SUCCESS(f'{total} contadores de estatísticas recalculados.'))
+        receitas = moderacao.recalcular_pendentes()
+        self.stdout.write(self.style.SUCCESS(f'{receitas} receitas com denúncias pendentes recalculadas.'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("denuncia", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EstatisticaDenuncia",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("dimensao", models.CharField(choices=[("total", "Total"), ("motivo", "Motivo"), ("receita", "Receita"), ("denunciante", "Denunciante"), ("dia", "Dia")], max_length=20, verbose_name="Dimensão")),
+                ("chave", models.CharField(max_length=50, verbose_name="Chave")),
+                ("rotulo", models.CharField(blank=True, default="", max_length=150, verbose_name="Rótulo")),
+                ("quantidade", models.IntegerField(default=0, verbose_name="Quantidade")),
+            ],
+            options={
+                "verbose_name": "Estatística de Denúncias",
+                "verbose_name_plural": "Estatísticas de Denúncias",
+                "indexes": [models.Index(fields=["dimensao", "-quantidade"], name="denuncia_estat_ranking_idx")],
+                "unique_together": {("dimensao", "chave")},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("denuncia", "0002_estatisticadenuncia"),
+        ("receita", "0003_receita_moderacao"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="denuncia",
+            name="status",
+            field=models.CharField(choices=[("pendente", "Pendente"), ("resolvida", "Resolvida"), ("descartada", "Descartada")], default="pendente", max_length=20, verbose_name="Status"),
+        ),
+        migrations.AddIndex(
+            model_name="denuncia",
+            index=models.Index(condition=models.Q(("status", "pendente")), fields=["-data_denuncia"], name="denuncia_pendentes_idx"),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:20
+
+import denuncia.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("denuncia", "0003_denuncia_status"),
+        ("receita", "0003_receita_moderacao"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="denuncia",
+            name="unique_id",
+            field=models.UUIDField(default=denuncia.models.uuid7, editable=False, primary_key=True, serialize=False, verbose_name="ID Único"),
+        ),
+        migrations.AddIndex(
+            model_name="denuncia",
+            index=models.Index(fields=["-data_denuncia", "-unique_id"], name="denuncia_data_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="denuncia",
+            index=models.Index(fields=["motivo_denuncia", "-data_denuncia", "-unique_id"], name="denuncia_motivo_data_idx"),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("denuncia", "0004_denuncia_uuid7_indices"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DenunciaArquivada",
+            fields=[
+                ("unique_id", models.UUIDField(primary_key=True, serialize=False, verbose_name="ID Único")),
+                ("id_receita", models.IntegerField(verbose_name="ID da Receita")),
+                ("id_denunciante", models.IntegerField(verbose_name="ID do Denunciante")),
+                ("motivo_denuncia", models.SmallIntegerField(choices=[(1, "Conteúdo inadequado"), (2, "Spam"), (3, "Informações falsas"), (4, "Violação de direitos autorais"), (5, "Conteúdo ofensivo"), (6, "Receita perigosa"), (7, "Outros")], verbose_name="Motivo da Denúncia")),
+                ("status", models.SmallIntegerField(choices=[(1, "Resolvida"), (2, "Descartada")], verbose_name="Status")),
+                ("data_denuncia", models.DateTimeField(verbose_name="Data da Denúncia")),
+                ("data_arquivamento", models.DateTimeField(verbose_name="Data do Arquivamento")),
+            ],
+            options={
+                "verbose_name": "Denúncia Arquivada",
+                "verbose_name_plural": "Denúncias Arquivadas",
+                "indexes": [models.Index(fields=["id_receita"], name="denuncia_arq_receita_idx"), models.Index(fields=["data_denuncia"], name="denuncia_arq_data_idx")],
+            },
+        ),
+    ]
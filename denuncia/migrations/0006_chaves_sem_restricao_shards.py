@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('denuncia', '0005_denunciaarquivada'),
+        ('receita', '0003_receita_moderacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='denuncia',
+            name='id_denunciante',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='denuncias_feitas', to=settings.AUTH_USER_MODEL, verbose_name='Denunciante'),
+        ),
+        migrations.AlterField(
+            model_name='denuncia',
+            name='id_receita',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='denuncias', to='receita.receita', verbose_name='Receita Denunciada'),
+        ),
+    ]
@@ -1,8 +1,27 @@
 from django.db import models
 from django.contrib.auth.models import User
+from kiItem.shards import QuerySetPorUsuario
 from receita.models import Receita
+import os
+import time
 import uuid
 
+
+def uuid7(timestamp_ms=None, aleatorio=None):
+    """
+    Gera um UUID versão 7 (RFC 9562): 48 bits de timestamp em milissegundos seguidos de bits aleatórios.
+    Identificadores gerados em sequência ficam próximos no índice, ao contrário do uuid4.
+    timestamp_ms e aleatorio (10 bytes) permitem gerar dados sintéticos com datas passadas e semente fixa.
+    """
+    if timestamp_ms is None:
+        timestamp_ms = time.time_ns() // 1_000_000
+    aleatorio = os.urandom(10) if aleatorio is None else aleatorio
+    valor = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80 | int.from_bytes(aleatorio, 'big')
+    valor = (valor & ~(0xF << 76)) | (0x7 << 76)  # versão 7
+    valor = (valor & ~(0x3 << 62)) | (0x2 << 62)  # variante RFC 9562
+    return uuid.UUID(int=valor)
+
+
 class Denuncia(models.Model):
     # Motivos de denúncia como choices para melhor validação
     MOTIVO_CHOICES = [
@@ -15,9 +34,15 @@ class Denuncia(models.Model):
         (7, 'Outros'),
     ]
     
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('resolvida', 'Resolvida'),
+        ('descartada', 'Descartada'),
+    ]
+    
     unique_id = models.UUIDField(
         primary_key=True, 
-        default=uuid.uuid4, 
+        default=uuid7, 
         editable=False,
         verbose_name="ID Único"
     )
@@ -26,7 +51,9 @@ class Denuncia(models.Model):
         Receita,
         on_delete=models.CASCADE,
         verbose_name="Receita Denunciada",
-        related_name="denuncias"
+        related_name="denuncias",
+        # Sem restrição no banco: denúncias podem estar em outro shard (ver kiItem/shards.py)
+        db_constraint=False
     )
     
     motivo_denuncia = models.IntegerField(
@@ -46,7 +73,8 @@ class Denuncia(models.Model):
         User,
         on_delete=models.CASCADE,
         verbose_name="Denunciante",
-        related_name="denuncias_feitas"
+        related_name="denuncias_feitas",
+        db_constraint=False
     )
     
     data_denuncia = models.DateTimeField(
@@ -54,12 +82,32 @@ class Denuncia(models.Model):
         verbose_name="Data da Denúncia"
     )
     
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pendente',
+        verbose_name="Status"
+    )
+
+    objects = QuerySetPorUsuario.as_manager()
+    
     class Meta:
         verbose_name = "Denúncia"
         verbose_name_plural = "Denúncias"
         ordering = ['-data_denuncia']
         # Impede que o mesmo usuário denuncie a mesma receita mais de uma vez
         unique_together = ['id_receita', 'id_denunciante']
+        indexes = [
+            # Índice parcial: a fila de moderação só cresce com as denúncias pendentes, não com o histórico
+            models.Index(
+                fields=['-data_denuncia'],
+                name='denuncia_pendentes_idx',
+                condition=models.Q(status='pendente')
+            ),
+            # Paginação por cursor na ordem padrão (-data_denuncia), com o id como desempate
+            models.Index(fields=['-data_denuncia', '-unique_id'], name='denuncia_data_id_idx'),
+            models.Index(fields=['motivo_denuncia', '-data_denuncia', '-unique_id'], name='denuncia_motivo_data_idx'),
+        ]
     
     def __str__(self):
         return f"Denúncia de {self.id_denunciante.username} para receita {self.id_receita.titulo}"
@@ -67,3 +115,67 @@ class Denuncia(models.Model):
     def get_motivo_display_verbose(self):
         """Retorna o motivo da denúncia em formato legível"""
         return dict(self.MOTIVO_CHOICES).get(self.motivo_denuncia, "Não especificado")
+
+
+class EstatisticaDenuncia(models.Model):
+    """
+    Contadores agregados das denúncias (total, por motivo, por receita, por denunciante e por dia),
+    atualizados a cada inclusão ou exclusão para que as estatísticas não varram a tabela de denúncias.
+    """
+    DIMENSAO_CHOICES = [
+        ('total', 'Total'),
+        ('motivo', 'Motivo'),
+        ('receita', 'Receita'),
+        ('denunciante', 'Denunciante'),
+        ('dia', 'Dia'),
+    ]
+
+    dimensao = models.CharField(max_length=20, choices=DIMENSAO_CHOICES, verbose_name="Dimensão")
+    chave = models.CharField(max_length=50, verbose_name="Chave")
+    rotulo = models.CharField(max_length=150, blank=True, default='', verbose_name="Rótulo")
+    quantidade = models.IntegerField(default=0, verbose_name="Quantidade")
+
+    class Meta:
+        verbose_name = "Estatística de Denúncias"
+        verbose_name_plural = "Estatísticas de Denúncias"
+        unique_together = ['dimensao', 'chave']
+        # Os rankings (top 10) são lidos direto deste índice, sem ordenar a tabela
+        indexes = [
+            models.Index(fields=['dimensao', '-quantidade'], name='denuncia_estat_ranking_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_dimensao_display()} {self.chave}: {self.quantidade}"
+
+
+class DenunciaArquivada(models.Model):
+    """
+    Denúncias antigas já moderadas, movidas da tabela principal pelo comando arquivar_denuncias.
+    Guarda apenas as colunas usadas nas estatísticas, com status codificado como inteiro e
+    referências sem chave estrangeira, para manter a tabela compacta e sem custo de integridade.
+    """
+    STATUS_CODIGOS = [
+        (1, 'Resolvida'),
+        (2, 'Descartada'),
+    ]
+    # Conversão do status textual de Denuncia para o código armazenado
+    CODIGO_STATUS = {'resolvida': 1, 'descartada': 2}
+
+    unique_id = models.UUIDField(primary_key=True, verbose_name="ID Único")
+    id_receita = models.IntegerField(verbose_name="ID da Receita")
+    id_denunciante = models.IntegerField(verbose_name="ID do Denunciante")
+    motivo_denuncia = models.SmallIntegerField(choices=Denuncia.MOTIVO_CHOICES, verbose_name="Motivo da Denúncia")
+    status = models.SmallIntegerField(choices=STATUS_CODIGOS, verbose_name="Status")
+    data_denuncia = models.DateTimeField(verbose_name="Data da Denúncia")
+    data_arquivamento = models.DateTimeField(verbose_name="Data do Arquivamento")
+
+    class Meta:
+        verbose_name = "Denúncia Arquivada"
+        verbose_name_plural = "Denúncias Arquivadas"
+        indexes = [
+            models.Index(fields=['id_receita'], name='denuncia_arq_receita_idx'),
+            models.Index(fields=['data_denuncia'], name='denuncia_arq_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"Denúncia arquivada {self.unique_id}"
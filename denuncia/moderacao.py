@@ -0,0 +1,195 @@
+"""
+Fila de moderação de denúncias.
+
+Cada receita guarda quantas denúncias pendentes possui (Receita.denuncias_pendentes).
+Ao atingir DENUNCIAS_LIMITE_OCULTAR_RECEITA a receita é marcada como oculta, e as
+listagens públicas filtram apenas por esse campo, sem join com a tabela de denúncias.
+A receita volta a ser exibida quando fica abaixo do limite (denúncias descartadas ou excluídas),
+a menos que tenha alguma denúncia resolvida: a moderação confirmou que ela deve continuar oculta.
+"""
+from collections import Counter
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from kiItem import shards
+from receita.models import Receita
+from .models import Denuncia, DenunciaArquivada
+
+LIMITE_OCULTAR_PADRAO = 5
+# Receitas por UPDATE ... CASE nas atualizações em lote
+TAMANHO_LOTE = 500
+
+
+def limite_ocultar():
+    """Quantidade de denúncias pendentes a partir da qual a receita é ocultada"""
+    return getattr(settings, 'DENUNCIAS_LIMITE_OCULTAR_RECEITA', LIMITE_OCULTAR_PADRAO)
+
+
+def _ajustar_pendentes(receita_id, delta):
+    Receita.objects.filter(pk=receita_id).update(denuncias_pendentes=F('denuncias_pendentes') + delta)
+
+
+def _valores_por_receita(valores):
+    """CASE id WHEN ... THEN valor, para atualizar várias receitas em um único UPDATE"""
+    return Case(
+        *[When(pk=receita_id, then=Value(valor)) for receita_id, valor in valores.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
+def _em_lotes(valores):
+    itens = list(valores.items())
+    for inicio in range(0, len(itens), TAMANHO_LOTE):
+        yield dict(itens[inicio:inicio + TAMANHO_LOTE])
+
+
+def _ajustar_pendentes_em_lote(variacoes):
+    """Soma a variação de cada receita ({receita_id: delta}) com um UPDATE por lote"""
+    for lote in _em_lotes(variacoes):
+        Receita.objects.filter(pk__in=lote.keys()).update(
+            denuncias_pendentes=F('denuncias_pendentes') + _valores_por_receita(lote)
+        )
+
+
+def _ocultar_receitas(receita_ids):
+    """Oculta as receitas que atingiram o limite de denúncias pendentes"""
+    Receita.objects.filter(
+        pk__in=receita_ids, oculta=False, denuncias_pendentes__gte=limite_ocultar()
+    ).update(oculta=True)
+
+
+def _com_denuncia_resolvida(receita_ids):
+    """Receitas com alguma denúncia resolvida (procedente), inclusive arquivada, em qualquer shard"""
+    receita_ids = list(receita_ids)
+    codigo = DenunciaArquivada.CODIGO_STATUS['resolvida']
+    encontradas = set()
+    # Em sequência, nas conexões da thread atual: a consulta precisa enxergar as alterações de
+    # status ainda não confirmadas da moderação em andamento
+    for alias in shards.shards():
+        encontradas.update(
+            Denuncia.objects.using(alias).filter(id_receita__in=receita_ids, status='resolvida')
+            .order_by().values_list('id_receita', flat=True)
+        )
+        encontradas.update(
+            DenunciaArquivada.objects.using(alias).filter(id_receita__in=receita_ids, status=codigo)
+            .values_list('id_receita', flat=True)
+        )
+    return encontradas
+
+
+def _reexibir_receitas(receita_ids):
+    """
+    Volta a exibir as receitas que ficaram abaixo do limite. Denúncias resolvidas (procedentes)
+    mantêm a receita oculta: só voltam a ser exibidas as que não têm nenhuma.
+    """
+    ocultas = Receita.objects.filter(pk__in=receita_ids, oculta=True, denuncias_pendentes__lt=limite_ocultar())
+    candidatas = set(ocultas.values_list('pk', flat=True))
+    if candidatas:
+        ocultas.filter(pk__in=candidatas - _com_denuncia_resolvida(candidatas)).update(oculta=False)
+
+
+def registrar_pendente(receita_id, delta):
+    """Soma (delta=1) ou subtrai (delta=-1) uma denúncia pendente da receita"""
+    with transaction.atomic():
+        _ajustar_pendentes(receita_id, delta)
+        if delta > 0:
+            _ocultar_receitas([receita_id])
+
+
+def registrar_mudanca_status(receita_id, status_anterior, status_novo, receita_anterior=None):
+    """Ajusta os contadores quando uma única denúncia muda de status ou de receita"""
+    receita_anterior = receita_anterior or receita_id
+    if status_anterior == 'pendente':
+        registrar_pendente(receita_anterior, -1)
+    if status_novo == 'pendente':
+        registrar_pendente(receita_id, 1)
+    if status_anterior != 'descartada' and (status_novo != 'resolvida' or receita_anterior != receita_id):
+        # A receita anterior perdeu uma denúncia pendente ou resolvida (e não ganhou uma resolvida)
+        _reexibir_receitas([receita_anterior])
+
+
+def registrar_exclusao(receita_id, status):
+    """Ajusta os contadores quando uma denúncia é excluída"""
+    if status == 'pendente':
+        registrar_pendente(receita_id, -1)
+    if status != 'descartada':
+        _reexibir_receitas([receita_id])
+
+
+def _alterar_no_shard(alias, ids, status):
+    """Altera o status das denúncias do shard com um único UPDATE; devolve (unique_id, receita, status anterior)"""
+    # Trava as linhas afetadas para que alterações concorrentes não contem a mesma denúncia duas vezes
+    afetadas = list(
+        Denuncia.objects.using(alias).select_for_update()
+        .filter(unique_id__in=ids).exclude(status=status)
+        .values_list('unique_id', 'id_receita_id', 'status')
+    )
+    if afetadas:
+        Denuncia.objects.using(alias).filter(unique_id__in=[unique_id for unique_id, _, _ in afetadas]).update(status=status)
+    return afetadas
+
+
+def alterar_status(ids, status):
+    """
+    Altera em lote o status das denúncias informadas, com um UPDATE em cada shard onde elas estão.
+    Retorna a quantidade de denúncias alteradas.
+
+    Com vários shards, as transações de todos ficam abertas até os contadores das receitas (em
+    'default') serem atualizados, e os shards são percorridos em sequência na thread atual: as
+    travas e as alterações ainda não confirmadas precisam estar nas mesmas conexões. Se a
+    confirmação de um banco falhar depois da de outro, recalcular_pendentes corrige os contadores.
+    """
+    ids = list(ids)
+    with ExitStack() as transacoes:
+        for alias in shards.shards():
+            transacoes.enter_context(transaction.atomic(using=alias))
+        afetadas = [linha for alias in shards.shards() for linha in _alterar_no_shard(alias, ids, status)]
+        if not afetadas:
+            return 0
+
+        if status == 'pendente':
+            # Denúncias reabertas voltam a contar para a receita
+            variacao = Counter(receita_id for _, receita_id, _ in afetadas)
+        else:
+            resolvidas = Counter(receita_id for _, receita_id, anterior in afetadas if anterior == 'pendente')
+            variacao = {receita_id: -quantidade for receita_id, quantidade in resolvidas.items()}
+        _ajustar_pendentes_em_lote(variacao)
+
+        if status == 'pendente':
+            _ocultar_receitas(variacao.keys())
+        if status != 'resolvida':
+            # Receitas que perderam denúncias pendentes ou resolvidas podem voltar a ser exibidas;
+            # denúncias resolvidas (procedentes) mantêm a receita fora das listagens
+            _reexibir_receitas({receita_id for _, receita_id, anterior in afetadas if anterior != 'descartada'})
+    return len(afetadas)
+
+
+def fila_pendentes():
+    """
+    Denúncias aguardando moderação, das mais recentes para as mais antigas (usa o índice parcial).
+    Com vários shards, a fila intercala as denúncias pendentes de todos (ver shards.ConsultaEmTodos).
+    """
+    pendentes = Denuncia.objects.filter(status='pendente').order_by('-data_denuncia')
+    if shards.distribuido():
+        return shards.ConsultaEmTodos(pendentes, relacionados=('id_receita', 'id_denunciante'))
+    return pendentes.select_related('id_receita', 'id_denunciante')
+
+
+def recalcular_pendentes():
+    """Recalcula do zero os contadores de denúncias pendentes e oculta as receitas acima do limite"""
+    # Soma das contagens de cada shard (ver kiItem/shards.py)
+    pendentes = Counter()
+    for parcial in shards.em_todos(lambda alias: list(
+        Denuncia.objects.using(alias).filter(status='pendente').order_by()
+        .values('id_receita').annotate(quantidade=Count('pk'))
+        .values_list('id_receita', 'quantidade')
+    )):
+        pendentes.update(dict(parcial))
+    with transaction.atomic():
+        Receita.objects.exclude(pk__in=pendentes.keys()).exclude(denuncias_pendentes=0).update(denuncias_pendentes=0)
+        for lote in _em_lotes(pendentes):
+            Receita.objects.filter(pk__in=lote.keys()).update(denuncias_pendentes=_valores_por_receita(lote))
+        _ocultar_receitas(pendentes.keys())
+    return len(pendentes)
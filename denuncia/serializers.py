@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from receita.models import Receita
+from kiItem.carregador import CarregamentoEmLoteMixin
 from .models import Denuncia
 
-class DenunciaSerializer(serializers.ModelSerializer):
+class DenunciaSerializer(CarregamentoEmLoteMixin, serializers.ModelSerializer):
     # Campos adicionais para exibição
     motivo_denuncia_display = serializers.CharField(source='get_motivo_denuncia_display', read_only=True)
     denunciante_username = serializers.CharField(source='id_denunciante.username', read_only=True)
@@ -20,11 +21,15 @@ class DenunciaSerializer(serializers.ModelSerializer):
             'id_denunciante',
             'denunciante_username',
             'receita_titulo',
-            'data_denuncia'
+            'data_denuncia',
+            'status'
         ]
+        # Usuário e receita de cada denúncia, em lote quando a consulta não tem select_related
+        carregar_em_lote = ['id_denunciante', 'id_receita']
         extra_kwargs = {
             'unique_id': {'read_only': True},
             'data_denuncia': {'read_only': True},
+            'status': {'read_only': True},  # Alterado apenas pelos endpoints de moderação
             'id_receita': {
                 'required': True,
                 'error_messages': {
@@ -74,8 +79,9 @@ class DenunciaSerializer(serializers.ModelSerializer):
         id_denunciante = data.get('id_denunciante')
         
         # Verifica se já existe uma denúncia desta receita por este usuário
-        if self.instance is None:  # Apenas para criação, não para atualização
-            if Denuncia.objects.filter(id_receita=id_receita, id_denunciante=id_denunciante).exists():
+        if self.instance is None and id_denunciante is not None:  # Apenas para criação, não para atualização
+            # Busca no shard do denunciante (ver kiItem/shards.py)
+            if Denuncia.objects.do_usuario(id_denunciante.pk).filter(id_receita=id_receita).exists():
                 raise serializers.ValidationError({
                     'non_field_errors': ['Você já denunciou esta receita anteriormente.']
                 })
@@ -83,7 +89,7 @@ class DenunciaSerializer(serializers.ModelSerializer):
         return data
 
 # Serializer simplificado para listagem
-class DenunciaListSerializer(serializers.ModelSerializer):
+class DenunciaListSerializer(CarregamentoEmLoteMixin, serializers.ModelSerializer):
     motivo_denuncia_display = serializers.CharField(source='get_motivo_denuncia_display', read_only=True)
     denunciante_username = serializers.CharField(source='id_denunciante.username', read_only=True)
     receita_titulo = serializers.CharField(source='id_receita.titulo', read_only=True)
@@ -96,5 +102,16 @@ class DenunciaListSerializer(serializers.ModelSerializer):
             'motivo_denuncia_display',
             'denunciante_username',
             'receita_titulo',
-            'data_denuncia'
+            'data_denuncia',
+            'status'
         ]
+        carregar_em_lote = ['id_denunciante', 'id_receita']
+
+# Serializers de entrada para a moderação
+class AlterarStatusDenunciaSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Denuncia.STATUS_CHOICES, required=False)
+
+
+class ModerarDenunciasSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=1000)
+    status = serializers.ChoiceField(choices=Denuncia.STATUS_CHOICES, default='resolvida')
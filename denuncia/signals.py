@@ -0,0 +1,63 @@
+import copy
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from kiItem import shards
+from . import estatisticas, moderacao
+from .models import Denuncia
+
+
+@receiver(pre_save, sender=Denuncia)
+def guardar_estado_anterior(sender, instance, raw=False, using=None, **kwargs):
+    """Guarda os valores gravados antes de uma alteração, para ajustar os contadores"""
+    if raw or instance._state.adding:
+        return
+    instance._estado_anterior = estatisticas.estado_atual(instance.pk, using=using)
+
+
+def _apos_gravar(using, funcao, *args):
+    """
+    Os contadores (estatísticas e fila de moderação) ficam em 'default'. Denúncias gravadas em
+    'default' os atualizam na mesma transação; nas gravadas em outro shard (ver kiItem/shards.py)
+    as transações são independentes, e os contadores só são atualizados depois da confirmação no
+    shard, para não contar uma gravação desfeita. Uma falha entre as duas confirmações deixa os
+    contadores defasados até estatisticas.recalcular() e moderacao.recalcular_pendentes().
+    """
+    if shards.distribuido() and using in shards.shards()[1:]:
+        transaction.on_commit(lambda: funcao(*args), using=using)
+    else:
+        funcao(*args)
+
+
+def _contar_gravacao(denuncia, created, anterior):
+    if created:
+        estatisticas.registrar_denuncia(denuncia, 1)
+        if denuncia.status == 'pendente':
+            moderacao.registrar_pendente(denuncia.id_receita_id, 1)
+        return
+    if anterior is not None:
+        estatisticas.registrar_alteracao(anterior, denuncia)
+        if (anterior.status, anterior.id_receita_id) != (denuncia.status, denuncia.id_receita_id):
+            moderacao.registrar_mudanca_status(
+                denuncia.id_receita_id, anterior.status, denuncia.status, receita_anterior=anterior.id_receita_id
+            )
+
+
+def _contar_exclusao(denuncia):
+    estatisticas.registrar_denuncia(denuncia, -1)
+    moderacao.registrar_exclusao(denuncia.id_receita_id, denuncia.status)
+
+
+@receiver(post_save, sender=Denuncia)
+def atualizar_estatisticas_ao_salvar(sender, instance, created, raw=False, using=None, **kwargs):
+    """Ajusta os contadores de estatísticas e de denúncias pendentes na inclusão ou alteração (ver _apos_gravar)"""
+    if raw:
+        return
+    # Cópia com os valores gravados: a instância pode mudar antes de uma atualização adiada
+    _apos_gravar(using, _contar_gravacao, copy.copy(instance), created, getattr(instance, '_estado_anterior', None))
+
+
+@receiver(post_delete, sender=Denuncia)
+def atualizar_estatisticas_ao_excluir(sender, instance, using=None, **kwargs):
+    """Remove a denúncia excluída dos contadores de estatísticas e de denúncias pendentes"""
+    _apos_gravar(using, _contar_exclusao, copy.copy(instance))
@@ -1,3 +1,383 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from receita.models import Receita
+from . import arquivamento, estatisticas, moderacao
+from .models import Denuncia, DenunciaArquivada, EstatisticaDenuncia
 
-# Create your tests here.
+
+class EstatisticasDenunciaTests(TestCase):
+    """Os contadores incrementais precisam coincidir com os recalculados do zero"""
+
+    def setUp(self):
+        self.usuarios = [User.objects.create(username=f'usuario{numero}', email=f'u{numero}@kitem.com') for numero in range(3)]
+        self.receitas = [
+            Receita.objects.create(
+                id_usuario=self.usuarios[0], titulo=f'Receita {numero}', descricao='Descrição',
+                tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+            )
+            for numero in range(3)
+        ]
+
+    def contadores(self):
+        return set(
+            EstatisticaDenuncia.objects.filter(quantidade__gt=0)
+            .values_list('dimensao', 'chave', 'rotulo', 'quantidade')
+        )
+
+    def test_contadores_incrementais_iguais_aos_recalculados(self):
+        denuncias = [
+            Denuncia.objects.create(id_receita=receita, id_denunciante=usuario, motivo_denuncia=motivo)
+            for receita, usuario, motivo in [
+                (self.receitas[0], self.usuarios[1], 1), (self.receitas[0], self.usuarios[2], 2),
+                (self.receitas[1], self.usuarios[1], 2), (self.receitas[2], self.usuarios[2], 3),
+            ]
+        ]
+        denuncias[0].id_denunciante = self.usuarios[0]
+        denuncias[0].save()
+        denuncias[1].motivo_denuncia = 4
+        denuncias[1].id_receita = self.receitas[1]
+        denuncias[1].save()
+        denuncias[3].delete()
+
+        incrementais = self.contadores()
+        self.assertIn(('total', '', '', 3), incrementais)
+        estatisticas.recalcular()
+        self.assertEqual(self.contadores(), incrementais)
+
+    def test_rotulos_sem_carregar_os_relacionados(self):
+        Denuncia.objects.create(id_receita=self.receitas[0], id_denunciante=self.usuarios[1], motivo_denuncia=1)
+        denuncia = Denuncia(id_receita_id=self.receitas[0].pk, id_denunciante_id=self.usuarios[2].pk, motivo_denuncia=1)
+        # Contadores de total, motivo e receita já existem: só o do novo denunciante busca o rótulo
+        with CaptureQueriesContext(connection) as consultas:
+            estatisticas.registrar_denuncia(denuncia, 1)
+        self.assertEqual(sum('auth_user' in consulta['sql'] for consulta in consultas.captured_queries), 1)
+        self.assertFalse(any('receita_receita' in consulta['sql'] for consulta in consultas.captured_queries))
+        self.assertEqual(
+            EstatisticaDenuncia.objects.get(dimensao='denunciante', chave=str(self.usuarios[2].pk)).rotulo, 'usuario2'
+        )
+
+    def test_arquivadas_continuam_nas_estatisticas(self):
+        limite = timezone.now() - timedelta(days=30)
+        antigas = {}
+        for numero, status in enumerate(['resolvida', 'descartada', 'pendente']):
+            denuncia = Denuncia.objects.create(
+                id_receita=self.receitas[numero], id_denunciante=self.usuarios[1], motivo_denuncia=numero + 1, status=status
+            )
+            antigas[status] = denuncia.pk
+        recente = Denuncia.objects.create(
+            id_receita=self.receitas[0], id_denunciante=self.usuarios[2], motivo_denuncia=1, status='resolvida'
+        )
+        # update() não passa pelos sinais: os contadores por dia são refeitos antes do arquivamento
+        Denuncia.objects.filter(pk__in=antigas.values()).update(data_denuncia=limite - timedelta(days=1))
+        estatisticas.recalcular()
+        contadores = self.contadores()
+
+        self.assertEqual(list(arquivamento.arquivar(limite_data=limite, lote=1)), [1, 2])
+        self.assertEqual(
+            set(Denuncia.objects.values_list('pk', flat=True)), {antigas['pendente'], recente.pk}
+        )
+        self.assertEqual(
+            dict(DenunciaArquivada.objects.values_list('unique_id', 'status')),
+            {antigas['resolvida']: 1, antigas['descartada']: 2}
+        )
+        arquivada = DenunciaArquivada.objects.get(pk=antigas['descartada'])
+        self.assertEqual(
+            (arquivada.id_receita, arquivada.id_denunciante, arquivada.motivo_denuncia),
+            (self.receitas[1].pk, self.usuarios[1].pk, 2)
+        )
+        # O DELETE do arquivamento não passa pelos sinais, e recalcular() soma as duas tabelas
+        self.assertEqual(self.contadores(), contadores)
+        estatisticas.recalcular()
+        self.assertEqual(self.contadores(), contadores)
+
+
+@override_settings(DENUNCIAS_LIMITE_OCULTAR_RECEITA=2)
+class ModeracaoTests(TestCase):
+    """Ocultação automática ao atingir o limite de denúncias pendentes e reexibição após a moderação"""
+
+    def setUp(self):
+        cache.clear()
+        autor = User.objects.create(username='autor', email='autor@kitem.com')
+        self.administrador = User.objects.create(username='admin', email='admin@kitem.com', is_staff=True)
+        self.receita = Receita.objects.create(
+            id_usuario=autor, titulo='Bolo denunciado', descricao='Descrição',
+            tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+        )
+        self.outra = Receita.objects.create(
+            id_usuario=autor, titulo='Bolo de fubá', descricao='Descrição',
+            tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+        )
+        self.denunciantes = [User.objects.create(username=f'denunciante{numero}', email=f'd{numero}@kitem.com') for numero in range(3)]
+
+    def denunciar(self, quantidade, inicio=0):
+        return [
+            Denuncia.objects.create(id_receita=self.receita, id_denunciante=usuario, motivo_denuncia=1)
+            for usuario in self.denunciantes[inicio:inicio + quantidade]
+        ]
+
+    def estado(self):
+        self.receita.refresh_from_db()
+        return self.receita.oculta, self.receita.denuncias_pendentes
+
+    def ids_listados(self):
+        """Ids da receita denunciada em cada listagem pública"""
+        listagens = {
+            'lista': self.client.get('/api/receitas/').json(),
+            'filtro': self.client.get('/api/receitas/filtrar/', {'search': 'Bolo'}).json(),
+            'categoria': self.client.get('/api/receitas/categoria/bolos/').json()['receitas'],
+        }
+        return {nome: self.receita.pk in [receita['id'] for receita in receitas] for nome, receitas in listagens.items()}
+
+    def test_limite_oculta_a_receita_das_listagens(self):
+        self.denunciar(1)
+        self.assertEqual(self.estado(), (False, 1))
+        self.assertEqual(self.ids_listados(), {'lista': True, 'filtro': True, 'categoria': True})
+
+        self.denunciar(1, inicio=1)
+        self.assertEqual(self.estado(), (True, 2))
+        self.assertEqual(self.ids_listados(), {'lista': False, 'filtro': False, 'categoria': False})
+        # Receita oculta continua acessível pelo id
+        self.assertEqual(self.client.get(f'/api/receitas/{self.receita.pk}/').status_code, 200)
+
+    def test_descartar_reexibe_e_reabrir_oculta_de_novo(self):
+        primeira, _ = self.denunciar(2)
+        self.assertEqual(moderacao.alterar_status([primeira.pk], 'descartada'), 1)
+        self.assertEqual(self.estado(), (False, 1))
+
+        resposta = self.client.patch(
+            f'/api/denuncias/{primeira.pk}/toggle-status/', {'status': 'pendente'}, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.administrador).access_token}'
+        )
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['status'], 'pendente')
+        self.assertEqual(self.estado(), (True, 2))
+
+    def test_denuncia_resolvida_mantem_a_receita_oculta(self):
+        resolvida, descartada, excluida = self.denunciar(3)
+        moderacao.alterar_status([resolvida.pk], 'resolvida')
+        self.assertEqual(self.estado(), (True, 2))
+        moderacao.alterar_status([descartada.pk], 'descartada')
+        self.assertEqual(self.estado(), (True, 1))
+        excluida.delete()
+        self.assertEqual(self.estado(), (True, 0))
+
+        # Sem denúncias procedentes, a receita volta às listagens
+        resolvida.refresh_from_db()
+        resolvida.status = 'descartada'
+        resolvida.save()
+        self.assertEqual(self.estado(), (False, 0))
+
+    def test_excluir_denuncia_pendente_reexibe_a_receita(self):
+        primeira, _ = self.denunciar(2)
+        self.assertEqual(self.estado(), (True, 2))
+        primeira.delete()
+        self.assertEqual(self.estado(), (False, 1))
+
+    def test_recalcular_pendentes(self):
+        self.denunciar(2)
+        Receita.objects.filter(pk=self.receita.pk).update(denuncias_pendentes=0, oculta=False)
+        self.assertEqual(moderacao.recalcular_pendentes(), 1)
+        self.assertEqual(self.estado(), (True, 2))
+
+
+class PaginacaoCursorDenunciasTests(TestCase):
+    """Paginação por cursor (keyset) do filtro de denúncias"""
+
+    def setUp(self):
+        autor = User.objects.create(username='autor', email='autor@kitem.com')
+        receita = Receita.objects.create(
+            id_usuario=autor, titulo='Bolo', descricao='Descrição',
+            tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+        )
+        denunciantes = [User.objects.create(username=f'denunciante{numero}', email=f'd{numero}@kitem.com') for numero in range(7)]
+        denuncias = [Denuncia.objects.create(id_receita=receita, id_denunciante=usuario, motivo_denuncia=1) for usuario in denunciantes]
+        # Cinco denúncias com a mesma data: o unique_id desempata, inclusive entre páginas
+        empate = timezone.now() - timedelta(hours=1)
+        Denuncia.objects.filter(pk__in=[denuncia.pk for denuncia in denuncias[:5]]).update(data_denuncia=empate)
+        self.ordem = [str(pk) for pk in Denuncia.objects.order_by('-data_denuncia', '-unique_id').values_list('pk', flat=True)]
+
+    def test_percorre_todas_as_paginas_sem_repetir_com_datas_iguais(self):
+        vistos, cursor, paginas = [], None, 0
+        while True:
+            parametros = {'limite': 2, **({'cursor': cursor} if cursor else {})}
+            resposta = self.client.get('/api/denuncias/filtrar/', parametros)
+            self.assertEqual(resposta.status_code, 200)
+            dados = resposta.json()
+            vistos += [denuncia['unique_id'] for denuncia in dados['denuncias']]
+            paginas += 1
+            cursor = dados['proximo_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(vistos, self.ordem)
+        self.assertEqual(paginas, 4)
+
+    def test_cursor_malformado_responde_400(self):
+        invalidos = [
+            'nao-e-um-cursor',
+            base64.urlsafe_b64encode(b'sem-separador').decode(),
+            base64.urlsafe_b64encode(b'ontem|123').decode(),
+            base64.urlsafe_b64encode(f'{timezone.now().isoformat()}|nao-e-uuid'.encode()).decode(),
+        ]
+        for cursor in invalidos:
+            resposta = self.client.get('/api/denuncias/filtrar/', {'cursor': cursor})
+            self.assertEqual(resposta.status_code, 400, cursor)
+            self.assertIn('cursor', resposta.json())
+        self.assertEqual(self.client.get('/api/denuncias/filtrar/', {'limite': 'dez'}).status_code, 400)
+
+
+class ExportacaoDenunciasTests(TestCase):
+    """Conteúdo da exportação em CSV e NDJSON, filtros e ação de exportação do admin"""
+
+    CABECALHO = [
+        'unique_id', 'data_denuncia', 'status', 'motivo_denuncia', 'id_receita', 'receita_titulo',
+        'id_denunciante', 'denunciante_username', 'detalhamento', 'motivo_texto',
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.administrador = User.objects.create(
+            username='admin', email='admin@kitem.com', is_staff=True, is_superuser=True
+        )
+        autor = User.objects.create(username='autor', email='autor@kitem.com')
+        self.bolo, self.torta = [
+            Receita.objects.create(
+                id_usuario=autor, titulo=titulo, descricao='Descrição',
+                tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+            )
+            for titulo in ('Bolo', 'Torta')
+        ]
+        self.ana, self.bia = [User.objects.create(username=nome, email=f'{nome}@kitem.com') for nome in ('ana', 'bia')]
+        self.denuncias = {}
+        for nome, receita, usuario, motivo, mes, detalhamento in [
+            ('janeiro', self.bolo, self.ana, 2, 1, 'Texto com vírgula, "aspas" e acento'),
+            ('fevereiro', self.torta, self.ana, 3, 2, None),
+            ('marco', self.bolo, self.bia, 2, 3, 'Repetida'),
+        ]:
+            denuncia = Denuncia.objects.create(
+                id_receita=receita, id_denunciante=usuario, motivo_denuncia=motivo, detalhamento=detalhamento
+            )
+            data = datetime(2026, mes, 10, 12, tzinfo=dt_timezone.utc)
+            Denuncia.objects.filter(pk=denuncia.pk).update(data_denuncia=data)
+            self.denuncias[nome] = (str(denuncia.pk), data)
+
+    def exportar(self, **parametros):
+        resposta = self.client.get(
+            '/api/denuncias/exportar/', parametros,
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.administrador).access_token}'
+        )
+        conteudo = b''.join(resposta.streaming_content).decode() if resposta.streaming else None
+        return resposta, conteudo
+
+    def ids_exportados(self, **parametros):
+        resposta, conteudo = self.exportar(formato='ndjson', **parametros)
+        self.assertEqual(resposta.status_code, 200, parametros)
+        return [json.loads(linha)['unique_id'] for linha in conteudo.splitlines()]
+
+    def test_csv_com_cabecalho_e_uma_linha_por_denuncia(self):
+        resposta, conteudo = self.exportar()
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertRegex(resposta['Content-Disposition'], r'^attachment; filename="denuncias-\d{8}-\d{6}\.csv"$')
+
+        cabecalho, *linhas = list(csv.reader(conteudo.splitlines()))
+        self.assertEqual(cabecalho, self.CABECALHO)
+        unique_id, data = self.denuncias['janeiro']
+        # Da mais recente para a mais antiga
+        self.assertEqual([linha[0] for linha in linhas], [self.denuncias[nome][0] for nome in ('marco', 'fevereiro', 'janeiro')])
+        self.assertEqual(linhas[-1], [
+            unique_id, data.isoformat(), 'pendente', '2', str(self.bolo.pk), 'Bolo',
+            str(self.ana.pk), 'ana', 'Texto com vírgula, "aspas" e acento', 'Spam',
+        ])
+        # Detalhamento vazio vira campo vazio
+        self.assertEqual(linhas[1][8], '')
+
+    def test_ndjson_com_um_objeto_por_linha(self):
+        resposta, conteudo = self.exportar(formato='ndjson')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], 'application/x-ndjson')
+        self.assertTrue(resposta['Content-Disposition'].endswith('.ndjson"'))
+
+        registros = [json.loads(linha) for linha in conteudo.splitlines()]
+        self.assertEqual(len(registros), 3)
+        unique_id, data = self.denuncias['fevereiro']
+        self.assertEqual(registros[1], {
+            'unique_id': unique_id, 'data_denuncia': data.isoformat(), 'status': 'pendente', 'motivo_denuncia': 3,
+            'id_receita': self.torta.pk, 'receita_titulo': 'Torta', 'id_denunciante': self.ana.pk,
+            'denunciante_username': 'ana', 'detalhamento': None, 'motivo_texto': 'Informações falsas',
+        })
+
+    def test_filtros(self):
+        ids = {nome: unique_id for nome, (unique_id, _) in self.denuncias.items()}
+        casos = [
+            ({'motivo': 2}, ['marco', 'janeiro']),
+            ({'receita_id': self.torta.pk}, ['fevereiro']),
+            ({'usuario_id': self.ana.pk}, ['fevereiro', 'janeiro']),
+            ({'data_inicio': '2026-02-01', 'data_fim': '2026-02-28'}, ['fevereiro']),
+            ({'data_inicio': '2026-02-01', 'motivo': 2}, ['marco']),
+            ({'search': 'repetida'}, ['marco']),
+            ({'status': 'resolvida'}, []),
+        ]
+        for parametros, esperados in casos:
+            self.assertEqual(self.ids_exportados(**parametros), [ids[nome] for nome in esperados], parametros)
+
+        self.assertEqual(self.exportar(formato='xml')[0].status_code, 400)
+        self.assertEqual(self.exportar(motivo=99)[0].status_code, 400)
+        self.assertEqual(self.exportar(data_inicio='ontem')[0].status_code, 400)
+
+    def test_acao_exportar_do_admin(self):
+        self.client.force_login(self.administrador)
+        selecionadas = [self.denuncias['janeiro'][0], self.denuncias['marco'][0]]
+        resposta = self.client.post('/admin/denuncia/denuncia/', {'action': 'exportar_csv', '_selected_action': selecionadas})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], 'text/csv; charset=utf-8')
+        cabecalho, *linhas = list(csv.reader(b''.join(resposta.streaming_content).decode().splitlines()))
+        self.assertEqual(cabecalho, self.CABECALHO)
+        self.assertEqual([linha[0] for linha in linhas], selecionadas[::-1])
+
+
+class PermissoesAdministrativasTests(TestCase):
+    """Moderação e exportação de denúncias restritas a administradores"""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create(username='comum', email='comum@kitem.com')
+        self.administrador = User.objects.create(username='admin', email='admin@kitem.com', is_staff=True)
+        receita = Receita.objects.create(
+            id_usuario=self.usuario, titulo='Bolo', descricao='Descrição',
+            tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+        )
+        self.denuncia = Denuncia.objects.create(id_receita=receita, id_denunciante=self.usuario, motivo_denuncia=2)
+
+    def requisitar(self, metodo, url, usuario=None, **dados):
+        cabecalhos = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(usuario).access_token}'} if usuario else {}
+        return getattr(self.client, metodo)(url, dados, content_type='application/json', **cabecalhos)
+
+    def test_moderacao_exige_administrador(self):
+        rotas = [
+            ('get', '/api/denuncias/pendentes/', {}),
+            ('post', '/api/denuncias/moderar/', {'ids': [str(self.denuncia.pk)], 'status': 'descartada'}),
+            ('patch', f'/api/denuncias/{self.denuncia.pk}/toggle-status/', {'status': 'descartada'}),
+        ]
+        for metodo, url, dados in rotas:
+            self.assertEqual(self.requisitar(metodo, url, **dados).status_code, 401, url)
+            self.assertEqual(self.requisitar(metodo, url, self.usuario, **dados).status_code, 403, url)
+        self.denuncia.refresh_from_db()
+        self.assertEqual(self.denuncia.status, 'pendente')
+        for metodo, url, dados in rotas:
+            self.assertEqual(self.requisitar(metodo, url, self.administrador, **dados).status_code, 200, url)
+
+    def test_exportacao_exige_administrador(self):
+        self.assertEqual(self.requisitar('get', '/api/denuncias/exportar/').status_code, 401)
+        self.assertEqual(self.requisitar('get', '/api/denuncias/exportar/', self.usuario).status_code, 403)
+        resposta = self.requisitar('get', '/api/denuncias/exportar/', self.administrador)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn(str(self.denuncia.pk), b''.join(resposta.streaming_content).decode())
@@ -22,7 +22,10 @@ urlpatterns = [
     # URLs para filtros avançados e estatísticas
     path('denuncias/filtrar/', views_api.DenunciaFilterAPIView.as_view(), name='denuncias-filtrar'),
     path('denuncias/estatisticas/', views_api.DenunciaEstatisticasAPIView.as_view(), name='denuncias-estatisticas'),
+    path('denuncias/exportar/', views_api.DenunciaExportarAPIView.as_view(), name='denuncias-exportar'),
     
-    # URL para futuras funcionalidades de moderação
+    # URLs de moderação
+    path('denuncias/pendentes/', views_api.DenunciasPendentesAPIView.as_view(), name='denuncias-pendentes'),
+    path('denuncias/moderar/', views_api.DenunciasModerarAPIView.as_view(), name='denuncias-moderar'),
     path('denuncias/<uuid:unique_id>/toggle-status/', views_api.DenunciaToggleStatusAPIView.as_view(), name='denuncia-toggle-status'),
 ] + router.urls
@@ -7,6 +7,7 @@ from drf_spectacular.utils import extend_schema, extend_schema_view
 from drf_spectacular.openapi import OpenApiParameter, OpenApiTypes
 from .models import Denuncia
 from .serializers import DenunciaSerializer, DenunciaListSerializer
+from . import estatisticas as estatisticas_denuncias
 
 @extend_schema_view(
     list=extend_schema(
@@ -47,6 +48,7 @@ class DenunciaViewSet(viewsets.ModelViewSet):
     queryset = Denuncia.objects.all().select_related('id_receita', 'id_denunciante')
     serializer_class = DenunciaSerializer
     lookup_field = 'unique_id'
+    escopo_throttle = 'denuncias'
     
     def get_serializer_class(self):
         """Usa serializer simplificado para listagem"""
@@ -133,33 +135,16 @@ class DenunciaViewSet(viewsets.ModelViewSet):
     def estatisticas(self, request):
         """Estatísticas gerais das denúncias"""
         try:
-            total_denuncias = self.queryset.count()
-            
-            # Estatísticas por motivo
-            stats_motivo = self.queryset.values('motivo_denuncia').annotate(
-                count=Count('motivo_denuncia')
-            ).order_by('-count')
-            
-            # Converte números em texto legível
-            motivos_stats = []
-            for stat in stats_motivo:
-                motivo_texto = dict(Denuncia.MOTIVO_CHOICES).get(stat['motivo_denuncia'], 'Desconhecido')
-                motivos_stats.append({
-                    'motivo': motivo_texto,
-                    'quantidade': stat['count']
-                })
-            
-            # Receitas mais denunciadas
-            receitas_denunciadas = self.queryset.values(
-                'id_receita__titulo', 'id_receita'
-            ).annotate(
-                count=Count('id_receita')
-            ).order_by('-count')[:10]
+            # Leitura dos contadores incrementais: custo constante, independente do tamanho da tabela
+            motivos_stats = [
+                {'motivo': stat['motivo_texto'], 'quantidade': stat['quantidade']}
+                for stat in estatisticas_denuncias.por_motivo()
+            ]
             
             return Response({
-                "total_denuncias": total_denuncias,
+                "total_denuncias": estatisticas_denuncias.total_denuncias(),
                 "estatisticas_por_motivo": motivos_stats,
-                "receitas_mais_denunciadas": list(receitas_denunciadas)
+                "receitas_mais_denunciadas": estatisticas_denuncias.receitas_mais_denunciadas()
             })
         except Exception as e:
             return Response(
@@ -1,14 +1,53 @@
 from rest_framework import generics
 from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAdminUser
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError
 from django.db.models import Q, Count
+from django.utils.dateparse import parse_datetime
+import base64
+import uuid
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from drf_spectacular.openapi import OpenApiParameter, OpenApiTypes
+from kiItem import shards
 from .models import Denuncia
-from .serializers import DenunciaSerializer, DenunciaListSerializer
+from .serializers import (
+    DenunciaSerializer,
+    DenunciaListSerializer,
+    AlterarStatusDenunciaSerializer,
+    ModerarDenunciasSerializer,
+)
+from . import estatisticas, moderacao
+from .exportacao import FORMATOS, resposta_exportacao
+from .filtros import filtros_denuncias
+
+# Tabelas globais carregadas com as denúncias (ver QuerySetPorUsuario.relacionados_globais)
+RELACIONADOS = ('id_receita', 'id_denunciante')
+
+# Paginação por cursor do filtro de denúncias
+LIMITE_PADRAO_CURSOR = 50
+LIMITE_MAXIMO_CURSOR = 500
+
+
+def codificar_cursor(denuncia):
+    """Cursor opaco com a posição (data_denuncia, unique_id) da última denúncia da página"""
+    posicao = f"{denuncia.data_denuncia.isoformat()}|{denuncia.unique_id}"
+    return base64.urlsafe_b64encode(posicao.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    try:
+        data, unique_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        data = parse_datetime(data)
+        unique_id = uuid.UUID(unique_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({"cursor": "Cursor inválido."})
+    if data is None:
+        raise ValidationError({"cursor": "Cursor inválido."})
+    return data, unique_id
 
 @api_view(['GET'])
 def api_root(request, format=None):
@@ -21,6 +60,9 @@ def api_root(request, format=None):
         'denuncias_por_usuario': request.build_absolute_uri('/api/denuncias/usuario/{usuario_id}/'),
         'estatisticas_denuncias': request.build_absolute_uri('/api/denuncias/estatisticas/'),
         'filtrar_denuncias': request.build_absolute_uri('/api/denuncias/filtrar/'),
+        'denuncias_pendentes': request.build_absolute_uri('/api/denuncias/pendentes/'),
+        'moderar_denuncias': request.build_absolute_uri('/api/denuncias/moderar/'),
+        'exportar_denuncias': request.build_absolute_uri('/api/denuncias/exportar/'),
     })
 
 # Views para a API de Denúncias
@@ -42,6 +84,7 @@ class DenunciaListCreateAPIView(generics.ListCreateAPIView):
     """
     queryset = Denuncia.objects.all().select_related('id_receita', 'id_denunciante')
     serializer_class = DenunciaSerializer
+    escopo_throttle = 'denuncias'
     
     def get_serializer_class(self):
         """Usa serializer simplificado para listagem"""
@@ -81,9 +124,9 @@ class DenunciaRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView
     
     def get_object(self):
         try:
-            return Denuncia.objects.select_related('id_receita', 'id_denunciante').get(
-                unique_id=self.kwargs['unique_id']
-            )
+            return Denuncia.objects.do_registro(self.kwargs['unique_id']).relacionados_globais(
+                'id_receita', 'id_denunciante'
+            ).get()
         except Denuncia.DoesNotExist:
             raise NotFound(detail="Denúncia não encontrada.")
         except Exception as e:
@@ -133,7 +176,7 @@ class DenunciasPorUsuarioAPIView(generics.ListAPIView):
 
     def get_queryset(self):
         usuario_id = self.kwargs['usuario_id']
-        return Denuncia.objects.filter(id_denunciante=usuario_id).select_related('id_receita', 'id_denunciante')
+        return Denuncia.objects.do_usuario(usuario_id).relacionados_globais('id_receita', 'id_denunciante')
 
 @extend_schema(
     tags=['denuncias'],
@@ -165,11 +208,26 @@ class DenunciasPorUsuarioAPIView(generics.ListAPIView):
             type=OpenApiTypes.DATE,
             description='Data final para filtro (YYYY-MM-DD)'
         ),
+        OpenApiParameter(
+            name='status',
+            type=OpenApiTypes.STR,
+            description='Status da denúncia (pendente, resolvida, descartada)'
+        ),
         OpenApiParameter(
             name='search',
             type=OpenApiTypes.STR,
             description='Busca no campo detalhamento'
         ),
+        OpenApiParameter(
+            name='limite',
+            type=OpenApiTypes.INT,
+            description=f'Ativa a paginação por cursor: quantidade de denúncias por página (máx. {LIMITE_MAXIMO_CURSOR})'
+        ),
+        OpenApiParameter(
+            name='cursor',
+            type=OpenApiTypes.STR,
+            description='Cursor retornado em "proximo_cursor" pela página anterior'
+        ),
     ]
 )
 class DenunciaFilterAPIView(APIView):
@@ -177,53 +235,87 @@ class DenunciaFilterAPIView(APIView):
     Endpoint para filtrar denúncias com base em motivo, data e receita.
     """
     def get(self, request):
-        motivo = request.query_params.get('motivo')
-        receita_id = request.query_params.get('receita_id')
-        usuario_id = request.query_params.get('usuario_id')
-        data_inicio = request.query_params.get('data_inicio')
-        data_fim = request.query_params.get('data_fim')
-        search = request.query_params.get('search')  # Busca no detalhamento
-        
-        # Validações
-        valid_motivos = [choice[0] for choice in Denuncia.MOTIVO_CHOICES]
-        
-        if motivo and int(motivo) not in valid_motivos:
-            raise ValidationError({"motivo": f"Motivo inválido. Valores permitidos: {valid_motivos}"})
-        
-        # Construção do filtro dinâmico
-        filtros = Q()
-        if motivo:
-            filtros &= Q(motivo_denuncia=int(motivo))
-        if receita_id:
-            filtros &= Q(id_receita=receita_id)
-        if usuario_id:
-            filtros &= Q(id_denunciante=usuario_id)
-        if data_inicio:
-            filtros &= Q(data_denuncia__gte=data_inicio)
-        if data_fim:
-            filtros &= Q(data_denuncia__lte=data_fim)
-        if search:
-            filtros &= Q(detalhamento__icontains=search)
-        
-        # Consulta ao banco de dados
-        try:
-            denuncias = Denuncia.objects.filter(filtros).select_related('id_receita', 'id_denunciante')
-        except Exception as e:
-            raise ValidationError({"error": f"Erro ao consultar denúncias: {str(e)}"})
+        filtros = filtros_denuncias(request.query_params)
+        denuncias = Denuncia.objects.filter(filtros)
+
+        if 'limite' in request.query_params or 'cursor' in request.query_params:
+            return self.paginar_por_cursor(request, denuncias)
 
-        if not denuncias.exists():
+        # Uma única consulta por shard: o total vem da própria lista, sem exists() e count() adicionais
+        denuncias = list(shards.ConsultaEmTodos(denuncias, relacionados=RELACIONADOS))
+        if not denuncias:
             return Response({"message": "Nenhuma denúncia encontrada com os filtros fornecidos."}, status=404)
 
         serializer = DenunciaListSerializer(denuncias, many=True)
         return Response({
-            "total_encontradas": denuncias.count(),
+            "total_encontradas": len(denuncias),
             "denuncias": serializer.data
         })
 
+    def paginar_por_cursor(self, request, denuncias):
+        """
+        Paginação por cursor (keyset) em (-data_denuncia, -unique_id): cada página é uma busca
+        no índice composto a partir da última posição, sem OFFSET nem contagem total.
+        """
+        try:
+            limite = int(request.query_params.get('limite', LIMITE_PADRAO_CURSOR))
+        except ValueError:
+            raise ValidationError({"limite": "O limite deve ser um número inteiro."})
+        limite = max(1, min(limite, LIMITE_MAXIMO_CURSOR))
+
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            data, unique_id = decodificar_cursor(cursor)
+            denuncias = denuncias.filter(
+                Q(data_denuncia__lt=data) | Q(data_denuncia=data, unique_id__lt=unique_id)
+            )
+
+        pagina = shards.ConsultaEmTodos(denuncias.order_by('-data_denuncia', '-unique_id'), relacionados=RELACIONADOS)[:limite + 1]
+        proximo_cursor = codificar_cursor(pagina[limite - 1]) if len(pagina) > limite else None
+        pagina = pagina[:limite]
+
+        return Response({
+            "quantidade": len(pagina),
+            "proximo_cursor": proximo_cursor,
+            "denuncias": DenunciaListSerializer(pagina, many=True).data
+        })
+
+@extend_schema(
+    tags=['denuncias'],
+    summary='Exportar denúncias',
+    description='Exporta em streaming (CSV ou NDJSON) as denúncias que atendem aos mesmos filtros de /denuncias/filtrar/. '
+                'As linhas são lidas do banco em blocos e escritas conforme são lidas, com uso de memória constante.',
+    parameters=[
+        OpenApiParameter(name='formato', type=OpenApiTypes.STR, enum=list(FORMATOS), description='Formato do arquivo (padrão: csv)'),
+        OpenApiParameter(name='motivo', type=OpenApiTypes.INT, description='Código do motivo da denúncia (1-7)'),
+        OpenApiParameter(name='receita_id', type=OpenApiTypes.INT, description='ID da receita específica'),
+        OpenApiParameter(name='usuario_id', type=OpenApiTypes.INT, description='ID do usuário denunciante'),
+        OpenApiParameter(name='data_inicio', type=OpenApiTypes.DATE, description='Data inicial para filtro (YYYY-MM-DD)'),
+        OpenApiParameter(name='data_fim', type=OpenApiTypes.DATE, description='Data final para filtro (YYYY-MM-DD)'),
+        OpenApiParameter(name='status', type=OpenApiTypes.STR, description='Status da denúncia (pendente, resolvida, descartada)'),
+        OpenApiParameter(name='search', type=OpenApiTypes.STR, description='Busca no campo detalhamento'),
+    ],
+    responses={200: OpenApiTypes.BINARY}
+)
+class DenunciaExportarAPIView(APIView):
+    """
+    Endpoint para exportar denúncias filtradas em CSV ou NDJSON.
+    """
+    # Exporta usuários denunciantes, motivos e detalhamentos: apenas administradores
+    permission_classes = [IsAdminUser]
+    usuario_completo = True
+    def get(self, request):
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS:
+            raise ValidationError({"formato": f"Formato inválido. Valores permitidos: {', '.join(FORMATOS)}"})
+        filtros = filtros_denuncias(request.query_params)
+        return resposta_exportacao(Denuncia.objects.filter(filtros), formato)
+
 @extend_schema(
     tags=['denuncias'],
     summary='Estatísticas de denúncias',
-    description='Retorna estatísticas gerais do sistema de denúncias, incluindo totais por motivo, receitas mais denunciadas, etc.'
+    description='Retorna estatísticas gerais do sistema de denúncias, incluindo totais por motivo, receitas mais denunciadas, série diária, etc. '
+                'Os valores vêm de contadores mantidos a cada inclusão ou exclusão de denúncia.'
 )
 class DenunciaEstatisticasAPIView(APIView):
     """
@@ -231,42 +323,13 @@ class DenunciaEstatisticasAPIView(APIView):
     """
     def get(self, request):
         try:
-            total_denuncias = Denuncia.objects.count()
-            
-            # Estatísticas por motivo
-            stats_motivo = Denuncia.objects.values('motivo_denuncia').annotate(
-                count=Count('motivo_denuncia')
-            ).order_by('-count')
-            
-            # Converte números em texto legível
-            motivos_stats = []
-            for stat in stats_motivo:
-                motivo_texto = dict(Denuncia.MOTIVO_CHOICES).get(stat['motivo_denuncia'], 'Desconhecido')
-                motivos_stats.append({
-                    'motivo_codigo': stat['motivo_denuncia'],
-                    'motivo_texto': motivo_texto,
-                    'quantidade': stat['count']
-                })
-            
-            # Receitas mais denunciadas
-            receitas_denunciadas = Denuncia.objects.values(
-                'id_receita__titulo', 'id_receita'
-            ).annotate(
-                count=Count('id_receita')
-            ).order_by('-count')[:10]
-            
-            # Usuários que mais denunciam
-            usuarios_denunciantes = Denuncia.objects.values(
-                'id_denunciante__username', 'id_denunciante'
-            ).annotate(
-                count=Count('id_denunciante')
-            ).order_by('-count')[:10]
-
+            # Leitura dos contadores incrementais: custo constante, independente do tamanho da tabela
             data = {
-                "total_denuncias": total_denuncias,
-                "estatisticas_por_motivo": motivos_stats,
-                "receitas_mais_denunciadas": list(receitas_denunciadas),
-                "usuarios_que_mais_denunciam": list(usuarios_denunciantes),
+                "total_denuncias": estatisticas.total_denuncias(),
+                "estatisticas_por_motivo": estatisticas.por_motivo(),
+                "receitas_mais_denunciadas": estatisticas.receitas_mais_denunciadas(),
+                "usuarios_que_mais_denunciam": estatisticas.usuarios_que_mais_denunciam(),
+                "denuncias_por_dia": estatisticas.por_dia(),
                 "motivos_disponiveis": [
                     {"codigo": codigo, "texto": texto} 
                     for codigo, texto in Denuncia.MOTIVO_CHOICES
@@ -278,23 +341,81 @@ class DenunciaEstatisticasAPIView(APIView):
         except Exception as e:
             return Response({"error": f"Erro ao calcular estatísticas: {str(e)}"}, status=500)
 
+@extend_schema(
+    tags=['denuncias'],
+    summary='Alterar status de uma denúncia',
+    description='Define o status da denúncia (pendente, resolvida ou descartada). '
+                'Sem o campo "status", alterna entre pendente e resolvida.',
+    request=AlterarStatusDenunciaSerializer,
+    responses=DenunciaSerializer
+)
 class DenunciaToggleStatusAPIView(APIView):
     """
-    Endpoint para marcar uma denúncia como resolvida/pendente (funcionalidade futura).
+    Endpoint para marcar uma denúncia como resolvida, descartada ou pendente.
     """
+    permission_classes = [IsAdminUser]
+    # is_staff lido do usuário atual, não do token (ver kiItem/autenticacao.py)
+    usuario_completo = True
     def patch(self, request, unique_id):
-        try:
-            denuncia = Denuncia.objects.get(unique_id=unique_id)
-            
-            # Por enquanto, apenas retorna informações da denúncia
-            # No futuro, pode adicionar campo 'status' no modelo
-            serializer = DenunciaSerializer(denuncia)
-            return Response({
-                "message": "Denúncia encontrada. Status toggle será implementado futuramente.",
-                "denuncia": serializer.data
-            })
-            
-        except Denuncia.DoesNotExist:
+        # Consulta no shard onde a denúncia está (ver kiItem/shards.py)
+        consulta = Denuncia.objects.do_registro(unique_id)
+        status_atual = consulta.values_list('status', flat=True).first()
+        if status_atual is None:
             raise NotFound(detail="Denúncia não encontrada.")
-        except Exception as e:
-            return Response({"error": f"Erro ao processar denúncia: {str(e)}"}, status=500)
+
+        entrada = AlterarStatusDenunciaSerializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        novo_status = entrada.validated_data.get('status')
+        if novo_status is None:
+            novo_status = 'resolvida' if status_atual == 'pendente' else 'pendente'
+
+        moderacao.alterar_status([unique_id], novo_status)
+        denuncia = consulta.relacionados_globais('id_receita', 'id_denunciante').get()
+        return Response(DenunciaSerializer(denuncia).data)
+
+class PaginacaoFilaModeracao(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'tamanho'
+    max_page_size = 200
+
+@extend_schema(
+    tags=['denuncias'],
+    summary='Fila de moderação',
+    description='Lista, paginadas, as denúncias pendentes da mais recente para a mais antiga. '
+                'A consulta usa um índice parcial que cobre apenas as denúncias pendentes.'
+)
+class DenunciasPendentesAPIView(generics.ListAPIView):
+    """
+    Lista as denúncias aguardando moderação
+    """
+    permission_classes = [IsAdminUser]
+    # is_staff lido do usuário atual, não do token (ver kiItem/autenticacao.py)
+    usuario_completo = True
+    serializer_class = DenunciaListSerializer
+    pagination_class = PaginacaoFilaModeracao
+
+    def get_queryset(self):
+        return moderacao.fila_pendentes()
+
+@extend_schema(
+    tags=['denuncias'],
+    summary='Moderar denúncias em lote',
+    description='Altera o status de várias denúncias com um único UPDATE (padrão: resolvida) e ajusta '
+                'os contadores de denúncias pendentes das receitas, ocultando ou reexibindo-as conforme o limite.',
+    request=ModerarDenunciasSerializer
+)
+class DenunciasModerarAPIView(APIView):
+    """
+    Endpoint para resolver ou descartar várias denúncias de uma vez.
+    """
+    permission_classes = [IsAdminUser]
+    # is_staff lido do usuário atual, não do token (ver kiItem/autenticacao.py)
+    usuario_completo = True
+    def post(self, request):
+        entrada = ModerarDenunciasSerializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        alteradas = moderacao.alterar_status(entrada.validated_data['ids'], entrada.validated_data['status'])
+        return Response({
+            "status": entrada.validated_data['status'],
+            "denuncias_alteradas": alteradas
+        })
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('favorito', '0001_initial'),
+        ('receita', '0003_receita_moderacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='favorito',
+            name='id_receita',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='favoritos', to='receita.receita'),
+        ),
+        migrations.AlterField(
+            model_name='favorito',
+            name='id_usuario',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='favoritos', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -1,11 +1,15 @@
 from django.db import models
 from django.contrib.auth.models import User as Usuario
+from kiItem.shards import QuerySetPorUsuario
 from receita.models import Receita
 
 class Favorito(models.Model):
     id = models.AutoField(primary_key=True)
-    id_receita = models.ForeignKey(Receita, on_delete=models.CASCADE, related_name='favoritos')
-    id_usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='favoritos')
+    # Sem restrição no banco: favoritos podem estar em outro shard (ver kiItem/shards.py)
+    id_receita = models.ForeignKey(Receita, on_delete=models.CASCADE, related_name='favoritos', db_constraint=False)
+    id_usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='favoritos', db_constraint=False)
+
+    objects = QuerySetPorUsuario.as_manager()
 
     def __str__(self):
         return f"{self.id_usuario.username} - {self.id_receita.titulo}"
@@ -1,7 +1,9 @@
 from rest_framework import viewsets
+from kiItem.shards import RegistroNoShardMixin
 from .models import Favorito
 from .serializers import FavoritoSerializer
 
-class FavoritoViewSet(viewsets.ModelViewSet):
+class FavoritoViewSet(RegistroNoShardMixin, viewsets.ModelViewSet):
     queryset = Favorito.objects.all()
     serializer_class = FavoritoSerializer
+    escopo_throttle = 'favoritos'
@@ -6,6 +6,7 @@ from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError
 from django.db.models import Q
 from .models import Favorito
+from kiItem.assincrono import APIViewAssincrona
 from kiItem.serializers import FavoritoSerializer
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiExample
 
@@ -47,6 +48,7 @@ def api_root(request, format=None):
 class FavoritoListCreateAPIView(generics.ListCreateAPIView):
     queryset = Favorito.objects.all()
     serializer_class = FavoritoSerializer
+    escopo_throttle = 'favoritos'
 
 @extend_schema_view(
     get=extend_schema(
@@ -75,7 +77,7 @@ class FavoritoRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView
     
     def get_object(self):
         try:
-            return Favorito.objects.get(pk=self.kwargs['pk'])
+            return Favorito.objects.do_registro(self.kwargs['pk']).get()
         except Favorito.DoesNotExist:
             raise NotFound(detail="Favorito não encontrado.")
         except Exception as e:
@@ -114,7 +116,7 @@ class GetFavoritoUsuario(generics.ListAPIView):
 
     def get_queryset(self):
         id_usuario = self.kwargs['id_usuario']  # Pega o valor <id_usuario> da URL
-        return Favorito.objects.filter(id_usuario=id_usuario)
+        return Favorito.objects.do_usuario(id_usuario)
 
 @extend_schema(
     summary="Obter favoritos detalhados de um usuário",
@@ -152,12 +154,12 @@ class GetFavoritoUsuario(generics.ListAPIView):
         }
     }
 )
-class FavoritoDetalhadoAPIView(APIView):
-    def get(self, request, id_usuario):
+class FavoritoDetalhadoAPIView(APIViewAssincrona):
+    async def get(self, request, id_usuario):
         try:
-            favoritos = Favorito.objects.filter(id_usuario=id_usuario).select_related('id_receita')
+            favoritos = [favorito async for favorito in Favorito.objects.do_usuario(id_usuario).relacionados_globais('id_receita')]
             
-            if not favoritos.exists():
+            if not favoritos:
                 return Response({"message": "Nenhum favorito encontrado para este usuário."}, status=404)
 
             data = []
@@ -253,11 +255,11 @@ class FavoritoFilterAPIView(APIView):
 
         # Consulta ao banco de dados
         try:
-            favoritos = Favorito.objects.filter(filtros).select_related('id_receita')
+            favoritos = list(Favorito.objects.filter(filtros).select_related('id_receita'))
         except Exception as e:
             raise ValidationError({"error": f"Erro ao consultar favoritos: {str(e)}"})
 
-        if not favoritos.exists():
+        if not favoritos:
             return Response({"message": "Nenhum favorito encontrado com os filtros fornecidos."}, status=404)
 
         serializer = FavoritoSerializer(favoritos, many=True)
@@ -303,10 +305,12 @@ class FavoritoToggleAPIView(APIView):
     """
     Endpoint para adicionar ou remover uma receita dos favoritos de um usuário.
     """
+    escopo_throttle = 'favoritos'
+
     def post(self, request, id_usuario, receita_id):
         try:
             # Verifica se já existe
-            favorito_existente = Favorito.objects.filter(id_usuario=id_usuario, id_receita=receita_id).first()
+            favorito_existente = Favorito.objects.do_usuario(id_usuario).filter(id_receita=receita_id).first()
             
             if favorito_existente:
                 # Remove dos favoritos
@@ -353,7 +357,7 @@ class ReceitasFavoritasAPIView(generics.ListAPIView):
     
     def get_queryset(self):
         id_usuario = self.kwargs['id_usuario']
-        return Favorito.objects.filter(id_usuario=id_usuario)
+        return Favorito.objects.do_usuario(id_usuario)
 
 @extend_schema(
     summary="Deletar favorito por usuário e receita",
@@ -400,10 +404,7 @@ class FavoritoDeleteByUsuarioReceitaAPIView(APIView):
     def delete(self, request, id_usuario, receita_id):
         try:
             # Busca o favorito específico do usuário
-            favorito = Favorito.objects.filter(
-                id_usuario=id_usuario, 
-                id_receita=receita_id
-            ).first()
+            favorito = Favorito.objects.do_usuario(id_usuario).filter(id_receita=receita_id).first()
             
             if not favorito:
                 return Response({
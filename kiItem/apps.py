@@ -0,0 +1,37 @@
+from django.apps import AppConfig
+
+
+class KiItemConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'kiItem'
+    verbose_name = 'KiItem'
+
+    def ready(self):
+        # Mede o tempo de serialização das requisições instrumentadas (ver instrumentacao.py)
+        from rest_framework.serializers import BaseSerializer
+        from django.contrib.auth.models import User
+        from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+        from ingrediente.models import Ingrediente
+        from lista_itens.eventos import broker
+        from receita.models import Receita
+        from . import autenticacao, instrumentacao, metricas, pool, shards, throttling  # noqa: F401 (registra o check)
+
+        if not getattr(BaseSerializer.data.fget, 'instrumentado', False):
+            BaseSerializer.data = instrumentacao.medir_serializacao(BaseSerializer.data)
+
+        # Conexões SSE abertas neste worker, lidas a cada coleta de métricas
+        metricas.registro.coletor('kitem_conexoes_sse', broker.total_conexoes)
+
+        # Saturação do pool de conexões do PostgreSQL (ver pool.py)
+        for nome in pool.METRICAS_POOL:
+            metricas.registro.coletor(nome, pool.coletor(nome))
+
+        # Exclusão em cascata dos registros distribuídos em outros shards (ver shards.py)
+        for modelo in (User, Receita, Ingrediente):
+            pre_delete.connect(shards.excluir_em_outros_shards, sender=modelo, dispatch_uid=f'shards-{modelo._meta.label_lower}')
+        # Faixa de ids própria de cada shard, reservada no migrate do shard
+        post_migrate.connect(shards.reservar_faixa_de_ids, dispatch_uid='shards-faixa-ids')
+
+        # Usuário em cache da autenticação JWT (ver autenticacao.py)
+        post_save.connect(autenticacao.invalidar_usuario, sender=User, dispatch_uid='autenticacao-usuario-salvo')
+        post_delete.connect(autenticacao.invalidar_usuario, sender=User, dispatch_uid='autenticacao-usuario-excluido')
@@ -3,6 +3,12 @@ ASGI config for Kitem project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Endpoints assíncronos, como o canal Server-Sent Events das listas de itens
+(/api/listas_itens/<pk>/eventos/), só mantêm conexões ociosas sem ocupar uma
+thread quando servidos por um servidor ASGI (ex.: uvicorn kiItem.asgi:application).
+As views de leitura mais acessadas (receitas e favoritos) também são assíncronas
+(kiItem/assincrono.py); o comando benchmark_asgi compara este servidor com o WSGI.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +19,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kiItem.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from kiItem.perfilador import registrar_loop_asgi  # noqa: E402 (depois de configurar o Django)
+
+# Views assíncronas rodam na thread do loop, que o perfilador também amostra
+application = registrar_loop_asgi(django_application)
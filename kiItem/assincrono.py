@@ -0,0 +1,145 @@
+"""
+Suporte às views assíncronas servidas por ASGI (uvicorn kiItem.asgi:application).
+
+No ASGI, uma view síncrona ocupa uma thread do asgiref do início ao fim da requisição,
+inclusive enquanto espera o banco remoto. Views assíncronas liberam o loop enquanto esperam,
+desde que toda a cadeia de middlewares também seja assíncrona: um único middleware só síncrono
+faz o Django executar o restante da cadeia, e a view, dentro de uma thread. Por isso os
+middlewares do projeto herdam de MiddlewareHibrido e atendem os dois modos sem adaptação.
+
+O ORM assíncrono do Django (aget, acount, async for) ainda executa cada consulta na thread
+síncrona da requisição (thread_sensitive), uma de cada vez: asyncio.gather sobre consultas do ORM
+não as sobrepõe. em_paralelo executa consultas independentes em threads próprias, cada uma com
+uma conexão do pool (ver pool.py).
+"""
+import asyncio
+from contextvars import ContextVar
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.views import APIView
+from . import pool
+
+# Corrotina do handler assíncrono em execução: o código que roda na thread síncrona (consultas_lentas)
+# encontra nela a linha da view que aguarda a consulta
+_handler_em_execucao = ContextVar('handler_em_execucao', default=None)
+
+
+class MiddlewareHibrido:
+    """Base dos middlewares que atendem WSGI (síncrono) e ASGI (assíncrono); no ASGI, __call__ delega a __acall__"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+
+def _instalar_wrappers(pilha, fabrica):
+    for alias in connections:
+        pilha.enter_context(connections[alias].execute_wrapper(fabrica(alias)))
+
+
+@contextmanager
+def wrappers_de_conexao(fabrica):
+    """Instala fabrica(alias) como execute_wrapper de todas as conexões da thread atual"""
+    with ExitStack() as pilha:
+        _instalar_wrappers(pilha, fabrica)
+        yield
+
+
+@asynccontextmanager
+async def awrappers_de_conexao(fabrica):
+    """
+    Versão assíncrona de wrappers_de_conexao: as conexões são as da thread síncrona da requisição,
+    onde o ORM executa as consultas, então a instalação e a remoção são feitas nela
+    """
+    pilha = ExitStack()
+    await sync_to_async(_instalar_wrappers)(pilha, fabrica)
+    try:
+        yield
+    finally:
+        await sync_to_async(pilha.close)()
+
+
+def quadros_do_handler():
+    """Quadros do handler assíncrono suspenso, do mais interno (a chamada aguardada) ao handler"""
+    corrotina = _handler_em_execucao.get()
+    quadros = []
+    while getattr(corrotina, 'cr_frame', None) is not None:
+        quadros.append(corrotina.cr_frame)
+        corrotina = corrotina.cr_await
+    return quadros[::-1]
+
+
+def _estado_da_requisicao():
+    conexao = connections[DEFAULT_DB_ALIAS]
+    wrappers = {alias: list(connections[alias].execute_wrappers) for alias in connections}
+    return wrappers, conexao.in_atomic_block
+
+
+def _executar_com_wrappers(funcao, wrappers):
+    try:
+        with ExitStack() as pilha:
+            for alias, lista in wrappers.items():
+                for wrapper in lista:
+                    pilha.enter_context(connections[alias].execute_wrapper(wrapper))
+            return funcao()
+    finally:
+        # Threads fora da requisição: a conexão volta ao pool (ou é fechada) logo após a consulta
+        connections.close_all()
+
+
+async def em_paralelo(*funcoes):
+    """
+    Executa funções síncronas independentes (cada uma avalia suas consultas) ao mesmo tempo e
+    devolve os resultados na ordem recebida. Cada função roda em uma thread com conexão própria e
+    os mesmos execute_wrappers da requisição (métricas, consultas lentas, comentários SQL).
+    Dentro de uma transação (só a thread da requisição enxerga os dados ainda não confirmados), com
+    CONSULTAS_PARALELAS desligado ou quando o pool não tem conexões para a thread da requisição e
+    mais uma por função (pool.comporta_paralelo), executa em sequência na thread da requisição.
+    """
+    wrappers, em_transacao = await sync_to_async(_estado_da_requisicao)()
+    paralelo = getattr(settings, 'CONSULTAS_PARALELAS', False) and pool.comporta_paralelo(len(funcoes))
+    if em_transacao or not paralelo:
+        return [await sync_to_async(funcao)() for funcao in funcoes]
+    return await asyncio.gather(*(
+        sync_to_async(_executar_com_wrappers, thread_sensitive=False)(funcao, wrappers) for funcao in funcoes
+    ))
+
+
+class APIViewAssincrona(APIView):
+    """
+    APIView com handlers `async def`. Autenticação, permissões, throttling e tratamento de
+    exceções continuam os do DRF e rodam na thread síncrona da requisição (podem consultar o
+    banco); o handler roda no loop. A renderização fica com o Django, também na thread síncrona.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                token = _handler_em_execucao.set(response)
+                try:
+                    response = await response
+                finally:
+                    _handler_em_execucao.reset(token)
+        except Exception as exc:
+            response = await sync_to_async(self.handle_exception)(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
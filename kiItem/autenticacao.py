@@ -0,0 +1,90 @@
+"""
+Autenticação da API sem consultar auth_user a cada requisição.
+
+O JWTAuthentication do simplejwt busca o usuário no banco em toda requisição autenticada, embora o
+token já traga o id. JWTAutenticacao:
+- em métodos seguros (GET, HEAD, OPTIONS) devolve um TokenUser montado a partir do token, sem
+  consulta; as views de leitura só usam o id (request.user.pk);
+- em escritas, e nas views com `usuario_completo = True` (as que conferem is_staff ou outros campos
+  do usuário), devolve o usuário completo, guardado em cache por TEMPO_CACHE_USUARIO segundos e
+  invalidado quando o usuário é salvo ou excluído (ver apps.py).
+Com o cache local (LocMemCache, um por worker), a invalidação só alcança o worker onde o usuário foi
+alterado: nos demais, a cópia vale até expirar.
+
+SessaoAutenticacao só considera a sessão do Django quando a requisição traz o cookie de sessão: os
+clientes da API, que usam apenas o token, não passam pela autenticação por sessão.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.authentication import SessionScheme
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .metricas import registrar_cache
+
+CHAVE_USUARIO = 'autenticacao:usuario:{}'
+TEMPO_CACHE_USUARIO = 60
+
+
+def usuario_em_cache(id_usuario, modelo):
+    """Usuário completo, lido do banco apenas quando não está em cache (None se não existe)"""
+    chave = CHAVE_USUARIO.format(id_usuario)
+    usuario = cache.get(chave)
+    registrar_cache('usuario_jwt', usuario is not None)
+    if usuario is None:
+        usuario = modelo.objects.filter(**{api_settings.USER_ID_FIELD: id_usuario}).first()
+        if usuario is not None:
+            cache.set(chave, usuario, TEMPO_CACHE_USUARIO)
+    return usuario
+
+
+def invalidar_usuario(sender, instance, **kwargs):
+    """post_save e post_delete de User: remove a cópia em cache"""
+    cache.delete(CHAVE_USUARIO.format(getattr(instance, api_settings.USER_ID_FIELD)))
+
+
+class JWTAutenticacao(JWTAuthentication):
+    """JWTAuthentication com TokenUser nas leituras e usuário completo em cache nas escritas"""
+    somente_token = False
+
+    def authenticate(self, request):
+        view = (getattr(request, 'parser_context', None) or {}).get('view')
+        self.somente_token = request.method in SAFE_METHODS and not getattr(view, 'usuario_completo', False)
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        try:
+            id_usuario = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as erro:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from erro
+        if self.somente_token:
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+
+        usuario = usuario_em_cache(id_usuario, self.user_model)
+        if usuario is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not usuario.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return usuario
+
+
+class SessaoAutenticacao(SessionAuthentication):
+    """SessionAuthentication apenas para requisições com o cookie de sessão (admin, API navegável)"""
+
+    def authenticate(self, request):
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return None
+        return super().authenticate(request)
+
+
+# Mesmo esquema de segurança das classes originais no OpenAPI (drf-spectacular)
+class JWTAutenticacaoScheme(SimpleJWTScheme):
+    target_class = JWTAutenticacao
+
+
+class SessaoAutenticacaoScheme(SessionScheme):
+    target_class = SessaoAutenticacao
@@ -0,0 +1,247 @@
+"""
+Benchmark de latência dos endpoints, executado em processo com o Client de teste do Django.
+
+Cada cenário sorteia uma requisição (URL, método e corpo) a partir de uma amostra dos
+dados do banco local, normalmente gerados por gerar_dados_sinteticos. A medição tem
+duas fases:
+- perfil: cada cenário é executado em sequência para contar consultas e medir a memória
+  alocada (pico do tracemalloc), que não podem ser medidas com várias threads ao mesmo tempo;
+- carga: N threads executam a mistura de cenários e medem a latência de cada requisição.
+"""
+import json
+import math
+import random
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+from lista_itens.models import ListaItens
+from receita.models import Receita
+
+# Host aceito por ALLOWED_HOSTS (o padrão do Client, 'testserver', só é aceito pelo executor de testes)
+HOST = 'localhost'
+# Quantidade de receitas, usuários e listas lidos do banco para montar as requisições
+TAMANHO_AMOSTRA = 2000
+
+# Peso de cada cenário na mistura padrão
+MISTURA_PADRAO = {
+    'receitas_filtrar': 4,
+    'receita_detalhe': 3,
+    'receita_detalhada': 2,
+    'receitas_categoria': 2,
+    'receitas_mais_acessadas': 1,
+    'favoritos_detalhados': 2,
+    'favorito_toggle': 2,
+    'lista_totais': 1,
+    'lista_marcar_comprados': 1,
+}
+
+FILTROS_RECEITA = {
+    'dificuldade': ['Fácil', 'Média', 'Difícil'],
+    'tipo': ['doce', 'salgado'],
+    'tempo_preparo': ['20', '30', '40', '60', '90'],
+    'search': ['bolo', 'frango', 'arroz', 'torta', 'pão', 'salada'],
+    'ingredientes': ['chocolate', 'queijo', 'tomate', 'leite'],
+}
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) pelo método do posto mais próximo; valores já ordenados"""
+    if not valores:
+        return 0.0
+    posto = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[posto]
+
+
+class Amostra:
+    """Identificadores reais do banco usados para montar as requisições"""
+
+    def __init__(self, tamanho=TAMANHO_AMOSTRA):
+        receitas = Receita.objects.filter(oculta=False)
+        # Metade das receitas mais acessadas, como no tráfego real, e metade distribuída pela tabela
+        populares = list(receitas.order_by('-quantidade_visualizacao').values_list('pk', flat=True)[:tamanho // 2])
+        passo = max(1, receitas.count() // max(1, tamanho // 2))
+        distribuidas = list(receitas.order_by('pk').values_list('pk', flat=True)[::passo][:tamanho // 2])
+        self.receitas = populares + distribuidas
+        self.usuarios = list(User.objects.order_by('pk').values_list('pk', flat=True)[:tamanho])
+        self.listas = list(ListaItens.objects.order_by('pk').values_list('pk', flat=True)[:tamanho])
+        self.categorias = [codigo for codigo, _ in Receita.CATEGORIA_CHOICES]
+        if not (self.receitas and self.usuarios):
+            raise ValueError('O banco não tem receitas e usuários; gere dados com gerar_dados_sinteticos.')
+        self._tokens = {}
+
+    def autorizacao(self, usuario_id):
+        """Cabeçalho Authorization com um token de acesso do usuário (gerado uma vez por usuário)"""
+        if usuario_id not in self._tokens:
+            self._tokens[usuario_id] = f'Bearer {AccessToken.for_user(User(pk=usuario_id))}'
+        return {'HTTP_AUTHORIZATION': self._tokens[usuario_id]}
+
+
+def _filtros_receita(amostra, rng):
+    parametros = {'categoria': rng.choice(amostra.categorias)} if rng.random() < 0.5 else {}
+    for nome in rng.sample(list(FILTROS_RECEITA), rng.randint(1, 2)):
+        parametros[nome] = rng.choice(FILTROS_RECEITA[nome])
+    return parametros
+
+
+def montar_requisicao(cenario, amostra, rng):
+    """(método, url, dados, cabeçalhos) de uma requisição do cenário"""
+    receita = rng.choice(amostra.receitas)
+    usuario = rng.choice(amostra.usuarios)
+    if cenario == 'receitas_filtrar':
+        return 'get', '/api/receitas/filtrar/', _filtros_receita(amostra, rng), {}
+    if cenario == 'receita_detalhe':
+        return 'get', f'/api/receitas/{receita}/', None, {}
+    if cenario == 'receita_detalhada':
+        return 'get', f'/api/receitas/{receita}/detalhada/', None, {}
+    if cenario == 'receitas_categoria':
+        return 'get', f'/api/receitas/categoria/{rng.choice(amostra.categorias)}/', None, {}
+    if cenario == 'receitas_mais_acessadas':
+        return 'get', '/api/receitas/mais-acessadas/', None, {}
+    if cenario == 'favoritos_detalhados':
+        return 'get', f'/api/usuarios/{usuario}/favoritos/detalhados/', None, {}
+    if cenario == 'favorito_toggle':
+        return 'post', f'/api/usuarios/{usuario}/favoritos/{receita}/toggle/', None, amostra.autorizacao(usuario)
+    if not amostra.listas:
+        raise ValueError('O banco não tem listas de itens para os cenários de listas.')
+    lista = rng.choice(amostra.listas)
+    if cenario == 'lista_totais':
+        return 'get', f'/api/listas_itens/{lista}/totais/', None, {}
+    if cenario == 'lista_marcar_comprados':
+        return 'post', f'/api/listas_itens/{lista}/itens/marcar-comprados/', {'comprado': rng.random() < 0.5}, {}
+    raise ValueError(f'Cenário desconhecido: {cenario}')
+
+
+def _executar(cliente, metodo, url, dados, cabecalhos):
+    if metodo == 'get':
+        resposta = cliente.get(url, dados, **cabecalhos)
+    else:
+        resposta = getattr(cliente, metodo)(url, dados, content_type='application/json', **cabecalhos)
+    if resposta.streaming:
+        for _ in resposta.streaming_content:
+            pass
+    return resposta.status_code
+
+
+def _falhou(status):
+    # A API responde 404 quando um filtro não encontra resultados: não é uma falha do endpoint
+    return status >= 400 and status != 404
+
+
+def perfilar(mistura, amostra, repeticoes, semente):
+    """Fase de perfil: máximo de consultas e mediana do pico de memória (KiB) de cada cenário, em sequência"""
+    rng = random.Random(semente)
+    cliente = Client(SERVER_NAME=HOST)
+    perfil = {}
+    for cenario in mistura:
+        # A primeira execução carrega módulos e caches do processo; não entra na medição
+        _executar(cliente, *montar_requisicao(cenario, amostra, rng))
+        consultas, memorias = 0, []
+        for _ in range(repeticoes):
+            requisicao = montar_requisicao(cenario, amostra, rng)
+            tracemalloc.start()
+            try:
+                with CaptureQueriesContext(connection) as capturadas:
+                    _executar(cliente, *requisicao)
+                _, pico = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            consultas = max(consultas, len(capturadas))
+            memorias.append(pico / 1024)
+        perfil[cenario] = {'consultas': consultas, 'memoria_kb': round(percentil(sorted(memorias), 50), 1)}
+    return perfil
+
+
+def _carga_thread(indice, mistura, amostra, quantidade, semente):
+    rng = random.Random(semente + indice)
+    cenarios, pesos = list(mistura), list(mistura.values())
+    cliente = Client(SERVER_NAME=HOST)
+    resultados = []
+    try:
+        for _ in range(quantidade):
+            cenario = rng.choices(cenarios, weights=pesos)[0]
+            requisicao = montar_requisicao(cenario, amostra, rng)
+            inicio = time.perf_counter()
+            status = _executar(cliente, *requisicao)
+            resultados.append((cenario, time.perf_counter() - inicio, status))
+    finally:
+        # Cada thread abre a própria conexão com o banco
+        connections.close_all()
+    return resultados
+
+
+def carregar(mistura, amostra, requisicoes, threads, semente):
+    """Fase de carga: retorna (segundos decorridos, [(cenário, segundos, status)])"""
+    por_thread = [requisicoes // threads + (1 if indice < requisicoes % threads else 0) for indice in range(threads)]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        tarefas = [
+            executor.submit(_carga_thread, indice, mistura, amostra, quantidade, semente)
+            for indice, quantidade in enumerate(por_thread)
+        ]
+        resultados = [resultado for tarefa in tarefas for resultado in tarefa.result()]
+    return time.perf_counter() - inicio, resultados
+
+
+def resumir(decorrido, resultados, perfil):
+    """Relatório por cenário: vazão, percentis de latência (ms), falhas, consultas e memória"""
+    por_cenario = {}
+    for cenario, segundos, status in resultados:
+        dados = por_cenario.setdefault(cenario, {'latencias': [], 'falhas': 0})
+        dados['latencias'].append(segundos * 1000)
+        dados['falhas'] += _falhou(status)
+
+    endpoints = {}
+    for cenario, dados in sorted(por_cenario.items()):
+        latencias = sorted(dados['latencias'])
+        endpoints[cenario] = {
+            'requisicoes': len(latencias),
+            'falhas': dados['falhas'],
+            'rps': round(len(latencias) / decorrido, 2),
+            'media_ms': round(sum(latencias) / len(latencias), 2),
+            'p50_ms': round(percentil(latencias, 50), 2),
+            'p95_ms': round(percentil(latencias, 95), 2),
+            'p99_ms': round(percentil(latencias, 99), 2),
+            **perfil.get(cenario, {}),
+        }
+    return {
+        'total': {
+            'requisicoes': len(resultados),
+            'falhas': sum(dados['falhas'] for dados in por_cenario.values()),
+            'segundos': round(decorrido, 2),
+            'rps': round(len(resultados) / decorrido, 2) if decorrido else 0,
+        },
+        'endpoints': endpoints,
+    }
+
+
+def comparar(atual, baseline, tolerancia):
+    """
+    Regressões em relação à baseline: p95 ou memória acima de (1 + tolerancia) vezes o valor
+    de referência, ou qualquer consulta a mais. Cenários ausentes em um dos lados são ignorados.
+    """
+    regressoes = []
+    for cenario, referencia in baseline.get('endpoints', {}).items():
+        medido = atual['endpoints'].get(cenario)
+        if medido is None:
+            continue
+        for metrica in ('p95_ms', 'memoria_kb'):
+            if metrica in referencia and metrica in medido and medido[metrica] > referencia[metrica] * (1 + tolerancia):
+                regressoes.append(f'{cenario}: {metrica} {referencia[metrica]} -> {medido[metrica]}')
+        if medido.get('consultas', 0) > referencia.get('consultas', medido.get('consultas', 0)):
+            regressoes.append(f'{cenario}: consultas {referencia["consultas"]} -> {medido["consultas"]}')
+    return regressoes
+
+
+def salvar(relatorio, caminho):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+
+
+def ler(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
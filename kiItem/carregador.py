@@ -0,0 +1,106 @@
+"""
+Carregamento em lote das chaves estrangeiras lidas na serialização (no estilo DataLoader).
+
+Um serializer que lê `id_denunciante.username` faz uma consulta por objeto quando a view não usa
+select_related. Serializers com CarregamentoEmLoteMixin declaram em Meta.carregar_em_lote as chaves
+estrangeiras que leem; antes de serializar, os ids de cada chave são reunidos e os objetos que
+faltam são buscados com um in_bulk por modelo e guardados nas instâncias, como o select_related
+faria. Campos já carregados (select_related, prefetch_related) não geram consultas.
+
+Os objetos buscados ficam memorizados até o fim da requisição (CarregadorMiddleware): outro
+serializer, ou outra página, da mesma requisição não os busca de novo. Objetos memorizados não são
+relidos depois de uma escrita na mesma requisição. Fora de uma requisição (comandos, testes), a
+memória vale apenas para cada chamada de carregar(), a não ser dentro de escopo().
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db.models import Manager
+from rest_framework import serializers
+from .assincrono import MiddlewareHibrido
+from .shards import CAMPO_USUARIO
+
+# {(rótulo do modelo, banco): {pk: objeto}} da requisição em andamento
+_memoria = ContextVar('carregador_memoria', default=None)
+
+
+@contextmanager
+def escopo():
+    """Memória de objetos compartilhada pelas chamadas de carregar() dentro do bloco"""
+    token = _memoria.set({})
+    try:
+        yield
+    finally:
+        _memoria.reset(token)
+
+
+def carregar(instancias, *campos):
+    """Preenche as chaves estrangeiras `campos` das instâncias com uma consulta in_bulk por modelo"""
+    memoria = _memoria.get()
+    if memoria is None:
+        memoria = {}
+    for nome in campos:
+        pendentes = {}
+        for instancia in instancias:
+            campo = instancia._meta.get_field(nome)
+            modelo = campo.related_model
+            # Modelos distribuídos estão no shard da instância; os globais, no banco escolhido pelos routers
+            banco = instancia._state.db if modelo._meta.label_lower in CAMPO_USUARIO else None
+            objetos = memoria.setdefault((modelo._meta.label_lower, banco), {})
+            if campo.is_cached(instancia):
+                relacionado = campo.get_cached_value(instancia)
+                if relacionado is not None:
+                    objetos.setdefault(relacionado.pk, relacionado)
+            elif getattr(instancia, campo.attname) is not None:
+                pendentes.setdefault((campo, banco), []).append(instancia)
+
+        for (campo, banco), lista in pendentes.items():
+            objetos = memoria[(campo.related_model._meta.label_lower, banco)]
+            faltantes = {getattr(instancia, campo.attname) for instancia in lista} - objetos.keys()
+            if faltantes:
+                objetos.update(campo.related_model._base_manager.db_manager(banco).in_bulk(faltantes))
+            for instancia in lista:
+                relacionado = objetos.get(getattr(instancia, campo.attname))
+                # Ids sem objeto (registro excluído) ficam com o carregamento padrão do Django
+                if relacionado is not None:
+                    campo.set_cached_value(instancia, relacionado)
+    return instancias
+
+
+class ListSerializerEmLote(serializers.ListSerializer):
+    """Carrega as chaves estrangeiras de todos os itens antes de serializá-los"""
+
+    def to_representation(self, data):
+        instancias = list(data.all() if isinstance(data, Manager) else data)
+        carregar(instancias, *self.child.Meta.carregar_em_lote)
+        return super().to_representation(instancias)
+
+
+class CarregamentoEmLoteMixin:
+    """
+    Mixin de ModelSerializer: as chaves estrangeiras de Meta.carregar_em_lote são carregadas em lote
+    (many=True) ou pela memória da requisição (uma instância)
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = getattr(cls, 'Meta', None)
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = ListSerializerEmLote
+
+    def to_representation(self, instance):
+        carregar([instance], *self.Meta.carregar_em_lote)
+        return super().to_representation(instance)
+
+
+class CarregadorMiddleware(MiddlewareHibrido):
+    """Uma memória de objetos carregados em lote por requisição"""
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        with escopo():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with escopo():
+            return await self.get_response(request)
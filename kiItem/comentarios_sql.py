@@ -0,0 +1,103 @@
+"""
+Comentários no formato sqlcommenter nas consultas do ORM, para atribuir no banco (pg_stat_statements,
+log de consultas lentas do PostgreSQL) cada consulta à rota e à view que a executou:
+
+    SELECT ... /*controller='ReceitaPorCategoriaAPIView',framework='django%3A5.2',
+                 request_id='6f1c...',route='receitas-por-categoria'*/
+
+As chaves ficam sempre na mesma ordem e o comentário vai no fim do SQL; o PostgreSQL ignora
+comentários ao agrupar consultas no pg_stat_statements. O identificador da requisição vem do
+cabeçalho X-Request-ID (quando válido) ou é gerado, e é devolvido no mesmo cabeçalho da resposta.
+
+O comentário é montado uma vez por requisição; por consulta só há uma concatenação de strings.
+"""
+import re
+from urllib.parse import quote
+from uuid import uuid4
+import django
+from django.conf import settings
+from .assincrono import MiddlewareHibrido, awrappers_de_conexao, wrappers_de_conexao
+
+CABECALHO = 'HTTP_X_REQUEST_ID'
+REQUEST_ID_VALIDO = re.compile(r'^[\w.-]{1,64}$')
+FRAMEWORK = f'django:{django.get_version()}'
+
+
+def _valor(valor):
+    # URL-encoding e escape de aspas simples, como na especificação do sqlcommenter
+    return quote(str(valor), safe='').replace("'", "\\'")
+
+
+def montar_comentario(**campos):
+    """Comentário sqlcommenter com os campos preenchidos, em ordem alfabética de chave"""
+    pares = [f"{chave}='{_valor(valor)}'" for chave, valor in sorted(campos.items()) if valor]
+    return '/*' + ','.join(pares) + '*/'
+
+
+def nome_da_view(view_func):
+    """Classe da view (APIView, ViewSet) ou nome da função"""
+    classe = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    return classe.__name__ if classe else getattr(view_func, '__name__', None)
+
+
+class ComentarioSQL:
+    """execute_wrapper que acrescenta o comentário da requisição ao fim de cada consulta"""
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.definir()
+
+    def definir(self, route=None, controller=None):
+        comentario = ' ' + montar_comentario(
+            controller=controller, framework=FRAMEWORK, request_id=self.request_id, route=route
+        )
+        self.comentario = comentario
+        # Com parâmetros, o driver trata % como marcador: os % do URL-encoding precisam ser dobrados
+        self.comentario_com_parametros = comentario.replace('%', '%%')
+
+    def __call__(self, execute, sql, params, many, context):
+        comentario = self.comentario if params is None else self.comentario_com_parametros
+        sql = sql.rstrip()
+        if sql.endswith(';'):
+            sql = sql[:-1] + comentario + ';'
+        else:
+            sql += comentario
+        return execute(sql, params, many, context)
+
+
+def _request_id(request):
+    request_id = request.META.get(CABECALHO, '')
+    return request_id if REQUEST_ID_VALIDO.match(request_id) else uuid4().hex
+
+
+class ComentariosSQLMiddleware(MiddlewareHibrido):
+    """
+    Instala ComentarioSQL em todas as conexões durante a requisição; desligado com COMENTARIOS_SQL = False.
+    Rota e view só são conhecidas em process_view; consultas anteriores levam apenas o request_id.
+    """
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if not getattr(settings, 'COMENTARIOS_SQL', False):
+            return self.get_response(request)
+        comentario = request._comentario_sql = ComentarioSQL(_request_id(request))
+        with wrappers_de_conexao(lambda alias: comentario):
+            response = self.get_response(request)
+        response['X-Request-ID'] = comentario.request_id
+        return response
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'COMENTARIOS_SQL', False):
+            return await self.get_response(request)
+        comentario = request._comentario_sql = ComentarioSQL(_request_id(request))
+        async with awrappers_de_conexao(lambda alias: comentario):
+            response = await self.get_response(request)
+        response['X-Request-ID'] = comentario.request_id
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        comentario = getattr(request, '_comentario_sql', None)
+        if comentario is not None:
+            resolver_match = request.resolver_match
+            comentario.definir(route=resolver_match.url_name or resolver_match.route, controller=nome_da_view(view_func))
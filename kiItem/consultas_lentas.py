@@ -0,0 +1,207 @@
+"""
+Registro de consultas lentas.
+
+Consultas acima de CONSULTAS_LENTAS_LIMITE_MS são gravadas em CONSULTAS_LENTAS_ARQUIVO (uma linha
+JSON por consulta) com SQL, parâmetros, ponto de chamada no código do projeto, nome da rota e a
+impressão digital do SQL normalizado, usada pelo comando consultas_lentas para agrupar as ocorrências.
+Com CONSULTAS_LENTAS_EXPLAIN = True, o plano (EXPLAIN no PostgreSQL, EXPLAIN QUERY PLAN no SQLite)
+é capturado uma vez por impressão digital.
+
+Na requisição só se mede o tempo e se copia o necessário; o EXPLAIN e a gravação no arquivo
+acontecem em uma thread separada, com fila limitada.
+
+O tempo medido é o de cursor.execute(). No PostgreSQL ele inclui a transferência de todas as
+linhas; no SQLite e em cursores no servidor (iterator()) as linhas são lidas depois, fora da medida.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from django.conf import settings
+from django.db import connections
+from . import assincrono, comentarios_sql, instrumentacao
+from .assincrono import MiddlewareHibrido, awrappers_de_conexao, wrappers_de_conexao
+
+logger = logging.getLogger(__name__)
+
+# Consultas aguardando gravação; acima disso as novas são descartadas para não acumular memória
+TAMANHO_FILA = 1000
+TAMANHO_MAXIMO_PARAMETRO = 200
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='consultas-lentas')
+_pendentes = 0
+_trava = threading.Lock()
+_planos_capturados = set()
+# Wrappers de consulta do próprio projeto, que não contam como ponto de chamada
+ARQUIVOS_IGNORADOS = {__file__, assincrono.__file__, instrumentacao.__file__, comentarios_sql.__file__}
+
+_LITERAIS = [
+    # Comentários (como os de comentarios_sql.py) não mudam a consulta
+    (re.compile(r'/\*.*?\*/', re.DOTALL), ''),
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    # IN (?, ?, ?) com qualquer quantidade de itens é a mesma consulta
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?+)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def normalizar_sql(sql):
+    """SQL sem literais nem parâmetros, com listas IN colapsadas e espaços uniformes"""
+    for padrao, substituto in _LITERAIS:
+        sql = padrao.sub(substituto, sql)
+    return sql.strip()
+
+
+def impressao_digital(sql):
+    return hashlib.sha1(normalizar_sql(sql).encode()).hexdigest()[:16]
+
+
+def _ponto_de_chamada():
+    """Primeiro quadro da pilha que pertence ao projeto (fora do Django e das bibliotecas)"""
+    base = str(settings.BASE_DIR)
+    quadro = sys._getframe(2)
+    while quadro is not None:
+        arquivo = quadro.f_code.co_filename
+        if _do_projeto(arquivo, base):
+            return f'{arquivo[len(base) + 1:]}:{quadro.f_lineno} ({quadro.f_code.co_name})'
+        if f'{os.sep}asgiref{os.sep}' in arquivo:
+            # Consulta do ORM assíncrono: quem a aguarda é o handler suspenso, fora desta pilha
+            for quadro_handler in assincrono.quadros_do_handler():
+                arquivo = quadro_handler.f_code.co_filename
+                if _do_projeto(arquivo, base):
+                    return f'{arquivo[len(base) + 1:]}:{quadro_handler.f_lineno} ({quadro_handler.f_code.co_name})'
+        quadro = quadro.f_back
+    return None
+
+
+def _do_projeto(arquivo, base):
+    return arquivo.startswith(base) and 'site-packages' not in arquivo and arquivo not in ARQUIVOS_IGNORADOS
+
+
+def _parametro_serializavel(valor):
+    texto = valor if isinstance(valor, (int, float, bool)) or valor is None else str(valor)
+    if isinstance(texto, str) and len(texto) > TAMANHO_MAXIMO_PARAMETRO:
+        return texto[:TAMANHO_MAXIMO_PARAMETRO] + '...'
+    return texto
+
+
+def _parametros(params, many):
+    if params is None:
+        return None
+    if many:
+        # executemany: só o primeiro conjunto interessa para reproduzir a consulta
+        params = next(iter(params), ())
+    if isinstance(params, dict):
+        return {chave: _parametro_serializavel(valor) for chave, valor in params.items()}
+    return [_parametro_serializavel(valor) for valor in params]
+
+
+def _capturar_plano(alias, sql, params):
+    conexao = connections[alias]
+    prefixo = 'EXPLAIN QUERY PLAN ' if conexao.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        with conexao.cursor() as cursor:
+            cursor.execute(prefixo + sql, params)
+            return [' '.join(str(coluna) for coluna in linha) for linha in cursor.fetchall()]
+    except Exception as erro:  # O plano é complementar: uma falha não impede o registro da consulta
+        return [f'EXPLAIN falhou: {erro}']
+    finally:
+        # Conexão própria desta thread: não fica aberta entre uma consulta lenta e outra
+        conexao.close()
+
+
+def _gravar(entrada, alias, sql, params):
+    global _pendentes
+    try:
+        if entrada.pop('capturar_plano'):
+            entrada['plano'] = _capturar_plano(alias, sql, params)
+        caminho = getattr(settings, 'CONSULTAS_LENTAS_ARQUIVO', None)
+        if caminho:
+            with open(caminho, 'a', encoding='utf-8') as arquivo:
+                arquivo.write(json.dumps(entrada, ensure_ascii=False, default=str) + '\n')
+    except Exception:
+        logger.exception('Falha ao registrar consulta lenta')
+    finally:
+        with _trava:
+            _pendentes -= 1
+
+
+def registrar(alias, sql, params, many, duracao, request=None):
+    """Enfileira o registro de uma consulta lenta (chamado no caminho da requisição)"""
+    global _pendentes
+    with _trava:
+        if _pendentes >= TAMANHO_FILA:
+            return
+        _pendentes += 1
+
+    digital = impressao_digital(sql)
+    resolver_match = getattr(request, 'resolver_match', None)
+    # EXPLAIN só de SELECT executados uma vez (executemany não tem um único conjunto de parâmetros)
+    eh_select = not many and sql.lstrip().upper().startswith('SELECT')
+    capturar_plano = eh_select and getattr(settings, 'CONSULTAS_LENTAS_EXPLAIN', False) and digital not in _planos_capturados
+    if capturar_plano:
+        _planos_capturados.add(digital)
+    entrada = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'duracao_ms': round(duracao * 1000, 2),
+        'impressao_digital': digital,
+        'sql': sql,
+        'parametros': _parametros(params, many),
+        'ponto_de_chamada': _ponto_de_chamada(),
+        'rota': resolver_match.url_name if resolver_match else None,
+        'banco': alias,
+        'capturar_plano': capturar_plano,
+    }
+    logger.warning('Consulta lenta (%.1f ms) em %s: %s', entrada['duracao_ms'], entrada['rota'], digital)
+    _executor.submit(_gravar, entrada, alias, sql, params if not many else None)
+
+
+def aguardar():
+    """Espera a gravação das consultas já enfileiradas (testes e comandos)"""
+    _executor.submit(lambda: None).result()
+
+
+class MonitorConsultas:
+    """execute_wrapper que mede cada consulta e registra as que passam do limite"""
+
+    def __init__(self, alias, limite, request=None):
+        self.alias = alias
+        self.limite = limite
+        self.request = request
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = time.perf_counter() - inicio
+            if duracao >= self.limite:
+                registrar(self.alias, sql, params, many, duracao, self.request)
+
+
+class ConsultasLentasMiddleware(MiddlewareHibrido):
+    """Monitora as consultas de cada requisição; desligado com CONSULTAS_LENTAS_LIMITE_MS vazio ou 0"""
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        limite_ms = getattr(settings, 'CONSULTAS_LENTAS_LIMITE_MS', None)
+        if not limite_ms:
+            return self.get_response(request)
+        with wrappers_de_conexao(lambda alias: MonitorConsultas(alias, limite_ms / 1000, request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        limite_ms = getattr(settings, 'CONSULTAS_LENTAS_LIMITE_MS', None)
+        if not limite_ms:
+            return await self.get_response(request)
+        async with awrappers_de_conexao(lambda alias: MonitorConsultas(alias, limite_ms / 1000, request)):
+            return await self.get_response(request)
@@ -0,0 +1,284 @@
+"""
+Geração de dados sintéticos para benchmarks locais.
+
+Cria usuários, ingredientes, receitas em todas as categorias, ingredientes das receitas,
+favoritos, listas de itens e denúncias com bulk_create em lotes. A popularidade das
+receitas segue uma distribuição de Zipf: poucas receitas concentram a maior parte das
+visualizações, favoritos e denúncias, como acontece em produção. A mesma semente gera
+sempre o mesmo conjunto de dados.
+
+bulk_create não dispara sinais: ao final, as estatísticas de denúncias e os contadores
+de denúncias pendentes das receitas são recalculados.
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import time as horario, timedelta
+from decimal import Decimal
+from itertools import accumulate, islice
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+from denuncia import estatisticas, moderacao
+from denuncia.models import Denuncia, uuid7
+from favorito.models import Favorito
+from ingrediente.models import Ingrediente
+from lista_itens.models import ListaItens, ListaItensIngrediente
+from receita.models import Receita, ReceitaIngrediente
+
+TAMANHO_LOTE = 5000
+# Expoente da distribuição de Zipf da popularidade das receitas
+EXPOENTE_ZIPF = 1.07
+VISUALIZACOES_MAXIMAS = 500_000
+# Denúncias espalhadas pelos últimos dois anos; as do último mês ainda estão, em sua maioria, pendentes
+DIAS_HISTORICO = 730
+DIAS_FILA_RECENTE = 30
+SENHA_PADRAO = 'Kitem@12345'
+
+INGREDIENTES_BASE = [
+    'Farinha de trigo', 'Açúcar', 'Sal', 'Ovo', 'Leite', 'Manteiga', 'Óleo', 'Azeite', 'Alho', 'Cebola',
+    'Tomate', 'Batata', 'Cenoura', 'Arroz', 'Feijão', 'Frango', 'Carne moída', 'Picanha', 'Costela',
+    'Linguiça', 'Bacon', 'Presunto', 'Queijo muçarela', 'Queijo parmesão', 'Requeijão', 'Creme de leite',
+    'Leite condensado', 'Chocolate', 'Cacau', 'Coco ralado', 'Fermento', 'Polvilho', 'Mandioca', 'Milho',
+    'Fubá', 'Aveia', 'Banana', 'Maçã', 'Laranja', 'Limão', 'Morango', 'Maracujá', 'Abacaxi', 'Goiabada',
+    'Camarão', 'Bacalhau', 'Tilápia', 'Salmão', 'Atum', 'Brócolis', 'Couve', 'Espinafre', 'Abobrinha',
+    'Berinjela', 'Pimentão', 'Cheiro-verde', 'Coentro', 'Manjericão', 'Orégano', 'Pimenta-do-reino',
+    'Cominho', 'Páprica', 'Canela', 'Cravo', 'Gengibre', 'Mel', 'Castanha-de-caju', 'Amendoim', 'Grão-de-bico',
+    'Lentilha', 'Tofu', 'Cogumelo', 'Palmito', 'Azeitona', 'Ervilha', 'Macarrão', 'Massa de lasanha',
+    'Iogurte natural', 'Ricota', 'Vinagre', 'Molho de soja', 'Caldo de legumes',
+]
+QUALIFICADORES = [
+    'integral', 'orgânico', 'light', 'caseiro', 'fresco', 'congelado', 'defumado', 'em pó', 'ralado',
+    'desidratado', 'zero lactose', 'sem glúten', 'artesanal', 'importado', 'picado',
+]
+
+PRATOS_POR_CATEGORIA = {
+    'massas': ['Macarrão', 'Lasanha', 'Nhoque', 'Talharim', 'Espaguete'],
+    'carnes': ['Carne assada', 'Bife acebolado', 'Picadinho', 'Carne de panela'],
+    'aves': ['Frango assado', 'Strogonoff de frango', 'Frango xadrez', 'Coxinha da asa'],
+    'peixes_frutos_mar': ['Moqueca', 'Peixe assado', 'Bobó de camarão', 'Bolinho de bacalhau'],
+    'sopas_caldos': ['Sopa', 'Caldo verde', 'Canja', 'Creme'],
+    'saladas': ['Salada', 'Salpicão', 'Tabule'],
+    'risotos': ['Risoto'],
+    'pizzas': ['Pizza', 'Calzone'],
+    'lanches_sanduiches': ['Sanduíche', 'Misto-quente', 'Wrap', 'Hambúrguer'],
+    'bolos': ['Bolo', 'Bolo de caneca', 'Rocambole'],
+    'tortas_doces': ['Torta', 'Cheesecake', 'Torta mousse'],
+    'tortas_salgadas': ['Torta salgada', 'Quiche', 'Empadão'],
+    'sobremesas': ['Pudim', 'Mousse', 'Pavê', 'Sorvete caseiro'],
+    'doces_brigadeiros': ['Brigadeiro', 'Beijinho', 'Cajuzinho', 'Doce de leite'],
+    'paes': ['Pão', 'Pão de queijo', 'Broa', 'Focaccia'],
+    'biscoitos': ['Biscoito', 'Cookie', 'Rosquinha'],
+    'bebidas': ['Chá gelado', 'Café gelado', 'Quentão'],
+    'sucos_vitaminas': ['Suco', 'Vitamina', 'Smoothie'],
+    'molhos_temperos': ['Molho', 'Pesto', 'Tempero caseiro'],
+    'arroz_feijao': ['Arroz', 'Feijoada', 'Baião de dois', 'Tutu'],
+    'comida_mineira': ['Feijão tropeiro', 'Frango com quiabo', 'Pão de queijo'],
+    'comida_japonesa': ['Yakisoba', 'Temaki', 'Missoshiru'],
+    'comida_mexicana': ['Taco', 'Burrito', 'Guacamole'],
+}
+PRATOS_GENERICOS = ['Receita', 'Prato', 'Refogado', 'Assado', 'Creme']
+COMPLEMENTOS = [
+    '', 'da vovó', 'de domingo', 'ao forno', 'na pressão', 'de liquidificador', 'especial', 'simples',
+    'para festa', 'light', 'na airfryer', 'de panela',
+]
+DIFICULDADES = ['Fácil', 'Média', 'Difícil']
+TIPOS = ['Doce', 'Salgado', None]
+RESTRICOES = [None, None, None, 'Sem glúten', 'Sem lactose', 'Vegana', 'Vegetariana', 'Low carb']
+UNIDADES = ['g', 'kg', 'ml', 'l', 'unidade', 'xícara', 'colher de sopa', 'colher de chá', 'pitada']
+# Pesos dos motivos de denúncia (spam e conteúdo inadequado são os mais comuns)
+PESOS_MOTIVOS = {1: 25, 2: 35, 3: 12, 4: 8, 5: 10, 6: 4, 7: 6}
+
+
+@contextmanager
+def _sem_auto_now_add(modelo, campo):
+    """Permite gravar datas passadas em um campo auto_now_add durante o bulk_create"""
+    field = modelo._meta.get_field(campo)
+    original = field.auto_now_add
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = original
+
+
+class GeradorDadosSinteticos:
+    """Gera o conjunto de dados; progresso(nome, quantidade, segundos) é chamado ao final de cada tabela"""
+
+    def __init__(self, usuarios=1000, ingredientes=500, receitas=10_000, favoritos_por_usuario=15,
+                 fracao_listas=0.3, denuncias=2000, semente=42, lote=TAMANHO_LOTE, progresso=None):
+        self.usuarios = usuarios
+        self.ingredientes = ingredientes
+        self.receitas = receitas
+        self.favoritos_por_usuario = favoritos_por_usuario
+        self.fracao_listas = fracao_listas
+        self.denuncias = denuncias
+        self.semente = semente
+        self.lote = lote
+        self.progresso = progresso or (lambda nome, quantidade, segundos: None)
+        self.rng = random.Random(semente)
+
+    @property
+    def prefixo_usuarios(self):
+        return f'sintetico{self.semente}_'
+
+    def ja_gerado(self):
+        """Usuários com o prefixo desta semente já existem (nomes de usuário são únicos)"""
+        return User.objects.filter(username__startswith=self.prefixo_usuarios).exists()
+
+    def _inserir(self, modelo, objetos, retornar_ids=False):
+        """bulk_create em lotes de self.lote, sem manter todos os objetos em memória"""
+        inicio, total, ids = time.perf_counter(), 0, []
+        objetos = iter(objetos)
+        while lote := list(islice(objetos, self.lote)):
+            criados = modelo.objects.bulk_create(lote)
+            total += len(criados)
+            if retornar_ids:
+                ids.extend(objeto.pk for objeto in criados)
+        self.progresso(modelo._meta.verbose_name_plural, total, time.perf_counter() - inicio)
+        return ids if retornar_ids else total
+
+    def gerar(self):
+        """Gera todas as tabelas e retorna {nome da tabela: linhas inseridas}"""
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            # Durabilidade dispensável para uma carga descartável: grava bem mais rápido
+            # (o SQLite não aceita mudar o PRAGMA dentro de uma transação)
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+
+        usuarios = self._inserir(User, self._gerar_usuarios(), retornar_ids=True)
+        ingredientes = self._inserir(Ingrediente, self._gerar_ingredientes(), retornar_ids=True)
+        receitas = self._inserir(Receita, self._gerar_receitas(usuarios), retornar_ids=True)
+        ids_por_posto, pesos = self._popularidade(receitas)
+
+        totais = {'usuarios': len(usuarios), 'ingredientes': len(ingredientes), 'receitas': len(receitas)}
+        totais['receita_ingredientes'] = self._inserir(ReceitaIngrediente, self._gerar_receita_ingredientes(receitas, ingredientes))
+        totais['favoritos'] = self._inserir(Favorito, self._gerar_favoritos(usuarios, ids_por_posto, pesos))
+        listas = self._inserir(ListaItens, self._gerar_listas(usuarios), retornar_ids=True)
+        totais['listas_itens'] = len(listas)
+        totais['itens_listas'] = self._inserir(ListaItensIngrediente, self._gerar_itens_listas(listas, ingredientes))
+        with _sem_auto_now_add(Denuncia, 'data_denuncia'):
+            totais['denuncias'] = self._inserir(Denuncia, self._gerar_denuncias(usuarios, ids_por_posto, pesos))
+
+        inicio = time.perf_counter()
+        estatisticas.recalcular()
+        moderacao.recalcular_pendentes()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.progresso('estatísticas e contadores', totais['denuncias'], time.perf_counter() - inicio)
+        return totais
+
+    def _popularidade(self, receitas):
+        """Ordena as receitas por popularidade (a mesma usada nas visualizações) e os pesos acumulados de Zipf"""
+        ids_por_posto = [None] * len(receitas)
+        for pk, posto in zip(receitas, self.postos):
+            ids_por_posto[posto] = pk
+        pesos = list(accumulate(1 / (posto + 1) ** EXPOENTE_ZIPF for posto in range(len(receitas))))
+        return ids_por_posto, pesos
+
+    def _gerar_usuarios(self):
+        # Uma única senha com hash: gerar um hash por usuário levaria horas com um milhão de usuários
+        senha = make_password(SENHA_PADRAO)
+        for numero in range(self.usuarios):
+            nome = f'{self.prefixo_usuarios}{numero}'
+            yield User(username=nome, email=f'{nome}@kitem.com', password=senha)
+
+    def _gerar_ingredientes(self):
+        for numero in range(self.ingredientes):
+            base = INGREDIENTES_BASE[numero % len(INGREDIENTES_BASE)]
+            variacao = numero // len(INGREDIENTES_BASE)
+            if variacao == 0:
+                nome = base
+            elif variacao <= len(QUALIFICADORES):
+                nome = f'{base} {QUALIFICADORES[variacao - 1]}'
+            else:
+                nome = f'{base} {variacao}'
+            yield Ingrediente(nome=nome[:50])
+
+    def _gerar_receitas(self, usuarios):
+        rng = self.rng
+        categorias = [codigo for codigo, _ in Receita.CATEGORIA_CHOICES]
+        # Posto de popularidade de cada receita (0 = mais popular), em ordem aleatória de criação
+        self.postos = list(range(self.receitas))
+        rng.shuffle(self.postos)
+        for numero in range(self.receitas):
+            categoria = categorias[numero % len(categorias)]
+            prato = rng.choice(PRATOS_POR_CATEGORIA.get(categoria, PRATOS_GENERICOS))
+            principal = rng.choice(INGREDIENTES_BASE).lower()
+            titulo = f'{prato} de {principal} {rng.choice(COMPLEMENTOS)}'.strip()
+            visualizacoes = VISUALIZACOES_MAXIMAS / (self.postos[numero] + 1) ** EXPOENTE_ZIPF
+            yield Receita(
+                id_usuario_id=rng.choice(usuarios),
+                titulo=titulo[:50],
+                descricao=f'{titulo}. Modo de preparo: misture os ingredientes, tempere a gosto e sirva.',
+                tempo_preparo=horario(rng.choice([0, 0, 0, 1, 2]), rng.choice([5, 10, 15, 20, 30, 40, 45, 50])),
+                dificuldade=rng.choice(DIFICULDADES),
+                tipo=rng.choice(TIPOS),
+                restricao_alimentar=rng.choice(RESTRICOES),
+                categoria=categoria,
+                quantidade_visualizacao=int(visualizacoes * rng.uniform(0.5, 1.5)),
+            )
+
+    def _gerar_receita_ingredientes(self, receitas, ingredientes):
+        rng = self.rng
+        for receita_id in receitas:
+            for ingrediente_id in rng.sample(ingredientes, min(rng.randint(3, 12), len(ingredientes))):
+                yield ReceitaIngrediente(
+                    id_receita_id=receita_id, id_ingrediente_id=ingrediente_id,
+                    quantidade=round(rng.uniform(0.1, 5), 2), unidade_medida=rng.choice(UNIDADES),
+                )
+
+    def _gerar_favoritos(self, usuarios, ids_por_posto, pesos):
+        rng = self.rng
+        if not ids_por_posto:
+            return
+        for usuario_id in usuarios:
+            quantidade = min(int(rng.expovariate(1 / self.favoritos_por_usuario)), len(ids_por_posto)) if self.favoritos_por_usuario else 0
+            # Sorteios repetidos da mesma receita são descartados (um favorito por usuário e receita)
+            for receita_id in set(rng.choices(ids_por_posto, cum_weights=pesos, k=quantidade)):
+                yield Favorito(id_usuario_id=usuario_id, id_receita_id=receita_id)
+
+    def _gerar_listas(self, usuarios):
+        for usuario_id in usuarios:
+            if self.rng.random() < self.fracao_listas:
+                yield ListaItens(id_usuario_id=usuario_id)
+
+    def _gerar_itens_listas(self, listas, ingredientes):
+        rng = self.rng
+        for lista_id in listas:
+            for ingrediente_id in rng.sample(ingredientes, min(rng.randint(3, 15), len(ingredientes))):
+                yield ListaItensIngrediente(
+                    id_lista_id=lista_id, id_ingrediente_id=ingrediente_id,
+                    quantidade=round(rng.uniform(0.1, 5), 2), unidade_medida=rng.choice(UNIDADES),
+                    preco=Decimal(rng.randint(100, 5000)) / 100 if rng.random() < 0.7 else None,
+                    comprado=rng.random() < 0.3,
+                )
+
+    def _gerar_denuncias(self, usuarios, ids_por_posto, pesos):
+        rng = self.rng
+        if not ids_por_posto or not usuarios:
+            return
+        agora = timezone.now()
+        motivos, pesos_motivos = list(PESOS_MOTIVOS), list(PESOS_MOTIVOS.values())
+        limite = min(self.denuncias, len(ids_por_posto) * len(usuarios))
+        pares, tentativas = set(), 0
+        # Receitas populares recebem mais denúncias; pares repetidos (receita, denunciante) são descartados
+        while len(pares) < limite and tentativas < 3 * limite:
+            tentativas += 1
+            par = (rng.choices(ids_por_posto, cum_weights=pesos)[0], rng.choice(usuarios))
+            if par in pares:
+                continue
+            pares.add(par)
+            data = agora - timedelta(seconds=rng.uniform(0, DIAS_HISTORICO * 86400))
+            if (agora - data).days < DIAS_FILA_RECENTE and rng.random() < 0.8:
+                status = 'pendente'
+            else:
+                status = 'resolvida' if rng.random() < 0.6 else 'descartada'
+            yield Denuncia(
+                unique_id=uuid7(int(data.timestamp() * 1000), rng.randbytes(10)),
+                id_receita_id=par[0], id_denunciante_id=par[1],
+                motivo_denuncia=rng.choices(motivos, weights=pesos_motivos)[0],
+                detalhamento='Denúncia gerada para testes de carga.' if rng.random() < 0.3 else None,
+                data_denuncia=data, status=status,
+            )
@@ -0,0 +1,174 @@
+"""
+Custo de cada requisição: consultas e tempo de banco, serialização, renderização e tempo total.
+
+As medidas são enviadas no cabeçalho Server-Timing (visível nas ferramentas do navegador) e,
+com INSTRUMENTACAO_LOG = True, em uma linha de log JSON com o nome da rota resolvida.
+INSTRUMENTACAO_AMOSTRAGEM (0 a 1) define a fração das requisições medidas; as demais só
+registram duração e status no registro de métricas (metricas.py).
+
+O tempo de serialização inclui as consultas feitas enquanto o serializer lê o queryset,
+então as medidas podem se sobrepor ao tempo de banco.
+"""
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from . import metricas
+from .assincrono import MiddlewareHibrido, awrappers_de_conexao, wrappers_de_conexao
+
+logger = logging.getLogger(__name__)
+
+_medicao_atual = ContextVar('medicao_atual', default=None)
+
+
+class Medicao:
+    """Acumula as medidas de uma requisição; os tempos são em segundos"""
+
+    def __init__(self, inicio=None):
+        self.inicio = time.perf_counter() if inicio is None else inicio
+        self.total = 0.0
+        self.consultas = 0
+        self.banco = 0.0
+        self.serializacao = 0.0
+        self.renderizacao = 0.0
+        self.inicio_renderizacao = None
+        self.serializando = False
+
+    def registrar_consulta(self, execute, sql, params, many, context):
+        """Usado em connection.execute_wrapper: conta a consulta e soma o tempo gasto no banco"""
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.banco += time.perf_counter() - inicio
+            self.consultas += 1
+
+    def iniciar_renderizacao(self):
+        self.inicio_renderizacao = time.perf_counter()
+
+    def finalizar_renderizacao(self, response):
+        if self.inicio_renderizacao is not None:
+            self.renderizacao += time.perf_counter() - self.inicio_renderizacao
+
+    def server_timing(self):
+        return ', '.join([
+            f'banco;dur={self.banco * 1000:.2f};desc="{self.consultas} consultas"',
+            f'serializacao;dur={self.serializacao * 1000:.2f}',
+            f'renderizacao;dur={self.renderizacao * 1000:.2f}',
+            f'total;dur={self.total * 1000:.2f}',
+        ])
+
+    def registro(self, request, response):
+        resolver_match = getattr(request, 'resolver_match', None)
+        return {
+            'rota': resolver_match.url_name if resolver_match else None,
+            'metodo': request.method,
+            'status': response.status_code,
+            'consultas': self.consultas,
+            'banco_ms': round(self.banco * 1000, 2),
+            'serializacao_ms': round(self.serializacao * 1000, 2),
+            'renderizacao_ms': round(self.renderizacao * 1000, 2),
+            'total_ms': round(self.total * 1000, 2),
+        }
+
+
+def medicao_atual():
+    """Medição da requisição em andamento, ou None quando ela está fora da amostra"""
+    return _medicao_atual.get()
+
+
+def medir_serializacao(propriedade):
+    """
+    Envolve a propriedade BaseSerializer.data (instalado em KiItemConfig.ready).
+    Só o serializer mais externo é medido: serializers usados dentro de outro não somam duas vezes.
+    """
+    def data(serializer):
+        medicao = _medicao_atual.get()
+        if medicao is None or medicao.serializando:
+            return propriedade.fget(serializer)
+        medicao.serializando = True
+        inicio = time.perf_counter()
+        try:
+            return propriedade.fget(serializer)
+        finally:
+            medicao.serializacao += time.perf_counter() - inicio
+            medicao.serializando = False
+
+    data.instrumentado = True
+    return property(data, doc=propriedade.__doc__)
+
+
+def _sortear_medicao(inicio):
+    amostragem = getattr(settings, 'INSTRUMENTACAO_AMOSTRAGEM', 0)
+    if not amostragem or (amostragem < 1 and random.random() >= amostragem):
+        return None
+    return Medicao(inicio)
+
+
+class InstrumentacaoMiddleware(MiddlewareHibrido):
+    """
+    Mede a requisição inteira; deve ser o primeiro da lista MIDDLEWARE. Duração e status de todas as
+    requisições vão para o registro de métricas; as amostradas também recebem o Server-Timing.
+    """
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        inicio = time.perf_counter()
+        medicao = _sortear_medicao(inicio)
+        metricas.registro.incrementar('kitem_requisicoes_em_andamento')
+        try:
+            response = self.get_response(request) if medicao is None else self.medir(request, medicao)
+        finally:
+            metricas.registro.incrementar('kitem_requisicoes_em_andamento', valor=-1)
+        return self.registrar(request, response, inicio, medicao)
+
+    async def __acall__(self, request):
+        inicio = time.perf_counter()
+        medicao = _sortear_medicao(inicio)
+        metricas.registro.incrementar('kitem_requisicoes_em_andamento')
+        try:
+            response = await self.get_response(request) if medicao is None else await self.amedir(request, medicao)
+        finally:
+            metricas.registro.incrementar('kitem_requisicoes_em_andamento', valor=-1)
+        return self.registrar(request, response, inicio, medicao)
+
+    def registrar(self, request, response, inicio, medicao):
+        duracao = time.perf_counter() - inicio
+        resolver_match = getattr(request, 'resolver_match', None)
+        metricas.registrar_requisicao(
+            resolver_match.url_name if resolver_match else None, request.method, response.status_code,
+            duracao, medicao.consultas if medicao else None
+        )
+        if medicao is not None:
+            medicao.total = duracao
+            response['Server-Timing'] = medicao.server_timing()
+            if getattr(settings, 'INSTRUMENTACAO_LOG', False):
+                logger.info(json.dumps(medicao.registro(request, response)))
+        return response
+
+    def medir(self, request, medicao):
+        token = _medicao_atual.set(medicao)
+        try:
+            with wrappers_de_conexao(lambda alias: medicao.registrar_consulta):
+                return self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+
+    async def amedir(self, request, medicao):
+        token = _medicao_atual.set(medicao)
+        try:
+            async with awrappers_de_conexao(lambda alias: medicao.registrar_consulta):
+                return await self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+
+    def process_template_response(self, request, response):
+        # Respostas do DRF são renderizadas logo depois deste hook; o callback marca o fim
+        medicao = _medicao_atual.get()
+        if medicao is not None:
+            medicao.iniciar_renderizacao()
+            response.add_post_render_callback(medicao.finalizar_renderizacao)
+        return response
@@ -0,0 +1,153 @@
+import importlib.util
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from kiItem import benchmark
+
+# Cenários de benchmark.py servidos pelas views assíncronas (kiItem/assincrono.py)
+CENARIOS_ASSINCRONOS = ['receita_detalhada', 'receitas_filtrar', 'receitas_categoria', 'favoritos_detalhados']
+URL_PRONTO = '/api/api/health-check/'
+# Segundos para o servidor começar a responder
+ESPERA_INICIO = 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara vazão e latência (p50/p95/p99) dos endpoints de leitura assíncronos servidos pelo '
+        'gunicorn com workers síncronos (WSGI) e pelo uvicorn (ASGI), com muitas requisições '
+        'simultâneas. Os servidores são iniciados como subprocessos com as configurações atuais.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requisicoes', type=int, default=500, help='Requisições medidas em cada servidor')
+        parser.add_argument('--concorrencia', type=int, default=32, help='Requisições simultâneas')
+        parser.add_argument('--workers', type=int, default=1, help='Processos de cada servidor')
+        parser.add_argument('--porta', type=int, default=8765, help='Porta local usada pelos servidores')
+        parser.add_argument('--semente', type=int, default=42, help='Semente do sorteio das requisições')
+
+    def handle(self, *args, **options):
+        if options['requisicoes'] <= 0 or options['concorrencia'] <= 0 or options['workers'] <= 0:
+            raise CommandError('--requisicoes, --concorrencia e --workers devem ser positivos.')
+        for modulo in ('gunicorn', 'uvicorn'):
+            if importlib.util.find_spec(modulo) is None:
+                raise CommandError(f'{modulo} não está instalado (pip install -r requirements.txt).')
+        try:
+            amostra = benchmark.Amostra()
+        except ValueError as erro:
+            raise CommandError(str(erro))
+
+        rng = random.Random(options['semente'])
+        urls = [self.montar_url(rng.choice(CENARIOS_ASSINCRONOS), amostra, rng) for _ in range(options['requisicoes'])]
+        base = f'http://127.0.0.1:{options["porta"]}'
+        servidores = {
+            'wsgi (gunicorn sync)': (
+                [sys.executable, '-m', 'gunicorn', 'kiItem.wsgi:application', '--workers', str(options['workers']),
+                 '--bind', f'127.0.0.1:{options["porta"]}'],
+                'sync',
+            ),
+            'asgi (uvicorn)': (
+                [sys.executable, '-m', 'uvicorn', 'kiItem.asgi:application', '--workers', str(options['workers']),
+                 '--host', '127.0.0.1', '--port', str(options['porta']), '--log-level', 'warning'],
+                'uvicorn',
+            ),
+        }
+        relatorio = {}
+        for modo, (comando, classe_worker) in servidores.items():
+            # O tamanho do pool de conexões de cada worker depende do tipo de worker (ver pool.py)
+            ambiente = {**os.environ, 'KITEM_WORKER_CLASSE': classe_worker}
+            # Saída em arquivo: um pipe cheio (logs de cada requisição) bloquearia o servidor
+            saida = tempfile.TemporaryFile()
+            processo = subprocess.Popen(comando, cwd=settings.BASE_DIR, env=ambiente, stdout=saida, stderr=saida)
+            try:
+                self.aguardar_inicio(processo, saida, base)
+                # Aquecimento: carrega módulos, caches e conexões dos workers
+                self.carregar(base, urls[:options['concorrencia']], options['concorrencia'])
+                relatorio[modo] = self.carregar(base, urls, options['concorrencia'])
+            finally:
+                processo.terminate()
+                try:
+                    processo.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    processo.kill()
+                    processo.wait()
+                saida.close()
+        self.imprimir(relatorio, options)
+
+    def montar_url(self, cenario, amostra, rng):
+        _, url, dados, _ = benchmark.montar_requisicao(cenario, amostra, rng)
+        return f'{url}?{urllib.parse.urlencode(dados)}' if dados else url
+
+    def aguardar_inicio(self, processo, saida, base):
+        limite = time.monotonic() + ESPERA_INICIO
+        while time.monotonic() < limite:
+            if processo.poll() is not None:
+                saida.seek(0)
+                erro = saida.read().decode(errors='replace').strip()
+                raise CommandError(f'O servidor terminou ao iniciar: {erro[-2000:]}')
+            try:
+                if self.requisitar(base + URL_PRONTO)[0] == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f'O servidor não respondeu em {ESPERA_INICIO} segundos.')
+
+    def requisitar(self, url):
+        """(status, latência em ms) de um GET; a resposta é lida por completo"""
+        requisicao = urllib.request.Request(url, headers={'Host': benchmark.HOST})
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(requisicao, timeout=60) as resposta:
+                resposta.read()
+                status = resposta.status
+        except urllib.error.HTTPError as erro:
+            status = erro.code
+        return status, (time.perf_counter() - inicio) * 1000
+
+    def executar(self, url):
+        try:
+            return self.requisitar(url)
+        except OSError:
+            # Conexão recusada ou tempo esgotado: conta como falha
+            return None, None
+
+    def carregar(self, base, urls, concorrencia):
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+            resultados = list(executor.map(self.executar, [base + url for url in urls]))
+        decorrido = time.perf_counter() - inicio
+        latencias = sorted(latencia for _, latencia in resultados if latencia is not None)
+        # A API responde 404 quando um filtro não encontra resultados: não é uma falha do endpoint
+        falhas = sum(1 for status, _ in resultados if status is None or (status >= 400 and status != 404))
+        return {
+            'requisicoes': len(resultados),
+            'vazao': round(len(resultados) / decorrido, 1),
+            'p50_ms': round(benchmark.percentil(latencias, 50), 2),
+            'p95_ms': round(benchmark.percentil(latencias, 95), 2),
+            'p99_ms': round(benchmark.percentil(latencias, 99), 2),
+            'falhas': falhas,
+        }
+
+    def imprimir(self, relatorio, options):
+        self.stdout.write(
+            f'{options["requisicoes"]} requisições por servidor, {options["concorrencia"]} simultâneas, '
+            f'{options["workers"]} worker(s); cenários: {", ".join(CENARIOS_ASSINCRONOS)}'
+        )
+        self.stdout.write(f'{"servidor":<22}{"req/s":>9}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"falhas":>8}')
+        for modo, dados in relatorio.items():
+            self.stdout.write(
+                f'{modo:<22}{dados["vazao"]:>9}{dados["p50_ms"]:>10}{dados["p95_ms"]:>10}{dados["p99_ms"]:>10}'
+                f'{dados["falhas"]:>8}'
+            )
+        wsgi, asgi = relatorio['wsgi (gunicorn sync)'], relatorio['asgi (uvicorn)']
+        if wsgi['vazao']:
+            self.stdout.write(f'vazão {asgi["vazao"] / wsgi["vazao"]:.1f}x com ASGI')
@@ -0,0 +1,111 @@
+import logging
+import os
+from contextlib import redirect_stdout
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from kiItem import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede vazão, latência (p50/p95/p99), consultas e memória de uma mistura de endpoints, em processo e '
+        'sem rede, contra o banco local (veja gerar_dados_sinteticos). Opcionalmente salva o resultado em JSON '
+        'e falha quando há regressão em relação a uma baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requisicoes', type=int, default=2000, help='Total de requisições da fase de carga')
+        parser.add_argument('--threads', type=int, default=4, help='Threads concorrentes')
+        parser.add_argument(
+            '--mistura',
+            help='Cenários e pesos, por exemplo "receitas_filtrar=4,receita_detalhe=1" '
+                 f'(padrão: {",".join(f"{nome}={peso}" for nome, peso in benchmark.MISTURA_PADRAO.items())})'
+        )
+        parser.add_argument('--repeticoes-perfil', type=int, default=5, help='Execuções por cenário na fase de perfil')
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--saida', help='Arquivo JSON onde o resultado é salvo')
+        parser.add_argument('--baseline', help='Arquivo JSON de uma execução anterior para comparação')
+        parser.add_argument('--tolerancia', type=float, default=0.2, help='Piora aceita em p95 e memória (0.2 = 20%%)')
+        parser.add_argument('--com-limites', action='store_true', help='Mantém os limites de requisições de escrita')
+
+    def handle(self, *args, **options):
+        if options['requisicoes'] <= 0 or options['threads'] <= 0 or options['repeticoes_perfil'] <= 0:
+            raise CommandError('--requisicoes, --threads e --repeticoes-perfil devem ser positivos.')
+        mistura = self.interpretar_mistura(options['mistura'])
+        baseline = benchmark.ler(options['baseline']) if options['baseline'] else None
+
+        # Sem taxas configuradas os limites de escrita não se aplicam: mede-se o endpoint, não o limite
+        rest_framework = settings.REST_FRAMEWORK
+        if not options['com_limites']:
+            rest_framework = {**rest_framework, 'DEFAULT_THROTTLE_RATES': {}}
+
+        # As views imprimem mensagens de depuração e o Django registra cada 404; nada disso deve se
+        # misturar ao relatório (erros 500 continuam registrados)
+        logger = logging.getLogger('django.request')
+        nivel_original = logger.level
+        logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(REST_FRAMEWORK=rest_framework), open(os.devnull, 'w') as nulo, redirect_stdout(nulo):
+                try:
+                    amostra = benchmark.Amostra()
+                except ValueError as erro:
+                    raise CommandError(str(erro))
+                perfil = benchmark.perfilar(mistura, amostra, options['repeticoes_perfil'], options['semente'])
+                decorrido, resultados = benchmark.carregar(
+                    mistura, amostra, options['requisicoes'], options['threads'], options['semente']
+                )
+        finally:
+            logger.setLevel(nivel_original)
+
+        relatorio = benchmark.resumir(decorrido, resultados, perfil)
+        relatorio['configuracao'] = {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'banco': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+            'requisicoes': options['requisicoes'],
+            'threads': options['threads'],
+            'mistura': mistura,
+            'semente': options['semente'],
+        }
+        self.imprimir(relatorio)
+        if options['saida']:
+            benchmark.salvar(relatorio, options['saida'])
+            self.stdout.write(f'Resultado salvo em {options["saida"]}')
+
+        if baseline is not None:
+            regressoes = benchmark.comparar(relatorio, baseline, options['tolerancia'])
+            if regressoes:
+                for regressao in regressoes:
+                    self.stderr.write(f'Regressão: {regressao}')
+                raise CommandError(f'{len(regressoes)} regressões em relação a {options["baseline"]}.')
+            self.stdout.write(self.style.SUCCESS(f'Sem regressões em relação a {options["baseline"]}.'))
+
+    def interpretar_mistura(self, texto):
+        if not texto:
+            return dict(benchmark.MISTURA_PADRAO)
+        mistura = {}
+        for parte in texto.split(','):
+            nome, _, peso = parte.strip().partition('=')
+            if nome not in benchmark.MISTURA_PADRAO:
+                raise CommandError(f'Cenário desconhecido: {nome}. Disponíveis: {", ".join(benchmark.MISTURA_PADRAO)}')
+            try:
+                mistura[nome] = float(peso) if peso else 1.0
+            except ValueError:
+                raise CommandError(f'Peso inválido para {nome}: {peso}')
+        return mistura
+
+    def imprimir(self, relatorio):
+        total = relatorio['total']
+        self.stdout.write(
+            f'{total["requisicoes"]} requisições em {total["segundos"]} s ({total["rps"]} req/s), {total["falhas"]} falhas'
+        )
+        self.stdout.write(
+            f'{"cenário":<26}{"req":>7}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+            f'{"consultas":>11}{"memória KiB":>13}{"falhas":>8}'
+        )
+        for cenario, dados in relatorio['endpoints'].items():
+            self.stdout.write(
+                f'{cenario:<26}{dados["requisicoes"]:>7}{dados["rps"]:>9}{dados["p50_ms"]:>9}{dados["p95_ms"]:>9}'
+                f'{dados["p99_ms"]:>9}{dados.get("consultas", "-"):>11}{dados.get("memoria_kb", "-"):>13}{dados["falhas"]:>8}'
+            )
@@ -0,0 +1,111 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.test import Client
+from kiItem import benchmark, pool
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a latência por requisição com e sem o pool de conexões do PostgreSQL. Sem pool, cada '
+        'requisição abre e fecha a própria conexão (como em produção com CONN_MAX_AGE = 0); com pool, a '
+        'conexão volta para o pool no fim da requisição.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requisicoes', type=int, default=200, help='Requisições medidas em cada modo')
+        parser.add_argument('--threads', type=int, default=1, help='Threads concorrentes')
+        parser.add_argument('--url', default='/api/api/health-check/', help='Endpoint medido (GET)')
+        parser.add_argument('--banco', default='default', help='Alias do banco')
+
+    def handle(self, *args, **options):
+        if options['requisicoes'] <= 0 or options['threads'] <= 0:
+            raise CommandError('--requisicoes e --threads devem ser positivos.')
+        alias = options['banco']
+        if alias not in connections:
+            raise CommandError(f'Banco desconhecido: {alias}')
+        if connections[alias].vendor != 'postgresql':
+            raise CommandError('O pool de conexões do psycopg só existe no PostgreSQL.')
+
+        opcoes_banco = connections.settings[alias]['OPTIONS']
+        original = opcoes_banco.get('pool')
+        # Mesmo com KITEM_POOL=0, o modo com pool usa o tamanho calculado para o ambiente
+        opcoes = original or pool.opcoes_pool({**os.environ, 'KITEM_POOL': '1'})
+        relatorio = {}
+        try:
+            for modo, opcoes_modo in (('sem pool', None), ('com pool', opcoes)):
+                self.configurar(alias, opcoes_modo)
+                latencias = self.medir(alias, options)
+                relatorio[modo] = self.resumir(latencias)
+                if opcoes_modo:
+                    estatisticas = connections[alias].pool.get_stats()
+                    checkouts = estatisticas.get('requests_num', 0)
+                    relatorio[modo]['espera_media_ms'] = round(
+                        estatisticas.get('requests_wait_ms', 0) / checkouts if checkouts else 0.0, 2
+                    )
+                    relatorio[modo]['enfileirados'] = estatisticas.get('requests_queued', 0)
+        finally:
+            self.configurar(alias, original)
+        self.imprimir(relatorio, opcoes, options)
+
+    def configurar(self, alias, opcoes):
+        """Troca OPTIONS['pool'] de todas as threads (settings_dict é compartilhado) e descarta o pool anterior"""
+        connections.close_all()
+        connections[alias].close_pool()
+        if opcoes:
+            connections.settings[alias]['OPTIONS']['pool'] = opcoes
+        else:
+            connections.settings[alias]['OPTIONS'].pop('pool', None)
+
+    def medir(self, alias, options):
+        # Aquecimento: abre o pool e carrega módulos e caches do processo
+        self.executar(options['url'], min(5, options['requisicoes']))
+        threads = options['threads']
+        por_thread = [options['requisicoes'] // threads + (1 if indice < options['requisicoes'] % threads else 0)
+                      for indice in range(threads)]
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            tarefas = [executor.submit(self.executar, options['url'], quantidade) for quantidade in por_thread]
+            return sorted(latencia for tarefa in tarefas for latencia in tarefa.result())
+
+    def executar(self, url, quantidade):
+        cliente = Client(SERVER_NAME=benchmark.HOST)
+        latencias = []
+        try:
+            for _ in range(quantidade):
+                inicio = time.perf_counter()
+                resposta = cliente.get(url)
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                if resposta.status_code >= 400:
+                    raise CommandError(f'{url} retornou {resposta.status_code}')
+                # O Client de teste não fecha conexões no fim da requisição; o servidor fecha
+                # (ou devolve ao pool) depois de enviar a resposta, fora da latência medida
+                close_old_connections()
+        finally:
+            connections.close_all()
+        return latencias
+
+    def resumir(self, latencias):
+        return {
+            'requisicoes': len(latencias),
+            'media_ms': round(sum(latencias) / len(latencias), 2),
+            'p50_ms': round(benchmark.percentil(latencias, 50), 2),
+            'p95_ms': round(benchmark.percentil(latencias, 95), 2),
+            'p99_ms': round(benchmark.percentil(latencias, 99), 2),
+        }
+
+    def imprimir(self, relatorio, opcoes, options):
+        self.stdout.write(
+            f'{options["url"]}: {options["requisicoes"]} requisições por modo, {options["threads"]} threads, '
+            f'pool min={opcoes["min_size"]} max={opcoes["max_size"]}'
+        )
+        self.stdout.write(f'{"modo":<10}{"média ms":>10}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"espera ms":>11}{"fila":>7}')
+        for modo, dados in relatorio.items():
+            self.stdout.write(
+                f'{modo:<10}{dados["media_ms"]:>10}{dados["p50_ms"]:>9}{dados["p95_ms"]:>9}{dados["p99_ms"]:>9}'
+                f'{dados.get("espera_media_ms", "-"):>11}{dados.get("enfileirados", "-"):>7}'
+            )
+        sem, com = relatorio['sem pool'], relatorio['com pool']
+        if com['p50_ms']:
+            self.stdout.write(f'p50 {sem["p50_ms"] / com["p50_ms"]:.1f}x menor com pool')
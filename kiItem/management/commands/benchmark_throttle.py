@@ -0,0 +1,52 @@
+import time
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.throttling import AnonRateThrottle
+from kiItem import throttling
+
+class ViewFalsa:
+    def __init__(self, escopo):
+        self.escopo_throttle = escopo
+
+
+class Command(BaseCommand):
+    help = 'Mede o custo por requisição dos limites de escrita (memória e cache) e do AnonRateThrottle do DRF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requisicoes', type=int, default=20_000, help='Requisições simuladas por cenário')
+        parser.add_argument('--clientes', type=int, default=100, help='Quantidade de IPs distintos')
+
+    def handle(self, *args, **options):
+        quantidade, clientes = options['requisicoes'], options['clientes']
+        fabrica = RequestFactory()
+        requisicoes = [
+            Request(fabrica.post('/', REMOTE_ADDR=f'10.0.{numero // 256}.{numero % 256}'))
+            for numero in range(clientes)
+        ]
+        # Taxas altas o bastante para que nenhuma requisição seja bloqueada: mede-se só o custo da verificação
+        # Escopo novo a cada execução, para não reaproveitar contadores de execuções anteriores no cache
+        escopo = f'benchmark{time.time_ns()}'
+        taxas = {**api_settings.DEFAULT_THROTTLE_RATES, f'{escopo}_ip': '1000000/min', 'anon': '1000000/min'}
+
+        cenarios = [
+            ('janela deslizante (memória)', 'memoria', throttling.EscritaIPThrottle),
+            ('janela deslizante (cache)', 'cache', throttling.EscritaIPThrottle),
+            ('DRF AnonRateThrottle (cache)', 'cache', AnonRateThrottle),
+        ]
+        self.stdout.write(f'{quantidade} requisições, {clientes} clientes')
+        for nome, armazenamento, classe in cenarios:
+            with override_settings(THROTTLE_ARMAZENAMENTO=armazenamento, REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': taxas}):
+                api_settings.reload()
+                throttling._armazenamento = None
+                classe.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+                view = ViewFalsa(escopo)
+                inicio = time.perf_counter()
+                for numero in range(quantidade):
+                    classe().allow_request(requisicoes[numero % clientes], view)
+                decorrido = time.perf_counter() - inicio
+            self.stdout.write(f'{nome:<32}{decorrido / quantidade * 1e6:>10.1f} µs/requisição')
+        api_settings.reload()
+        throttling._armazenamento = None
+        AnonRateThrottle.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
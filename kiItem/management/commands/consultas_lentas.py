@@ -0,0 +1,77 @@
+import json
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from kiItem.benchmark import percentil
+
+ORDENACOES = {
+    'total': lambda grupo: grupo['total_ms'],
+    'maximo': lambda grupo: grupo['duracoes'][-1],
+    'quantidade': lambda grupo: len(grupo['duracoes']),
+}
+
+
+class Command(BaseCommand):
+    help = 'Agrupa o registro de consultas lentas por impressão digital do SQL e mostra as piores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--arquivo', default=getattr(settings, 'CONSULTAS_LENTAS_ARQUIVO', None))
+        parser.add_argument('--top', type=int, default=10, help='Quantidade de consultas exibidas')
+        parser.add_argument('--ordenar', choices=sorted(ORDENACOES), default='total', help='Critério de ordenação')
+        parser.add_argument('--horas', type=float, help='Considera apenas as últimas N horas')
+        parser.add_argument('--sql-completo', action='store_true', help='Exibe o SQL sem truncar')
+
+    def handle(self, *args, **options):
+        if not options['arquivo']:
+            raise CommandError('Informe --arquivo ou configure CONSULTAS_LENTAS_ARQUIVO.')
+        desde = datetime.now() - timedelta(hours=options['horas']) if options['horas'] else None
+
+        grupos = {}
+        try:
+            with open(options['arquivo'], encoding='utf-8') as arquivo:
+                for linha in arquivo:
+                    try:
+                        entrada = json.loads(linha)
+                    except ValueError:
+                        continue
+                    if desde and datetime.fromisoformat(entrada['data']) < desde:
+                        continue
+                    grupo = grupos.setdefault(entrada['impressao_digital'], {
+                        'duracoes': [], 'total_ms': 0.0, 'rotas': {}, 'pontos': {}, 'exemplo': entrada, 'plano': None,
+                    })
+                    grupo['duracoes'].append(entrada['duracao_ms'])
+                    grupo['total_ms'] += entrada['duracao_ms']
+                    grupo['rotas'][entrada.get('rota')] = grupo['rotas'].get(entrada.get('rota'), 0) + 1
+                    grupo['pontos'][entrada.get('ponto_de_chamada')] = grupo['pontos'].get(entrada.get('ponto_de_chamada'), 0) + 1
+                    if entrada['duracao_ms'] >= grupo['exemplo']['duracao_ms']:
+                        grupo['exemplo'] = entrada
+                    grupo['plano'] = entrada.get('plano') or grupo['plano']
+        except FileNotFoundError:
+            raise CommandError(f'Arquivo não encontrado: {options["arquivo"]}')
+
+        if not grupos:
+            self.stdout.write('Nenhuma consulta lenta registrada.')
+            return
+        for grupo in grupos.values():
+            grupo['duracoes'].sort()
+        ordenados = sorted(grupos.items(), key=lambda item: ORDENACOES[options['ordenar']](item[1]), reverse=True)
+
+        self.stdout.write(f'{len(grupos)} consultas distintas, {sum(len(g["duracoes"]) for g in grupos.values())} ocorrências')
+        for posicao, (digital, grupo) in enumerate(ordenados[:options['top']], start=1):
+            duracoes = grupo['duracoes']
+            exemplo = grupo['exemplo']
+            sql = exemplo['sql'] if options['sql_completo'] else exemplo['sql'][:300]
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'\n{posicao}. {digital}: {len(duracoes)}x, total {grupo["total_ms"]:.0f} ms, '
+                f'p50 {percentil(duracoes, 50):.1f} ms, p95 {percentil(duracoes, 95):.1f} ms, máximo {duracoes[-1]:.1f} ms'
+            ))
+            self.stdout.write(f'   rotas: {self.resumir(grupo["rotas"])}')
+            self.stdout.write(f'   chamado em: {self.resumir(grupo["pontos"])}')
+            self.stdout.write(f'   SQL: {sql}')
+            self.stdout.write(f'   parâmetros do pior caso: {exemplo.get("parametros")}')
+            for linha in grupo['plano'] or []:
+                self.stdout.write(f'   plano: {linha}')
+
+    @staticmethod
+    def resumir(contagens):
+        return ', '.join(f'{nome} ({quantidade})' for nome, quantidade in sorted(contagens.items(), key=lambda item: -item[1])[:3])
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from kiItem.dados_sinteticos import TAMANHO_LOTE, GeradorDadosSinteticos
+
+# Hosts considerados locais: fora deles o comando exige --permitir-remoto
+HOSTS_LOCAIS = {'', 'localhost', '127.0.0.1', '::1'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera um conjunto de dados sintéticos (usuários, ingredientes, receitas, favoritos, listas e denúncias) '
+        'com popularidade no formato de Zipf, para benchmarks locais. Use KITEM_SQLITE=1 para gravar em SQLite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=1000)
+        parser.add_argument('--ingredientes', type=int, default=500)
+        parser.add_argument('--receitas', type=int, default=10_000)
+        parser.add_argument('--favoritos-por-usuario', type=float, default=15, help='Média de favoritos por usuário')
+        parser.add_argument('--fracao-listas', type=float, default=0.3, help='Fração dos usuários com lista de itens')
+        parser.add_argument('--denuncias', type=int, default=2000)
+        parser.add_argument('--semente', type=int, default=42, help='Mesma semente, mesmos dados')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Linhas por bulk_create')
+        parser.add_argument('--permitir-remoto', action='store_true', help='Permite gravar em um banco que não é local')
+
+    def handle(self, *args, **options):
+        quantidades = ['usuarios', 'ingredientes', 'receitas', 'denuncias', 'lote']
+        if any(options[nome] < 0 for nome in quantidades) or options['lote'] == 0:
+            raise CommandError('As quantidades não podem ser negativas e --lote deve ser positivo.')
+        if not 0 <= options['fracao_listas'] <= 1:
+            raise CommandError('--fracao-listas deve estar entre 0 e 1.')
+        if options['receitas'] and not (options['usuarios'] and options['ingredientes']):
+            raise CommandError('Receitas precisam de pelo menos um usuário e um ingrediente.')
+
+        host = settings.DATABASES['default'].get('HOST', '')
+        if connection.vendor != 'sqlite' and host not in HOSTS_LOCAIS and not options['permitir_remoto']:
+            raise CommandError(
+                f'O banco configurado está em {host}. Use KITEM_SQLITE=1 ou um PostgreSQL local, '
+                'ou --permitir-remoto para gravar mesmo assim.'
+            )
+
+        gerador = GeradorDadosSinteticos(
+            usuarios=options['usuarios'],
+            ingredientes=options['ingredientes'],
+            receitas=options['receitas'],
+            favoritos_por_usuario=options['favoritos_por_usuario'],
+            fracao_listas=options['fracao_listas'],
+            denuncias=options['denuncias'],
+            semente=options['semente'],
+            lote=options['lote'],
+            progresso=self.informar,
+        )
+        if gerador.ja_gerado():
+            raise CommandError(f'Já existem dados gerados com a semente {options["semente"]}; use outra --semente.')
+
+        totais = gerador.gerar()
+        resumo = ', '.join(f'{quantidade} {nome}' for nome, quantidade in totais.items())
+        self.stdout.write(self.style.SUCCESS(f'Dados sintéticos gerados: {resumo}.'))
+
+    def informar(self, nome, quantidade, segundos):
+        taxa = quantidade / segundos if segundos else 0
+        self.stdout.write(f'{nome:<40}{quantidade:>12} linhas {segundos:>8.1f} s {taxa:>12.0f} linhas/s')
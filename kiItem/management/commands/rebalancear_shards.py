@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from kiItem import shards
+
+
+class Command(BaseCommand):
+    help = (
+        'Move para o shard correto os registros de usuários que ficaram em outro shard, por exemplo '
+        'depois de acrescentar um alias ao fim de BANCO_SHARDS. Os registros movidos mantêm os ids.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help='Apenas lista o que seria movido')
+
+    def handle(self, *args, **options):
+        if not shards.distribuido():
+            self.stdout.write('Apenas um shard configurado; nada a rebalancear.')
+            return
+        fora_do_lugar = shards.usuarios_fora_do_lugar()
+        if not fora_do_lugar:
+            self.stdout.write('Todos os registros estão no shard correto.')
+            return
+
+        totais = {}
+        for (id_usuario, origem), destino in sorted(fora_do_lugar.items()):
+            if options['simular']:
+                quantidades = shards.contar_registros(id_usuario, origem)
+            else:
+                quantidades = shards.mover_usuario(id_usuario, origem, destino)
+            for modelo, quantidade in quantidades.items():
+                totais[modelo] = totais.get(modelo, 0) + quantidade
+            resumo = ', '.join(f'{modelo}={quantidade}' for modelo, quantidade in quantidades.items())
+            self.stdout.write(f'usuário {id_usuario}: {origem} -> {destino} ({resumo})')
+
+        verbo = 'seriam movidos' if options['simular'] else 'movidos'
+        resumo = ', '.join(f'{modelo}={quantidade}' for modelo, quantidade in totais.items())
+        self.stdout.write(self.style.SUCCESS(f'{len(fora_do_lugar)} usuário(s); registros {verbo}: {resumo}'))
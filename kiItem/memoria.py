@@ -0,0 +1,153 @@
+"""
+Memória alocada por requisição, medida com tracemalloc (opcional: MEMORIA_RASTREAMENTO = True).
+
+Para cada requisição rastreada são registrados, no registro de métricas (metricas.py):
+- o pico de memória alocada durante a requisição, por rota (kitem_memoria_pico_bytes);
+- os locais do projeto que mais alocaram, por rota (kitem_memoria_local_bytes_total), com até
+  MEMORIA_LOCAIS locais por requisição. O local é a primeira linha do projeto na pilha da alocação,
+  e a medida é a diferença entre o início da requisição e a renderização da resposta, quando o
+  queryset e os dados do serializer ainda estão em memória.
+Requisições com pico acima de MEMORIA_LIMITE_KB geram um aviso com rota, parâmetros e locais.
+
+O tracemalloc é global ao processo e deixa cada alocação mais lenta enquanto está ativo, então
+só uma requisição é rastreada por vez e o rastreamento deve ficar desligado no uso normal. Com
+várias threads atendendo ao mesmo tempo, o pico inclui o que as outras threads alocaram.
+"""
+import json
+import logging
+import threading
+import tracemalloc
+from contextvars import ContextVar
+from django.conf import settings
+from . import consultas_lentas, metricas, perfilador
+from .assincrono import MiddlewareHibrido
+
+logger = logging.getLogger(__name__)
+
+# Quadros guardados por alocação: o suficiente para sair do Django e chegar ao código do projeto
+QUADROS = 25
+
+# Middlewares e wrappers do projeto, que não contam como local da alocação
+ARQUIVOS_IGNORADOS = consultas_lentas.ARQUIVOS_IGNORADOS | {__file__, perfilador.__file__}
+
+_trava = threading.Lock()
+_rastreamento_atual = ContextVar('rastreamento_memoria', default=None)
+
+
+def _local(traceback):
+    """Primeira linha do projeto (fora das bibliotecas) na pilha da alocação, ou a mais interna"""
+    base = str(settings.BASE_DIR)
+    for quadro in reversed(traceback):
+        if quadro.filename.startswith(base) and 'site-packages' not in quadro.filename \
+                and quadro.filename not in ARQUIVOS_IGNORADOS:
+            return f'{quadro.filename[len(base) + 1:]}:{quadro.lineno}'
+    return f'{traceback[-1].filename}:{traceback[-1].lineno}'
+
+
+class Rastreamento:
+    """Memória de uma requisição: pico e diferença entre dois instantâneos"""
+
+    def __init__(self, locais):
+        self.locais = locais
+        self.instantaneo = tracemalloc.take_snapshot() if locais else None
+        self.maiores = []
+        self.pico_anterior = 0
+        # Depois do instantâneo, para que a memória usada por ele não conte no pico
+        tracemalloc.reset_peak()
+        self.inicial, _ = tracemalloc.get_traced_memory()
+
+    def comparar(self):
+        """Guarda os locais que mais cresceram desde o início: [(local, bytes)], do maior para o menor"""
+        if self.instantaneo is None:
+            return
+        _, self.pico_anterior = tracemalloc.get_traced_memory()
+        self.maiores = self._maiores_locais()
+        self.instantaneo = None
+        # Os instantâneos já foram liberados: o pico volta a medir só a requisição
+        tracemalloc.reset_peak()
+
+    def _maiores_locais(self):
+        filtros = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen *>')]
+        atual = tracemalloc.take_snapshot().filter_traces(filtros)
+        por_local = {}
+        for diferenca in atual.compare_to(self.instantaneo.filter_traces(filtros), 'traceback'):
+            if diferenca.size_diff > 0:
+                local = _local(diferenca.traceback)
+                por_local[local] = por_local.get(local, 0) + diferenca.size_diff
+        return sorted(por_local.items(), key=lambda item: item[1], reverse=True)[:self.locais]
+
+    def pico(self):
+        _, pico = tracemalloc.get_traced_memory()
+        return max(0, self.pico_anterior - self.inicial, pico - self.inicial)
+
+
+def _rastrear():
+    """Liga o tracemalloc quando preciso; retorna False quando outra requisição já está sendo rastreada"""
+    if not _trava.acquire(blocking=False):
+        return False
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(QUADROS)
+    return True
+
+
+class MemoriaMiddleware(MiddlewareHibrido):
+    """Mede o pico de memória e os locais que mais alocaram; desligado com MEMORIA_RASTREAMENTO = False"""
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if not getattr(settings, 'MEMORIA_RASTREAMENTO', False) or not _rastrear():
+            return self.get_response(request)
+        try:
+            rastreamento = Rastreamento(getattr(settings, 'MEMORIA_LOCAIS', 5))
+            token = _rastreamento_atual.set(rastreamento)
+            try:
+                response = self.get_response(request)
+            finally:
+                _rastreamento_atual.reset(token)
+            # Respostas que não passam por process_template_response (HttpResponse, streaming)
+            rastreamento.comparar()
+        finally:
+            _trava.release()
+        return self.registrar(request, response, rastreamento)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'MEMORIA_RASTREAMENTO', False) or not _rastrear():
+            return await self.get_response(request)
+        try:
+            rastreamento = Rastreamento(getattr(settings, 'MEMORIA_LOCAIS', 5))
+            token = _rastreamento_atual.set(rastreamento)
+            try:
+                response = await self.get_response(request)
+            finally:
+                _rastreamento_atual.reset(token)
+            rastreamento.comparar()
+        finally:
+            _trava.release()
+        return self.registrar(request, response, rastreamento)
+
+    def registrar(self, request, response, rastreamento):
+        pico = rastreamento.pico()
+        resolver_match = getattr(request, 'resolver_match', None)
+        rota = resolver_match.url_name if resolver_match else None
+        metricas.registrar_memoria(rota, pico, rastreamento.maiores)
+        limite_kb = getattr(settings, 'MEMORIA_LIMITE_KB', None)
+        if limite_kb and pico > limite_kb * 1024:
+            logger.warning(json.dumps({
+                'mensagem': 'Requisição acima do limite de memória',
+                'rota': rota,
+                'metodo': request.method,
+                'caminho': request.path,
+                'parametros': request.GET.dict(),
+                'argumentos': resolver_match.kwargs if resolver_match else {},
+                'status': response.status_code,
+                'pico_kb': round(pico / 1024, 1),
+                'locais': [{'local': local, 'kb': round(tamanho / 1024, 1)} for local, tamanho in rastreamento.maiores],
+            }, ensure_ascii=False, default=str))
+        return response
+
+    def process_template_response(self, request, response):
+        rastreamento = _rastreamento_atual.get()
+        if rastreamento is not None:
+            rastreamento.comparar()
+        return response
@@ -0,0 +1,261 @@
+"""
+Registro de métricas em processo, exportado no formato texto do Prometheus.
+
+Cada thread grava em um dicionário próprio (sem trava no caminho da requisição); a exportação
+soma os dicionários de todas as threads. Com vários workers (gunicorn), cada worker grava de
+tempos em tempos um arquivo <pid>.json em METRICAS_DIRETORIO, e o worker que atende a
+exportação soma os arquivos dos demais ao seu próprio registro. Contadores e histogramas de
+workers encerrados continuam somados; medidores (gauges) só contam workers vivos. Limpe o
+diretório ao iniciar o servidor para não somar execuções anteriores.
+"""
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+BALDES_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BALDES_CONSULTAS = (1, 2, 3, 5, 10, 20, 50, 100)
+BALDES_MEMORIA = tuple(2 ** expoente * 1024 for expoente in range(6, 19, 2))  # 64 KiB a 256 MiB
+
+# nome: (tipo, descrição, baldes dos histogramas)
+METRICAS = {
+    'kitem_requisicoes_total': ('counter', 'Requisições atendidas por rota, método e status', None),
+    'kitem_requisicao_duracao_segundos': ('histogram', 'Duração das requisições por rota e status', BALDES_DURACAO),
+    'kitem_consultas_por_requisicao': (
+        'histogram', 'Consultas ao banco por requisição (apenas requisições instrumentadas)', BALDES_CONSULTAS
+    ),
+    'kitem_cache_acessos_total': ('counter', 'Leituras de cache por cache e resultado (acerto ou falha)', None),
+    'kitem_requisicoes_em_andamento': ('gauge', 'Requisições sendo atendidas neste momento', None),
+    'kitem_conexoes_sse': ('gauge', 'Conexões de Server-Sent Events abertas', None),
+    'kitem_memoria_pico_bytes': (
+        'histogram', 'Pico de memória alocada por requisição (apenas com MEMORIA_RASTREAMENTO)', BALDES_MEMORIA
+    ),
+    'kitem_memoria_local_bytes_total': (
+        'counter', 'Memória alocada pelos locais do projeto que mais alocaram, por rota', None
+    ),
+    'kitem_pool_conexoes': ('gauge', 'Conexões abertas no pool do psycopg, por banco', None),
+    'kitem_pool_conexoes_livres': ('gauge', 'Conexões livres no pool', None),
+    'kitem_pool_aguardando': ('gauge', 'Requisições aguardando uma conexão do pool', None),
+    'kitem_pool_checkouts_total': ('counter', 'Conexões entregues pelo pool', None),
+    'kitem_pool_checkouts_enfileirados_total': ('counter', 'Conexões entregues depois de espera na fila do pool', None),
+    'kitem_pool_espera_segundos_total': ('counter', 'Tempo total de espera por conexões do pool', None),
+    'kitem_pool_erros_total': ('counter', 'Pedidos de conexão ao pool que falharam (tempo esgotado)', None),
+    'kitem_perfis_total': ('counter', 'Requisições perfiladas por motivo (cabecalho ou amostragem)', None),
+}
+# Calculada na exportação a partir de kitem_cache_acessos_total
+TAXA_ACERTO_CACHE = ('kitem_cache_taxa_acerto', 'Fração das leituras de cache atendidas pelo cache')
+
+
+class Registro:
+    def __init__(self):
+        self._local = threading.local()
+        self._fragmentos = []
+        self._trava = threading.Lock()
+        self._coletores = {}
+        self._ultima_gravacao = time.monotonic()
+
+    def _fragmento(self):
+        try:
+            return self._local.fragmento
+        except AttributeError:
+            fragmento = self._local.fragmento = {}
+            # Trava apenas na primeira gravação de cada thread
+            with self._trava:
+                self._fragmentos.append(fragmento)
+            return fragmento
+
+    def incrementar(self, nome, rotulos=(), valor=1):
+        """Soma `valor` a um contador ou medidor; rotulos é uma tupla de pares (nome, valor)"""
+        fragmento = self._fragmento()
+        chave = (nome, rotulos)
+        fragmento[chave] = fragmento.get(chave, 0) + valor
+
+    def observar(self, nome, rotulos, valor):
+        """Registra uma observação em um histograma: contagem por balde (não acumulada), soma"""
+        fragmento = self._fragmento()
+        chave = (nome, rotulos)
+        histograma = fragmento.get(chave)
+        baldes = METRICAS[nome][2]
+        if histograma is None:
+            histograma = fragmento[chave] = [0] * (len(baldes) + 1) + [0.0]
+        histograma[bisect_left(baldes, valor)] += 1
+        histograma[-1] += valor
+
+    def coletor(self, nome, funcao):
+        """
+        Valor calculado no momento da coleta (por exemplo, conexões abertas). A função retorna um
+        número ou um dicionário {rotulos: valor} com uma série por conjunto de rótulos.
+        """
+        self._coletores[nome] = funcao
+
+    def instantaneo(self):
+        """Valores somados das threads deste processo: {(nome, rotulos): valor ou lista}"""
+        with self._trava:
+            fragmentos = list(self._fragmentos)
+        total = {}
+        for fragmento in fragmentos:
+            # dict(...) copia o dicionário de uma vez, mesmo com a thread dona gravando nele
+            for chave, valor in dict(fragmento).items():
+                _somar(total, chave, valor)
+        for nome, funcao in self._coletores.items():
+            valor = funcao()
+            if isinstance(valor, dict):
+                for rotulos, parcela in valor.items():
+                    total[(nome, rotulos)] = parcela
+            else:
+                total[(nome, ())] = valor
+        return total
+
+    def gravar_se_necessario(self):
+        """Chamado ao final de cada requisição: grava o arquivo do worker a cada METRICAS_INTERVALO_GRAVACAO segundos"""
+        diretorio = getattr(settings, 'METRICAS_DIRETORIO', None)
+        if not diretorio:
+            return
+        agora = time.monotonic()
+        if agora - self._ultima_gravacao < getattr(settings, 'METRICAS_INTERVALO_GRAVACAO', 5):
+            return
+        self._ultima_gravacao = agora
+        self.gravar(diretorio)
+
+    def gravar(self, diretorio):
+        caminho = os.path.join(diretorio, f'{os.getpid()}.json')
+        temporario = f'{caminho}.tmp'
+        dados = [[nome, list(rotulos), valor] for (nome, rotulos), valor in self.instantaneo().items()]
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(dados, arquivo)
+        # Troca atômica: a exportação nunca lê um arquivo pela metade
+        os.replace(temporario, caminho)
+
+
+def _somar(total, chave, valor):
+    atual = total.get(chave)
+    if atual is None:
+        total[chave] = list(valor) if isinstance(valor, list) else valor
+    elif isinstance(valor, list):
+        for indice, parcela in enumerate(valor):
+            atual[indice] += parcela
+    else:
+        total[chave] = atual + valor
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _agregar():
+    """Registro deste processo somado aos arquivos dos outros workers"""
+    total = registro.instantaneo()
+    diretorio = getattr(settings, 'METRICAS_DIRETORIO', None)
+    if not diretorio or not os.path.isdir(diretorio):
+        return total
+    for nome_arquivo in os.listdir(diretorio):
+        pid = nome_arquivo.removesuffix('.json')
+        # Só os arquivos <pid>.json dos workers; outros arquivos no diretório são ignorados
+        if not nome_arquivo.endswith('.json') or not pid.isdigit():
+            continue
+        pid = int(pid)
+        if pid == os.getpid():
+            continue
+        vivo = _processo_vivo(pid)
+        try:
+            with open(os.path.join(diretorio, nome_arquivo), encoding='utf-8') as arquivo:
+                dados = json.load(arquivo)
+        except (OSError, ValueError):
+            continue
+        for nome, rotulos, valor in dados:
+            if nome not in METRICAS or (METRICAS[nome][0] == 'gauge' and not vivo):
+                continue
+            _somar(total, (nome, tuple(tuple(par) for par in rotulos)), valor)
+    return total
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(rotulos):
+    if not rotulos:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos) + '}'
+
+
+def _formatar_numero(valor):
+    if isinstance(valor, float) and math.isinf(valor):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exportar():
+    """Texto no formato de exposição do Prometheus com as métricas de todos os workers"""
+    total = _agregar()
+    linhas = []
+    for nome, (tipo, descricao, baldes) in METRICAS.items():
+        series = sorted((rotulos, valor) for (nome_serie, rotulos), valor in total.items() if nome_serie == nome)
+        linhas.append(f'# HELP {nome} {descricao}')
+        linhas.append(f'# TYPE {nome} {tipo}')
+        for rotulos, valor in series:
+            if tipo != 'histogram':
+                linhas.append(f'{nome}{_formatar_rotulos(rotulos)} {_formatar_numero(valor)}')
+                continue
+            acumulado = 0
+            for limite, quantidade in zip(list(baldes) + [math.inf], valor[:-1]):
+                acumulado += quantidade
+                le = '+Inf' if math.isinf(limite) else repr(float(limite))
+                linhas.append(f'{nome}_bucket{_formatar_rotulos(rotulos + (("le", le),))} {acumulado}')
+            linhas.append(f'{nome}_sum{_formatar_rotulos(rotulos)} {_formatar_numero(valor[-1])}')
+            linhas.append(f'{nome}_count{_formatar_rotulos(rotulos)} {acumulado}')
+
+    nome, descricao = TAXA_ACERTO_CACHE
+    linhas.append(f'# HELP {nome} {descricao}')
+    linhas.append(f'# TYPE {nome} gauge')
+    acessos = {}
+    for (nome_serie, rotulos), valor in total.items():
+        if nome_serie == 'kitem_cache_acessos_total':
+            rotulos = dict(rotulos)
+            acertos, leituras = acessos.get(rotulos['cache'], (0, 0))
+            acessos[rotulos['cache']] = (acertos + (valor if rotulos['resultado'] == 'acerto' else 0), leituras + valor)
+    for cache, (acertos, leituras) in sorted(acessos.items()):
+        linhas.append(f'{nome}{_formatar_rotulos((("cache", cache),))} {_formatar_numero(acertos / leituras if leituras else 0.0)}')
+    return '\n'.join(linhas) + '\n'
+
+
+def registrar_requisicao(rota, metodo, status, duracao, consultas=None):
+    rota = rota or 'desconhecida'
+    registro.incrementar('kitem_requisicoes_total', (('rota', rota), ('metodo', metodo), ('status', str(status))))
+    registro.observar('kitem_requisicao_duracao_segundos', (('rota', rota), ('status', str(status))), duracao)
+    if consultas is not None:
+        registro.observar('kitem_consultas_por_requisicao', (('rota', rota),), consultas)
+    registro.gravar_se_necessario()
+
+
+def registrar_memoria(rota, pico, locais):
+    rota = rota or 'desconhecida'
+    registro.observar('kitem_memoria_pico_bytes', (('rota', rota),), pico)
+    for local, tamanho in locais:
+        registro.incrementar('kitem_memoria_local_bytes_total', (('rota', rota), ('local', local)), tamanho)
+
+
+def registrar_cache(cache, acerto):
+    registro.incrementar('kitem_cache_acessos_total', (('cache', cache), ('resultado', 'acerto' if acerto else 'falha')))
+
+
+def _gravar_ao_encerrar():
+    diretorio = getattr(settings, 'METRICAS_DIRETORIO', None)
+    if diretorio and os.path.isdir(diretorio):
+        registro.gravar(diretorio)
+
+
+registro = Registro()
+atexit.register(_gravar_ao_encerrar)
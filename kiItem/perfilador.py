@@ -0,0 +1,273 @@
+"""
+Perfilador por amostragem de requisições individuais.
+
+Uma thread lê a pilha da thread que atende a requisição (sys._current_frames) a cada
+PERFILADOR_INTERVALO_MS e conta as pilhas no formato collapsed ("quadro;quadro;quadro N"),
+aceito por flamegraph.pl, speedscope e inferno. Não usa sinais nem hooks de trace, então o
+custo recai sobre a thread de amostragem e funciona em qualquer thread do servidor.
+
+Uma requisição é perfilada quando:
+- traz o cabeçalho X-Perfilar e vem de um administrador (sessão ou token JWT). Com
+  "X-Perfilar: retornar" a resposta é substituída pelo arquivo collapsed; com qualquer outro
+  valor o perfil é guardado e o cabeçalho X-Perfil da resposta traz a URL de download;
+- é sorteada por PERFILADOR_AMOSTRAGEM (0 a 1), e o perfil é guardado.
+
+Os perfis guardados ficam em PERFILADOR_DIRETORIO (um .collapsed e um .json com os dados da
+requisição), limitados aos PERFILADOR_MAXIMO_ARQUIVOS mais recentes, e são baixados em
+/api/perfis/<id>/.
+
+No WSGI, a view roda na própria thread da requisição. No ASGI, o Django executa views síncronas e
+as consultas do ORM em uma thread por requisição, que é a amostrada; middlewares e views
+assíncronos rodam na thread do loop, registrada por registrar_loop_asgi em asgi.py e amostrada
+apenas enquanto executa alguma corrotina (as amostras podem incluir outras requisições atendidas
+pelo mesmo loop).
+Respostas em streaming são perfiladas só até o início do envio.
+"""
+import json
+import os
+import random
+import re
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from uuid import uuid4
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from . import metricas
+from .assincrono import MiddlewareHibrido
+
+CABECALHO = 'HTTP_X_PERFILAR'
+CONTENT_TYPE = 'text/plain; charset=utf-8'
+PROFUNDIDADE_MAXIMA = 200
+# Identificadores gerados por novo_id: data e sufixo aleatório
+ID_VALIDO = re.compile(r'^\d{8}-\d{6}-[0-9a-f]{8}$')
+
+_thread_do_loop = None
+_BIBLIOTECA_PADRAO = sysconfig.get_paths()['stdlib']
+
+
+def registrar_loop_asgi(aplicacao):
+    """Envolve a aplicação ASGI para que o perfilador conheça a thread do loop de eventos"""
+    async def aplicacao_perfilavel(scope, receive, send):
+        global _thread_do_loop
+        _thread_do_loop = threading.get_ident()
+        return await aplicacao(scope, receive, send)
+
+    return aplicacao_perfilavel
+
+
+def _nome_arquivo(caminho):
+    base = str(settings.BASE_DIR)
+    if 'site-packages' in caminho:
+        return caminho.rsplit('site-packages' + os.sep, 1)[-1]
+    if caminho.startswith(base):
+        return caminho[len(base) + 1:]
+    if caminho.startswith(_BIBLIOTECA_PADRAO):
+        return caminho[len(_BIBLIOTECA_PADRAO) + 1:]
+    return caminho
+
+
+def _pilha(quadro):
+    """Quadros da raiz até o topo, como 'funcao (arquivo:linha da definição)'"""
+    quadros = []
+    while quadro is not None and len(quadros) < PROFUNDIDADE_MAXIMA:
+        codigo = quadro.f_code
+        quadros.append(f'{codigo.co_name} ({_nome_arquivo(codigo.co_filename)}:{codigo.co_firstlineno})')
+        quadro = quadro.f_back
+    quadros.reverse()
+    return quadros
+
+
+def _executando_corrotina(quadros):
+    # Loop ocioso fica em select(); só interessam as amostras com um callback (Handle._run) em execução
+    return any(quadro.startswith('_run (asyncio/events.py:') for quadro in quadros)
+
+
+class Amostrador:
+    """Conta as pilhas de uma thread (e da thread do loop ASGI, se houver) enquanto está ativo"""
+
+    def __init__(self, thread_alvo, intervalo):
+        self.thread_alvo = thread_alvo
+        self.thread_do_loop = _thread_do_loop if _thread_do_loop != thread_alvo else None
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self.amostras = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, name='perfilador', daemon=True)
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            quadros = sys._current_frames()
+            self.amostras += 1
+            quadro = quadros.get(self.thread_alvo)
+            if quadro is not None:
+                self.pilhas[';'.join(['requisicao'] + _pilha(quadro))] += 1
+            quadro = quadros.get(self.thread_do_loop) if self.thread_do_loop else None
+            if quadro is not None:
+                pilha = _pilha(quadro)
+                if _executando_corrotina(pilha):
+                    self.pilhas[';'.join(['loop-asgi'] + pilha)] += 1
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return ''.join(f'{pilha} {quantidade}\n' for pilha, quantidade in self.pilhas.most_common())
+
+
+def novo_id():
+    return f'{datetime.now():%Y%m%d-%H%M%S}-{uuid4().hex[:8]}'
+
+
+def _diretorio():
+    diretorio = getattr(settings, 'PERFILADOR_DIRETORIO', None)
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def caminho_perfil(id_perfil, extensao='collapsed'):
+    """Caminho do arquivo de um perfil guardado, ou None para identificadores inválidos"""
+    diretorio = getattr(settings, 'PERFILADOR_DIRETORIO', None)
+    if not diretorio or not ID_VALIDO.match(id_perfil):
+        return None
+    return os.path.join(diretorio, f'{id_perfil}.{extensao}')
+
+
+def guardar(amostrador, dados):
+    """Grava o perfil e os dados da requisição; remove os mais antigos acima do limite"""
+    diretorio = _diretorio()
+    if not diretorio:
+        return None
+    id_perfil = novo_id()
+    with open(os.path.join(diretorio, f'{id_perfil}.collapsed'), 'w', encoding='utf-8') as arquivo:
+        arquivo.write(amostrador.collapsed())
+    with open(os.path.join(diretorio, f'{id_perfil}.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump({'id': id_perfil, **dados}, arquivo, ensure_ascii=False)
+
+    # Os nomes começam pela data, então a ordem alfabética é a cronológica
+    perfis = sorted(nome.removesuffix('.collapsed') for nome in os.listdir(diretorio) if nome.endswith('.collapsed'))
+    for antigo in perfis[:max(0, len(perfis) - getattr(settings, 'PERFILADOR_MAXIMO_ARQUIVOS', 200))]:
+        for extensao in ('collapsed', 'json'):
+            try:
+                os.remove(os.path.join(diretorio, f'{antigo}.{extensao}'))
+            except FileNotFoundError:
+                pass
+    return id_perfil
+
+
+def listar():
+    """Dados dos perfis guardados, do mais recente para o mais antigo"""
+    diretorio = getattr(settings, 'PERFILADOR_DIRETORIO', None)
+    if not diretorio or not os.path.isdir(diretorio):
+        return []
+    perfis = []
+    for nome in sorted(os.listdir(diretorio), reverse=True):
+        if not nome.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(diretorio, nome), encoding='utf-8') as arquivo:
+                perfis.append(json.load(arquivo))
+        except (OSError, ValueError):
+            # Removido pela rotação durante a leitura
+            continue
+    return perfis
+
+
+def _administrador(request):
+    """Sessão do Django ou token JWT de um administrador (a autenticação do DRF só ocorre na view)"""
+    usuario = getattr(request, 'user', None)
+    if usuario is not None and usuario.is_authenticated:
+        return usuario.is_staff
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    try:
+        autenticado = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return autenticado is not None and autenticado[0].is_staff
+
+
+def _sorteada():
+    amostragem = getattr(settings, 'PERFILADOR_AMOSTRAGEM', 0)
+    return bool(amostragem) and random.random() < amostragem
+
+
+class PerfiladorMiddleware(MiddlewareHibrido):
+    """
+    Perfila as requisições pedidas por administradores e uma amostra das demais. Deve ficar depois
+    de AuthenticationMiddleware para reconhecer administradores pela sessão.
+    """
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        pedido = request.META.get(CABECALHO)
+        if pedido is not None and not _administrador(request):
+            pedido = None
+        if pedido is None and not _sorteada():
+            return self.get_response(request)
+
+        amostrador = Amostrador(threading.get_ident(), getattr(settings, 'PERFILADOR_INTERVALO_MS', 5) / 1000)
+        inicio = time.perf_counter()
+        amostrador.iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            amostrador.parar()
+        return self.finalizar(request, response, pedido, amostrador, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        pedido = request.META.get(CABECALHO)
+        # A sessão e o usuário vêm do banco: verificados na thread síncrona da requisição
+        if pedido is not None and not await sync_to_async(_administrador)(request):
+            pedido = None
+        if pedido is None and not _sorteada():
+            return await self.get_response(request)
+
+        # Amostra a thread síncrona da requisição (views síncronas, ORM) e a do loop
+        thread_alvo = await sync_to_async(threading.get_ident)()
+        amostrador = Amostrador(thread_alvo, getattr(settings, 'PERFILADOR_INTERVALO_MS', 5) / 1000)
+        inicio = time.perf_counter()
+        amostrador.iniciar()
+        try:
+            response = await self.get_response(request)
+        finally:
+            amostrador.parar()
+        return await sync_to_async(self.finalizar)(request, response, pedido, amostrador, time.perf_counter() - inicio)
+
+    def finalizar(self, request, response, pedido, amostrador, duracao):
+        motivo = 'cabecalho' if pedido is not None else 'amostragem'
+        metricas.registro.incrementar('kitem_perfis_total', (('motivo', motivo),))
+        resolver_match = getattr(request, 'resolver_match', None)
+        dados = {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'motivo': motivo,
+            'rota': resolver_match.url_name if resolver_match else None,
+            'metodo': request.method,
+            'caminho': request.path,
+            'status': response.status_code,
+            'duracao_ms': round(duracao * 1000, 2),
+            'amostras': amostrador.amostras,
+            'intervalo_ms': amostrador.intervalo * 1000,
+        }
+        if pedido == 'retornar' and not response.streaming:
+            perfil = HttpResponse(amostrador.collapsed(), content_type=CONTENT_TYPE)
+            perfil['Content-Disposition'] = f'attachment; filename="{novo_id()}.collapsed"'
+            perfil['X-Perfil-Status'] = response.status_code
+            perfil['X-Perfil-Duracao-Ms'] = dados['duracao_ms']
+            return perfil
+
+        id_perfil = guardar(amostrador, dados)
+        if pedido is not None and id_perfil:
+            response['X-Perfil'] = f'/api/perfis/{id_perfil}/'
+        return response
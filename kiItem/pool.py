@@ -0,0 +1,114 @@
+"""
+Pool de conexões do psycopg 3 (psycopg_pool), usado pelo backend PostgreSQL do Django com
+OPTIONS['pool'] (ver settings.py).
+
+Sem pool, cada requisição abre uma conexão nova com o banco remoto (TCP, TLS e autenticação) e a
+fecha no fim. Com o pool, a conexão volta para o pool e é reaproveitada; o psycopg verifica a
+conexão ao entregá-la (CONN_HEALTH_CHECKS) e a substitui depois de POOL_VIDA_MAXIMA segundos.
+
+O tamanho vale por processo (cada worker do gunicorn tem o próprio pool) e depende de quantas
+requisições o worker atende ao mesmo tempo:
+- sync: uma requisição por vez, uma conexão;
+- gthread: uma conexão por thread (--threads);
+- uvicorn (ASGI): views síncronas e o ORM assíncrono rodam em threads do asgiref, limitadas por
+  KITEM_WORKER_THREADS (padrão: 10).
+Além disso, uma requisição pode usar CONEXOES_PARALELAS conexões a mais ao mesmo tempo (em_paralelo,
+em kiItem/assincrono.py, e shards.em_todos), enquanto a thread da requisição mantém a sua. Essas
+threads só seguram uma conexão cada e a devolvem ao terminar; quando o pool não comporta a thread da
+requisição mais as paralelas (comporta_paralelo), as consultas são executadas em sequência.
+KITEM_POOL_MIN e KITEM_POOL_MAX substituem o tamanho calculado. Vários workers somam conexões:
+workers x KITEM_POOL_MAX deve caber no limite de conexões do banco.
+"""
+import os
+
+# Conexões por worker quando o tipo de worker não define a concorrência
+THREADS_PADRAO = 10
+# Conexões que uma requisição usa ao mesmo tempo além da sua (consultas paralelas)
+CONEXOES_PARALELAS = 3
+
+METRICAS_POOL = {
+    # nome da métrica: (chave de get_stats(), divisor)
+    'kitem_pool_conexoes': ('pool_size', 1),
+    'kitem_pool_conexoes_livres': ('pool_available', 1),
+    'kitem_pool_aguardando': ('requests_waiting', 1),
+    'kitem_pool_checkouts_total': ('requests_num', 1),
+    'kitem_pool_checkouts_enfileirados_total': ('requests_queued', 1),
+    'kitem_pool_espera_segundos_total': ('requests_wait_ms', 1000),
+    'kitem_pool_erros_total': ('requests_errors', 1),
+}
+
+
+def tamanho_pool(classe_worker, threads=None):
+    """(mínimo, máximo) de conexões por processo para o tipo de worker do gunicorn"""
+    classe_worker = (classe_worker or 'sync').lower()
+    if classe_worker == 'sync':
+        concorrencia, minimo = 1, 1
+    else:
+        concorrencia = threads or THREADS_PADRAO
+        minimo = max(1, concorrencia // 4)
+    return minimo, concorrencia + CONEXOES_PARALELAS
+
+
+def comporta_paralelo(quantidade, aliases=None):
+    """
+    True quando o pool de cada banco (todos, ou `aliases`) tem conexões para a thread da requisição
+    e mais `quantidade` threads paralelas. Bancos sem pool abrem uma conexão por thread.
+    """
+    from django.db import connections
+    for alias in connections if aliases is None else aliases:
+        opcoes = connections.settings[alias].get('OPTIONS', {}).get('pool')
+        if not opcoes:
+            continue
+        # pool=True usa o padrão do psycopg_pool: min_size=4 e max_size igual ao mínimo
+        opcoes = opcoes if isinstance(opcoes, dict) else {}
+        maximo = opcoes.get('max_size') or opcoes.get('min_size', 4)
+        if maximo < 1 + quantidade:
+            return False
+    return True
+
+
+def opcoes_pool(ambiente=None):
+    """
+    OPTIONS['pool'] do backend PostgreSQL a partir das variáveis de ambiente, ou None quando o pool
+    está desligado (KITEM_POOL=0)
+    """
+    ambiente = os.environ if ambiente is None else ambiente
+    if ambiente.get('KITEM_POOL', '1') == '0':
+        return None
+    threads = int(ambiente['KITEM_WORKER_THREADS']) if ambiente.get('KITEM_WORKER_THREADS') else None
+    minimo, maximo = tamanho_pool(ambiente.get('KITEM_WORKER_CLASSE'), threads)
+    maximo = int(ambiente.get('KITEM_POOL_MAX', maximo))
+    minimo = min(int(ambiente.get('KITEM_POOL_MIN', minimo)), maximo)
+    return {
+        'min_size': minimo,
+        'max_size': maximo,
+        # Espera máxima por uma conexão livre antes de a requisição falhar
+        'timeout': float(ambiente.get('KITEM_POOL_TIMEOUT', 10)),
+        'max_lifetime': float(ambiente.get('KITEM_POOL_VIDA_MAXIMA', 30 * 60)),
+        'max_idle': float(ambiente.get('KITEM_POOL_OCIOSIDADE_MAXIMA', 10 * 60)),
+    }
+
+
+def pools():
+    """{alias: pool} dos bancos com pool já criado neste processo"""
+    from django.db import connections
+    resultado = {}
+    for alias in connections:
+        conexao = connections[alias]
+        if conexao.vendor == 'postgresql' and conexao.settings_dict['OPTIONS'].get('pool'):
+            resultado[alias] = conexao.pool
+    return resultado
+
+
+def coletor(nome):
+    """Função de coleta de uma métrica do pool, com uma série por banco (ver metricas.Registro.coletor)"""
+    chave, divisor = METRICAS_POOL[nome]
+
+    def coletar():
+        series = {}
+        for alias, pool in pools().items():
+            valor = pool.get_stats().get(chave, 0)
+            series[(('banco', alias),)] = valor / divisor if divisor != 1 else valor
+        return series
+
+    return coletar
@@ -0,0 +1,209 @@
+"""
+Roteamento de leituras para réplicas do banco.
+
+Escritas vão sempre para o primário ('default'). Leituras feitas durante uma requisição vão para
+uma das réplicas de BANCO_REPLICAS, exceto quando:
+- a requisição não é de leitura (POST, PUT, PATCH, DELETE): tudo vai para o primário;
+- há uma transação aberta no primário;
+- o cliente escreveu há menos de REPLICAS_JANELA_PRIMARIO segundos (ler as próprias escritas).
+  A marca vai em um cookie e, para clientes com token JWT, no cache, por usuário, então um
+  Favorito recém-criado aparece na leitura seguinte mesmo com atraso na replicação. O cache só é
+  compartilhado entre os workers com o Redis (KITEM_REDIS_URL); com o LocMemCache, a marca do
+  token vale apenas no worker que recebeu a escrita;
+- nenhuma réplica está saudável.
+
+Fora de requisições (comandos, shell) todas as leituras vão para o primário.
+
+A saúde de cada réplica é verificada no máximo a cada REPLICAS_INTERVALO_VERIFICACAO segundos,
+na própria leitura: conexão, SELECT 1 e, no PostgreSQL, atraso de replicação até
+REPLICAS_ATRASO_MAXIMO segundos. Uma réplica que cai entre duas verificações faz a consulta falhar
+até a verificação seguinte.
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+from .assincrono import MiddlewareHibrido
+
+logger = logging.getLogger(__name__)
+
+COOKIE = 'kitem_primario'
+PREFIXO_CACHE = 'replicas:primario:'
+
+_estado = ContextVar('roteamento_replicas', default=None)
+
+
+class Estado:
+    """Roteamento da requisição em andamento"""
+
+    def __init__(self, primario):
+        self.primario = primario
+        self.escreveu = False
+
+
+class SaudeReplicas:
+    """Última verificação de cada réplica: {alias: (saudável, instante da verificação)}"""
+
+    def __init__(self):
+        self._verificacoes = {}
+        self._trava = threading.Lock()
+
+    def saudavel(self, alias):
+        saudavel, verificada_em = self._verificacoes.get(alias, (True, None))
+        intervalo = getattr(settings, 'REPLICAS_INTERVALO_VERIFICACAO', 10)
+        if verificada_em is not None and time.monotonic() - verificada_em < intervalo:
+            return saudavel
+        # Uma thread verifica; as demais usam o resultado anterior enquanto isso
+        if not self._trava.acquire(blocking=False):
+            return saudavel
+        try:
+            saudavel = verificar(alias)
+            self._verificacoes[alias] = (saudavel, time.monotonic())
+        finally:
+            self._trava.release()
+        return saudavel
+
+    def limpar(self):
+        self._verificacoes.clear()
+
+
+def verificar(alias):
+    """Conecta, executa SELECT 1 e, no PostgreSQL, confere o atraso de replicação"""
+    conexao = connections[alias]
+    try:
+        with conexao.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            if conexao.vendor == 'postgresql':
+                cursor.execute('SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())')
+                atraso = cursor.fetchone()[0]
+                if atraso is not None and atraso > getattr(settings, 'REPLICAS_ATRASO_MAXIMO', 30):
+                    logger.warning('Réplica %s com atraso de %.1f s; leituras vão para o primário', alias, atraso)
+                    return False
+    except Exception:
+        logger.warning('Réplica %s indisponível; leituras vão para o primário', alias, exc_info=True)
+        conexao.close()
+        return False
+    return True
+
+
+saude = SaudeReplicas()
+
+
+class RoteadorReplicas:
+    """Router do Django (DATABASE_ROUTERS); sem réplicas configuradas, mantém o comportamento padrão"""
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'BANCO_REPLICAS', None)
+        estado = _estado.get()
+        if not replicas or estado is None or estado.primario or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        saudaveis = [alias for alias in replicas if saude.saudavel(alias)]
+        return random.choice(saudaveis) if saudaveis else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            # As leituras seguintes desta requisição também precisam ver a escrita
+            estado.escreveu = estado.primario = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {DEFAULT_DB_ALIAS, *getattr(settings, 'BANCO_REPLICAS', ())}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # As réplicas recebem o esquema pela replicação
+        if db in getattr(settings, 'BANCO_REPLICAS', ()):
+            return False
+        return None
+
+
+def _usuario_do_token(request):
+    """id do usuário do token JWT, sem consulta ao banco (None sem token ou com token inválido)"""
+    cabecalho = request.META.get('HTTP_AUTHORIZATION', '')
+    if not cabecalho.startswith('Bearer '):
+        return None
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+    try:
+        return AccessToken(cabecalho.removeprefix('Bearer ').strip()).get(api_settings.USER_ID_CLAIM)
+    except TokenError:
+        return None
+
+
+def _marcado_pelo_cookie(request, agora):
+    try:
+        return float(request.COOKIES.get(COOKIE, 0)) > agora
+    except ValueError:
+        return False
+
+
+class ReplicasMiddleware(MiddlewareHibrido):
+    """
+    Define o roteamento de cada requisição e marca o cliente depois de uma escrita. Deve vir antes
+    dos middlewares que leem o banco (sessão, autenticação). No ASGI, o estado vai em uma ContextVar,
+    que o asgiref copia para a thread onde o ORM consulta o router.
+    """
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if not getattr(settings, 'BANCO_REPLICAS', None):
+            return self.get_response(request)
+
+        usuario = _usuario_do_token(request)
+        agora = time.time()
+        marcado = _marcado_pelo_cookie(request, agora)
+        if not marcado and usuario is not None:
+            marcado = cache.get(f'{PREFIXO_CACHE}{usuario}') is not None
+        estado = Estado(primario=marcado or request.method not in SAFE_METHODS)
+
+        token = _estado.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado.reset(token)
+
+        if estado.escreveu:
+            janela = self.marcar(response, agora)
+            if usuario is not None:
+                cache.set(f'{PREFIXO_CACHE}{usuario}', 1, janela)
+        return response
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'BANCO_REPLICAS', None):
+            return await self.get_response(request)
+
+        usuario = _usuario_do_token(request)
+        agora = time.time()
+        marcado = _marcado_pelo_cookie(request, agora)
+        if not marcado and usuario is not None:
+            marcado = await cache.aget(f'{PREFIXO_CACHE}{usuario}') is not None
+        estado = Estado(primario=marcado or request.method not in SAFE_METHODS)
+
+        token = _estado.set(estado)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _estado.reset(token)
+
+        if estado.escreveu:
+            janela = self.marcar(response, agora)
+            if usuario is not None:
+                await cache.aset(f'{PREFIXO_CACHE}{usuario}', 1, janela)
+        return response
+
+    def marcar(self, response, agora):
+        """Cookie que mantém o cliente no primário; retorna a janela em segundos"""
+        janela = getattr(settings, 'REPLICAS_JANELA_PRIMARIO', 5)
+        response.set_cookie(COOKIE, str(int(agora + janela)), max_age=janela, httponly=True, samesite='Lax')
+        return janela
@@ -6,8 +6,10 @@ from django.contrib.auth.models import User as Usuario
 from ingrediente.models import Ingrediente
 from receita.models import Receita, ReceitaIngrediente
 from favorito.models import Favorito
-from lista_itens.models import ListaItens, ListaItensIngrediente
+from lista_itens.models import ListaItens, ListaItensIngrediente, formatar_preco
+from lista_itens.cache import obter_totais_lista
 from denuncia.models import Denuncia
+from kiItem.carregador import CarregamentoEmLoteMixin
 
 # Configuração do modelo de usuário
 Usuario = get_user_model()
@@ -135,7 +137,10 @@ class ReceitaSerializer(serializers.ModelSerializer):
             },
             'tempo_preparo': {'required': True},  # Campo obrigatório
             'dificuldade': {'required': True},  # Campo obrigatório
-            'quantidade_visualizacao': {'read_only': True}  # Somente leitura
+            'quantidade_visualizacao': {'read_only': True},  # Somente leitura
+            # Mantidos pela moderação de denúncias
+            'denuncias_pendentes': {'read_only': True},
+            'oculta': {'read_only': True}
         }
     
     def validate_categoria(self, value):
@@ -191,6 +196,10 @@ class FavoritoSerializer(serializers.ModelSerializer):
 
 # Serializer para o modelo ListaItens
 class ListaItensSerializer(serializers.ModelSerializer):
+    # Totais calculados no banco: anotados na listagem ou lidos do cache no detalhe
+    total_itens = serializers.SerializerMethodField()
+    total_preco = serializers.SerializerMethodField()
+
     class Meta:
         model = ListaItens
         fields = '__all__'
@@ -199,6 +208,18 @@ class ListaItensSerializer(serializers.ModelSerializer):
             'id_usuario': {'required': True}  # Campo obrigatório
         }
 
+    def get_totais(self, obj):
+        """Usa os totais anotados pela queryset ou, na falta deles, o cache da lista"""
+        if hasattr(obj, 'total_preco'):
+            return {'total_itens': obj.total_itens, 'total_preco': obj.total_preco}
+        return obter_totais_lista(obj.pk)
+
+    def get_total_itens(self, obj):
+        return self.get_totais(obj)['total_itens']
+
+    def get_total_preco(self, obj):
+        return formatar_preco(self.get_totais(obj)['total_preco'])
+
 # Serializer para o modelo ListaItensIngrediente
 class ListaItensIngredienteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -229,6 +250,23 @@ class ListaItensIngredienteSerializer(serializers.ModelSerializer):
             }
         }
 
+# Serializers para a listagem aninhada das listas de um usuário
+class ListaItensIngredienteDetalhadoSerializer(CarregamentoEmLoteMixin, serializers.ModelSerializer):
+    # Nome do ingrediente vindo do select_related (ou carregado em lote), sem consulta extra por item
+    nome_ingrediente = serializers.CharField(source='id_ingrediente.nome', read_only=True)
+
+    class Meta:
+        model = ListaItensIngrediente
+        fields = ['id', 'id_ingrediente', 'nome_ingrediente', 'quantidade', 'unidade_medida', 'preco', 'comprado']
+        carregar_em_lote = ['id_ingrediente']
+
+class ListaItensDetalhadaSerializer(ListaItensSerializer):
+    # Itens pré-carregados com prefetch_related na view
+    ingredientes = ListaItensIngredienteDetalhadoSerializer(many=True, read_only=True)
+
+    class Meta(ListaItensSerializer.Meta):
+        fields = ['id', 'id_usuario', 'total_itens', 'total_preco', 'ingredientes']
+
 # Aliases para manter compatibilidade com nomenclatura anterior
 class ListaComprasSerializer(ListaItensSerializer):
     """Alias para compatibilidade com API anterior"""
@@ -239,7 +277,7 @@ class ListaComprasIngredienteSerializer(ListaItensIngredienteSerializer):
     pass
 
 # Serializer para o modelo Denuncia
-class DenunciaSerializer(serializers.ModelSerializer):
+class DenunciaSerializer(CarregamentoEmLoteMixin, serializers.ModelSerializer):
     # Campos adicionais para exibição
     motivo_denuncia_display = serializers.CharField(source='get_motivo_denuncia_display', read_only=True)
     denunciante_username = serializers.CharField(source='id_denunciante.username', read_only=True)
@@ -256,11 +294,14 @@ class DenunciaSerializer(serializers.ModelSerializer):
             'id_denunciante',
             'denunciante_username',
             'receita_titulo',
-            'data_denuncia'
+            'data_denuncia',
+            'status'
         ]
+        carregar_em_lote = ['id_denunciante', 'id_receita']
         extra_kwargs = {
             'unique_id': {'read_only': True},
             'data_denuncia': {'read_only': True},
+            'status': {'read_only': True},
             'id_receita': {
                 'required': True,
                 'error_messages': {
@@ -9,7 +9,9 @@ https://docs.djangoproject.com/en/5.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
+import os
 from pathlib import Path
+from kiItem import pool
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,10 +46,19 @@ INSTALLED_APPS = [
     'favorito',
     'lista_itens',
     'denuncia',
+    'kiItem',
     'corsheaders',
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista para medir o custo total da requisição (Server-Timing)
+    'kiItem.instrumentacao.InstrumentacaoMiddleware',
+    'kiItem.consultas_lentas.ConsultasLentasMiddleware',
+    'kiItem.memoria.MemoriaMiddleware',
+    # Depois dos middlewares que medem consultas, para que eles vejam o SQL sem o comentário
+    'kiItem.comentarios_sql.ComentariosSQLMiddleware',
+    # Antes da sessão e da autenticação, que já leem o banco
+    'kiItem.roteadores.ReplicasMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -56,6 +67,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Memória, por requisição, dos objetos carregados em lote pelos serializers
+    'kiItem.carregador.CarregadorMiddleware',
+    # Depois da autenticação, para reconhecer administradores pela sessão
+    'kiItem.perfilador.PerfiladorMiddleware',
 ]
 
 
@@ -86,8 +101,6 @@ CORS_ALLOWED_ORIGINS = [
     "https://kitem.onrender.com",  # URL de produção do seu frontend
     "http://localhost:5173",       # URL local -> funcionando
     "https://www.kitem.onrender.com",
-    "https://www.kitem.onrender.com/",
-    "https://www.4alltests.com.br/",
     "https://www.4alltests.com.br",
 ]
 
@@ -125,16 +138,50 @@ DATABASES = {
         'OPTIONS': {
             'sslmode': 'require',
         },
+        # Verifica a conexão ao retirá-la do pool
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
-# SQLite para desenvolvimento local (descomente se necessário)
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.sqlite3',
-#         'NAME': BASE_DIR / 'db.sqlite3',
-#     }
-# }
+# Pool de conexões do psycopg 3 (kiItem/pool.py): tamanho por worker a partir de KITEM_WORKER_CLASSE
+# (sync, gthread, uvicorn) e KITEM_WORKER_THREADS, ou de KITEM_POOL_MIN/KITEM_POOL_MAX; KITEM_POOL=0 desliga
+_opcoes_pool = pool.opcoes_pool()
+if _opcoes_pool:
+    DATABASES['default']['OPTIONS']['pool'] = _opcoes_pool
+
+# SQLite para desenvolvimento local e benchmarks: KITEM_SQLITE=1 usa db.sqlite3,
+# ou informe o caminho do arquivo (KITEM_SQLITE=/tmp/kitem.sqlite3)
+if os.environ.get('KITEM_SQLITE'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3' if os.environ['KITEM_SQLITE'] == '1' else os.environ['KITEM_SQLITE'],
+        }
+    }
+
+# Consultas independentes das views assíncronas em threads paralelas (kiItem/assincrono.py). Só com o
+# pool: sem ele, cada consulta paralela abriria e fecharia a própria conexão com o banco remoto. O pool
+# reserva pool.CONEXOES_PARALELAS conexões para elas; com um pool menor, as consultas são sequenciais
+CONSULTAS_PARALELAS = bool(DATABASES['default'].get('OPTIONS', {}).get('pool'))
+
+# Réplicas de leitura (kiItem/roteadores.py): hosts separados por vírgula em KITEM_REPLICAS, com o
+# mesmo banco, usuário e senha do primário. Sem réplicas, todas as consultas vão para 'default'.
+BANCO_REPLICAS = []
+for indice, host in enumerate(filter(None, os.environ.get('KITEM_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica_{indice}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    BANCO_REPLICAS.append(f'replica_{indice}')
+# Shards das tabelas por usuário (kiItem/shards.py): hosts separados por vírgula em KITEM_SHARDS, com o
+# mesmo banco, usuário e senha do primário. 'default' é sempre o primeiro shard; novos shards vão no fim.
+BANCO_SHARDS = ['default']
+for indice, host in enumerate(filter(None, os.environ.get('KITEM_SHARDS', '').split(',')), start=1):
+    DATABASES[f'shard_{indice}'] = {**DATABASES['default'], 'HOST': host.strip()}
+    BANCO_SHARDS.append(f'shard_{indice}')
+DATABASE_ROUTERS = ['kiItem.shards.RoteadorShards', 'kiItem.roteadores.RoteadorReplicas']
+# Segundos em que um cliente lê do primário depois de escrever
+REPLICAS_JANELA_PRIMARIO = 5
+REPLICAS_INTERVALO_VERIFICACAO = 10
+# Atraso de replicação (segundos) acima do qual a réplica deixa de receber leituras (PostgreSQL)
+REPLICAS_ATRASO_MAXIMO = 30
 
 
 # Password validation
@@ -180,9 +227,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Django REST Framework settings
 REST_FRAMEWORK = {
+    # JWT sem consulta ao banco nas leituras e sessão só com cookie (ver kiItem/autenticacao.py)
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
+        'kiItem.autenticacao.JWTAutenticacao',
+        'kiItem.autenticacao.SessaoAutenticacao',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Permite acesso público para testes
@@ -192,6 +240,78 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Limites de escrita (POST/PUT/PATCH/DELETE) para views com o atributo `escopo_throttle`
+    'DEFAULT_THROTTLE_CLASSES': [
+        'kiItem.throttling.EscritaUsuarioThrottle',
+        'kiItem.throttling.EscritaIPThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'denuncias_usuario': '10/min',
+        'denuncias_ip': '30/min',
+        'favoritos_usuario': '60/min',
+        'favoritos_ip': '120/min',
+        'cadastro_ip': '5/hour',
+    },
+}
+
+# Cache compartilhado entre os workers (limites de requisição, usuários da autenticação JWT, marcas
+# de escrita das réplicas): Redis em KITEM_REDIS_URL (redis://host:6379/0). Sem ele, cada processo usa
+# o próprio LocMemCache, que só serve para desenvolvimento (check --deploy acusa, ver throttling.py)
+if os.environ.get('KITEM_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['KITEM_REDIS_URL'],
+        }
+    }
+
+# Onde ficam os contadores dos limites de requisição: 'cache' (compartilhado entre workers) ou 'memoria'
+THROTTLE_ARMAZENAMENTO = 'cache'
+
+# Moderação: quantidade de denúncias pendentes que oculta uma receita das listagens públicas
+DENUNCIAS_LIMITE_OCULTAR_RECEITA = 5
+
+# Instrumentação (kiItem/instrumentacao.py): fração das requisições medidas (0 desliga) e
+# registro de uma linha JSON por requisição medida no logger 'kiItem.instrumentacao'
+INSTRUMENTACAO_AMOSTRAGEM = 1.0
+INSTRUMENTACAO_LOG = False
+
+# Métricas (kiItem/metricas.py): com vários workers, diretório compartilhado onde cada worker grava
+# suas métricas a cada METRICAS_INTERVALO_GRAVACAO segundos (sem diretório, só o processo atual)
+METRICAS_DIRETORIO = os.environ.get('KITEM_METRICAS_DIR')
+METRICAS_INTERVALO_GRAVACAO = 5
+
+# Consultas lentas (kiItem/consultas_lentas.py): limite em milissegundos (None desliga), arquivo JSONL
+# analisado pelo comando consultas_lentas e captura do plano de execução
+CONSULTAS_LENTAS_LIMITE_MS = 200
+CONSULTAS_LENTAS_ARQUIVO = os.environ.get('KITEM_CONSULTAS_LENTAS', str(BASE_DIR / 'consultas_lentas.jsonl'))
+CONSULTAS_LENTAS_EXPLAIN = True
+
+# Comentários sqlcommenter com rota, view e request_id em cada consulta (kiItem/comentarios_sql.py)
+COMENTARIOS_SQL = True
+
+# Memória por requisição (kiItem/memoria.py): rastreamento com tracemalloc (deixa as alocações mais
+# lentas; ligue só para investigar), limite do aviso em KiB e locais registrados por requisição
+MEMORIA_RASTREAMENTO = os.environ.get('KITEM_MEMORIA') == '1'
+MEMORIA_LIMITE_KB = 20 * 1024
+MEMORIA_LOCAIS = 5
+
+# Perfilador por amostragem (kiItem/perfilador.py): fração das requisições perfiladas sem pedido
+# (0 desliga), intervalo entre amostras, diretório e quantidade de perfis guardados
+PERFILADOR_AMOSTRAGEM = float(os.environ.get('KITEM_PERFILADOR_AMOSTRAGEM', 0))
+PERFILADOR_INTERVALO_MS = 5
+PERFILADOR_DIRETORIO = os.environ.get('KITEM_PERFIS_DIR', str(BASE_DIR / 'perfis'))
+PERFILADOR_MAXIMO_ARQUIVOS = 200
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'kiItem': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
 }
 
 # JWT settings
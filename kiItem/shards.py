@@ -0,0 +1,383 @@
+"""
+Distribuição (sharding) das tabelas por usuário entre vários bancos.
+
+Favorito, ListaItens, ListaItensIngrediente e Denuncia crescem com usuários x atividade e são
+consultados pelo usuário dono (id_usuario, id_denunciante). Com mais de um alias em BANCO_SHARDS,
+os registros de cada usuário ficam no shard escolhido por jump consistent hash do id do usuário;
+tabelas globais (usuários, receitas, ingredientes, estatísticas) continuam em 'default', que é
+também o primeiro shard. Com um único shard (padrão) nada muda.
+
+Como o router escolhe o shard:
+- pela instância: save(), delete() e relações a partir de um usuário ou de uma lista
+  (usuario.favoritos.all(), lista.ingredientes.create(...)) vão para o shard certo;
+- consultas sem instância não têm como saber o usuário: use Modelo.objects.do_usuario(id), que
+  filtra pelo dono e seleciona o shard, Modelo.objects.do_registro(pk) nas URLs com o id do
+  registro (ou RegistroNoShardMixin nas views genéricas), ou em_todos() para consultas globais
+  (scatter-gather), como a fila de moderação, o filtro, a exportação e o arquivamento de denúncias;
+  ConsultaEmTodos intercala os resultados ordenados dos shards para paginação.
+
+Os ids (AutoField) não se repetem entre shards: a sequência do shard N começa em N * IDS_POR_SHARD
+(reservar_faixa_de_ids, executado pelo migrate de cada shard). Assim um id identifica o registro em
+qualquer shard: chaves de cache e canais de eventos por id de lista continuam únicos, e o shard de
+origem do id indica onde procurar o registro primeiro (shard_do_registro). Com AutoField de 32 bits
+cabem 21 shards de 100 milhões de ids por tabela.
+
+Novos shards devem ser acrescentados ao fim de BANCO_SHARDS: o jump hash só move para o shard
+novo os usuários que passam a pertencer a ele (cerca de 1/N). O comando rebalancear_shards move
+os registros que ficaram no shard errado, mantendo os ids.
+Todos os shards recebem o esquema completo (manage.py migrate --database shard_N), mas as tabelas
+globais só têm dados em 'default': consultas em outro shard não podem fazer join com elas
+(ver QuerySetPorUsuario.relacionados_globais). Pelo mesmo motivo as chaves estrangeiras desses
+modelos não têm restrição no banco (db_constraint=False), e as exclusões em cascata entre bancos
+são feitas por excluir_em_outros_shards.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from operator import attrgetter
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from . import pool
+
+# Registros por INSERT ao mover um usuário entre shards
+TAMANHO_LOTE = 500
+# Ids reservados para cada shard: o shard N gera ids a partir de N * IDS_POR_SHARD
+IDS_POR_SHARD = 100_000_000
+
+# Modelos distribuídos: caminho até o usuário dono de cada registro
+CAMPO_USUARIO = {
+    'favorito.favorito': 'id_usuario',
+    'lista_itens.listaitens': 'id_usuario',
+    'lista_itens.listaitensingrediente': 'id_lista__id_usuario',
+    'denuncia.denuncia': 'id_denunciante',
+}
+
+
+def shards():
+    return getattr(settings, 'BANCO_SHARDS', None) or [DEFAULT_DB_ALIAS]
+
+
+def distribuido():
+    return len(shards()) > 1
+
+
+def jump_hash(chave, baldes):
+    """Jump consistent hash (Lamping e Veach): balde em [0, baldes) para uma chave inteira"""
+    balde, proximo = -1, 0
+    while proximo < baldes:
+        balde = proximo
+        chave = (chave * 2862933555777941757 + 1) & 0xFFFF_FFFF_FFFF_FFFF
+        proximo = int((balde + 1) * ((1 << 31) / ((chave >> 33) + 1)))
+    return balde
+
+
+def shard_do_usuario(id_usuario):
+    aliases = shards()
+    return aliases[jump_hash(int(id_usuario), len(aliases))]
+
+
+def modelos_distribuidos():
+    return [apps.get_model(rotulo) for rotulo in CAMPO_USUARIO]
+
+
+def shard_de_origem(pk):
+    """Shard em cuja faixa o id foi gerado; o registro continua lá, a menos que o dono tenha sido movido"""
+    aliases = shards()
+    indice = int(pk) // IDS_POR_SHARD
+    return aliases[indice] if 0 <= indice < len(aliases) else DEFAULT_DB_ALIAS
+
+
+def shard_do_registro(modelo, pk):
+    """
+    Shard onde está o registro `pk` de um modelo distribuído: o de origem do id ou, se ele não estiver
+    lá (usuário movido por rebalancear_shards), o primeiro dos demais em que existir. Cada shard
+    verificado custa um exists(); o último candidato é devolvido sem verificação, e a consulta
+    seguinte não encontra nada se o registro não existe. Com um único shard devolve None sem
+    consultar: o banco fica a cargo dos demais routers (réplicas).
+    """
+    if not distribuido():
+        return None
+    try:
+        origem = shard_de_origem(pk)
+    except (TypeError, ValueError):
+        # Chave que não é um id inteiro (UUID das denúncias): procura em todos, a partir de 'default'
+        origem = DEFAULT_DB_ALIAS
+    candidatos = [origem] + [alias for alias in shards() if alias != origem]
+    for alias in candidatos[:-1]:
+        try:
+            if modelo._base_manager.using(alias).filter(pk=pk).exists():
+                return alias
+        except (TypeError, ValueError, ValidationError):
+            # Chave inválida para o campo: a consulta da view falha como falharia sem shards
+            return alias
+    return candidatos[-1]
+
+
+def reservar_faixa_de_ids(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate: no shard N, as sequências dos ids dos modelos distribuídos passam a começar em
+    N * IDS_POR_SHARD. Só avança a sequência, então pode ser executado a cada migrate.
+    """
+    aliases = shards()
+    if using not in aliases[1:]:
+        return
+    inicio = aliases.index(using) * IDS_POR_SHARD
+    conexao = connections[using]
+    for modelo in modelos_distribuidos():
+        campo = modelo._meta.pk
+        if modelo._meta.app_config is not sender or not isinstance(campo, models.AutoField):
+            continue
+        _, maximo = conexao.ops.integer_field_range(campo.get_internal_type())
+        if inicio + IDS_POR_SHARD - 1 > maximo:
+            raise ImproperlyConfigured(
+                f'{using}: a faixa de ids a partir de {inicio} não cabe em {modelo._meta.label}.{campo.name}.'
+            )
+        tabela = modelo._meta.db_table
+        with conexao.cursor() as cursor:
+            if conexao.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT setval(sequencia, GREATEST(%s, COALESCE(pg_sequence_last_value(sequencia), 0))) '
+                    'FROM (SELECT pg_get_serial_sequence(%s, %s)::regclass AS sequencia) AS s',
+                    [inicio, tabela, campo.column],
+                )
+            elif conexao.vendor == 'sqlite':
+                # AUTOINCREMENT: o próximo id é o maior entre o último gerado e o valor de sqlite_sequence, mais um
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) SELECT %s, 0 '
+                    'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                    [tabela, tabela],
+                )
+                cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s', [inicio, tabela])
+            else:
+                raise ImproperlyConfigured(f'{using}: faixas de ids por shard não implementadas para {conexao.vendor}.')
+
+
+def _shard_da_instancia(instancia):
+    if isinstance(instancia, User):
+        return shard_do_usuario(instancia.pk) if instancia.pk is not None else None
+    campo = CAMPO_USUARIO.get(instancia._meta.label_lower)
+    if campo is None:
+        return None
+    relacao = campo.split('__')[0]
+    if '__' not in campo:
+        id_usuario = getattr(instancia, f'{relacao}_id')
+        if id_usuario is not None:
+            return shard_do_usuario(id_usuario)
+    else:
+        # Itens ficam no shard da lista: usa a lista já carregada, sem consultar o banco
+        relacionado = instancia._state.fields_cache.get(relacao)
+        if relacionado is not None:
+            return _shard_da_instancia(relacionado)
+    return instancia._state.db
+
+
+class RoteadorShards:
+    """Router do Django para os modelos distribuídos; deve vir antes de RoteadorReplicas"""
+
+    def _shard(self, model, **hints):
+        if not distribuido() or model._meta.label_lower not in CAMPO_USUARIO:
+            return None
+        instancia = hints.get('instance')
+        return _shard_da_instancia(instancia) if instancia is not None else None
+
+    db_for_read = _shard
+    db_for_write = _shard
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not distribuido():
+            return None
+        distribuidos = [obj._meta.label_lower in CAMPO_USUARIO for obj in (obj1, obj2)]
+        if all(distribuidos):
+            # Registro novo ainda não tem banco definitivo: o save() escolhe o shard pelo dono
+            return obj1._state.adding or obj2._state.adding or obj1._state.db == obj2._state.db
+        # Registro distribuído apontando para uma tabela global (usuário, receita): referência só pelo id
+        return True if any(distribuidos) else None
+
+
+class QuerySetPorUsuario(models.QuerySet):
+    """QuerySet dos modelos distribuídos"""
+
+    def do_usuario(self, id_usuario):
+        """Registros de um usuário, lidos do shard dele"""
+        campo = CAMPO_USUARIO[self.model._meta.label_lower]
+        consulta = self.filter(**{campo: id_usuario})
+        # Com um único shard, o banco continua a cargo dos demais routers (réplicas)
+        return consulta.using(shard_do_usuario(id_usuario)) if distribuido() else consulta
+
+    def do_registro(self, pk):
+        """Registro de chave primária `pk`, lido do shard onde ele está (ver shard_do_registro)"""
+        return self.filter(pk=pk).using(shard_do_registro(self.model, pk))
+
+    def relacionados_globais(self, *campos):
+        """
+        select_related das tabelas globais (receita, usuário, ingrediente) quando a consulta vai para
+        'default' ou uma réplica, onde elas têm dados; nos demais shards, prefetch_related lido de 'default'
+        """
+        # Sem shards não consulta o router: a view pode estar no loop assíncrono (ver assincrono.py)
+        if distribuido() and self.db in shards()[1:]:
+            return self.prefetch_related(*campos)
+        return self.select_related(*campos)
+
+    def create(self, **kwargs):
+        if self._db is not None or not distribuido():
+            return super().create(**kwargs)
+        # Sem banco escolhido, o save() passa a instância ao router, que escolhe o shard pelo dono
+        objeto = self.model(**kwargs)
+        objeto.save(force_insert=True)
+        return objeto
+
+
+class RegistroNoShardMixin:
+    """
+    Views genéricas e ViewSets de modelos distribuídos: nas rotas com o id do registro, a consulta
+    vai para o shard onde ele está
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        pk = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if pk is None or not distribuido():
+            return queryset
+        return queryset.using(shard_do_registro(queryset.model, pk))
+
+
+def _executar_e_fechar(funcao, alias):
+    try:
+        return funcao(alias)
+    finally:
+        connections.close_all()
+
+
+def em_todos(funcao):
+    """
+    Scatter-gather: executa funcao(alias) em cada shard, em paralelo, e devolve os resultados na
+    ordem de BANCO_SHARDS. A função deve avaliar as consultas (list(), count()) antes de retornar.
+    Quando o pool de algum shard não comporta a conexão da thread atual e mais uma, executa em
+    sequência na thread atual (ver pool.comporta_paralelo).
+    """
+    aliases = shards()
+    if len(aliases) == 1 or not pool.comporta_paralelo(1, aliases):
+        return [funcao(alias) for alias in aliases]
+    with ThreadPoolExecutor(max_workers=len(aliases), thread_name_prefix='shards') as executor:
+        return list(executor.map(_executar_e_fechar, [funcao] * len(aliases), aliases))
+
+
+class ConsultaEmTodos:
+    """
+    Registros de uma consulta ordenada em todos os shards, como uma sequência que o Paginator do
+    Django e as views podem fatiar. count() soma as contagens dos shards; a fatia [inicio:fim] lê os
+    `fim` primeiros registros de cada shard (em_todos) e os intercala pela ordenação da consulta, que
+    precisa ter todos os campos na mesma direção. Páginas profundas custam como um OFFSET em cada shard.
+    Com um único shard a consulta não recebe using(): o banco fica a cargo dos routers (réplicas).
+    """
+
+    def __init__(self, queryset, relacionados=()):
+        campos = queryset.query.order_by or queryset.model._meta.ordering
+        if not campos or len({campo.startswith('-') for campo in campos}) > 1:
+            raise ValueError('A consulta precisa de uma ordenação com todos os campos na mesma direção.')
+        self.queryset = queryset
+        self.relacionados = relacionados
+        self.chave = attrgetter(*(campo.lstrip('-') for campo in campos))
+        self.decrescente = campos[0].startswith('-')
+
+    def _no_shard(self, alias):
+        consulta = self.queryset.using(alias) if distribuido() else self.queryset
+        return consulta.relacionados_globais(*self.relacionados) if self.relacionados else consulta
+
+    def count(self):
+        return sum(em_todos(lambda alias: self._no_shard(alias).count()))
+
+    def __getitem__(self, fatia):
+        if not isinstance(fatia, slice):
+            return self[fatia:fatia + 1][0]
+        if not distribuido():
+            return list(self._no_shard(DEFAULT_DB_ALIAS)[fatia])
+        parciais = em_todos(lambda alias: list(self._no_shard(alias)[:fatia.stop]))
+        return sorted(chain.from_iterable(parciais), key=self.chave, reverse=self.decrescente)[fatia]
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+def excluir_em_outros_shards(sender, instance, using, **kwargs):
+    """
+    pre_delete de usuários, receitas e ingredientes: o Django só exclui em cascata os registros do
+    mesmo banco; os dos demais shards são excluídos aqui
+    """
+    if not distribuido():
+        return
+    for modelo in modelos_distribuidos():
+        for campo in modelo._meta.concrete_fields:
+            if campo.many_to_one and campo.related_model is sender and campo.remote_field.on_delete is models.CASCADE:
+                for alias in shards():
+                    if alias != using:
+                        modelo._base_manager.using(alias).filter(**{campo.name: instance.pk}).delete()
+
+
+def usuarios_fora_do_lugar():
+    """{(id do usuário, shard atual): shard correto} dos usuários com registros no shard errado"""
+    resultado = {}
+    for alias in shards():
+        for modelo in modelos_distribuidos():
+            campo = CAMPO_USUARIO[modelo._meta.label_lower]
+            if '__' in campo:
+                continue  # itens acompanham a lista
+            ids = modelo._base_manager.using(alias).order_by().values_list(campo, flat=True).distinct()
+            for id_usuario in ids:
+                destino = shard_do_usuario(id_usuario)
+                if destino != alias:
+                    resultado[(id_usuario, alias)] = destino
+    return resultado
+
+
+def contar_registros(id_usuario, alias):
+    """{rótulo do modelo: quantidade} dos registros de um usuário em um shard"""
+    return {
+        modelo._meta.label_lower: modelo._base_manager.using(alias).filter(
+            **{CAMPO_USUARIO[modelo._meta.label_lower]: id_usuario}
+        ).count()
+        for modelo in modelos_distribuidos()
+    }
+
+
+def mover_usuario(id_usuario, origem, destino):
+    """
+    Copia os registros de um usuário de `origem` para `destino` e os remove de `origem`; devolve
+    {rótulo do modelo: quantidade}. Os registros mantêm os ids, únicos entre os shards (ver
+    reservar_faixa_de_ids): links, chaves de cache e o Last-Event-ID dos canais de eventos continuam
+    válidos. Cópia e remoção não disparam sinais: as estatísticas e a fila de moderação não mudam.
+    A transação do destino é confirmada antes da de origem: uma falha entre as duas deixa os
+    registros duplicados na origem, nunca perdidos.
+    """
+    from lista_itens.cache import invalidar_totais_lista
+    favorito, lista, item, denuncia = modelos_distribuidos()
+    with transaction.atomic(using=origem), transaction.atomic(using=destino):
+        favoritos = list(favorito._base_manager.using(origem).filter(id_usuario=id_usuario))
+        favorito._base_manager.using(destino).bulk_create(favoritos, batch_size=TAMANHO_LOTE)
+
+        listas = list(lista._base_manager.using(origem).filter(id_usuario=id_usuario).order_by('pk'))
+        ids_listas = [registro.pk for registro in listas]
+        itens = list(item._base_manager.using(origem).filter(id_lista__in=ids_listas))
+        lista._base_manager.using(destino).bulk_create(listas, batch_size=TAMANHO_LOTE)
+        item._base_manager.using(destino).bulk_create(itens, batch_size=TAMANHO_LOTE)
+
+        denuncias = list(denuncia._base_manager.using(origem).filter(id_denunciante=id_usuario))
+        # INSERT sem pre_save (raw), para manter data_denuncia (auto_now_add)
+        for inicio in range(0, len(denuncias), TAMANHO_LOTE):
+            denuncia._base_manager._insert(
+                denuncias[inicio:inicio + TAMANHO_LOTE], fields=denuncia._meta.local_concrete_fields, raw=True, using=destino
+            )
+
+        item._base_manager.using(origem).filter(id_lista__in=ids_listas)._raw_delete(origem)
+        lista._base_manager.using(origem).filter(pk__in=ids_listas)._raw_delete(origem)
+        favorito._base_manager.using(origem).filter(id_usuario=id_usuario)._raw_delete(origem)
+        denuncia._base_manager.using(origem).filter(id_denunciante=id_usuario)._raw_delete(origem)
+    invalidar_totais_lista(*ids_listas)
+    return {
+        favorito._meta.label_lower: len(favoritos),
+        lista._meta.label_lower: len(listas),
+        item._meta.label_lower: len(itens),
+        denuncia._meta.label_lower: len(denuncias),
+    }
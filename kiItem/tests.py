@@ -0,0 +1,1335 @@
+"""
+Orçamento de consultas por endpoint.
+
+Cada rota de kiItem/urls.py e dos urls.py dos apps é chamada com dados em duas escalas.
+O número de consultas precisa caber no orçamento declarado em ORCAMENTO_CONSULTAS e
+não pode crescer quando a quantidade de dados cresce (consultas N+1).
+
+Os demais testes deste módulo cobrem o pacote kiItem (instrumentação, routers, shards, pool,
+autenticação); os de cada funcionalidade dos apps ficam no tests.py do app.
+"""
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+from unittest import mock
+from decimal import Decimal
+from io import StringIO
+import django
+from django.conf import settings
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import RefreshToken
+from denuncia.models import Denuncia, DenunciaArquivada, EstatisticaDenuncia
+from favorito.models import Favorito
+from ingrediente.models import Ingrediente
+from lista_itens.models import ListaItens, ListaItensIngrediente
+from receita.models import Receita, ReceitaIngrediente
+from denuncia import arquivamento, estatisticas, moderacao
+from denuncia.serializers import DenunciaListSerializer, DenunciaSerializer
+from kiItem import assincrono, benchmark, autenticacao, carregador, comentarios_sql, consultas_lentas, memoria, metricas, perfilador, pool, roteadores, shards, throttling
+
+# Máximo de consultas por (rota normalizada, método). Rotas repetidas (por exemplo a rota
+# de um path() e a do router com o mesmo caminho) são a mesma entrada: só a primeira é alcançável.
+ORCAMENTO_CONSULTAS = {
+    ('', 'GET'): 0,
+    ('api/', 'GET'): 0,
+    ('api/api/health-check/', 'GET'): 1,
+    ('api/auth/login/', 'POST'): 1,
+    ('api/auth/login2/', 'POST'): 1,
+    ('api/auth/refresh/', 'POST'): 1,
+    ('api/schema/', 'GET'): 0,
+    ('api/metricas/', 'GET'): 0,
+    ('api/perfis/', 'GET'): 0,
+    ('api/perfis/<id_perfil>/', 'GET'): 0,
+    ('api/docs/', 'GET'): 0,
+    ('api/redoc/', 'GET'): 0,
+    # Usuários
+    ('api/usuarios/', 'GET'): 1,
+    ('api/usuarios/', 'POST'): 2,
+    ('api/usuarios/<pk>/', 'GET'): 1,
+    # Ingredientes
+    ('api/ingredientes/', 'GET'): 1,
+    ('api/ingredientes/<pk>/', 'GET'): 1,
+    # Receitas
+    ('api/receitas/', 'GET'): 1,
+    ('api/receitas/<pk>/', 'GET'): 1,
+    ('api/receitas/usuario/<user_id>/', 'GET'): 1,
+    ('api/receitas/<pk>/detalhada/', 'GET'): 3,
+    ('api/receitas/filtrar/', 'GET'): 1,
+    ('api/receitas/mais-acessadas/', 'GET'): 1,
+    ('api/receitas/aleatorias/', 'GET'): 1,
+    ('api/receitas/categorias/', 'GET'): 1,
+    ('api/receitas/categoria/<categoria>/', 'GET'): 1,
+    ('api/receitas/<pk>/adicionar_ingrediente/', 'POST'): 5,
+    ('api/receitas/<pk>/ingredientes/', 'GET'): 2,
+    ('api/receita_ingredientes/', 'GET'): 1,
+    ('api/receita_ingredientes/<pk>/', 'GET'): 1,
+    ('api/receita-ingredientes/', 'GET'): 1,
+    ('api/receita-ingredientes/<pk>/', 'GET'): 1,
+    # Favoritos
+    ('api/favoritos/', 'GET'): 1,
+    ('api/favoritos/<pk>/', 'GET'): 1,
+    ('api/usuarios/<id_usuario>/favoritos/', 'GET'): 1,
+    ('api/usuarios/<id_usuario>/favoritos/detalhados/', 'GET'): 1,
+    ('api/usuarios/<id_usuario>/favoritos/filtrar/', 'GET'): 1,
+    ('api/usuarios/<id_usuario>/favoritos/<receita_id>/toggle/', 'POST'): 3,
+    ('api/usuarios/<id_usuario>/favoritos/<receita_id>/', 'DELETE'): 3,
+    # Listas de itens
+    ('api/listas_itens/', 'GET'): 1,
+    ('api/listas_itens/<pk>/', 'GET'): 2,
+    ('api/listas_itens/usuario/<user_id>/', 'GET'): 1,
+    ('api/listas_itens/usuario/<user_id>/detalhadas/', 'GET'): 3,
+    ('api/listas_itens/<pk>/detalhada/', 'GET'): 2,
+    ('api/listas_itens/<pk>/totais/', 'GET'): 3,
+    ('api/listas_itens/usuario/<user_id>/totais/', 'GET'): 3,
+    ('api/listas_itens/<pk>/itens/marcar-comprados/', 'POST'): 3,
+    ('api/listas_itens/<pk>/itens/precos/', 'PATCH'): 4,
+    ('api/listas_itens/<pk>/itens/remover/', 'POST'): 3,
+    ('api/listas_itens/<pk>/eventos/', 'GET'): 1,
+    ('api/listas_itens_ingredientes/', 'GET'): 1,
+    ('api/listas_itens_ingredientes/<pk>/', 'GET'): 1,
+    ('api/listas_itens_ingredientes/<pk>/toggle-comprado/', 'PATCH'): 3,
+    ('api/listas_compras/', 'GET'): 1,
+    ('api/listas_compras/<pk>/', 'GET'): 2,
+    ('api/listas_compras_ingredientes/', 'GET'): 1,
+    ('api/listas_compras_ingredientes/<pk>/', 'GET'): 1,
+    ('api/listas-itens/', 'GET'): 1,
+    ('api/listas-itens/<pk>/', 'GET'): 1,
+    ('api/lista-itens-ingredientes/', 'GET'): 1,
+    ('api/lista-itens-ingredientes/<pk>/', 'GET'): 1,
+    # Denúncias
+    ('api/denuncias/', 'GET'): 0,
+    ('api/denuncias/lista/', 'GET'): 1,
+    ('api/denuncias/lista/', 'POST'): 22,
+    ('api/denuncias/<unique_id>/', 'GET'): 1,
+    ('api/denuncias/receita/<receita_id>/', 'GET'): 1,
+    ('api/denuncias/usuario/<usuario_id>/', 'GET'): 1,
+    ('api/denuncias/filtrar/', 'GET'): 1,
+    ('api/denuncias/estatisticas/', 'GET'): 5,
+    ('api/denuncias/exportar/', 'GET'): 1,
+    ('api/denuncias/pendentes/', 'GET'): 2,
+    ('api/denuncias/moderar/', 'POST'): 5,
+    ('api/denuncias/<unique_id>/toggle-status/', 'PATCH'): 7,
+    ('api/denuncias/por-receita/<receita_id>/', 'GET'): 2,
+    ('api/denuncias/por-usuario/<usuario_id>/', 'GET'): 2,
+}
+
+# Rotas restritas a administradores, chamadas com um administrador autenticado sem sessão
+ROTAS_ADMINISTRATIVAS = {
+    'api/metricas/', 'api/perfis/', 'api/perfis/<id_perfil>/',
+    'api/denuncias/pendentes/', 'api/denuncias/moderar/', 'api/denuncias/<unique_id>/toggle-status/',
+    'api/denuncias/exportar/',
+}
+
+# Perfil gravado no diretório temporário de cada teste de orçamento
+ID_PERFIL_TESTE = '20260101-000000-0123abcd'
+
+# Rotas fora do orçamento: administração do Django e variantes com sufixo de formato do router
+ROTAS_IGNORADAS = re.compile(r'^admin/|<format>')
+
+# Objeto usado em <pk> de acordo com o primeiro segmento da rota
+OBJETO_POR_SEGMENTO = {
+    'usuarios': 'usuario',
+    'ingredientes': 'ingrediente',
+    'receitas': 'receita',
+    'receita_ingredientes': 'receita_ingrediente',
+    'receita-ingredientes': 'receita_ingrediente',
+    'favoritos': 'favorito',
+    'listas_itens': 'lista',
+    'listas_compras': 'lista',
+    'listas-itens': 'lista',
+    'listas_itens_ingredientes': 'item',
+    'listas_compras_ingredientes': 'item',
+    'lista-itens-ingredientes': 'item',
+    'denuncias': 'denuncia',
+}
+
+
+def normalizar_rota(rota):
+    """Mesma forma para rotas de path() e de regex do router: 'api/receitas/<pk>/'"""
+    rota = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'<\1>', rota)
+    rota = re.sub(r'<\w+:(\w+)>', r'<\1>', rota)
+    return rota.replace('^', '').replace('$', '')
+
+
+def rotas_do_projeto(padroes=None, prefixo=''):
+    padroes = get_resolver().url_patterns if padroes is None else padroes
+    for padrao in padroes:
+        rota = prefixo + str(padrao.pattern)
+        if isinstance(padrao, URLResolver):
+            yield from rotas_do_projeto(padrao.url_patterns, rota)
+        elif not ROTAS_IGNORADAS.search(normalizar_rota(rota)):
+            yield normalizar_rota(rota)
+
+
+@override_settings(THROTTLE_ARMAZENAMENTO='memoria')
+class OrcamentoConsultasTests(TestCase):
+    """Falha quando um endpoint passa do orçamento ou quando o número de consultas cresce com os dados"""
+
+    SENHA = 'Senha@12345'
+
+    def setUp(self):
+        self.contador = 0
+        self.usuario = User.objects.create_user('principal', 'principal@kitem.com', self.SENHA)
+        self.ingrediente = Ingrediente.objects.create(nome='Farinha')
+        self.receita = self.criar_receita(self.usuario)
+        self.receita_ingrediente = ReceitaIngrediente.objects.create(
+            id_receita=self.receita, id_ingrediente=self.ingrediente, quantidade=1, unidade_medida='kg'
+        )
+        self.favorito = Favorito.objects.create(id_usuario=self.usuario, id_receita=self.receita)
+        self.lista = ListaItens.objects.create(id_usuario=self.usuario)
+        self.item = ListaItensIngrediente.objects.create(
+            id_lista=self.lista, id_ingrediente=self.ingrediente, quantidade=1, unidade_medida='kg', preco=Decimal('2.50')
+        )
+        self.denuncia = Denuncia.objects.create(
+            id_receita=self.receita, id_denunciante=self.criar_usuario(), motivo_denuncia=1
+        )
+        diretorio_perfis = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(PERFILADOR_DIRETORIO=diretorio_perfis))
+        with open(os.path.join(diretorio_perfis, f'{ID_PERFIL_TESTE}.collapsed'), 'w') as arquivo:
+            arquivo.write('requisicao;view 1\n')
+
+    def proximo(self):
+        self.contador += 1
+        return self.contador
+
+    def criar_usuario(self):
+        numero = self.proximo()
+        return User.objects.create(username=f'usuario{numero}', email=f'usuario{numero}@kitem.com')
+
+    def criar_receita(self, usuario):
+        return Receita.objects.create(
+            id_usuario=usuario, titulo=f'Receita {self.proximo()}', descricao='Descrição',
+            tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+        )
+
+    def semear(self, quantidade):
+        """Acrescenta `quantidade` registros relacionados a cada objeto usado nas URLs"""
+        for _ in range(quantidade):
+            outro = self.criar_usuario()
+            ingrediente = Ingrediente.objects.create(nome=f'Ingrediente {self.proximo()}')
+            receita = self.criar_receita(self.usuario)
+            receita_de_outro = self.criar_receita(outro)
+            ReceitaIngrediente.objects.create(id_receita=self.receita, id_ingrediente=ingrediente, quantidade=2, unidade_medida='g')
+            ReceitaIngrediente.objects.create(id_receita=receita, id_ingrediente=ingrediente, quantidade=3, unidade_medida='g')
+            Favorito.objects.create(id_usuario=self.usuario, id_receita=receita_de_outro)
+            Favorito.objects.create(id_usuario=outro, id_receita=self.receita)
+            lista = ListaItens.objects.create(id_usuario=self.usuario)
+            for destino in (self.lista, lista):
+                ListaItensIngrediente.objects.create(
+                    id_lista=destino, id_ingrediente=ingrediente, quantidade=1, unidade_medida='un', preco=Decimal('1.25')
+                )
+            Denuncia.objects.create(id_receita=receita_de_outro, id_denunciante=self.usuario, motivo_denuncia=2)
+            Denuncia.objects.create(id_receita=receita, id_denunciante=outro, motivo_denuncia=3)
+
+    def valores(self):
+        return {
+            'usuario': self.usuario.pk,
+            'ingrediente': self.ingrediente.pk,
+            'receita': self.receita.pk,
+            'receita_ingrediente': self.receita_ingrediente.pk,
+            'favorito': self.favorito.pk,
+            'lista': self.lista.pk,
+            'item': self.item.pk,
+            'denuncia': self.denuncia.pk,
+        }
+
+    def montar_url(self, rota):
+        valores = self.valores()
+        objeto = OBJETO_POR_SEGMENTO.get(rota.removeprefix('api/').split('/')[0])
+        parametros = {
+            'pk': valores.get(objeto),
+            'user_id': valores['usuario'],
+            'id_usuario': valores['usuario'],
+            'usuario_id': valores['usuario'],
+            'receita_id': valores['receita'],
+            'unique_id': valores['denuncia'],
+            'categoria': self.receita.categoria,
+            'id_perfil': ID_PERFIL_TESTE,
+        }
+        return '/' + re.sub(r'<(\w+)>', lambda m: str(parametros[m.group(1)]), rota)
+
+    def corpo(self, rota, metodo):
+        """Dados enviados nas rotas de escrita"""
+        itens = list(self.lista.ingredientes.values_list('pk', flat=True))
+        numero = self.proximo()
+        if rota == 'api/usuarios/':
+            return {'username': f'novo{numero}', 'email': f'novo{numero}@kitem.com', 'password': self.SENHA}
+        if rota.startswith('api/auth/login'):
+            return {'username': self.usuario.username, 'password': self.SENHA}
+        if rota == 'api/auth/refresh/':
+            return {'refresh': str(RefreshToken.for_user(self.usuario))}
+        if rota.endswith('adicionar_ingrediente/'):
+            ingrediente = Ingrediente.objects.create(nome=f'Novo {numero}')
+            return {'id_ingrediente': ingrediente.pk, 'id_receita': self.receita.pk, 'quantidade': 1, 'unidade_medida': 'g'}
+        if rota.endswith('marcar-comprados/') or rota.endswith('remover/'):
+            return {'ids': itens}
+        if rota.endswith('precos/'):
+            return {'itens': [{'id': item, 'preco': '3.10'} for item in itens]}
+        if rota == 'api/denuncias/lista/':
+            return {'id_receita': self.receita.pk, 'id_denunciante': self.criar_usuario().pk, 'motivo_denuncia': 4}
+        if rota == 'api/denuncias/moderar/':
+            return {'ids': [str(pk) for pk in Denuncia.objects.values_list('pk', flat=True)], 'status': 'resolvida'}
+        return {}
+
+    def medir(self, rota, metodo):
+        """Executa a requisição dentro de uma transação desfeita ao final e devolve o número de consultas"""
+        url = self.montar_url(rota)
+        with transaction.atomic():
+            corpo = self.corpo(rota, metodo)
+            cache.clear()
+            throttling.obter_armazenamento().limpar()
+            cliente = self.client
+            if rota in ROTAS_ADMINISTRATIVAS:
+                cliente = APIClient()
+                cliente.force_authenticate(User(username='admin', is_staff=True))
+            with CaptureQueriesContext(connection) as consultas:
+                resposta = getattr(cliente, metodo.lower())(url, corpo, content_type='application/json') \
+                    if metodo != 'GET' else cliente.get(url)
+                if resposta.streaming and not resposta.is_async:
+                    b''.join(resposta.streaming_content)
+            transaction.set_rollback(True)
+        self.assertLess(resposta.status_code, 400, f'{metodo} {url} retornou {resposta.status_code}')
+        return len(consultas)
+
+    def medir_todos(self):
+        return {chave: self.medir(*chave) for chave in ORCAMENTO_CONSULTAS}
+
+    def test_todas_as_rotas_tem_orcamento(self):
+        rotas = set(rotas_do_projeto())
+        com_orcamento = {rota for rota, _ in ORCAMENTO_CONSULTAS}
+        self.assertEqual(rotas - com_orcamento, set(), 'Rotas sem orçamento de consultas')
+        self.assertEqual(com_orcamento - rotas, set(), 'Orçamentos de rotas que não existem mais')
+
+    def test_consultas_dentro_do_orcamento_e_independentes_dos_dados(self):
+        self.semear(2)
+        pequena = self.medir_todos()
+        self.semear(8)
+        grande = self.medir_todos()
+        for chave, orcamento in ORCAMENTO_CONSULTAS.items():
+            with self.subTest(rota=chave[0], metodo=chave[1]):
+                self.assertLessEqual(grande[chave], pequena[chave], 'O número de consultas cresce com os dados')
+                self.assertLessEqual(grande[chave], orcamento, 'Acima do orçamento de consultas')
+
+
+class InstrumentacaoTests(TestCase):
+    """Cabeçalho Server-Timing e linha de log do middleware de instrumentação"""
+
+    def setUp(self):
+        usuario = User.objects.create(username='autor', email='autor@kitem.com')
+        Receita.objects.create(
+            id_usuario=usuario, titulo='Bolo', descricao='Descrição',
+            tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+        )
+
+    @override_settings(INSTRUMENTACAO_AMOSTRAGEM=1.0, INSTRUMENTACAO_LOG=True)
+    def test_server_timing_e_log_com_nome_da_rota(self):
+        with self.assertLogs('kiItem.instrumentacao', 'INFO') as logs:
+            with CaptureQueriesContext(connection) as consultas:
+                resposta = self.client.get('/api/receitas/categoria/bolos/')
+        self.assertRegex(resposta['Server-Timing'], r'^banco;dur=[\d.]+;desc="\d+ consultas", serializacao;dur=[\d.]+, renderizacao;dur=[\d.]+, total;dur=[\d.]+$')
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual(registro['rota'], 'receitas-por-categoria')
+        self.assertEqual(registro['consultas'], len(consultas))
+        self.assertGreater(registro['serializacao_ms'], 0)
+        self.assertLessEqual(registro['banco_ms'], registro['total_ms'])
+
+    @override_settings(INSTRUMENTACAO_AMOSTRAGEM=0)
+    def test_fora_da_amostra_nao_mede(self):
+        resposta = self.client.get('/api/receitas/categoria/bolos/')
+        self.assertFalse(resposta.has_header('Server-Timing'))
+
+
+def valor_metrica(texto, serie):
+    """Valor de uma série no texto exportado no formato do Prometheus (0 quando ausente)"""
+    for linha in texto.splitlines():
+        if linha.startswith(serie + ' '):
+            return float(linha.rsplit(' ', 1)[1])
+    return 0.0
+
+
+class MetricasTests(TestCase):
+    """Registro de métricas, exportação no formato do Prometheus e soma entre workers"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', email='admin@kitem.com', is_staff=True)
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.admin)
+
+    def test_exige_administrador(self):
+        self.assertIn(self.client.get('/api/metricas/').status_code, (401, 403))
+
+    def test_histograma_de_latencia_por_rota_e_status(self):
+        serie = 'kitem_requisicao_duracao_segundos_count{rota="receita-categorias",status="200"}'
+        antes = valor_metrica(metricas.exportar(), serie)
+        self.client.get('/api/receitas/categorias/')
+        resposta = self.cliente.get('/api/metricas/')
+        self.assertEqual(resposta['Content-Type'], metricas.CONTENT_TYPE)
+        texto = resposta.content.decode()
+        self.assertEqual(valor_metrica(texto, serie), antes + 1)
+        self.assertIn('# TYPE kitem_requisicao_duracao_segundos histogram', texto)
+        self.assertIn('kitem_requisicao_duracao_segundos_bucket{rota="receita-categorias",status="200",le="+Inf"}', texto)
+
+    def test_soma_arquivos_de_outros_workers(self):
+        with tempfile.TemporaryDirectory() as diretorio, override_settings(METRICAS_DIRETORIO=diretorio):
+            # PID que não existe: worker encerrado, cujos contadores continuam somados e medidores não
+            with open(os.path.join(diretorio, '999999999.json'), 'w') as arquivo:
+                json.dump([
+                    ['kitem_cache_acessos_total', [['cache', 'teste'], ['resultado', 'acerto']], 3],
+                    ['kitem_requisicoes_em_andamento', [], 7],
+                ], arquivo)
+            # Arquivos que não são de um worker não impedem a exportação
+            for nome_arquivo in ('backup.json', '.json', 'notas.txt'):
+                with open(os.path.join(diretorio, nome_arquivo), 'w') as arquivo:
+                    arquivo.write('[]')
+            metricas.registrar_cache('teste', False)
+            texto = metricas.exportar()
+            self.assertEqual(self.cliente.get('/api/metricas/').status_code, 200)
+        self.assertGreaterEqual(valor_metrica(texto, 'kitem_cache_acessos_total{cache="teste",resultado="acerto"}'), 3)
+        self.assertLess(valor_metrica(texto, 'kitem_requisicoes_em_andamento'), 7)
+        self.assertGreater(valor_metrica(texto, 'kitem_cache_taxa_acerto{cache="teste"}'), 0)
+
+
+class ThrottlingTests(TestCase):
+    """Limites de escrita: 429 com Retry-After, incremento atômico e cache compartilhado em produção"""
+
+    def setUp(self):
+        cache.clear()
+        usuario = User.objects.create(username='autor', email='autor@kitem.com')
+        self.receitas = [
+            Receita.objects.create(
+                id_usuario=usuario, titulo=f'Receita {numero}', descricao='Descrição',
+                tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+            )
+            for numero in range(4)
+        ]
+        self.denunciante = User.objects.create(username='denunciante', email='denunciante@kitem.com')
+
+    def taxas(self, **taxas):
+        rest_framework = {**settings.REST_FRAMEWORK}
+        rest_framework['DEFAULT_THROTTLE_RATES'] = {**rest_framework['DEFAULT_THROTTLE_RATES'], **taxas}
+        return override_settings(REST_FRAMEWORK=rest_framework)
+
+    def test_acima_do_limite_responde_429_com_retry_after(self):
+        with self.taxas(denuncias_ip='2/min'):
+            respostas = [
+                self.client.post('/api/denuncias/lista/', {
+                    'id_receita': receita.pk, 'id_denunciante': self.denunciante.pk, 'motivo_denuncia': 1
+                }, content_type='application/json')
+                for receita in self.receitas
+            ]
+        self.assertEqual([resposta.status_code for resposta in respostas], [201, 201, 429, 429])
+        self.assertTrue(1 <= int(respostas[2]['Retry-After']) <= 60)
+        self.assertEqual(Denuncia.objects.count(), 2)
+
+    def test_requisicoes_simultaneas_nao_ultrapassam_o_limite(self):
+        view = mock.Mock(escopo_throttle='teste')
+        requisicao = Request(RequestFactory().post('/', REMOTE_ADDR='10.0.0.1'))
+        barreira = threading.Barrier(20)
+        permitidas = []
+
+        def requisitar():
+            barreira.wait()
+            permitidas.append(throttling.EscritaIPThrottle().allow_request(requisicao, view))
+
+        with self.taxas(teste_ip='5/hour'):
+            threads = [threading.Thread(target=requisitar) for _ in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(permitidas.count(True), 5)
+
+    def test_base_limita_por_usuario_ou_ip(self):
+        view = mock.Mock(escopo_throttle='teste')
+        fabrica = RequestFactory()
+
+        def requisicao(usuario=None, ip='10.0.0.1'):
+            requisicao = Request(fabrica.post('/', REMOTE_ADDR=ip))
+            requisicao.user = usuario
+            return requisicao
+
+        with self.taxas(teste='1/hour'):
+            throttle = throttling.JanelaDeslizanteThrottle
+            self.assertTrue(throttle().allow_request(requisicao(self.denunciante), view))
+            # Mesmo usuário em outro IP: conta no limite do usuário
+            self.assertFalse(throttle().allow_request(requisicao(self.denunciante, ip='10.0.0.2'), view))
+            # Anônimos: limite por IP
+            self.assertTrue(throttle().allow_request(requisicao(), view))
+            self.assertFalse(throttle().allow_request(requisicao(), view))
+            self.assertTrue(throttle().allow_request(requisicao(ip='10.0.0.3'), view))
+
+    def test_check_de_producao_exige_cache_compartilhado(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/0'}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual([erro.id for erro in throttling.verificar_armazenamento(None)], ['kiItem.E001'])
+        with override_settings(CACHES=redis):
+            self.assertEqual(throttling.verificar_armazenamento(None), [])
+        with override_settings(CACHES=locmem, THROTTLE_ARMAZENAMENTO='memoria'):
+            self.assertEqual(throttling.verificar_armazenamento(None), [])
+
+
+class PoolTests(TestCase):
+    """Tamanho do pool por tipo de worker, opções vindas do ambiente e métricas por banco"""
+
+    def test_tamanho_por_tipo_de_worker(self):
+        # Máximo: requisições simultâneas mais as conexões das consultas paralelas de uma requisição
+        self.assertEqual(pool.tamanho_pool('sync'), (1, 1 + pool.CONEXOES_PARALELAS))
+        self.assertEqual(pool.tamanho_pool('gthread', 8), (2, 8 + pool.CONEXOES_PARALELAS))
+        self.assertEqual(pool.tamanho_pool('uvicorn'), (2, pool.THREADS_PADRAO + pool.CONEXOES_PARALELAS))
+
+    def test_comporta_paralelo_conta_a_conexao_da_requisicao(self):
+        opcoes = connections.settings['default']['OPTIONS']
+        with mock.patch.dict(opcoes, {'pool': {'min_size': 1, 'max_size': 3}}):
+            self.assertTrue(pool.comporta_paralelo(2, ['default']))
+            self.assertFalse(pool.comporta_paralelo(3, ['default']))
+        with mock.patch.dict(opcoes, {'pool': True}):
+            self.assertTrue(pool.comporta_paralelo(3, ['default']))
+        self.assertTrue(pool.comporta_paralelo(10, ['default']))
+
+    def test_opcoes_do_ambiente(self):
+        self.assertIsNone(pool.opcoes_pool({'KITEM_POOL': '0'}))
+        opcoes = pool.opcoes_pool({
+            'KITEM_WORKER_CLASSE': 'gthread', 'KITEM_WORKER_THREADS': '4', 'KITEM_POOL_MIN': '9',
+            'KITEM_POOL_VIDA_MAXIMA': '600',
+        })
+        # O mínimo nunca passa do máximo
+        self.assertEqual((opcoes['min_size'], opcoes['max_size'], opcoes['max_lifetime']), (7, 7, 600.0))
+        self.assertEqual(pool.opcoes_pool({'KITEM_POOL_MAX': '20'})['max_size'], 20)
+
+    def test_coletor_com_uma_serie_por_rotulo(self):
+        registro = metricas.Registro()
+        registro.coletor('kitem_pool_conexoes', lambda: {(('banco', 'default'),): 3, (('banco', 'replica_1'),): 2})
+        instantaneo = registro.instantaneo()
+        self.assertEqual(instantaneo[('kitem_pool_conexoes', (('banco', 'replica_1'),))], 2)
+        if connection.vendor != 'postgresql':
+            self.assertEqual(pool.coletor('kitem_pool_aguardando')(), {})
+
+    def test_health_check_executa_consulta(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get('/api/api/health-check/')
+        self.assertEqual(resposta.json()['status'], 'ok')
+        self.assertEqual([consulta['sql'] for consulta in consultas], ['SELECT 1'])
+
+
+class ConsultasLentasTests(TestCase):
+    """Registro de consultas acima do limite, com impressão digital e plano de execução"""
+
+    def test_impressao_digital_ignora_literais_e_tamanho_das_listas(self):
+        self.assertEqual(
+            consultas_lentas.impressao_digital('SELECT * FROM t WHERE id IN (%s, %s) AND nome = %s'),
+            consultas_lentas.impressao_digital("SELECT  * FROM t WHERE id IN (1, 2, 3) AND nome = 'x'"),
+        )
+        self.assertNotEqual(
+            consultas_lentas.impressao_digital('SELECT * FROM t WHERE id = %s'),
+            consultas_lentas.impressao_digital('SELECT * FROM u WHERE id = %s'),
+        )
+
+    def test_registra_consulta_com_rota_parametros_e_plano(self):
+        usuario = User.objects.create(username='autor', email='autor@kitem.com')
+        Receita.objects.create(
+            id_usuario=usuario, titulo='Bolo', descricao='Descrição',
+            tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+        )
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'lentas.jsonl')
+            # Limite ínfimo: toda consulta é considerada lenta
+            with override_settings(CONSULTAS_LENTAS_LIMITE_MS=1e-6, CONSULTAS_LENTAS_ARQUIVO=caminho), \
+                    self.assertLogs('kiItem.consultas_lentas', 'WARNING'):
+                self.client.get('/api/receitas/categoria/bolos/')
+                consultas_lentas.aguardar()
+            with open(caminho, encoding='utf-8') as arquivo:
+                entradas = [json.loads(linha) for linha in arquivo]
+        entrada = next(entrada for entrada in entradas if 'receita_receita' in entrada['sql'])
+        self.assertEqual(entrada['rota'], 'receitas-por-categoria')
+        self.assertIn('bolos', entrada['parametros'])
+        self.assertTrue(entrada['ponto_de_chamada'].startswith('receita/views_api.py'))
+        self.assertTrue(entrada['plano'])
+
+
+class ComentariosSQLTests(TestCase):
+    """Comentários sqlcommenter no SQL que chega ao banco, com e sem parâmetros"""
+
+    def sql_executado(self, funcao):
+        """SQL recebido pelo banco, depois de todos os execute_wrappers"""
+        if connection.vendor == 'sqlite':
+            executados = []
+            connection.ensure_connection()
+            connection.connection.set_trace_callback(executados.append)
+            try:
+                funcao()
+            finally:
+                connection.connection.set_trace_callback(None)
+            return executados
+        # No PostgreSQL (psycopg), last_executed_query devolve a consulta enviada ao servidor
+        with CaptureQueriesContext(connection) as capturadas:
+            funcao()
+        return [consulta['sql'] for consulta in capturadas]
+
+    def test_comentario_estavel_e_escapado(self):
+        comentario = comentarios_sql.montar_comentario(route="a'b", controller='View', framework='django:5.2', vazio='')
+        self.assertEqual(comentario, "/*controller='View',framework='django%3A5.2',route='a%27b'*/")
+
+    def test_consultas_com_e_sem_parametros_chegam_comentadas(self):
+        wrapper = comentarios_sql.ComentarioSQL('req-1')
+        wrapper.definir(route='rota:teste', controller='View')
+
+        def consultar():
+            with connection.execute_wrapper(wrapper), connection.cursor() as cursor:
+                cursor.execute('SELECT %s', ['100%'])
+                self.assertEqual(cursor.fetchone()[0], '100%')
+                cursor.execute("SELECT 'sem parâmetros';")
+                self.assertEqual(cursor.fetchone()[0], 'sem parâmetros')
+
+        executados = self.sql_executado(consultar)
+        comentario = "/*controller='View',framework='django%3A{}',request_id='req-1',route='rota%3Ateste'*/"
+        self.assertTrue(executados[0].endswith(comentario.format(django.get_version())), executados[0])
+        self.assertTrue(executados[1].endswith(comentario.format(django.get_version()) + ';'), executados[1])
+
+    def test_requisicao_comenta_rota_view_e_request_id(self):
+        executados = self.sql_executado(
+            lambda: self.client.get('/api/receitas/categoria/bolos/', HTTP_X_REQUEST_ID='abc-123')
+        )
+        consulta = next(sql for sql in executados if 'receita_receita' in sql)
+        self.assertIn("controller='ReceitaPorCategoriaAPIView'", consulta)
+        self.assertIn("request_id='abc-123',route='receitas-por-categoria'*/", consulta)
+        resposta = self.client.get('/api/receitas/categorias/', HTTP_X_REQUEST_ID='inválido!')
+        self.assertRegex(resposta['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+    def test_impressao_digital_ignora_comentario(self):
+        self.assertEqual(
+            consultas_lentas.impressao_digital("SELECT 1 /*request_id='a'*/"),
+            consultas_lentas.impressao_digital("SELECT 1 /*request_id='b'*/"),
+        )
+
+
+class MemoriaTests(TestCase):
+    """Pico de memória e locais de alocação por rota, com aviso acima do limite"""
+
+    def setUp(self):
+        self.addCleanup(tracemalloc.stop)
+        usuario = User.objects.create(username='autor', email='autor@kitem.com')
+        for numero in range(20):
+            Receita.objects.create(
+                id_usuario=usuario, titulo=f'Bolo {numero}', descricao='Descrição ' * 50,
+                tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+            )
+
+    def test_desligado_nao_rastreia(self):
+        with override_settings(MEMORIA_RASTREAMENTO=False):
+            self.client.get('/api/receitas/categoria/bolos/')
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_registra_pico_locais_e_aviso_acima_do_limite(self):
+        serie = 'kitem_memoria_pico_bytes_count{rota="receitas-por-categoria"}'
+        antes = valor_metrica(metricas.exportar(), serie)
+        with override_settings(MEMORIA_RASTREAMENTO=True, MEMORIA_LIMITE_KB=1), \
+                self.assertLogs('kiItem.memoria', 'WARNING') as registros:
+            self.client.get('/api/receitas/categoria/bolos/', {'pagina': 1})
+        aviso = json.loads(registros.records[0].getMessage())
+        self.assertEqual(aviso['rota'], 'receitas-por-categoria')
+        self.assertEqual(aviso['parametros'], {'pagina': '1'})
+        self.assertEqual(aviso['argumentos'], {'categoria': 'bolos'})
+        self.assertGreater(aviso['pico_kb'], 1)
+        self.assertTrue(aviso['locais'])
+        self.assertLessEqual(len(aviso['locais']), 5)
+        texto = metricas.exportar()
+        self.assertEqual(valor_metrica(texto, serie), antes + 1)
+        self.assertIn('kitem_memoria_local_bytes_total{rota="receitas-por-categoria",local=', texto)
+
+    def test_uma_requisicao_rastreada_por_vez(self):
+        self.assertTrue(memoria._rastrear())
+        try:
+            self.assertFalse(memoria._rastrear())
+        finally:
+            memoria._trava.release()
+
+
+class PerfiladorTests(TestCase):
+    """Perfis pedidos por administradores, amostragem, armazenamento com rotação e download"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', email='admin@kitem.com', is_staff=True)
+        self.diretorio = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(PERFILADOR_DIRETORIO=self.diretorio))
+
+    def autorizacao(self, usuario):
+        return {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(usuario).access_token}'}
+
+    def test_amostrador_conta_pilhas_no_formato_collapsed(self):
+        parar = threading.Event()
+
+        def esperar():
+            while not parar.is_set():
+                time.sleep(0.001)
+
+        thread = threading.Thread(target=esperar)
+        thread.start()
+        amostrador = perfilador.Amostrador(thread.ident, 0.001).iniciar()
+        time.sleep(0.05)
+        amostrador.parar()
+        parar.set()
+        thread.join()
+        linhas = amostrador.collapsed().splitlines()
+        self.assertTrue(linhas)
+        for linha in linhas:
+            self.assertRegex(linha, r'^requisicao;.+ \d+$')
+        self.assertTrue(any('esperar (kiItem/tests.py:' in linha for linha in linhas))
+
+    def test_cabecalho_ignorado_para_quem_nao_e_administrador(self):
+        comum = User.objects.create(username='comum', email='comum@kitem.com')
+        resposta = self.client.get('/api/receitas/categorias/', HTTP_X_PERFILAR='retornar', **self.autorizacao(comum))
+        self.assertEqual(resposta['Content-Type'], 'application/json')
+        self.assertNotIn('X-Perfil', resposta)
+        self.assertEqual(perfilador.listar(), [])
+
+    def test_administrador_recebe_o_perfil_na_resposta(self):
+        resposta = self.client.get('/api/receitas/categorias/', HTTP_X_PERFILAR='retornar', **self.autorizacao(self.admin))
+        self.assertEqual(resposta['Content-Type'], perfilador.CONTENT_TYPE)
+        self.assertEqual(resposta['X-Perfil-Status'], '200')
+        self.assertIn('.collapsed', resposta['Content-Disposition'])
+
+    def test_perfil_guardado_e_baixado(self):
+        self.client.force_login(self.admin)
+        resposta = self.client.get('/api/receitas/categorias/', HTTP_X_PERFILAR='1')
+        self.assertEqual(resposta.status_code, 200)
+        url = resposta['X-Perfil']
+        [dados] = self.client.get('/api/perfis/').json()
+        self.assertEqual(url, f'/api/perfis/{dados["id"]}/')
+        self.assertEqual((dados['rota'], dados['motivo'], dados['status']), ('receita-categorias', 'cabecalho', 200))
+        download = self.client.get(url)
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download['Content-Type'], perfilador.CONTENT_TYPE)
+        self.assertEqual(self.client.get('/api/perfis/..%2Fsettings/').status_code, 404)
+        self.client.logout()
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+
+    def test_amostragem_guarda_com_rotacao(self):
+        with override_settings(PERFILADOR_AMOSTRAGEM=1.0, PERFILADOR_MAXIMO_ARQUIVOS=2):
+            for _ in range(3):
+                resposta = self.client.get('/api/receitas/categorias/')
+                self.assertNotIn('X-Perfil', resposta)
+        perfis = perfilador.listar()
+        self.assertEqual(len(perfis), 2)
+        self.assertEqual({perfil['motivo'] for perfil in perfis}, {'amostragem'})
+        self.assertEqual(len(os.listdir(self.diretorio)), 4)
+
+
+class BancosTemporariosMixin:
+    """Aliases de banco SQLite criados durante o teste (réplicas, shards)"""
+
+    def adicionar_banco(self, alias, caminho):
+        connections.settings[alias] = {**connections.settings['default'], 'NAME': caminho, 'TEST': {}}
+        # Aliases fora de `databases` são bloqueados pelo executor de testes; a limpeza restaura antes do flush
+        databases = type(self).databases
+        type(self).databases = databases | {alias}
+
+        def remover():
+            type(self).databases = databases
+            connections[alias].close()
+            del connections.settings[alias]
+            delattr(connections._connections, alias)
+
+        self.addCleanup(remover)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Réplica simulada com cópia de arquivo SQLite')
+class ReplicasTests(BancosTemporariosMixin, TransactionTestCase):
+    """
+    Primário e réplica em dois bancos SQLite: a réplica é uma cópia do primário feita antes das
+    escritas do teste, como uma réplica atrasada.
+    """
+
+    def setUp(self):
+        cache.clear()
+        roteadores.saude.limpar()
+        self.usuario = User.objects.create(username='leitor', email='leitor@kitem.com')
+        self.receita = Receita.objects.create(
+            id_usuario=self.usuario, titulo='Bolo', descricao='Descrição',
+            tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+        )
+        diretorio = self.enterContext(tempfile.TemporaryDirectory())
+        self.adicionar_banco('replica_teste', os.path.join(diretorio, 'replica.sqlite3'))
+        connection.ensure_connection()
+        with sqlite3.connect(os.path.join(diretorio, 'replica.sqlite3')) as destino:
+            connection.connection.backup(destino)
+        destino.close()
+        self.enterContext(override_settings(BANCO_REPLICAS=['replica_teste']))
+
+    def favoritos(self, cliente=None, **cabecalhos):
+        return (cliente or self.client).get(f'/api/usuarios/{self.usuario.pk}/favoritos/detalhados/', **cabecalhos)
+
+    def autorizacao(self):
+        return {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.usuario).access_token}'}
+
+    def test_leitura_vai_para_a_replica(self):
+        Favorito.objects.create(id_usuario=self.usuario, id_receita=self.receita)
+        # Escrita fora de requisição só existe no primário; a leitura da requisição vem da réplica
+        self.assertEqual(self.favoritos().status_code, 404)
+        self.assertEqual(roteadores.RoteadorReplicas().db_for_read(Favorito), 'default')
+
+    def test_le_as_proprias_escritas_pelo_cookie(self):
+        url = f'/api/usuarios/{self.usuario.pk}/favoritos/{self.receita.pk}/toggle/'
+        resposta = self.client.post(url, **self.autorizacao())
+        self.assertEqual(resposta.status_code, 201)
+        self.assertIn(roteadores.COOKIE, resposta.cookies)
+        self.assertEqual(self.favoritos().status_code, 200)
+        # Outro cliente, sem cookie nem token, ainda lê da réplica atrasada
+        self.assertEqual(self.favoritos(APIClient()).status_code, 404)
+
+    def test_le_as_proprias_escritas_pelo_token(self):
+        url = f'/api/usuarios/{self.usuario.pk}/favoritos/{self.receita.pk}/toggle/'
+        self.client.post(url, **self.autorizacao())
+        self.assertEqual(self.favoritos(APIClient(), **self.autorizacao()).status_code, 200)
+
+    def test_replica_indisponivel_usa_o_primario(self):
+        Favorito.objects.create(id_usuario=self.usuario, id_receita=self.receita)
+        self.adicionar_banco('replica_fora', '/diretorio/inexistente/replica.sqlite3')
+        with override_settings(BANCO_REPLICAS=['replica_fora']), self.assertLogs('kiItem.roteadores', 'WARNING'):
+            self.assertEqual(self.favoritos().status_code, 200)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Shards simulados com arquivos SQLite')
+class ShardsTests(BancosTemporariosMixin, TransactionTestCase):
+    """'default' e dois shards SQLite temporários com o esquema completo"""
+
+    def setUp(self):
+        cache.clear()
+        diretorio = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(BANCO_SHARDS=['default', 'shard_1', 'shard_2']))
+        for alias in ('shard_1', 'shard_2'):
+            self.adicionar_banco(alias, os.path.join(diretorio, f'{alias}.sqlite3'))
+            # O migrate de cada shard reserva a faixa de ids dele (ver shards.reservar_faixa_de_ids)
+            call_command('migrate', database=alias, verbosity=0)
+        self.autor = User.objects.create(username='autor')
+        self.receita = Receita.objects.create(
+            id_usuario=self.autor, titulo='Bolo', descricao='Descrição',
+            tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+        )
+        self.ingrediente = Ingrediente.objects.create(nome='Farinha')
+
+    def usuario_no_shard(self, alias):
+        while True:
+            usuario = User.objects.create(username=f'usuario{User.objects.count()}')
+            if shards.shard_do_usuario(usuario.pk) == alias:
+                return usuario
+
+    def registros(self, usuario):
+        """Favorito, lista com um item e denúncia do usuário, criados sem informar o banco"""
+        Favorito.objects.create(id_usuario=usuario, id_receita=self.receita)
+        lista = ListaItens.objects.create(id_usuario=usuario)
+        lista.ingredientes.create(id_ingrediente=self.ingrediente, quantidade=2, unidade_medida='kg', preco=Decimal('5.00'))
+        Denuncia.objects.create(id_receita=self.receita, id_denunciante=usuario, motivo_denuncia=2)
+
+    def contagens(self, usuario, alias):
+        return list(shards.contar_registros(usuario.pk, alias).values())
+
+    def test_jump_hash_so_move_chaves_para_o_novo_shard(self):
+        for chave in range(2000):
+            antes, depois = shards.jump_hash(chave, 2), shards.jump_hash(chave, 3)
+            self.assertIn(depois, (antes, 2))
+        self.assertEqual({shards.jump_hash(chave, 3) for chave in range(100)}, {0, 1, 2})
+
+    def test_registros_ficam_no_shard_do_usuario(self):
+        usuario = self.usuario_no_shard('shard_1')
+        self.registros(usuario)
+        self.assertEqual(self.contagens(usuario, 'shard_1'), [1, 1, 1, 1])
+        self.assertEqual(self.contagens(usuario, 'default'), [0, 0, 0, 0])
+        self.assertEqual(Favorito.objects.do_usuario(usuario.pk).get().id_receita, self.receita)
+        self.assertEqual(usuario.favoritos.count(), 1)
+
+        # Endpoints por usuário leem do shard; nomes de receitas e ingredientes vêm de 'default'
+        resposta = self.client.get(f'/api/usuarios/{usuario.pk}/favoritos/detalhados/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()[0]['titulo_receita'], 'Bolo')
+        totais = self.client.get(f'/api/listas_itens/usuario/{usuario.pk}/totais/').json()
+        self.assertEqual(totais['total_preco'], '10.00')
+        self.assertEqual(totais['por_ingrediente'][0]['nome_ingrediente'], 'Farinha')
+        detalhadas = self.client.get(f'/api/listas_itens/usuario/{usuario.pk}/detalhadas/').json()
+        self.assertEqual(detalhadas['results'][0]['ingredientes'][0]['nome_ingrediente'], 'Farinha')
+
+    def test_ids_unicos_entre_os_shards(self):
+        listas = {}
+        for alias in ('default', 'shard_1', 'shard_2'):
+            self.registros(self.usuario_no_shard(alias))
+            listas[alias] = ListaItens._base_manager.using(alias).get()
+        self.assertLess(listas['default'].pk, shards.IDS_POR_SHARD)
+        self.assertEqual(listas['shard_1'].pk, shards.IDS_POR_SHARD + 1)
+        self.assertEqual(listas['shard_2'].pk, 2 * shards.IDS_POR_SHARD + 1)
+        self.assertEqual(Favorito._base_manager.using('shard_2').get().pk, 2 * shards.IDS_POR_SHARD + 1)
+        # Um novo migrate não volta a sequência
+        call_command('migrate', database='shard_1', verbosity=0)
+        self.assertEqual(ListaItens.objects.create(id_usuario=listas['shard_1'].id_usuario).pk, shards.IDS_POR_SHARD + 2)
+
+    def test_rotas_com_id_leem_do_shard_do_registro(self):
+        usuario = self.usuario_no_shard('shard_2')
+        self.registros(usuario)
+        lista = ListaItens.objects.do_usuario(usuario.pk).get()
+        item = lista.ingredientes.get()
+        favorito = Favorito.objects.do_usuario(usuario.pk).get()
+
+        totais = self.client.get(f'/api/listas_itens/{lista.pk}/totais/').json()
+        self.assertEqual((totais['total_preco'], totais['por_ingrediente'][0]['nome_ingrediente']), ('10.00', 'Farinha'))
+        detalhada = self.client.get(f'/api/listas_itens/{lista.pk}/detalhada/').json()
+        self.assertEqual(detalhada['ingredientes'][0]['nome_ingrediente'], 'Farinha')
+        self.assertEqual(self.client.get(f'/api/listas-itens/{lista.pk}/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/favoritos/{favorito.pk}/').status_code, 200)
+
+        resposta = self.client.patch(f'/api/listas_itens_ingredientes/{item.pk}/toggle-comprado/')
+        self.assertTrue(resposta.json()['ingrediente']['comprado'])
+        resposta = self.client.patch(
+            f'/api/listas_itens/{lista.pk}/itens/precos/', {'itens': [{'id': item.pk, 'preco': '7.00'}]},
+            content_type='application/json'
+        )
+        self.assertEqual(resposta.json()['itens_atualizados'], 1)
+        item = ListaItensIngrediente._base_manager.using('shard_2').get(pk=item.pk)
+        self.assertEqual((item.comprado, item.preco), (True, Decimal('7.00')))
+        self.assertEqual(self.client.get(f'/api/listas_itens/{lista.pk}/totais/').json()['total_preco'], '14.00')
+
+        resposta = self.client.post(f'/api/listas_itens/{lista.pk}/itens/remover/', {'ids': [item.pk]}, content_type='application/json')
+        self.assertEqual(resposta.json()['itens_removidos'], 1)
+        self.assertEqual(self.client.get(f'/api/listas_itens/{lista.pk + 1}/totais/').status_code, 404)
+
+    def test_estatisticas_somam_todos_os_shards(self):
+        for alias in ('default', 'shard_1', 'shard_2'):
+            self.registros(self.usuario_no_shard(alias))
+        EstatisticaDenuncia.objects.all().delete()
+        Receita.objects.update(denuncias_pendentes=0)
+
+        estatisticas.recalcular()
+        moderacao.recalcular_pendentes()
+        self.assertEqual(estatisticas.total_denuncias(), 3)
+        self.assertEqual(estatisticas.receitas_mais_denunciadas()[0]['count'], 3)
+        self.receita.refresh_from_db()
+        self.assertEqual(self.receita.denuncias_pendentes, 3)
+
+    @override_settings(DENUNCIAS_LIMITE_OCULTAR_RECEITA=2)
+    def test_moderacao_de_denuncias_em_outros_shards(self):
+        denunciantes = [self.usuario_no_shard('shard_1'), self.usuario_no_shard('shard_2')]
+        denuncias = [
+            str(Denuncia.objects.create(id_receita=self.receita, id_denunciante=usuario, motivo_denuncia=2).pk)
+            for usuario in denunciantes
+        ]
+        mais_antiga, mais_recente = denuncias
+        self.assertEqual(Denuncia._base_manager.using('default').count(), 0)
+
+        def receita():
+            self.receita.refresh_from_db()
+            return self.receita.oculta, self.receita.denuncias_pendentes
+
+        self.assertEqual(receita(), (True, 2))
+        administrador = User.objects.create(username='moderador', is_staff=True, is_superuser=True)
+        cabecalhos = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(administrador).access_token}'}
+
+        # Fila, filtro (com e sem cursor) e exportação reúnem as denúncias dos dois shards
+        fila = self.client.get('/api/denuncias/pendentes/?tamanho=1&page=2', **cabecalhos).json()
+        self.assertEqual((fila['count'], [denuncia['unique_id'] for denuncia in fila['results']]), (2, [mais_antiga]))
+        filtradas = self.client.get('/api/denuncias/filtrar/?status=pendente').json()
+        self.assertEqual([denuncia['unique_id'] for denuncia in filtradas['denuncias']], [mais_recente, mais_antiga])
+        pagina = self.client.get('/api/denuncias/filtrar/?limite=1').json()
+        pagina = self.client.get(f'/api/denuncias/filtrar/?limite=1&cursor={pagina["proximo_cursor"]}').json()
+        self.assertEqual(([denuncia['unique_id'] for denuncia in pagina['denuncias']], pagina['proximo_cursor']), ([mais_antiga], None))
+        resposta = self.client.get('/api/denuncias/exportar/?formato=ndjson', **cabecalhos)
+        exportadas = [json.loads(linha) for linha in b''.join(resposta.streaming_content).decode().splitlines()]
+        self.assertEqual(
+            [(linha['unique_id'], linha['receita_titulo'], linha['denunciante_username']) for linha in exportadas],
+            [(mais_recente, 'Bolo', denunciantes[1].username), (mais_antiga, 'Bolo', denunciantes[0].username)]
+        )
+
+        # Alteração de uma denúncia e em lote, no shard onde cada uma está
+        resposta = self.client.patch(
+            f'/api/denuncias/{mais_recente}/toggle-status/', {'status': 'descartada'}, content_type='application/json', **cabecalhos
+        )
+        self.assertEqual((resposta.status_code, resposta.json()['status']), (200, 'descartada'))
+        self.assertEqual(Denuncia._base_manager.using('shard_2').get().status, 'descartada')
+        self.assertEqual(receita(), (False, 1))
+        resposta = self.client.post(
+            '/api/denuncias/moderar/', {'ids': denuncias, 'status': 'pendente'}, content_type='application/json', **cabecalhos
+        )
+        # Só a descartada é reaberta
+        self.assertEqual(resposta.json()['denuncias_alteradas'], 1)
+        self.assertEqual(receita(), (True, 2))
+
+        # Ações do admin sobre as denúncias do shard escolhido no filtro
+        self.client.force_login(administrador)
+        resposta = self.client.post(
+            '/admin/denuncia/denuncia/?shard=shard_1', {'action': 'marcar_como_resolvida', '_selected_action': [mais_antiga]}
+        )
+        self.assertEqual(resposta.status_code, 302)
+        self.assertEqual(Denuncia._base_manager.using('shard_1').get().status, 'resolvida')
+        self.assertEqual(moderacao.alterar_status([mais_recente], 'descartada'), 1)
+        # A denúncia resolvida mantém a receita oculta, inclusive depois de arquivada no próprio shard
+        self.assertEqual(receita(), (True, 0))
+        self.assertEqual(arquivamento.quantidade_pendente_arquivamento(todas_moderadas=True), 2)
+        self.assertEqual(list(arquivamento.arquivar(todas_moderadas=True)), [1, 2])
+        self.assertEqual([DenunciaArquivada.objects.using(alias).count() for alias in ('default', 'shard_1', 'shard_2')], [0, 1, 1])
+        self.assertEqual(self.client.get('/api/denuncias/pendentes/', **cabecalhos).json()['count'], 0)
+        EstatisticaDenuncia.objects.all().delete()
+        estatisticas.recalcular()
+        self.assertEqual(estatisticas.total_denuncias(), 2)
+        self.assertEqual(receita(), (True, 0))
+
+    def test_contadores_atualizados_apos_a_confirmacao_no_shard(self):
+        usuario = self.usuario_no_shard('shard_1')
+
+        def contadores():
+            self.receita.refresh_from_db()
+            return estatisticas.total_denuncias(), self.receita.denuncias_pendentes
+
+        with transaction.atomic(using='shard_1'):
+            denuncia = Denuncia.objects.create(id_receita=self.receita, id_denunciante=usuario, motivo_denuncia=2)
+            # Os contadores em 'default' esperam a confirmação no shard
+            self.assertEqual(contadores(), (0, 0))
+        self.assertEqual(contadores(), (1, 1))
+
+        with transaction.atomic(using='shard_1'):
+            denuncia.status = 'resolvida'
+            denuncia.save()
+            transaction.set_rollback(True, using='shard_1')
+        self.assertEqual(contadores(), (1, 1))
+
+        denuncia.refresh_from_db()
+        with transaction.atomic(using='shard_1'):
+            denuncia.delete()
+        self.assertEqual(contadores(), (0, 0))
+
+    def test_rebalancear_move_usuarios_para_o_novo_shard(self):
+        def sai_de_shard_1(usuario):
+            return shards.jump_hash(usuario.pk, 2) == 1 and shards.jump_hash(usuario.pk, 3) == 2
+
+        with override_settings(BANCO_SHARDS=['default', 'shard_1']):
+            # Pelo menos doze usuários, um deles movido de shard_1 (os demais movidos saem de 'default')
+            usuarios = []
+            while len(usuarios) < 12 or not any(map(sai_de_shard_1, usuarios)):
+                usuarios.append(User.objects.create(username=f'rebalancear{len(usuarios)}'))
+                self.registros(usuarios[-1])
+        movidos = [usuario for usuario in usuarios if shards.shard_do_usuario(usuario.pk) == 'shard_2']
+        movido = next(filter(sai_de_shard_1, usuarios))
+        data_denuncia = Denuncia.objects.do_usuario(movido.pk).using('shard_1').get().data_denuncia
+        lista_movida = ListaItens.objects.do_usuario(movido.pk).using('shard_1').get().pk
+
+        saida = StringIO()
+        call_command('rebalancear_shards', simular=True, stdout=saida)
+        self.assertIn(f'{len(movidos)} usuário(s)', saida.getvalue())
+        self.assertEqual(self.contagens(movido, 'shard_2'), [0, 0, 0, 0])
+
+        call_command('rebalancear_shards', stdout=StringIO())
+        for usuario in usuarios:
+            destino = shards.shard_do_usuario(usuario.pk)
+            for alias in ('default', 'shard_1', 'shard_2'):
+                self.assertEqual(self.contagens(usuario, alias), [1, 1, 1, 1] if alias == destino else [0, 0, 0, 0])
+        # Registros movidos mantêm os ids; denúncias mantêm também a data
+        lista = ListaItens.objects.do_usuario(movido.pk).get()
+        self.assertEqual(lista.pk, lista_movida)
+        self.assertEqual(lista.ingredientes.get().quantidade, 2)
+        # O id foi gerado em shard_1: a lista é encontrada em shard_2 depois de não estar na origem
+        self.assertEqual(shards.shard_de_origem(lista.pk), 'shard_1')
+        self.assertEqual(shards.shard_do_registro(ListaItens, lista.pk), 'shard_2')
+        self.assertEqual(self.client.get(f'/api/listas_itens/{lista.pk}/totais/').json()['total_preco'], '10.00')
+        self.assertEqual(Denuncia.objects.do_usuario(movido.pk).get().data_denuncia, data_denuncia)
+        self.assertEqual(estatisticas.total_denuncias(), len(usuarios))
+        self.assertEqual(shards.usuarios_fora_do_lugar(), {})
+
+    def test_em_todos_em_sequencia_quando_o_pool_nao_comporta(self):
+        connection.ensure_connection()
+        with mock.patch.dict(connections.settings['default']['OPTIONS'], {'pool': {'min_size': 1, 'max_size': 1}}):
+            threads = shards.em_todos(lambda alias: threading.get_ident())
+        self.assertEqual(threads, [threading.get_ident()] * 3)
+
+    def test_exclusao_em_cascata_nos_outros_shards(self):
+        usuario, outro = self.usuario_no_shard('shard_1'), self.usuario_no_shard('shard_2')
+        self.registros(usuario)
+        self.registros(outro)
+        usuario.delete()
+        self.assertEqual(self.contagens(usuario, 'shard_1'), [0, 0, 0, 0])
+        self.receita.delete()
+        self.assertEqual(Favorito._base_manager.using('shard_2').count(), 0)
+        self.assertEqual(Denuncia._base_manager.using('shard_2').count(), 0)
+
+
+class AssincronoTests(TestCase):
+    """Views assíncronas servidas pelo ASGI (AsyncClient) e pelo WSGI (Client)"""
+
+    def setUp(self):
+        self.usuario = User.objects.create(username='autor', email='autor@kitem.com')
+        self.receita = Receita.objects.create(
+            id_usuario=self.usuario, titulo='Bolo', descricao='Descrição',
+            tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+        )
+        ingrediente = Ingrediente.objects.create(nome='Farinha')
+        ReceitaIngrediente.objects.create(id_receita=self.receita, id_ingrediente=ingrediente, quantidade=2, unidade_medida='g')
+        Favorito.objects.create(id_usuario=self.usuario, id_receita=self.receita)
+
+    @override_settings(INSTRUMENTACAO_AMOSTRAGEM=1.0)
+    async def test_mesma_resposta_pelo_asgi_e_pelo_wsgi(self):
+        urls = [
+            f'/api/receitas/{self.receita.pk}/detalhada/',
+            '/api/receitas/filtrar/?tipo=doce',
+            '/api/receitas/categorias/',
+            '/api/receitas/categoria/bolos/',
+            f'/api/usuarios/{self.usuario.pk}/favoritos/detalhados/',
+        ]
+        for url in urls:
+            assincrona = await self.async_client.get(url, headers={'X-Request-ID': 'abc-123'})
+            sincrona = await sync_to_async(self.client.get)(url)
+            self.assertEqual(assincrona.status_code, 200, url)
+            self.assertEqual(assincrona.json(), sincrona.json(), url)
+            # Middlewares no modo assíncrono: consultas contadas na thread do ORM e request id propagado
+            self.assertGreater(int(re.search(r'desc="(\d+) consultas"', assincrona['Server-Timing']).group(1)), 0, url)
+            self.assertEqual(assincrona['X-Request-ID'], 'abc-123')
+        resposta = await self.async_client.get(f'/api/receitas/{self.receita.pk + 1}/detalhada/')
+        self.assertEqual(resposta.status_code, 404)
+
+    @override_settings(CONSULTAS_PARALELAS=True)
+    def test_em_paralelo_dentro_de_transacao_executa_na_thread_da_requisicao(self):
+        resultados = async_to_sync(assincrono.em_paralelo)(threading.get_ident, Receita.objects.count)
+        self.assertEqual(resultados, [threading.get_ident(), 1])
+
+
+@override_settings(CONSULTAS_PARALELAS=True)
+class ConsultasParalelasTests(TransactionTestCase):
+    """em_paralelo fora de transação: uma thread e uma conexão por função"""
+
+    def test_funcoes_executam_ao_mesmo_tempo_com_os_wrappers_da_requisicao(self):
+        usuario = User.objects.create(username='autor', email='autor@kitem.com')
+        Receita.objects.create(
+            id_usuario=usuario, titulo='Bolo', descricao='Descrição',
+            tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+        )
+        # Só passa da barreira com as três funções em execução ao mesmo tempo
+        barreira = threading.Barrier(3, timeout=5)
+
+        def consultar():
+            barreira.wait()
+            return threading.get_ident(), Receita.objects.count()
+
+        consultas = []
+
+        def registrar(execute, sql, params, many, context):
+            consultas.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(registrar):
+            resultados = async_to_sync(assincrono.em_paralelo)(consultar, consultar, consultar)
+        self.assertEqual(len({thread for thread, _ in resultados}), 3)
+        self.assertEqual([total for _, total in resultados], [1, 1, 1])
+        self.assertEqual(len(consultas), 3)
+
+    def test_pool_sem_conexoes_para_as_threads_executa_em_sequencia(self):
+        # A thread da requisição já segura a única conexão do pool: threads paralelas esperariam por ela
+        connection.ensure_connection()
+        with mock.patch.dict(connections.settings['default']['OPTIONS'], {'pool': {'min_size': 1, 'max_size': 1}}):
+            resultados = async_to_sync(assincrono.em_paralelo)(
+                threading.get_ident, threading.get_ident, Receita.objects.count
+            )
+        self.assertEqual(resultados, [threading.get_ident(), threading.get_ident(), 0])
+
+
+class DadosSinteticosTests(TestCase):
+    """gerar_dados_sinteticos em escala pequena: quantidades pedidas e os mesmos dados para a mesma semente"""
+
+    QUANTIDADES = {'usuarios': 12, 'ingredientes': 20, 'receitas': 30, 'denuncias': 15}
+
+    def gerar(self, semente=7):
+        saida = StringIO()
+        call_command(
+            'gerar_dados_sinteticos', favoritos_por_usuario=3, fracao_listas=0.5, semente=semente, lote=8,
+            stdout=saida, **self.QUANTIDADES
+        )
+        return saida.getvalue()
+
+    def conteudo(self):
+        """Dados gerados sem ids nem datas, que mudam a cada execução"""
+        return {
+            'receitas': list(Receita.objects.order_by('pk').values_list(
+                'titulo', 'categoria', 'dificuldade', 'quantidade_visualizacao', 'id_usuario__username'
+            )),
+            'receita_ingredientes': sorted(ReceitaIngrediente.objects.values_list(
+                'id_receita__titulo', 'id_ingrediente__nome', 'quantidade', 'unidade_medida'
+            )),
+            'favoritos': sorted(Favorito.objects.values_list('id_usuario__username', 'id_receita__titulo')),
+            'itens_listas': sorted(ListaItensIngrediente.objects.values_list(
+                'id_lista__id_usuario__username', 'id_ingrediente__nome', 'preco', 'comprado'
+            )),
+            'denuncias': sorted(Denuncia.objects.values_list(
+                'id_receita__titulo', 'id_denunciante__username', 'motivo_denuncia', 'status'
+            )),
+        }
+
+    def test_gera_as_quantidades_pedidas_com_contadores_recalculados(self):
+        saida = self.gerar()
+        self.assertIn('Dados sintéticos gerados:', saida)
+        self.assertEqual(User.objects.filter(username__startswith='sintetico7_').count(), 12)
+        self.assertEqual(Ingrediente.objects.count(), 20)
+        self.assertEqual(Receita.objects.count(), 30)
+        self.assertEqual(Denuncia.objects.count(), 15)
+        self.assertEqual(
+            set(Receita.objects.values_list('categoria', flat=True)),
+            {codigo for codigo, _ in Receita.CATEGORIA_CHOICES[:30]}
+        )
+        for modelo in (ReceitaIngrediente, Favorito, ListaItens, ListaItensIngrediente):
+            self.assertTrue(modelo.objects.exists(), modelo.__name__)
+        self.assertEqual(
+            sum(Receita.objects.values_list('denuncias_pendentes', flat=True)),
+            Denuncia.objects.filter(status='pendente').count()
+        )
+        self.assertEqual(EstatisticaDenuncia.objects.get(dimensao='total').quantidade, 15)
+
+    def test_mesma_semente_gera_os_mesmos_dados(self):
+        with transaction.atomic():
+            self.gerar()
+            primeiro = self.conteudo()
+            transaction.set_rollback(True)
+        self.gerar()
+        self.assertEqual(self.conteudo(), primeiro)
+        # A mesma semente não é gerada duas vezes no mesmo banco (nomes de usuário repetidos)
+        with self.assertRaisesMessage(CommandError, 'semente 7'):
+            self.gerar()
+
+
+class BenchmarkTests(TransactionTestCase):
+    """benchmark_endpoints contra duas rotas: percentis no relatório e comparação com a baseline"""
+
+    MISTURA = 'receita_detalhe=1,receitas_categoria=1'
+
+    def setUp(self):
+        # As threads da fase de carga usam conexões próprias: os dados precisam estar gravados
+        call_command('gerar_dados_sinteticos', usuarios=5, ingredientes=10, receitas=30, denuncias=5, stdout=StringIO())
+        self.diretorio = self.enterContext(tempfile.TemporaryDirectory())
+
+    def executar(self, **opcoes):
+        saida = StringIO()
+        call_command(
+            'benchmark_endpoints', requisicoes=12, threads=2, mistura=self.MISTURA, repeticoes_perfil=2,
+            stdout=saida, stderr=StringIO(), **opcoes
+        )
+        return saida.getvalue()
+
+    def test_percentil_pelo_posto_mais_proximo(self):
+        valores = list(range(1, 101))
+        self.assertEqual([benchmark.percentil(valores, p) for p in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertEqual(benchmark.percentil([7], 99), 7)
+        self.assertEqual(benchmark.percentil([], 50), 0.0)
+
+    def test_relatorio_com_percentis_e_comparacao_com_a_baseline(self):
+        caminho = os.path.join(self.diretorio, 'resultado.json')
+        saida = self.executar(saida=caminho)
+        self.assertIn('p95 ms', saida)
+        self.assertIn(f'Resultado salvo em {caminho}', saida)
+
+        relatorio = benchmark.ler(caminho)
+        self.assertEqual(relatorio['total']['requisicoes'], 12)
+        self.assertEqual(relatorio['total']['falhas'], 0)
+        self.assertEqual(set(relatorio['endpoints']), {'receita_detalhe', 'receitas_categoria'})
+        for cenario, dados in relatorio['endpoints'].items():
+            self.assertIn(cenario, saida)
+            self.assertLessEqual(dados['p50_ms'], dados['p95_ms'])
+            self.assertLessEqual(dados['p95_ms'], dados['p99_ms'])
+            self.assertGreater(dados['consultas'], 0)
+            self.assertIn('memoria_kb', dados)
+
+        # Baseline folgada: sem regressões
+        folgada = os.path.join(self.diretorio, 'folgada.json')
+        benchmark.salvar({'endpoints': {
+            cenario: {'p95_ms': 1e6, 'memoria_kb': 1e6, 'consultas': 100} for cenario in relatorio['endpoints']
+        }}, folgada)
+        self.assertIn(f'Sem regressões em relação a {folgada}.', self.executar(baseline=folgada))
+
+        # Uma consulta a menos na baseline já é uma regressão
+        apertada = os.path.join(self.diretorio, 'apertada.json')
+        benchmark.salvar({'endpoints': {'receita_detalhe': {'consultas': 0}}}, apertada)
+        with self.assertRaisesMessage(CommandError, f'1 regressões em relação a {apertada}.'):
+            self.executar(baseline=apertada)
+
+
+class CarregadorTests(TestCase):
+    """Chaves estrangeiras dos serializers carregadas em lote e memorizadas por requisição"""
+
+    def setUp(self):
+        for numero in range(5):
+            usuario = User.objects.create(username=f'usuario{numero}', email=f'usuario{numero}@kitem.com')
+            receita = Receita.objects.create(
+                id_usuario=usuario, titulo=f'Bolo {numero}', descricao='Descrição',
+                tempo_preparo='00:30:00', dificuldade='Fácil', tipo='doce', categoria='bolos'
+            )
+            Denuncia.objects.create(id_receita=receita, id_denunciante=usuario, motivo_denuncia=2)
+
+    def test_uma_consulta_por_modelo_com_o_mesmo_resultado(self):
+        esperado = DenunciaListSerializer(Denuncia.objects.select_related('id_receita', 'id_denunciante'), many=True).data
+        with self.assertNumQueries(3):
+            dados = DenunciaListSerializer(Denuncia.objects.all(), many=True).data
+        self.assertEqual(dados, esperado)
+        # Campos já carregados pelo select_related não geram consultas
+        with self.assertNumQueries(1):
+            DenunciaListSerializer(Denuncia.objects.select_related('id_receita', 'id_denunciante'), many=True).data
+
+    def test_objetos_memorizados_no_escopo_da_requisicao(self):
+        with carregador.escopo():
+            with self.assertNumQueries(3):
+                DenunciaListSerializer(Denuncia.objects.all(), many=True).data
+            denuncia = Denuncia.objects.first()
+            with self.assertNumQueries(0):
+                self.assertEqual(DenunciaSerializer(denuncia).data['denunciante_username'], denuncia.id_denunciante.username)
+        # Fora do escopo, uma nova serialização busca de novo
+        with self.assertNumQueries(3):
+            DenunciaSerializer(Denuncia.objects.first()).data
+
+
+class AutenticacaoTests(TestCase):
+    """Usuário do token nas leituras, usuário em cache nas escritas e sessão só com cookie"""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create(username='leitor', email='leitor@kitem.com')
+        self.token = f'Bearer {RefreshToken.for_user(self.usuario).access_token}'
+
+    def autenticar(self, metodo, view=None):
+        requisicao = Request(getattr(RequestFactory(), metodo)('/', HTTP_AUTHORIZATION=self.token), parser_context={'view': view})
+        return autenticacao.JWTAutenticacao().authenticate(requisicao)[0]
+
+    def test_leitura_usa_o_token_sem_consulta(self):
+        with self.assertNumQueries(0):
+            usuario = self.autenticar('get')
+        self.assertIsInstance(usuario, TokenUser)
+        self.assertEqual(usuario.pk, str(self.usuario.pk))
+
+    def test_escrita_usa_o_usuario_em_cache_ate_ser_salvo(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.autenticar('post'), self.usuario)
+        with self.assertNumQueries(0):
+            self.assertFalse(self.autenticar('post').is_staff)
+        self.usuario.is_staff = True
+        self.usuario.save()
+        with self.assertNumQueries(1):
+            self.assertTrue(self.autenticar('post').is_staff)
+
+    def test_view_administrativa_confere_o_usuario_atual(self):
+        self.usuario.is_staff = True
+        self.usuario.save()
+        self.assertEqual(self.client.get('/api/metricas/', HTTP_AUTHORIZATION=self.token).status_code, 200)
+        self.usuario.is_staff = False
+        self.usuario.save()
+        self.assertEqual(self.client.get('/api/metricas/', HTTP_AUTHORIZATION=self.token).status_code, 403)
+
+    def test_sessao_apenas_com_cookie(self):
+        self.usuario.is_staff = True
+        self.usuario.save()
+        self.assertIsNone(autenticacao.SessaoAutenticacao().authenticate(Request(RequestFactory().get('/'))))
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get('/api/metricas/').status_code, 200)
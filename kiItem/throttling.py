@@ -0,0 +1,227 @@
+"""
+Limite de requisições de escrita com contador de janela deslizante.
+
+A taxa é estimada a partir de dois contadores de janela fixa (a atual e a anterior,
+ponderada pela fração da janela anterior que ainda está dentro do intervalo). Cada
+requisição custa um incremento e uma leitura no armazenamento, ao contrário do
+SimpleRateThrottle do DRF, que lê e regrava a lista de horários de todas as requisições.
+O contador é incrementado antes da verificação (incr é atômico no Redis e no Memcached):
+requisições simultâneas em workers diferentes não passam todas pelo mesmo valor lido.
+
+Com THROTTLE_ARMAZENAMENTO = 'cache', o limite só vale para o serviço inteiro se o cache for
+compartilhado entre os workers; `manage.py check --deploy` acusa um cache por processo (kiItem.E001).
+
+As taxas ficam em REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], com chaves
+'<escopo>_usuario' e '<escopo>_ip'; o escopo vem do atributo `escopo_throttle` da view.
+Escopos sem taxa configurada não são limitados.
+"""
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Error, Tags, register
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DURACOES = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+# Backends de cache compartilhados entre processos e com incr atômico
+CACHES_COMPARTILHADOS = {
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+}
+
+
+def interpretar_taxa(taxa):
+    """'10/min' -> (10, 60), no mesmo formato aceito pelo DRF"""
+    quantidade, periodo = taxa.split('/')
+    return int(quantidade), DURACOES[periodo[0]]
+
+
+class ArmazenamentoMemoria:
+    """Contadores em memória do processo; usado nos testes e em execuções com um único worker"""
+
+    def __init__(self):
+        self._contadores = {}
+        self._trava = threading.Lock()
+
+    def ler(self, chaves):
+        with self._trava:
+            agora = time.monotonic()
+            return {chave: self._contadores[chave][0] for chave in chaves
+                    if chave in self._contadores and self._contadores[chave][1] > agora}
+
+    def incrementar(self, chave, expiracao):
+        with self._trava:
+            agora = time.monotonic()
+            valor, expira_em = self._contadores.get(chave, (0, 0))
+            if expira_em <= agora:
+                valor, expira_em = 0, agora + expiracao
+            self._contadores[chave] = (valor + 1, expira_em)
+            if len(self._contadores) > 10_000:
+                self._contadores = {c: v for c, v in self._contadores.items() if v[1] > agora}
+            return valor + 1
+
+    def decrementar(self, chave):
+        with self._trava:
+            if chave in self._contadores:
+                valor, expira_em = self._contadores[chave]
+                self._contadores[chave] = (valor - 1, expira_em)
+
+    def limpar(self):
+        with self._trava:
+            self._contadores.clear()
+
+
+class ArmazenamentoCache:
+    """Contadores no cache do Django, compartilhados entre workers (Redis/Memcached em produção)"""
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def ler(self, chaves):
+        return self.cache.get_many(chaves)
+
+    def incrementar(self, chave, expiracao):
+        """Soma 1 ao contador e devolve o novo valor"""
+        try:
+            return self.cache.incr(chave)
+        except ValueError:
+            # Primeira requisição da janela; se outro worker criou o contador ao mesmo tempo, incrementa
+            if self.cache.add(chave, 1, expiracao):
+                return 1
+            return self.cache.incr(chave)
+
+    def decrementar(self, chave):
+        try:
+            self.cache.decr(chave)
+        except ValueError:
+            # O contador já expirou
+            pass
+
+
+ARMAZENAMENTOS = {
+    'memoria': ArmazenamentoMemoria,
+    'cache': ArmazenamentoCache,
+}
+_armazenamento = None
+
+
+def obter_armazenamento():
+    """Armazenamento configurado em THROTTLE_ARMAZENAMENTO ('cache' por padrão, ou 'memoria')"""
+    global _armazenamento
+    if _armazenamento is None:
+        _armazenamento = ARMAZENAMENTOS[getattr(settings, 'THROTTLE_ARMAZENAMENTO', 'cache')]()
+    return _armazenamento
+
+
+@register(Tags.caches, deploy=True)
+def verificar_armazenamento(app_configs, **kwargs):
+    """Com contadores no cache, exige um cache compartilhado entre os workers"""
+    if getattr(settings, 'THROTTLE_ARMAZENAMENTO', 'cache') != 'cache':
+        return []
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in CACHES_COMPARTILHADOS:
+        return []
+    return [Error(
+        f'Os limites de requisição usam o cache {backend}, que não é compartilhado entre os workers: '
+        'cada processo aplicaria o próprio limite.',
+        hint='Configure o Redis em KITEM_REDIS_URL (CACHES em settings.py).',
+        id='kiItem.E001',
+    )]
+
+
+@receiver(setting_changed)
+def recarregar_armazenamento(setting, **kwargs):
+    """Troca o armazenamento quando THROTTLE_ARMAZENAMENTO muda (override_settings nos testes)"""
+    global _armazenamento
+    if setting == 'THROTTLE_ARMAZENAMENTO':
+        _armazenamento = None
+
+
+class JanelaDeslizanteThrottle(BaseThrottle):
+    """
+    Base dos limites de escrita: aplica-se apenas a métodos que alteram dados. Sem sufixo, a taxa
+    é lida de DEFAULT_THROTTLE_RATES[escopo] e cada usuário (ou IP, para anônimos) tem o seu limite.
+    """
+    sufixo = None
+
+    def __init__(self):
+        self.espera = None
+
+    def get_ident_escopo(self, request):
+        """Identidade contada no limite: o usuário autenticado ou, sem usuário, o IP (None não limita)"""
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return self.get_ident(request)
+
+    def get_taxa(self, view):
+        escopo = getattr(view, 'escopo_throttle', None)
+        if escopo is None:
+            return None, None
+        nome = f'{escopo}_{self.sufixo}' if self.sufixo else escopo
+        return nome, api_settings.DEFAULT_THROTTLE_RATES.get(nome)
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS:
+            return True
+        nome, taxa = self.get_taxa(view)
+        if taxa is None:
+            return True
+        ident = self.get_ident_escopo(request)
+        if ident is None:
+            return True
+
+        limite, duracao = interpretar_taxa(taxa)
+        agora = time.time()
+        janela = int(agora // duracao)
+        decorrido = (agora % duracao) / duracao
+        prefixo = f'throttle:{nome}:{ident}'
+        chave_atual, chave_anterior = f'{prefixo}:{janela}', f'{prefixo}:{janela - 1}'
+
+        armazenamento = obter_armazenamento()
+        # O contador expira depois de servir também como janela anterior
+        atual = armazenamento.incrementar(chave_atual, 2 * duracao)
+        anterior = armazenamento.ler([chave_anterior]).get(chave_anterior, 0)
+        if anterior * (1 - decorrido) + atual > limite:
+            # A requisição recusada não conta no limite
+            armazenamento.decrementar(chave_atual)
+            self.espera = self.calcular_espera(limite, duracao, decorrido, atual - 1, anterior)
+            return False
+        return True
+
+    @staticmethod
+    def calcular_espera(limite, duracao, decorrido, atual, anterior):
+        if atual < limite and anterior:
+            # Momento da janela atual em que o peso da anterior cai o suficiente
+            necessario = 1 - (limite - atual) / anterior
+            return max(0.0, (necessario - decorrido) * duracao)
+        return (1 - decorrido) * duracao
+
+    def wait(self):
+        return self.espera
+
+
+class EscritaUsuarioThrottle(JanelaDeslizanteThrottle):
+    """Limite de escritas por usuário autenticado"""
+    sufixo = 'usuario'
+
+    def get_ident_escopo(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class EscritaIPThrottle(JanelaDeslizanteThrottle):
+    """Limite de escritas por endereço IP, aplicado também a requisições anônimas"""
+    sufixo = 'ip'
+
+    def get_ident_escopo(self, request):
+        return self.get_ident(request)
@@ -38,6 +38,13 @@ urlpatterns = [
     path('api/usuarios/', views_api.UsuarioListCreateAPIView.as_view(), name='usuario-list-create'),
     path('api/usuarios/<int:pk>/', views_api.UsuarioRetrieveUpdateDestroyAPIView.as_view(), name='usuario-detail'),
 
+    # Métricas no formato do Prometheus (apenas administradores)
+    path('api/metricas/', views_api.MetricasAPIView.as_view(), name='metricas'),
+
+    # Perfis de requisições guardados pelo perfilador (apenas administradores)
+    path('api/perfis/', views_api.PerfisAPIView.as_view(), name='perfis'),
+    path('api/perfis/<str:id_perfil>/', views_api.PerfilAPIView.as_view(), name='perfil'),
+
     # URLs dos apps
     path('api/', include('ingrediente.urls')),
     path('api/', include('receita.urls')),
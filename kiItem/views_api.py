@@ -26,6 +26,11 @@ from django.db.models import Q
 from datetime import timedelta
 from random import sample
 from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework.permissions import IsAdminUser
+import os
+from django.http import FileResponse, HttpResponse
+from drf_spectacular.utils import extend_schema
+from . import metricas, perfilador
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
@@ -33,6 +38,7 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 class UsuarioListCreateAPIView(generics.ListCreateAPIView):
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
+    escopo_throttle = 'cadastro'
 
 class UsuarioRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Usuario.objects.all()
@@ -339,7 +345,7 @@ class ReceitasFavoritasAPIView(APIView):
     def get(self, request, id_usuario):
         try:
             # Filtra os favoritos pelo id_usuario
-            favoritos = Favorito.objects.filter(id_usuario=id_usuario).select_related('id_receita')
+            favoritos = Favorito.objects.do_usuario(id_usuario).relacionados_globais('id_receita')
             
             if not favoritos.exists():
                 return Response({"message": "Nenhuma receita favorita encontrada para este usuário."}, status=404)
@@ -384,6 +390,45 @@ class ListaComprasIngredienteRetrieveUpdateDestroyAPIView(generics.RetrieveUpdat
             raise NotFound(detail=f"Erro inesperado: {str(e)}")
 
 
+@extend_schema(exclude=True)
+class MetricasAPIView(APIView):
+    """Métricas de todos os workers no formato texto do Prometheus, apenas para administradores"""
+    permission_classes = [IsAdminUser]
+    # is_staff lido do usuário atual, não do token (ver autenticacao.py)
+    usuario_completo = True
+
+    def get(self, request):
+        return HttpResponse(metricas.exportar(), content_type=metricas.CONTENT_TYPE)
+
+
+@extend_schema(exclude=True)
+class PerfisAPIView(APIView):
+    """Perfis de requisições guardados pelo perfilador, do mais recente para o mais antigo"""
+    permission_classes = [IsAdminUser]
+    # is_staff lido do usuário atual, não do token (ver autenticacao.py)
+    usuario_completo = True
+
+    def get(self, request):
+        return Response(perfilador.listar())
+
+
+@extend_schema(exclude=True)
+class PerfilAPIView(APIView):
+    """Download de um perfil no formato collapsed (flamegraph.pl, speedscope)"""
+    permission_classes = [IsAdminUser]
+    # is_staff lido do usuário atual, não do token (ver autenticacao.py)
+    usuario_completo = True
+
+    def get(self, request, id_perfil):
+        caminho = perfilador.caminho_perfil(id_perfil)
+        if caminho is None or not os.path.isfile(caminho):
+            raise NotFound(detail="Perfil não encontrado.")
+        return FileResponse(
+            open(caminho, 'rb'), as_attachment=True, filename=f'{id_perfil}.collapsed',
+            content_type=perfilador.CONTENT_TYPE
+        )
+
+
 @api_view(['GET'])
 def api_root(request):
     return Response({
@@ -412,12 +457,29 @@ def api_root(request):
             "lista_item": "/lista_itens/<int:pk>/",
             "lista_itens_ingredientes": "/lista_itens_ingredientes/",
             "lista_itens_ingrediente": "/lista_itens_ingredientes/<int:pk>/",
+            "lista_itens_usuario": "/listas_itens/usuario/<int:user_id>/",
+            "lista_itens_usuario_detalhadas": "/listas_itens/usuario/<int:user_id>/detalhadas/",
+            "lista_itens_detalhada": "/listas_itens/<int:pk>/detalhada/",
+            "lista_itens_totais": "/listas_itens/<int:pk>/totais/",
+            "lista_itens_usuario_totais": "/listas_itens/usuario/<int:user_id>/totais/",
+            "lista_itens_eventos": "/listas_itens/<int:pk>/eventos/ [Server-Sent Events]",
+            "lista_itens_ingrediente_toggle_comprado": "/listas_itens_ingredientes/<int:pk>/toggle-comprado/",
+            "lista_itens_marcar_comprados": "/listas_itens/<int:pk>/itens/marcar-comprados/ [POST]",
+            "lista_itens_atualizar_precos": "/listas_itens/<int:pk>/itens/precos/ [PATCH]",
+            "lista_itens_remover_itens": "/listas_itens/<int:pk>/itens/remover/ [POST]",
             "denuncias": "/denuncias/lista/",
             "denuncia": "/denuncias/<uuid:unique_id>/",
             "denuncias_por_receita": "/denuncias/receita/<int:receita_id>/",
             "denuncias_por_usuario": "/denuncias/usuario/<int:usuario_id>/",
             "denuncias_filtrar": "/denuncias/filtrar/",
             "denuncias_estatisticas": "/denuncias/estatisticas/",
+            "denuncias_pendentes": "/denuncias/pendentes/",
+            "denuncias_moderar": "/denuncias/moderar/ [POST]",
+            "denuncias_exportar": "/denuncias/exportar/?formato=csv|ndjson",
+            "denuncia_toggle_status": "/denuncias/<uuid:unique_id>/toggle-status/ [PATCH]",
+            "metricas": "/metricas/ [administradores, formato Prometheus]",
+            "perfis": "/perfis/ [administradores]",
+            "perfil": "/perfis/<id>/ [administradores, formato collapsed]",
             "listas_compras": "/listas_compras/ [DEPRECADO]",
             "lista_compras": "/listas_compras/<int:pk>/ [DEPRECADO]",
             "listas_compras_ingredientes": "/listas_compras_ingredientes/ [DEPRECADO]",
@@ -449,6 +511,9 @@ def api_root(request):
             "denuncias_por_usuario": "/api/denuncias/usuario/<usuario_id>/",
             "filtrar_denuncias": "/api/denuncias/filtrar/",
             "estatisticas_denuncias": "/api/denuncias/estatisticas/",
+            "denuncias_pendentes": "/api/denuncias/pendentes/",
+            "moderar_denuncias": "/api/denuncias/moderar/",
+            "exportar_denuncias": "/api/denuncias/exportar/",
             "descricao": "Sistema completo de denúncias de receitas"
         }
     })
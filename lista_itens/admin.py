@@ -14,6 +14,6 @@ class ListaItensAdmin(admin.ModelAdmin):
 
 @admin.register(ListaItensIngrediente)
 class ListaItensIngredienteAdmin(admin.ModelAdmin):
-    list_display = ['id_lista', 'id_ingrediente', 'quantidade', 'unidade_medida', 'preco']
-    list_filter = ['id_lista', 'id_ingrediente']
+    list_display = ['id_lista', 'id_ingrediente', 'quantidade', 'unidade_medida', 'preco', 'comprado']
+    list_filter = ['id_lista', 'id_ingrediente', 'comprado']
     search_fields = ['id_ingrediente__nome']
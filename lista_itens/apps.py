@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ListaItensConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "lista_itens"
+
+    def ready(self):
+        # Registra os receivers que mantêm o cache de totais atualizado
+        from . import signals  # noqa: F401
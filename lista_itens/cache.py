@@ -0,0 +1,26 @@
+from django.core.cache import cache
+from kiItem.metricas import registrar_cache
+from .models import ListaItensIngrediente
+
+# Totais por lista ficam em cache até que algum item da lista seja alterado
+CHAVE_TOTAIS_LISTA = 'lista_itens:totais:{}'
+TEMPO_CACHE_TOTAIS = 60 * 60
+
+
+def obter_totais_lista(lista_id, using=None):
+    """
+    Retorna os totais de uma lista, calculando no banco (`using`, o shard da lista) apenas quando
+    não estão em cache. Os ids das listas são únicos entre os shards (ver kiItem/shards.py).
+    """
+    chave = CHAVE_TOTAIS_LISTA.format(lista_id)
+    totais = cache.get(chave)
+    registrar_cache('totais_lista', totais is not None)
+    if totais is None:
+        totais = ListaItensIngrediente.objects.using(using).filter(id_lista=lista_id).total_geral()
+        cache.set(chave, totais, TEMPO_CACHE_TOTAIS)
+    return totais
+
+
+def invalidar_totais_lista(*listas_ids):
+    """Remove do cache os totais das listas informadas"""
+    cache.delete_many([CHAVE_TOTAIS_LISTA.format(lista_id) for lista_id in listas_ids])
@@ -0,0 +1,166 @@
+"""
+Broker de eventos em processo para o canal Server-Sent Events das listas de itens.
+
+As alterações dos itens (sinais de ListaItensIngrediente) são publicadas aqui e
+entregues às conexões abertas da mesma lista. Cada conexão ocupa apenas uma fila
+limitada e uma corrotina parada, em vez de uma requisição de polling a cada poucos
+segundos. O broker vive no processo: com vários workers ASGI cada um entrega apenas
+as alterações feitas por ele.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Eventos guardados por lista para reenvio na reconexão (Last-Event-ID)
+TAMANHO_HISTORICO = 100
+# Quantidade máxima de listas com histórico em memória
+MAXIMO_LISTAS_HISTORICO = 1000
+# Eventos pendentes por conexão antes de ela ser encerrada por lentidão
+TAMANHO_BUFFER_CONEXAO = 50
+# Intervalo, em segundos, dos comentários que mantêm a conexão aberta
+INTERVALO_HEARTBEAT = 15
+# Tempo, em milissegundos, que o navegador espera antes de reconectar
+TEMPO_RECONEXAO = 3000
+
+
+class Assinatura:
+    """Conexão aberta de um cliente, com uma fila limitada de eventos"""
+
+    def __init__(self, loop, tamanho_buffer):
+        self.loop = loop
+        self.fila = asyncio.Queue(maxsize=tamanho_buffer)
+        self.encerrada = False
+
+    def notificar(self, evento):
+        """Agenda a entrega do evento no loop da conexão (pode ser chamado de qualquer thread)"""
+        try:
+            self.loop.call_soon_threadsafe(self._entregar, evento)
+        except RuntimeError:
+            # Loop já encerrado: a conexão caiu e será removida pelo gerador
+            self.encerrada = True
+
+    def _entregar(self, evento):
+        if self.encerrada:
+            return
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: encerra a conexão, ele reconecta e recupera o que perdeu pelo histórico
+            self.encerrada = True
+
+
+class BrokerEventos:
+    """Pub/sub em memória com histórico curto por lista"""
+
+    def __init__(self, tamanho_historico=TAMANHO_HISTORICO, tamanho_buffer=TAMANHO_BUFFER_CONEXAO,
+                 maximo_listas=MAXIMO_LISTAS_HISTORICO):
+        self.tamanho_historico = tamanho_historico
+        self.tamanho_buffer = tamanho_buffer
+        self.maximo_listas = maximo_listas
+        self._lock = threading.Lock()
+        self._assinaturas = {}
+        self._historico = OrderedDict()
+        self._ultimo_id = 0
+
+    def _proximo_id(self):
+        # Ids crescentes baseados no relógio, para continuarem válidos após reiniciar o processo
+        self._ultimo_id = max(self._ultimo_id + 1, time.time_ns() // 1000)
+        return self._ultimo_id
+
+    def publicar(self, lista_id, tipo, dados):
+        """Registra o evento no histórico da lista e o entrega às conexões abertas"""
+        with self._lock:
+            evento = {'id': self._proximo_id(), 'tipo': tipo, 'dados': dados}
+            historico = self._historico.get(lista_id)
+            if historico is None:
+                historico = self._historico[lista_id] = deque(maxlen=self.tamanho_historico)
+                if len(self._historico) > self.maximo_listas:
+                    self._historico.popitem(last=False)
+            else:
+                self._historico.move_to_end(lista_id)
+            historico.append(evento)
+            assinaturas = list(self._assinaturas.get(lista_id, ()))
+
+        for assinatura in assinaturas:
+            assinatura.notificar(evento)
+        return evento
+
+    def assinar(self, lista_id, ultimo_id=None):
+        """
+        Abre uma assinatura no loop atual.
+
+        Retorna a assinatura, os eventos posteriores a ultimo_id ainda no histórico e se o
+        cliente precisa recarregar a lista. O histórico só garante a continuidade a partir de um
+        evento que ele ainda guarda: ultimo_id mais antigo que o histórico (eventos descartados),
+        mais novo (publicado por outro worker ou antes de reiniciar o processo) ou de uma lista sem
+        histórico (descartada do LRU) pode ter perdido eventos.
+        """
+        assinatura = Assinatura(asyncio.get_running_loop(), self.tamanho_buffer)
+        with self._lock:
+            self._assinaturas.setdefault(lista_id, set()).add(assinatura)
+            pendentes = []
+            incompleto = False
+            if ultimo_id is not None:
+                historico = self._historico.get(lista_id, ())
+                pendentes = [evento for evento in historico if evento['id'] > ultimo_id]
+                incompleto = not any(evento['id'] == ultimo_id for evento in historico)
+        return assinatura, pendentes, incompleto
+
+    def cancelar(self, lista_id, assinatura):
+        """Remove a assinatura de uma conexão encerrada"""
+        with self._lock:
+            assinaturas = self._assinaturas.get(lista_id)
+            if assinaturas is None:
+                return
+            assinaturas.discard(assinatura)
+            if not assinaturas:
+                del self._assinaturas[lista_id]
+
+    def total_conexoes(self):
+        with self._lock:
+            return sum(len(assinaturas) for assinaturas in self._assinaturas.values())
+
+
+broker = BrokerEventos()
+
+
+def formatar_evento(evento):
+    """Formata um evento no protocolo Server-Sent Events"""
+    dados = json.dumps(evento['dados'], ensure_ascii=False)
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {dados}\n\n"
+
+
+async def fluxo_eventos(lista_id, ultimo_id=None, broker=broker):
+    """Gerador assíncrono com os eventos de uma lista, usado como corpo da resposta SSE"""
+    assinatura, pendentes, incompleto = broker.assinar(lista_id, ultimo_id)
+    try:
+        yield f"retry: {TEMPO_RECONEXAO}\n\n"
+        if incompleto:
+            # O histórico não cobre o que o cliente perdeu: ele deve recarregar a lista
+            yield formatar_evento({'id': ultimo_id, 'tipo': 'sincronizar', 'dados': {'id_lista': lista_id}})
+        for evento in pendentes:
+            yield formatar_evento(evento)
+        while not assinatura.encerrada:
+            try:
+                evento = await asyncio.wait_for(assinatura.fila.get(), INTERVALO_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield formatar_evento(evento)
+    finally:
+        broker.cancelar(lista_id, assinatura)
+
+
+def dados_item(item):
+    """Representação enviada nos eventos de um item da lista"""
+    return {
+        'id': item.id,
+        'id_lista': item.id_lista_id,
+        'id_ingrediente': item.id_ingrediente_id,
+        'quantidade': item.quantidade,
+        'unidade_medida': item.unidade_medida,
+        'preco': None if item.preco is None else str(item.preco),
+        'comprado': item.comprado,
+    }
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lista_itens", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="listaitensingrediente",
+            name="comprado",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingrediente', '0002_alter_ingrediente_options_and_more'),
+        ('lista_itens', '0002_listaitensingrediente_comprado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='listaitens',
+            name='id_usuario',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='listas_itens', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='listaitensingrediente',
+            name='id_ingrediente',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='listas_itens', to='ingrediente.ingrediente'),
+        ),
+    ]
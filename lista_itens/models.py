@@ -1,10 +1,85 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Cast, Coalesce
 from django.contrib.auth.models import User as Usuario
 from ingrediente.models import Ingrediente
+from kiItem.shards import QuerySetPorUsuario, shards
+
+
+def valor_item(prefixo=''):
+    """Expressão preco * quantidade de um item, calculada no banco"""
+    # quantidade é float e preco é decimal: converte para decimal para manter a precisão monetária
+    return F(f'{prefixo}preco') * Cast(f'{prefixo}quantidade', DecimalField(max_digits=12, decimal_places=3))
+
+
+def soma_valores(prefixo=''):
+    """Soma de preco * quantidade, retornando 0 quando não há itens com preço"""
+    return Coalesce(
+        Sum(valor_item(prefixo)),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
+
+
+def formatar_preco(valor):
+    """Formata um total monetário com duas casas decimais, como os campos DecimalField da API"""
+    return str(Decimal(valor or 0).quantize(Decimal('0.01')))
+
+
+class ListaItensQuerySet(QuerySetPorUsuario):
+    def com_totais(self):
+        """Anota cada lista com a quantidade de itens e o preço total, calculados em uma única consulta"""
+        return self.annotate(
+            total_itens=Count('ingredientes'),
+            total_preco=soma_valores('ingredientes__'),
+        )
+
+
+class ListaItensIngredienteQuerySet(QuerySetPorUsuario):
+    def totais_por_lista(self):
+        """Agrupa os itens por lista com a quantidade de itens e o preço total"""
+        return self.values('id_lista').annotate(
+            total_itens=Count('id'),
+            total_preco=soma_valores(),
+        ).order_by('id_lista')
+
+    def totais_por_ingrediente(self):
+        """
+        Agrupa os itens por ingrediente e unidade de medida com a quantidade somada e o preço total.
+        Quantidades em unidades diferentes (500 g e 2 kg) não são somadas entre si.
+        """
+        if self.db in shards()[1:]:
+            # Ingredientes só têm dados em 'default': agrupa no shard e busca os nomes lá
+            linhas = list(self.values('id_ingrediente', 'unidade_medida').annotate(
+                total_itens=Count('id'),
+                quantidade_total=Sum('quantidade'),
+                total_preco=soma_valores(),
+            ).order_by())
+            nomes = dict(Ingrediente.objects.filter(pk__in=[linha['id_ingrediente'] for linha in linhas]).values_list('pk', 'nome'))
+            for linha in linhas:
+                linha['id_ingrediente__nome'] = nomes.get(linha['id_ingrediente'])
+            return sorted(linhas, key=lambda linha: (linha['id_ingrediente__nome'] or '', linha['unidade_medida']))
+        return self.values('id_ingrediente', 'id_ingrediente__nome', 'unidade_medida').annotate(
+            total_itens=Count('id'),
+            quantidade_total=Sum('quantidade'),
+            total_preco=soma_valores(),
+        ).order_by('id_ingrediente__nome', 'unidade_medida')
+
+    def total_geral(self):
+        """Retorna a quantidade de itens e o preço total do conjunto filtrado"""
+        return self.aggregate(
+            total_itens=Count('id'),
+            total_preco=soma_valores(),
+        )
+
 
 class ListaItens(models.Model):
     id = models.AutoField(primary_key=True)
-    id_usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='listas_itens')
+    # Sem restrição no banco: listas podem estar em outro shard (ver kiItem/shards.py)
+    id_usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='listas_itens', db_constraint=False)
+
+    objects = ListaItensQuerySet.as_manager()
 
     def __str__(self):
         return f"Lista de {self.id_usuario.username}"
@@ -16,11 +91,14 @@ class ListaItens(models.Model):
 
 class ListaItensIngrediente(models.Model):
     id = models.AutoField(primary_key=True)
-    id_ingrediente = models.ForeignKey(Ingrediente, on_delete=models.CASCADE, related_name='listas_itens')
+    id_ingrediente = models.ForeignKey(Ingrediente, on_delete=models.CASCADE, related_name='listas_itens', db_constraint=False)
     id_lista = models.ForeignKey(ListaItens, on_delete=models.CASCADE, related_name='ingredientes')
     quantidade = models.FloatField(null=False)
     unidade_medida = models.CharField(max_length=25, null=False)
     preco = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    comprado = models.BooleanField(default=False)
+
+    objects = ListaItensIngredienteQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.id_lista} - {self.id_ingrediente.nome}"
@@ -0,0 +1,91 @@
+"""
+Operações em lote nos itens de uma lista.
+
+Cada operação é um único UPDATE/DELETE restrito à lista (em lotes no caso dos preços),
+sem carregar os itens. Como update() e o DELETE direto não disparam os sinais do
+modelo, o cache de totais e o canal de eventos são atualizados aqui. `using` é o shard
+da lista (shards.shard_do_registro); None deixa a escolha do banco aos routers.
+"""
+from django.db import transaction
+from django.db.models import Case, DecimalField, Value, When
+from .cache import invalidar_totais_lista
+from .eventos import broker, dados_item
+from .models import ListaItensIngrediente
+
+# Quantidade de itens por UPDATE na atualização de preços
+TAMANHO_LOTE = 500
+
+
+def _ao_confirmar(lista_id, tipo, dados, invalidar_totais=False, using=None):
+    """Publica o evento (e invalida os totais) somente após o commit"""
+    def executar():
+        if invalidar_totais:
+            invalidar_totais_lista(lista_id)
+        broker.publicar(lista_id, tipo, dados)
+    transaction.on_commit(executar, using=using)
+
+
+def alternar_comprado(item_id, using=None):
+    """
+    Inverte o campo comprado de um item com um UPDATE atômico, sem leitura prévia.
+    Retorna o item atualizado ou None se ele não existir.
+    """
+    itens = ListaItensIngrediente.objects.db_manager(using)
+    atualizados = itens.filter(pk=item_id).update(
+        comprado=Case(When(comprado=True, then=Value(False)), default=Value(True))
+    )
+    if not atualizados:
+        return None
+    item = itens.get(pk=item_id)
+    _ao_confirmar(item.id_lista_id, 'item_marcado', dados_item(item), using=using)
+    return item
+
+
+def marcar_comprados(lista_id, ids=None, comprado=True, using=None):
+    """Marca todos os itens da lista (ou apenas os ids informados) como comprados ou não"""
+    itens = ListaItensIngrediente.objects.using(using).filter(id_lista=lista_id)
+    if ids is not None:
+        itens = itens.filter(id__in=ids)
+    atualizados = itens.update(comprado=comprado)
+    if atualizados:
+        _ao_confirmar(lista_id, 'itens_marcados', {'id_lista': lista_id, 'ids': ids, 'comprado': comprado}, using=using)
+    return atualizados
+
+
+def atualizar_precos(lista_id, precos, using=None):
+    """
+    Atualiza o preço de vários itens da lista a partir de um dicionário {id_item: preco},
+    com um UPDATE ... CASE por lote restrito aos itens da própria lista.
+    """
+    ids = list(precos)
+    atualizados = 0
+    with transaction.atomic(using=using):
+        for inicio in range(0, len(ids), TAMANHO_LOTE):
+            lote = ids[inicio:inicio + TAMANHO_LOTE]
+            atualizados += ListaItensIngrediente.objects.using(using).filter(id_lista=lista_id, id__in=lote).update(
+                preco=Case(
+                    *[When(id=item_id, then=Value(precos[item_id])) for item_id in lote],
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                )
+            )
+        if atualizados:
+            dados = {
+                'id_lista': lista_id,
+                'precos': {str(item_id): None if preco is None else str(preco) for item_id, preco in precos.items()},
+            }
+            _ao_confirmar(lista_id, 'itens_atualizados', dados, invalidar_totais=True, using=using)
+    return atualizados
+
+
+def remover_itens(lista_id, ids, using=None):
+    """Remove os itens informados da lista com um único DELETE"""
+    itens = ListaItensIngrediente.objects.using(using).filter(id_lista=lista_id, id__in=ids)
+    # QuerySet._raw_delete é interno do Django: um DELETE ... WHERE sem o coletor. delete() faria
+    # um SELECT dos itens só para disparar post_delete por item (ver signals.py), cujo efeito
+    # (totais e evento) é reproduzido abaixo para o lote todo. É seguro porque nenhum modelo
+    # referencia ListaItensIngrediente (não há cascata a resolver); os testes em
+    # lista_itens/tests.py falham se isso mudar ou se o método deixar de existir.
+    removidos = itens._raw_delete(itens.db)
+    if removidos:
+        _ao_confirmar(lista_id, 'itens_removidos', {'id_lista': lista_id, 'ids': ids}, invalidar_totais=True, using=using)
+    return removidos
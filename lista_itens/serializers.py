@@ -1,9 +1,14 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User as Usuario
-from .models import ListaItens, ListaItensIngrediente
+from .models import ListaItens, ListaItensIngrediente, formatar_preco
+from .cache import obter_totais_lista
 
 # Serializer para o modelo ListaItens (mantendo compatibilidade com ListaCompras)
 class ListaItensSerializer(serializers.ModelSerializer):
+    # Totais calculados no banco: anotados na listagem ou lidos do cache no detalhe
+    total_itens = serializers.SerializerMethodField()
+    total_preco = serializers.SerializerMethodField()
+
     class Meta:
         model = ListaItens
         fields = '__all__'
@@ -12,6 +17,18 @@ class ListaItensSerializer(serializers.ModelSerializer):
             'id_usuario': {'required': True}  # Campo obrigatório
         }
 
+    def get_totais(self, obj):
+        """Usa os totais anotados pela queryset ou, na falta deles, o cache da lista"""
+        if hasattr(obj, 'total_preco'):
+            return {'total_itens': obj.total_itens, 'total_preco': obj.total_preco}
+        return obter_totais_lista(obj.pk)
+
+    def get_total_itens(self, obj):
+        return self.get_totais(obj)['total_itens']
+
+    def get_total_preco(self, obj):
+        return formatar_preco(self.get_totais(obj)['total_preco'])
+
 # Serializer para o modelo ListaItensIngrediente (mantendo compatibilidade com ListaComprasIngrediente)
 class ListaItensIngredienteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -42,6 +59,40 @@ class ListaItensIngredienteSerializer(serializers.ModelSerializer):
             }
         }
 
+# Serializers de entrada para as operações em lote nos itens de uma lista
+class MarcarCompradosSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False,
+        max_length=1000,
+        help_text='IDs dos itens. Se omitido, todos os itens da lista são marcados.'
+    )
+    comprado = serializers.BooleanField(default=True)
+
+
+class PrecoItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    preco = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        allow_null=True,
+        error_messages={'invalid': 'O preço deve ser um número decimal válido.'}
+    )
+
+
+class AtualizarPrecosSerializer(serializers.Serializer):
+    itens = serializers.ListField(child=PrecoItemSerializer(), allow_empty=False, max_length=1000)
+
+
+class RemoverItensSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=1000,
+        error_messages={'required': 'Informe os IDs dos itens a remover.'}
+    )
+
 # Aliases para manter compatibilidade com nomenclatura antiga
 ListaComprasSerializer = ListaItensSerializer
 ListaComprasIngredienteSerializer = ListaItensIngredienteSerializer
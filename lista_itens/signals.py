@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import invalidar_totais_lista
+from .eventos import broker, dados_item
+from .models import ListaItensIngrediente
+
+
+@receiver(post_save, sender=ListaItensIngrediente)
+@receiver(post_delete, sender=ListaItensIngrediente)
+def invalidar_totais_ao_alterar_item(sender, instance, **kwargs):
+    """Invalida o cache de totais da lista depois que a alteração do item for confirmada"""
+    lista_id = instance.id_lista_id
+    transaction.on_commit(lambda: invalidar_totais_lista(lista_id))
+
+
+@receiver(post_save, sender=ListaItensIngrediente)
+def publicar_item_salvo(sender, instance, created, update_fields=None, **kwargs):
+    """Publica no canal SSE da lista a inclusão, alteração ou marcação de um item"""
+    if created:
+        tipo = 'item_adicionado'
+    elif update_fields and set(update_fields) == {'comprado'}:
+        tipo = 'item_marcado'
+    else:
+        tipo = 'item_atualizado'
+    lista_id = instance.id_lista_id
+    dados = dados_item(instance)
+    transaction.on_commit(lambda: broker.publicar(lista_id, tipo, dados))
+
+
+@receiver(post_delete, sender=ListaItensIngrediente)
+def publicar_item_removido(sender, instance, **kwargs):
+    """Publica no canal SSE da lista a remoção de um item"""
+    lista_id = instance.id_lista_id
+    dados = {'id': instance.id, 'id_lista': lista_id}
+    transaction.on_commit(lambda: broker.publicar(lista_id, 'item_removido', dados))
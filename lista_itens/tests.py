@@ -1,3 +1,156 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from ingrediente.models import Ingrediente
+from . import eventos, operacoes
+from .cache import obter_totais_lista
+from .models import ListaItens, ListaItensIngrediente
 
-# Create your tests here.
+
+class TotaisListaTests(TestCase):
+    """Totais das listas: agrupados por ingrediente e unidade, com cache invalidado pelos itens"""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create(username='dono', email='dono@kitem.com')
+        self.lista = ListaItens.objects.create(id_usuario=self.usuario)
+        farinha = Ingrediente.objects.create(nome='Farinha')
+        self.item = self.criar_item(self.lista, farinha, 500, 'g', '0.01')
+        self.criar_item(self.lista, Ingrediente.objects.create(nome='Açúcar'), 1, 'kg', '4.00')
+        # Mesmo ingrediente em outras listas do usuário, em gramas e em quilos
+        self.criar_item(ListaItens.objects.create(id_usuario=self.usuario), farinha, 250, 'g', '0.01')
+        self.criar_item(ListaItens.objects.create(id_usuario=self.usuario), farinha, 2, 'kg', '6.00')
+
+    def criar_item(self, lista, ingrediente, quantidade, unidade, preco):
+        return ListaItensIngrediente.objects.create(
+            id_lista=lista, id_ingrediente=ingrediente, quantidade=quantidade, unidade_medida=unidade, preco=Decimal(preco)
+        )
+
+    def test_totais_por_ingrediente_separam_as_unidades(self):
+        resposta = self.client.get(f'/api/listas_itens/usuario/{self.usuario.pk}/totais/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(
+            [(linha['nome_ingrediente'], linha['unidade_medida'], linha['quantidade_total'], linha['total_preco'])
+             for linha in resposta.json()['por_ingrediente']],
+            [('Açúcar', 'kg', 1, '4.00'), ('Farinha', 'g', 750, '7.50'), ('Farinha', 'kg', 2, '12.00')]
+        )
+
+    def test_cache_dos_totais_invalidado_ao_salvar_e_excluir_item(self):
+        self.assertEqual(obter_totais_lista(self.lista.pk), {'total_itens': 2, 'total_preco': Decimal('9.00')})
+        with self.assertNumQueries(0):
+            obter_totais_lista(self.lista.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.preco = Decimal('0.02')
+            self.item.save()
+        self.assertEqual(obter_totais_lista(self.lista.pk)['total_preco'], Decimal('14.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.delete()
+        self.assertEqual(obter_totais_lista(self.lista.pk), {'total_itens': 1, 'total_preco': Decimal('4.00')})
+
+
+class OperacoesListaTests(TestCase):
+    """Operações em lote nos itens: restritas à lista, em lotes, com os totais invalidados"""
+
+    def setUp(self):
+        cache.clear()
+        usuario = User.objects.create(username='dono', email='dono@kitem.com')
+        self.lista = ListaItens.objects.create(id_usuario=usuario)
+        self.outra = ListaItens.objects.create(id_usuario=usuario)
+        self.itens = [self.criar_item(self.lista, numero) for numero in range(5)]
+        self.alheio = self.criar_item(self.outra, 9)
+
+    def criar_item(self, lista, numero):
+        ingrediente = Ingrediente.objects.create(nome=f'Ingrediente {lista.pk}-{numero}')
+        return ListaItensIngrediente.objects.create(
+            id_lista=lista, id_ingrediente=ingrediente, quantidade=1, unidade_medida='un', preco=Decimal('1.00')
+        )
+
+    def test_alternar_comprado(self):
+        item = self.itens[0]
+        with mock.patch.object(operacoes.broker, 'publicar') as publicar, self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(operacoes.alternar_comprado(item.pk).comprado)
+            self.assertFalse(operacoes.alternar_comprado(item.pk).comprado)
+            self.assertIsNone(operacoes.alternar_comprado(999999))
+        self.assertEqual([chamada.args[:2] for chamada in publicar.call_args_list], [(self.lista.pk, 'item_marcado')] * 2)
+        self.alheio.refresh_from_db()
+        self.assertFalse(self.alheio.comprado)
+
+    def test_atualizar_precos_em_lotes_apenas_da_lista(self):
+        self.assertEqual(obter_totais_lista(self.lista.pk)['total_preco'], Decimal('5.00'))
+        precos = {item.pk: Decimal('2.00') for item in self.itens}
+        precos[self.alheio.pk] = Decimal('50.00')
+        with mock.patch.object(operacoes, 'TAMANHO_LOTE', 2), self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as consultas:
+                atualizados = operacoes.atualizar_precos(self.lista.pk, precos)
+        self.assertEqual(atualizados, 5)
+        self.assertEqual(sum(consulta['sql'].startswith('UPDATE') for consulta in consultas.captured_queries), 3)
+        self.alheio.refresh_from_db()
+        self.assertEqual(self.alheio.preco, Decimal('1.00'))
+        self.assertEqual(obter_totais_lista(self.lista.pk)['total_preco'], Decimal('10.00'))
+
+    def test_remover_itens_apenas_da_lista_com_um_delete(self):
+        self.assertEqual(obter_totais_lista(self.lista.pk)['total_itens'], 5)
+        ids = [self.itens[0].pk, self.itens[1].pk, self.alheio.pk]
+        with mock.patch.object(operacoes.broker, 'publicar') as publicar, self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as consultas:
+                removidos = operacoes.remover_itens(self.lista.pk, ids)
+        self.assertEqual(removidos, 2)
+        self.assertEqual([consulta['sql'].split()[0] for consulta in consultas.captured_queries], ['DELETE'])
+        self.assertTrue(ListaItensIngrediente.objects.filter(pk=self.alheio.pk).exists())
+        self.assertEqual(obter_totais_lista(self.lista.pk)['total_itens'], 3)
+        publicar.assert_called_once_with(self.lista.pk, 'itens_removidos', {'id_lista': self.lista.pk, 'ids': ids})
+
+    def test_remover_itens_sem_cascata_a_resolver(self):
+        # O DELETE direto de remover_itens só é seguro enquanto nenhum modelo referenciar os itens
+        relacoes = [campo for campo in ListaItensIngrediente._meta.get_fields() if campo.auto_created and not campo.concrete]
+        self.assertEqual(relacoes, [])
+        self.assertTrue(callable(getattr(ListaItensIngrediente.objects.all(), '_raw_delete', None)))
+
+
+class BrokerEventosTests(SimpleTestCase):
+    """Reenvio do histórico na reconexão (Last-Event-ID) e pedido de sincronização quando há lacuna"""
+
+    async def assinar(self, broker, lista_id, ultimo_id):
+        assinatura, pendentes, incompleto = broker.assinar(lista_id, ultimo_id)
+        broker.cancelar(lista_id, assinatura)
+        return [evento['id'] for evento in pendentes], incompleto
+
+    def publicar(self, broker, lista_id, quantidade=1):
+        return [broker.publicar(lista_id, 'item_atualizado', {'numero': numero})['id'] for numero in range(quantidade)]
+
+    async def test_reenvia_os_eventos_posteriores_ao_ultimo_recebido(self):
+        broker = eventos.BrokerEventos(tamanho_historico=5)
+        ids = self.publicar(broker, 1, 3)
+        self.assertEqual(await self.assinar(broker, 1, ids[0]), (ids[1:], False))
+        self.assertEqual(await self.assinar(broker, 1, ids[-1]), ([], False))
+        # Conexão nova, sem Last-Event-ID: nada a reenviar nem a sincronizar
+        self.assertEqual(await self.assinar(broker, 1, None), ([], False))
+
+    async def test_lacuna_no_historico_pede_sincronizacao(self):
+        broker = eventos.BrokerEventos(tamanho_historico=2)
+        ids = self.publicar(broker, 1, 4)
+        # Os eventos seguintes ao último recebido já saíram do histórico
+        self.assertEqual(await self.assinar(broker, 1, ids[0]), (ids[2:], True))
+        # Id mais novo que o histórico: publicado por outro worker ou antes de reiniciar o processo
+        self.assertEqual(await self.assinar(broker, 1, ids[-1] + 1), ([], True))
+
+    async def test_lista_sem_historico_pede_sincronizacao(self):
+        broker = eventos.BrokerEventos(maximo_listas=2)
+        [primeiro] = self.publicar(broker, 1)
+        self.publicar(broker, 2)
+        self.publicar(broker, 3)
+        # A lista 1 saiu do LRU; a lista 9 nunca teve eventos neste processo
+        self.assertEqual(await self.assinar(broker, 1, primeiro), ([], True))
+        self.assertEqual(await self.assinar(broker, 9, primeiro), ([], True))
+
+    async def test_fluxo_envia_sincronizar_antes_dos_eventos(self):
+        fluxo = eventos.fluxo_eventos(1, 123, broker=eventos.BrokerEventos())
+        self.assertTrue((await anext(fluxo)).startswith('retry:'))
+        self.assertIn('event: sincronizar', await anext(fluxo))
+        await fluxo.aclose()
@@ -15,10 +15,26 @@ urlpatterns = [
     # URLs para Lista de Itens (novo nome)
     path('listas_itens/', views_api.ListaItensListCreateAPIView.as_view(), name='lista-itens-list-create'),
     path('listas_itens/<int:pk>/', views_api.ListaItensRetrieveUpdateDestroyAPIView.as_view(), name='lista-itens-detail'),
+    path('listas_itens/usuario/<int:user_id>/', views_api.GetListaItensUsuario.as_view(), name='lista-itens-por-usuario'),
+    path('listas_itens/usuario/<int:user_id>/detalhadas/', views_api.ListaItensUsuarioDetalhadasAPIView.as_view(), name='lista-itens-usuario-detalhadas'),
+    path('listas_itens/<int:pk>/detalhada/', views_api.ListaItensDetalhadaAPIView.as_view(), name='lista-itens-detalhada'),
+
+    # URLs para totais de preço das listas
+    path('listas_itens/<int:pk>/totais/', views_api.ListaItensTotaisAPIView.as_view(), name='lista-itens-totais'),
+    path('listas_itens/usuario/<int:user_id>/totais/', views_api.ListaItensUsuarioTotaisAPIView.as_view(), name='lista-itens-usuario-totais'),
+
+    # URLs para operações em lote nos itens de uma lista
+    path('listas_itens/<int:pk>/itens/marcar-comprados/', views_api.ListaItensMarcarCompradosAPIView.as_view(), name='lista-itens-marcar-comprados'),
+    path('listas_itens/<int:pk>/itens/precos/', views_api.ListaItensAtualizarPrecosAPIView.as_view(), name='lista-itens-atualizar-precos'),
+    path('listas_itens/<int:pk>/itens/remover/', views_api.ListaItensRemoverItensAPIView.as_view(), name='lista-itens-remover-itens'),
+
+    # URL do canal Server-Sent Events com as alterações dos itens de uma lista (ASGI)
+    path('listas_itens/<int:pk>/eventos/', views_api.lista_itens_eventos, name='lista-itens-eventos'),
 
     # URLs para ListaItensIngrediente (novo nome)
     path('listas_itens_ingredientes/', views_api.ListaItensIngredienteListCreateAPIView.as_view(), name='lista-itens-ingrediente-list-create'),
     path('listas_itens_ingredientes/<int:pk>/', views_api.ListaItensIngredienteRetrieveUpdateDestroyAPIView.as_view(), name='lista-itens-ingrediente-detail'),
+    path('listas_itens_ingredientes/<int:pk>/toggle-comprado/', views_api.ListaItensIngredienteToggleCompradoAPIView.as_view(), name='lista-itens-ingrediente-toggle-comprado'),
 
     # URLs para Lista de Compras (compatibilidade com nome antigo)
     path('listas_compras/', views_api.ListaComprasListCreateAPIView.as_view(), name='lista-compras-list-create'),
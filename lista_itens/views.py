@@ -1,13 +1,14 @@
 from rest_framework import viewsets
 from rest_framework.response import Response
+from kiItem.shards import RegistroNoShardMixin
 from .models import ListaItens, ListaItensIngrediente
 from .serializers import ListaItensSerializer, ListaItensIngredienteSerializer
 
-class ListaItensViewSet(viewsets.ModelViewSet):
+class ListaItensViewSet(RegistroNoShardMixin, viewsets.ModelViewSet):
     """
     ViewSet para operações CRUD em listas de itens.
     """
-    queryset = ListaItens.objects.all()
+    queryset = ListaItens.objects.com_totais()
     serializer_class = ListaItensSerializer
     
     def destroy(self, request, *args, **kwargs):
@@ -20,7 +21,7 @@ class ListaItensViewSet(viewsets.ModelViewSet):
         )
 
 
-class ListaItensIngredienteViewSet(viewsets.ModelViewSet):
+class ListaItensIngredienteViewSet(RegistroNoShardMixin, viewsets.ModelViewSet):
     """
     ViewSet para operações CRUD completas em ingredientes das listas.
     """
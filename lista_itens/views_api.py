@@ -3,12 +3,28 @@ from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework.views import APIView
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.exceptions import ValidationError
-from django.db.models import Q
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch, Q
+from django.http import JsonResponse, StreamingHttpResponse
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiResponse
 from drf_spectacular.types import OpenApiTypes
-from .models import ListaItens, ListaItensIngrediente
-from kiItem.serializers import ListaItensSerializer, ListaItensIngredienteSerializer
+from .models import ListaItens, ListaItensIngrediente, formatar_preco
+from .cache import obter_totais_lista
+from .eventos import fluxo_eventos
+from .operacoes import alternar_comprado, atualizar_precos, marcar_comprados, remover_itens
+from .serializers import AtualizarPrecosSerializer, MarcarCompradosSerializer, RemoverItensSerializer
+from kiItem import shards
+from kiItem.serializers import ListaItensSerializer, ListaItensIngredienteSerializer, ListaItensDetalhadaSerializer
+
+
+def banco_da_lista(pk):
+    """Shard da lista `pk` (None sem shards: o banco fica a cargo dos routers); 404 se ela não existe"""
+    banco = shards.shard_do_registro(ListaItens, pk)
+    if not ListaItens.objects.using(banco).filter(pk=pk).exists():
+        raise NotFound(detail="Lista de itens não encontrada.")
+    return banco
 
 @api_view(['GET'])
 def api_root(request, format=None):
@@ -18,6 +34,10 @@ def api_root(request, format=None):
     return Response({
         'lista_itens': request.build_absolute_uri('/api/lista_itens/'),
         'lista_itens_ingredientes': request.build_absolute_uri('/api/lista_itens_ingredientes/'),
+        'lista_itens_totais': request.build_absolute_uri('/api/listas_itens/{pk}/totais/'),
+        'lista_itens_usuario_totais': request.build_absolute_uri('/api/listas_itens/usuario/{user_id}/totais/'),
+        'lista_itens_usuario_detalhadas': request.build_absolute_uri('/api/listas_itens/usuario/{user_id}/detalhadas/'),
+        'lista_itens_eventos': request.build_absolute_uri('/api/listas_itens/{pk}/eventos/'),
         # Mantendo compatibilidade com nomes antigos
         'listas_compras': request.build_absolute_uri('/api/listas_compras/'),
         'listas_compras_ingredientes': request.build_absolute_uri('/api/listas_compras_ingredientes/'),
@@ -37,7 +57,7 @@ def api_root(request, format=None):
     )
 )
 class ListaItensListCreateAPIView(generics.ListCreateAPIView):
-    queryset = ListaItens.objects.all()
+    queryset = ListaItens.objects.com_totais()
     serializer_class = ListaItensSerializer
 
 @extend_schema_view(
@@ -72,7 +92,7 @@ class ListaItensRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateAPIView):
     
     def get_object(self):
         try:
-            return ListaItens.objects.get(pk=self.kwargs['pk'])
+            return ListaItens.objects.do_registro(self.kwargs['pk']).get()
         except ListaItens.DoesNotExist:
             raise NotFound(detail="Lista de itens não encontrada.")
         except Exception as e:
@@ -105,7 +125,7 @@ class GetListaItensUsuario(generics.ListAPIView):
 
     def get_queryset(self):
         user_id = self.kwargs['user_id']  # Pega o valor <user_id> da URL
-        return ListaItens.objects.filter(id_usuario=user_id)
+        return ListaItens.objects.do_usuario(user_id).com_totais()
 
 @extend_schema(
     tags=['listas'],
@@ -123,26 +143,29 @@ class GetListaItensUsuario(generics.ListAPIView):
 class ListaItensDetalhadaAPIView(APIView):
     def get(self, request, pk):
         try:
-            lista = ListaItens.objects.get(pk=pk)
-            ingredientes = ListaItensIngrediente.objects.filter(id_lista_itens=lista).select_related('id_ingrediente')
+            lista = ListaItens.objects.do_registro(pk).get()
+            ingredientes = list(
+                ListaItensIngrediente.objects.using(lista._state.db).filter(id_lista=lista)
+                .relacionados_globais('id_ingrediente').order_by('id')
+            )
 
             data = {
                 "id_lista": lista.id,
-                "nome": lista.nome,
-                "data_criacao": lista.data_criacao,
-                "id_usuario": lista.id_usuario.id if lista.id_usuario else None,
+                "id_usuario": lista.id_usuario_id,
                 "ingredientes": [
                     {
                         "id_lista_ingrediente": ingrediente.id,
                         "quantidade": ingrediente.quantidade,
                         "unidade_medida": ingrediente.unidade_medida,
+                        "preco": None if ingrediente.preco is None else str(ingrediente.preco),
                         "nome_ingrediente": ingrediente.id_ingrediente.nome,
                         "comprado": ingrediente.comprado,
                     }
                     for ingrediente in ingredientes
                 ],
-                "total_ingredientes": ingredientes.count(),
-                "ingredientes_comprados": ingredientes.filter(comprado=True).count(),
+                # Contagens feitas sobre os itens já carregados, sem novas consultas
+                "total_ingredientes": len(ingredientes),
+                "ingredientes_comprados": sum(1 for ingrediente in ingredientes if ingrediente.comprado),
             }
 
             return Response(data)
@@ -150,6 +173,127 @@ class ListaItensDetalhadaAPIView(APIView):
         except ListaItens.DoesNotExist:
             raise NotFound(detail="Lista de itens não encontrada.")
 
+class PaginacaoListasItens(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'tamanho'
+    max_page_size = 100
+
+@extend_schema(
+    tags=['listas'],
+    summary="Listar listas de um usuário com seus itens",
+    description="Retorna, paginadas, todas as listas de itens de um usuário com os itens, nomes dos ingredientes e totais. "
+                "Custo fixo de três consultas (contagem, listas da página e itens), independente da quantidade de listas.",
+    parameters=[
+        OpenApiParameter(
+            name='user_id',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.PATH,
+            description='ID do usuário'
+        ),
+        OpenApiParameter(name='page', type=OpenApiTypes.INT, description='Número da página'),
+        OpenApiParameter(name='tamanho', type=OpenApiTypes.INT, description='Listas por página (máximo 100)'),
+    ]
+)
+class ListaItensUsuarioDetalhadasAPIView(generics.ListAPIView):
+    serializer_class = ListaItensDetalhadaSerializer
+    pagination_class = PaginacaoListasItens
+
+    def get_queryset(self):
+        user_id = self.kwargs['user_id']
+        listas = ListaItens.objects.do_usuario(user_id)
+        itens = ListaItensIngrediente.objects.using(listas.db).relacionados_globais('id_ingrediente').order_by('id')
+        return (
+            listas
+            .com_totais()
+            .order_by('id')
+            .prefetch_related(Prefetch('ingredientes', queryset=itens))
+        )
+
+@extend_schema(
+    tags=['listas'],
+    summary="Obter totais de preço de uma lista de itens",
+    description="Retorna o preço total (preço x quantidade) de uma lista e os totais agrupados por ingrediente e unidade de medida, calculados no banco.",
+    parameters=[
+        OpenApiParameter(
+            name='pk',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.PATH,
+            description='ID da lista de itens'
+        )
+    ]
+)
+class ListaItensTotaisAPIView(APIView):
+    """
+    Endpoint para obter os totais de preço de uma lista de itens.
+    """
+    def get(self, request, pk):
+        banco = banco_da_lista(pk)
+        totais = obter_totais_lista(pk, using=banco)
+        por_ingrediente = ListaItensIngrediente.objects.using(banco).filter(id_lista=pk).totais_por_ingrediente()
+
+        return Response({
+            "id_lista": pk,
+            "total_itens": totais['total_itens'],
+            "total_preco": formatar_preco(totais['total_preco']),
+            "por_ingrediente": [
+                {
+                    "id_ingrediente": item['id_ingrediente'],
+                    "nome_ingrediente": item['id_ingrediente__nome'],
+                    "unidade_medida": item['unidade_medida'],
+                    "quantidade_total": item['quantidade_total'],
+                    "total_preco": formatar_preco(item['total_preco']),
+                }
+                for item in por_ingrediente
+            ],
+        })
+
+@extend_schema(
+    tags=['listas'],
+    summary="Obter resumo de preços das listas de um usuário",
+    description="Retorna o preço total de todas as listas de um usuário, agrupado por lista e por par ingrediente/unidade de medida.",
+    parameters=[
+        OpenApiParameter(
+            name='user_id',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.PATH,
+            description='ID do usuário'
+        )
+    ]
+)
+class ListaItensUsuarioTotaisAPIView(APIView):
+    """
+    Endpoint para obter o resumo de preços de todas as listas de um usuário.
+    """
+    def get(self, request, user_id):
+        itens = ListaItensIngrediente.objects.do_usuario(user_id)
+        totais = itens.total_geral()
+        por_lista = ListaItens.objects.do_usuario(user_id).com_totais().order_by('id')
+        por_ingrediente = itens.totais_por_ingrediente()
+
+        return Response({
+            "user_id": user_id,
+            "total_itens": totais['total_itens'],
+            "total_preco": formatar_preco(totais['total_preco']),
+            "por_lista": [
+                {
+                    "id_lista": lista.id,
+                    "total_itens": lista.total_itens,
+                    "total_preco": formatar_preco(lista.total_preco),
+                }
+                for lista in por_lista
+            ],
+            "por_ingrediente": [
+                {
+                    "id_ingrediente": item['id_ingrediente'],
+                    "nome_ingrediente": item['id_ingrediente__nome'],
+                    "unidade_medida": item['unidade_medida'],
+                    "quantidade_total": item['quantidade_total'],
+                    "total_preco": formatar_preco(item['total_preco']),
+                }
+                for item in por_ingrediente
+            ],
+        })
+
 class ListaItensFilterAPIView(APIView):
     """
     Endpoint para filtrar listas de itens com base em nome e status.
@@ -174,7 +318,7 @@ class ListaItensFilterAPIView(APIView):
 
         # Consulta ao banco de dados
         try:
-            listas = ListaItens.objects.filter(filtros)
+            listas = ListaItens.objects.do_usuario(user_id).filter(filtros)
             
             # Filtro por status de compra
             if status_compra:
@@ -208,7 +352,7 @@ class ListaItensStatusAPIView(APIView):
     """
     def get(self, request, user_id):
         try:
-            listas = ListaItens.objects.filter(id_usuario=user_id)
+            listas = ListaItens.objects.do_usuario(user_id)
             
             total_listas = listas.count()
             listas_completas = 0
@@ -250,7 +394,7 @@ class ListaItensIngredienteRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateD
     serializer_class = ListaItensIngredienteSerializer
     def get_object(self):
         try:
-            return ListaItensIngrediente.objects.get(pk=self.kwargs['pk'])
+            return ListaItensIngrediente.objects.do_registro(self.kwargs['pk']).get()
         except ListaItensIngrediente.DoesNotExist:
             raise NotFound(detail="Lista Itens Ingrediente não encontrado.")
         except Exception as e:
@@ -262,21 +406,101 @@ class ListaItensIngredienteToggleCompradoAPIView(APIView):
     """
     def patch(self, request, pk):
         try:
-            ingrediente = ListaItensIngrediente.objects.get(pk=pk)
-            ingrediente.comprado = not ingrediente.comprado
-            ingrediente.save()
-            
-            serializer = ListaItensIngredienteSerializer(ingrediente)
-            return Response({
-                "message": f"Ingrediente {'marcado como comprado' if ingrediente.comprado else 'desmarcado'}.",
-                "ingrediente": serializer.data
-            })
-            
-        except ListaItensIngrediente.DoesNotExist:
-            raise NotFound(detail="Ingrediente não encontrado.")
+            # UPDATE atômico, sem ler o item antes de inverter o campo
+            ingrediente = alternar_comprado(pk, using=shards.shard_do_registro(ListaItensIngrediente, pk))
         except Exception as e:
             return Response({"error": f"Erro ao atualizar ingrediente: {str(e)}"}, status=500)
 
+        if ingrediente is None:
+            raise NotFound(detail="Ingrediente não encontrado.")
+
+        serializer = ListaItensIngredienteSerializer(ingrediente)
+        return Response({
+            "message": f"Ingrediente {'marcado como comprado' if ingrediente.comprado else 'desmarcado'}.",
+            "ingrediente": serializer.data
+        })
+
+# Views para operações em lote nos itens de uma lista
+@extend_schema(
+    tags=['listas'],
+    summary="Marcar itens da lista como comprados",
+    description="Marca todos os itens da lista (ou apenas os IDs informados) como comprados ou não comprados com um único UPDATE.",
+    request=MarcarCompradosSerializer
+)
+class ListaItensMarcarCompradosAPIView(APIView):
+    def post(self, request, pk):
+        banco = banco_da_lista(pk)
+        serializer = MarcarCompradosSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        comprado = serializer.validated_data['comprado']
+
+        atualizados = marcar_comprados(pk, serializer.validated_data.get('ids'), comprado, using=banco)
+        return Response({
+            "message": f"{atualizados} itens {'marcados como comprados' if comprado else 'desmarcados'}.",
+            "itens_atualizados": atualizados
+        })
+
+@extend_schema(
+    tags=['listas'],
+    summary="Atualizar preços de itens da lista em lote",
+    description="Atualiza o preço de vários itens da lista em lotes de UPDATE, ignorando IDs que não pertencem à lista.",
+    request=AtualizarPrecosSerializer
+)
+class ListaItensAtualizarPrecosAPIView(APIView):
+    def patch(self, request, pk):
+        banco = banco_da_lista(pk)
+        serializer = AtualizarPrecosSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        precos = {item['id']: item['preco'] for item in serializer.validated_data['itens']}
+
+        atualizados = atualizar_precos(pk, precos, using=banco)
+        return Response({
+            "message": f"Preço de {atualizados} itens atualizado.",
+            "itens_atualizados": atualizados
+        })
+
+@extend_schema(
+    tags=['listas'],
+    summary="Remover itens da lista em lote",
+    description="Remove os itens informados da lista com um único DELETE.",
+    request=RemoverItensSerializer
+)
+class ListaItensRemoverItensAPIView(APIView):
+    def post(self, request, pk):
+        banco = banco_da_lista(pk)
+        serializer = RemoverItensSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        removidos = remover_itens(pk, serializer.validated_data['ids'], using=banco)
+        return Response({
+            "message": f"{removidos} itens removidos da lista.",
+            "itens_removidos": removidos
+        })
+
+# Views assíncronas (servidas via ASGI)
+async def lista_itens_eventos(request, pk):
+    """
+    Canal Server-Sent Events com as alterações dos itens de uma lista
+    (item_adicionado, item_atualizado, item_marcado e item_removido).
+    Na reconexão o navegador envia Last-Event-ID e recebe os eventos perdidos.
+    """
+    # Sem shards não há o que localizar: evita a ida a uma thread para shard_do_registro
+    banco = await sync_to_async(shards.shard_do_registro)(ListaItens, pk) if shards.distribuido() else None
+    if not await ListaItens.objects.using(banco).filter(pk=pk).aexists():
+        return JsonResponse({"detail": "Lista de itens não encontrada."}, status=404)
+
+    ultimo_id = request.headers.get('Last-Event-ID') or request.GET.get('ultimo_id')
+    try:
+        ultimo_id = int(ultimo_id) if ultimo_id else None
+    except ValueError:
+        # Id que o broker não reconhece: o cliente recebe o evento sincronizar
+        ultimo_id = 0
+
+    response = StreamingHttpResponse(fluxo_eventos(pk, ultimo_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Evita que o proxy acumule os eventos
+    return response
+
 # Views para compatibilidade com nomenclatura anterior (lista_compras)
 class ListaComprasListCreateAPIView(ListaItensListCreateAPIView):
     """Alias para compatibilidade com API anterior"""
@@ -292,7 +516,7 @@ class ListaComprasRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateAPIView):
     
     def get_object(self):
         try:
-            return ListaItens.objects.get(pk=self.kwargs['pk'])
+            return ListaItens.objects.do_registro(self.kwargs['pk']).get()
         except ListaItens.DoesNotExist:
             raise NotFound(detail="Lista de itens não encontrada.")
         except Exception as e:
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("receita", "0002_receita_categoria"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="receita",
+            name="denuncias_pendentes",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="receita",
+            name="oculta",
+            field=models.BooleanField(default=False, help_text="Receita oculta das listagens públicas"),
+        ),
+    ]
@@ -68,6 +68,9 @@ class Receita(models.Model):
     )
     imagem = models.URLField(max_length=600, null=True)
     quantidade_visualizacao = models.IntegerField(default=0, null=False)
+    # Moderação: denúncias pendentes e ocultação automática ao atingir o limite configurado
+    denuncias_pendentes = models.PositiveIntegerField(default=0, null=False)
+    oculta = models.BooleanField(default=False, help_text='Receita oculta das listagens públicas')
 
     def __str__(self):
         return self.titulo
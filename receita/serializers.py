@@ -27,7 +27,10 @@ class ReceitaSerializer(serializers.ModelSerializer):
             },
             'tempo_preparo': {'required': True},  # Campo obrigatório
             'dificuldade': {'required': True},  # Campo obrigatório
-            'quantidade_visualizacao': {'read_only': True}  # Somente leitura
+            'quantidade_visualizacao': {'read_only': True},  # Somente leitura
+            # Mantidos pela moderação de denúncias
+            'denuncias_pendentes': {'read_only': True},
+            'oculta': {'read_only': True}
         }
 
 # Serializer para o modelo ReceitaIngrediente
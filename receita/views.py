@@ -8,6 +8,12 @@ class ReceitaViewSet(viewsets.ModelViewSet):
     queryset = Receita.objects.all()
     serializer_class = ReceitaSerializer
 
+    def get_queryset(self):
+        # A listagem é pública: receitas ocultas pela moderação continuam acessíveis apenas pelo id
+        if self.action == 'list':
+            return Receita.objects.filter(oculta=False)
+        return super().get_queryset()
+
     @action(detail=True, methods=['post'])
     def adicionar_ingrediente(self, request, pk=None):
         """Adiciona um ingrediente a uma receita"""
@@ -38,8 +44,10 @@ from django.db.utils import OperationalError
 
 def health_check(request):
     try:
-        # Tenta fazer a consulta mais simples possível ao banco de dados
-        connection.cursor()
+        # Consulta mais simples possível; o cursor é fechado e, com pool, a conexão volta para o pool
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
         return JsonResponse({"status": "ok", "message": "Conexão com o banco de dados bem-sucedida!"})
     except OperationalError as e:
         # Se falhar, retorna o erro exato
@@ -4,12 +4,13 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError
-from django.db.models import Q
+from django.db.models import Q, Count
 from random import sample
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
 from drf_spectacular.types import OpenApiTypes
 from .models import Receita, ReceitaIngrediente
 from favorito.models import Favorito
+from kiItem.assincrono import APIViewAssincrona, em_paralelo
 from kiItem.serializers import ReceitaSerializer, ReceitaIngredienteSerializer
 
 @api_view(['GET'])
@@ -24,7 +25,8 @@ def api_root(request, format=None):
 
 # Views para a API de Receitas
 class ReceitaListCreateAPIView(generics.ListCreateAPIView):
-    queryset = Receita.objects.all()
+    # Receitas ocultas pela moderação ficam fora das listagens públicas
+    queryset = Receita.objects.filter(oculta=False)
     serializer_class = ReceitaSerializer
 
 class ReceitaRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
@@ -45,33 +47,34 @@ class GetReceitaUsuario(generics.ListAPIView):
         user_id = self.kwargs['user_id']  # Pega o valor <user_id> da URL
         return Receita.objects.filter(id_usuario=user_id)
 
-class ReceitaDetalhadaAPIView(APIView):
-    def get(self, request, pk):
-        try:
-            receita = Receita.objects.get(pk=pk)
-            ingredientes = ReceitaIngrediente.objects.filter(id_receita=receita).select_related('id_ingrediente')
-            favoritos_count = Favorito.objects.filter(id_receita=receita).count()
-
-            data = {
-                "id_receita": receita.id,
-                "titulo": receita.titulo,
-                "dificuldade": receita.dificuldade,
-                "ingredientes": [
-                    {
-                        "id_receita_ingrediente": ingrediente.id,
-                        "quantidade": ingrediente.quantidade,
-                        "unidade_medida": ingrediente.unidade_medida,
-                        "nome_ingrediente": ingrediente.id_ingrediente.nome,
-                    }
-                    for ingrediente in ingredientes
-                ],
-                "favorito": favoritos_count,
-            }
+class ReceitaDetalhadaAPIView(APIViewAssincrona):
+    async def get(self, request, pk):
+        # Receita, ingredientes e contagem de favoritos só dependem do pk: consultados ao mesmo tempo
+        receita, ingredientes, favoritos_count = await em_paralelo(
+            lambda: Receita.objects.filter(pk=pk).first(),
+            lambda: list(ReceitaIngrediente.objects.filter(id_receita=pk).select_related('id_ingrediente')),
+            lambda: Favorito.objects.filter(id_receita=pk).count(),
+        )
+        if receita is None:
+            raise NotFound(detail="Receita não encontrada.")
 
-            return Response(data)
+        data = {
+            "id_receita": receita.id,
+            "titulo": receita.titulo,
+            "dificuldade": receita.dificuldade,
+            "ingredientes": [
+                {
+                    "id_receita_ingrediente": ingrediente.id,
+                    "quantidade": ingrediente.quantidade,
+                    "unidade_medida": ingrediente.unidade_medida,
+                    "nome_ingrediente": ingrediente.id_ingrediente.nome,
+                }
+                for ingrediente in ingredientes
+            ],
+            "favorito": favoritos_count,
+        }
 
-        except Receita.DoesNotExist:
-            raise NotFound(detail="Receita não encontrada.")
+        return Response(data)
 
 @extend_schema(
     tags=['receitas'],
@@ -87,11 +90,11 @@ class ReceitaDetalhadaAPIView(APIView):
         OpenApiParameter(name='search', type=OpenApiTypes.STR, description='Busca por título da receita'),
     ]
 )
-class ReceitaFilterAPIView(APIView):
+class ReceitaFilterAPIView(APIViewAssincrona):
     """
     Endpoint para filtrar receitas com base em tipo, restrição alimentar, dificuldade, tempo de preparo e pesquisa por nome.
     """
-    def get(self, request):
+    async def get(self, request):
         tipo = request.query_params.get('tipo')
         restricoes_alimentares = request.query_params.getlist('restricao_alimentar')  # Aceita múltiplos valores
         dificuldade = request.query_params.get('dificuldade')
@@ -130,7 +133,7 @@ class ReceitaFilterAPIView(APIView):
                 raise ValidationError({"tempo_preparo": "O tempo de preparo deve ser um número inteiro representando minutos."})
 
         # Construção do filtro dinâmico
-        filtros = Q()
+        filtros = Q(oculta=False)
         if tipo:
             filtros &= Q(tipo__iexact=tipo)  # Combina com AND lógico
         if restricoes_alimentares:
@@ -172,11 +175,11 @@ class ReceitaFilterAPIView(APIView):
 
         # Consulta ao banco de dados
         try:
-            receitas = Receita.objects.filter(filtros).select_related('id_usuario').distinct()
+            receitas = [receita async for receita in Receita.objects.filter(filtros).select_related('id_usuario').distinct()]
         except Exception as e:
             raise ValidationError({"error": f"Erro ao consultar receitas: {str(e)}"})
 
-        if not receitas.exists():
+        if not receitas:
             return Response({"message": "Nenhuma receita encontrada com os filtros fornecidos."}, status=404)
 
         serializer = ReceitaSerializer(receitas, many=True)
@@ -188,7 +191,7 @@ class ReceitaMaisAcessadasAPIView(APIView):
     """
     def get(self, request):
         try:
-            receitas = Receita.objects.all().order_by('-quantidade_visualizacao')
+            receitas = Receita.objects.filter(oculta=False).order_by('-quantidade_visualizacao')
             serializer = ReceitaSerializer(receitas, many=True)
             return Response(serializer.data)
         except Exception as e:
@@ -200,7 +203,7 @@ class ReceitaAleatoriaAPIView(APIView):
     """
     def get(self, request):
         try:
-            receitas = list(Receita.objects.all())
+            receitas = list(Receita.objects.filter(oculta=False))
             random_receitas = sample(receitas, min(len(receitas), 10))  # Seleciona até 10 receitas aleatórias
             serializer = ReceitaSerializer(random_receitas, many=True)
             return Response(serializer.data)
@@ -217,21 +220,27 @@ class ReceitaAleatoriaAPIView(APIView):
         )
     }
 )
-class ReceitaCategoriasAPIView(APIView):
+class ReceitaCategoriasAPIView(APIViewAssincrona):
     """
     Endpoint para listar todas as categorias disponíveis para receitas.
     """
-    def get(self, request):
+    async def get(self, request):
         try:
             categorias = [
                 {"codigo": codigo, "nome": nome} 
                 for codigo, nome in Receita.CATEGORIA_CHOICES
             ]
             
-            # Estatísticas por categoria (opcional)
+            # Estatísticas por categoria: uma única consulta agrupada em vez de uma contagem por categoria
+            contagens = {
+                categoria: quantidade async for categoria, quantidade in
+                Receita.objects.filter(oculta=False).order_by()
+                .values('categoria').annotate(quantidade=Count('id'))
+                .values_list('categoria', 'quantidade')
+            }
             estatisticas = []
             for codigo, nome in Receita.CATEGORIA_CHOICES:
-                count = Receita.objects.filter(categoria=codigo).count()
+                count = contagens.get(codigo, 0)
                 estatisticas.append({
                     "codigo": codigo,
                     "nome": nome,
@@ -265,11 +274,11 @@ class ReceitaCategoriasAPIView(APIView):
         404: OpenApiResponse(description="Categoria não encontrada ou sem receitas")
     }
 )
-class ReceitaPorCategoriaAPIView(APIView):
+class ReceitaPorCategoriaAPIView(APIViewAssincrona):
     """
     Endpoint para listar receitas de uma categoria específica.
     """
-    def get(self, request, categoria):
+    async def get(self, request, categoria):
         try:
             # Valida se a categoria existe
             valid_categorias = [choice[0] for choice in Receita.CATEGORIA_CHOICES]
@@ -280,9 +289,11 @@ class ReceitaPorCategoriaAPIView(APIView):
                 )
             
             # Busca receitas da categoria
-            receitas = Receita.objects.filter(categoria=categoria).select_related('id_usuario')
+            receitas = [
+                receita async for receita in Receita.objects.filter(categoria=categoria, oculta=False).select_related('id_usuario')
+            ]
             
-            if not receitas.exists():
+            if not receitas:
                 categoria_nome = dict(Receita.CATEGORIA_CHOICES).get(categoria, categoria)
                 return Response({
                     "message": f"Nenhuma receita encontrada na categoria '{categoria_nome}'.",
@@ -296,7 +307,7 @@ class ReceitaPorCategoriaAPIView(APIView):
             
             return Response({
                 "categoria": {"codigo": categoria, "nome": categoria_nome},
-                "total_receitas": receitas.count(),
+                "total_receitas": len(receitas),
                 "receitas": serializer.data
             })
             